@@ -0,0 +1,81 @@
+"""The objects in this module describe issue attachments, as returned by
+Bugjira.iter_attachments, and the helpers used to stream their contents to
+files in fixed-size chunks.
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+# The suffix of the file an attachment is downloaded to until it is complete
+PARTIAL_SUFFIX = ".part"
+
+
+class Attachment(BaseModel):
+    """An attachment of a bugzilla bug or a JIRA issue. The url is where the
+    attachment's contents are downloaded from. If the sha256 hex digest of
+    the contents is known (e.g. because it was recorded when the file was
+    uploaded), it can be set so that downloads are verified against it.
+    """
+
+    key: str
+    id: str
+    filename: str
+    size: Optional[int] = None
+    content_type: Optional[str] = None
+    url: Optional[str] = None
+    sha256: Optional[str] = None
+    # The name of the configured instance the issue belongs to, or None for
+    # the default instance of its backend
+    instance: Optional[str] = None
+
+
+class AttachmentResult(BaseModel):
+    """The outcome of downloading a single attachment. Exactly one of the
+    path or error attributes is set.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    attachment: Attachment
+    path: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the attachment was downloaded"""
+        return self.error is None
+
+
+def sha256_file(path, chunk_size):
+    """Return a sha256 hash object updated with the contents of a file, read
+    in chunks so that the whole file is never held in memory.
+
+    :param path: The file to hash
+    :type path: str
+    :param chunk_size: The number of bytes to read at a time
+    :type chunk_size: int
+    :return: The hash object, which can be updated with further data
+    :rtype: hashlib.sha256
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
+
+
+def attachment_filename(attachment) -> str:
+    """Return a file name for an attachment that is unique among the
+    attachments of all issues, and that cannot escape the directory it is
+    joined to.
+
+    :param attachment: The attachment
+    :type attachment: Attachment
+    :return: The file name
+    :rtype: str
+    """
+    filename = os.path.basename(attachment.filename.replace("\\", "/"))
+    return f"{attachment.key}-{attachment.id}-{filename or 'attachment'}"
@@ -1,29 +1,306 @@
+import contextvars
+import hashlib
+import inspect
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+import requests
 from bugzilla import Bugzilla
 from jira import JIRA
+from jira.resources import Issue as JiraResourceIssue
 
+from bugjira import deadline, field_generator
+from bugjira.attachment import PARTIAL_SUFFIX, Attachment, sha256_file
+from bugjira.comment import Comment, is_new, since_for
+from bugjira.common import BUGZILLA, JIRA as JIRA_TYPE
+from bugjira.circuit import CircuitStats
+from bugjira.concurrency import LimiterStats
 from bugjira.config import Config
 from bugjira.exceptions import (
+    BrokerAttachmentException,
+    BrokerCircuitOpenException,
     BrokerInitException,
     BrokerLookupException,
-    BrokerAddCommentException
+    BrokerAddCommentException,
+    BrokerCreateException,
+    BrokerUpdateException
+)
+from bugjira.hedging import HedgeStats, Hedger, is_hedging
+from bugjira.history import HistoryRecord
+from bugjira.issue import (
+    BugzillaIssue,
+    Issue,
+    JiraIssue,
+    LazyBugzillaIssue,
+    LazyIssue,
+    LazyJiraIssue
+)
+from bugjira.jsonstream import JsonArrayStream
+from bugjira.lazy import LazyLoader
+from bugjira.links import (
+    BLOCKS,
+    DEPENDS_ON,
+    EXTERNAL,
+    REMOTE,
+    IssueLink,
+    LinkResult
+)
+from bugjira.result import IssueResult
+from bugjira.scheduling import ContextThreadPoolExecutor
+from bugjira.session import ClientPool, register_lock_owner
+from bugjira.transport import (
+    PoolStats,
+    configure_session,
+    get_circuit_breaker,
+    get_dispatcher,
+    get_limiter,
+    get_pool_stats,
+    get_timeout,
+    get_transport_config
+)
+from bugjira.util import (
+    bugzilla_key_from_url,
+    is_jira_key,
+    jira_update_value,
+    normalize_value,
+    parse_datetime
 )
-from bugjira.issue import BugzillaIssue, Issue, JiraIssue
+
+# The HTTP status returned when a server honours a Range header
+PARTIAL_CONTENT = 206
+# The timestamp format bugzilla accepts for last_change_time in queries
+BUGZILLA_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# The brokers whose dispatcher slots the current context holds (see
+# Broker.dispatch). A context variable rather than a thread local, so that
+# it follows a dispatched call into the thread bugjira.deadline.call_within
+# runs it in.
+_dispatching = contextvars.ContextVar("bugjira_dispatching",
+                                      default=frozenset())
+
+
+def _backend_error(exception_class, error) -> Exception:
+    """Return the exception to raise, or report in a result, for an error
+    raised by a backend call. Errors are wrapped in an exception_class,
+    except BrokerCircuitOpenException, which is passed on as it is so that
+    callers can tell a backend that is down from a failed call.
+
+    :param exception_class: A BrokerException subclass
+    :type exception_class: type
+    :param error: The error
+    :type error: Exception
+    :rtype: Exception
+    """
+    if isinstance(error, BrokerCircuitOpenException):
+        return error
+    return exception_class(error)
 
 
 class Broker:
-    def __init__(self, config=None, backend=None) -> None:
+    # The field generator type used to resolve configured field names
+    generator_type = None
+    # The Issue subclasses for this broker's backend, and for its lazy
+    # issues (see get_lazy_issue)
+    issue_class = Issue
+    lazy_issue_class = LazyIssue
+    # The default size of the thread pools used for concurrent operations
+    max_workers = 8
+    # The maximum number of keys looked up in one bulk lookup request
+    bulk_lookup_size = 100
+    # The default number of issues requested per page when searching
+    page_size = 100
+    # The number of bytes copied at a time when transferring attachments
+    attachment_chunk_size = 1024 * 1024
+
+    def __init__(self, config=None, backend=None, instance=None) -> None:
         """Init method for the Broker class
 
         :param config: An optional config dict, defaults to None
         :type config: dict, optional
         :param backend: An optional API backend instance, defaults to None
         :type backend: object, optional
+        :param instance: The name of the configured instance the broker talks
+            to, defaults to None for the default instance
+        :type instance: str, optional
         :raises BrokerInitException: If neither a config nor a backend is
             provided
         """
         if config is None and backend is None:
             raise BrokerInitException("API backend or config dict required")
-        self.backend = backend
+        self.config = config
+        self._backend = backend
+        self._clients = None
+        self.instance = instance
+        # The adaptive concurrency limit of the requests sent by the clients
+        # the broker creates, if enabled (see bugjira.concurrency)
+        self.limiter = None
+        # Caps the requests in flight, and queues the ones beyond the cap by
+        # priority class, while there is no limiter, if enabled (see
+        # bugjira.transport.get_dispatcher)
+        self.dispatcher = None
+        # Fails requests at once while the backend is down, if enabled (see
+        # bugjira.circuit)
+        self.circuit = None
+        # Hedges idempotent reads (see bugjira.hedging)
+        self.hedger = Hedger(self.generator_type, instance)
+        self._fields = None
+        self._lazy_loader = LazyLoader(self)
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    @property
+    def backend(self):
+        """The API backend client. A broker created from a config gives every
+        thread its own client from a bugjira.session.ClientPool, and creates
+        new clients in child processes after fork(), so it can be shared by
+        many threads and processes. A backend passed to the constructor (or
+        assigned here) is used as is, by every thread.
+        """
+        if self._backend is None and self._clients is not None:
+            return self._clients.get()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend) -> None:
+        self._backend = backend
+
+    def _use_client_pool(self, create_client) -> None:
+        """Create the backend clients with a pool instead of sharing a single
+        client. The calling thread's client is created immediately, so that
+        connection and authentication errors are raised right away.
+
+        :param create_client: A callable that returns a new client
+        :type create_client: Callable
+        """
+        self._clients = ClientPool(create_client)
+        self._clients.get()
+
+    @property
+    def enforces_deadlines(self) -> bool:
+        """True if the requests of the broker's clients are cut short at the
+        current deadline (see bugjira.deadline), which is the case for the
+        clients the broker creates from its config, but not for a backend
+        passed to it
+        """
+        return self._owns_clients
+
+    @property
+    def _owns_clients(self) -> bool:
+        """True if the broker's clients were created from its config, so that
+        their requests go through bugjira.transport.BrokerHTTPAdapter
+        """
+        return self._backend is None and self._clients is not None
+
+    def within_deadline(self, fn, *args):
+        """Call fn(*args), a call to the broker, making sure that it returns
+        or raises by the current deadline. If the broker does not enforce
+        deadlines, the call is dispatched (see dispatch) and waited for
+        until the deadline at most (see bugjira.deadline.call_within).
+
+        :param fn: The call
+        :type fn: Callable
+        :raises bugjira.deadline.DeadlineExceeded: If the deadline passes
+            before a backend passed to the broker answers
+        :return: What fn returns
+        """
+        if self.enforces_deadlines:
+            return fn(*args)
+        return deadline.call_within(self.dispatch, fn, *args)
+
+    def dispatch(self, fn, *args):
+        """Call fn(*args), a call to the broker, in a slot of the broker's
+        Dispatcher, if it has one, so that it waits its turn by priority
+        class. The requests of the clients the broker creates take a slot
+        each as they are sent, so this only applies to a backend passed to
+        the broker, whose calls take a slot each instead. A call dispatched
+        while the current context already holds a slot of the broker uses
+        that slot.
+
+        :param fn: The call
+        :type fn: Callable
+        :raises bugjira.deadline.DeadlineExceeded: If the current deadline
+            passes while the call is waiting for a slot
+        :return: What fn returns
+        """
+        held = _dispatching.get()
+        if self._owns_clients or self.dispatcher is None or self in held:
+            return fn(*args)
+        with self.dispatcher.slot():
+            # Calls dispatched from within the call, e.g. a lazy lookup
+            # during an update, reuse its slot rather than waiting for
+            # another one, which could never come if every slot is held
+            token = _dispatching.set(held | {self})
+            try:
+                return fn(*args)
+            finally:
+                _dispatching.reset(token)
+
+    def iter_dispatched(self, iterable):
+        """Yield the items of an iterable whose items are computed by calls
+        to the broker, e.g. its search_pages method, dispatching the
+        computation of each one (see dispatch)
+
+        :param iterable: The iterable
+        :type iterable: Iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            try:
+                item = self.dispatch(next, iterator)
+            except StopIteration:
+                return
+            yield item
+
+    def _get_session(self, client):
+        """Return the requests session of a backend client
+
+        :param client: A backend client
+        :type client: object
+        :return: The session, or None if the client does not have one
+        :rtype: requests.Session
+        """
+        # Override in subclasses
+        return None
+
+    def concurrency_stats(self) -> LimiterStats:
+        """Return the state of the broker's adaptive concurrency limit
+
+        :return: The stats, or None if the broker has no limiter
+        :rtype: bugjira.concurrency.LimiterStats
+        """
+        return self.limiter.stats() if self.limiter else None
+
+    def circuit_stats(self) -> CircuitStats:
+        """Return the state of the broker's circuit breaker
+
+        :return: The stats, or None if the broker has no circuit breaker
+        :rtype: bugjira.circuit.CircuitStats
+        """
+        return self.circuit.stats() if self.circuit else None
+
+    def hedging_stats(self) -> [HedgeStats]:
+        """Return the broker's hedging statistics, one entry per operation
+
+        :rtype: [bugjira.hedging.HedgeStats]
+        """
+        return self.hedger.stats()
+
+    def pool_stats(self) -> [PoolStats]:
+        """Return the statistics of the HTTP connection pools of the clients
+        of every thread using this broker (see bugjira.transport.PoolStats)
+
+        :return: One PoolStats per host
+        :rtype: [bugjira.transport.PoolStats]
+        """
+        if self._backend is None and self._clients is not None:
+            clients = self._clients.clients()
+        else:
+            clients = [self._backend]
+        sessions = [self._get_session(client) for client in clients]
+        return get_pool_stats([session for session in sessions if session],
+                              self.generator_type, self.instance)
 
     def add_comment(self, issue, comment) -> None:
         # Override in subclasses
@@ -33,11 +310,351 @@ class Broker:
         # Override in subclasses
         pass
 
+    def _wrap_issue(self, key, backend_issue) -> Issue:
+        # Override in subclasses
+        pass
+
+    def issue_from_raw(self, raw) -> Issue:
+        """Build an issue from the decoded JSON for one issue, e.g. as
+        pushed by a webhook. Subclasses whose backend's JSON can be wrapped
+        without a request override this.
+
+        :param raw: The decoded JSON for the issue
+        :type raw: dict
+        :raises ValueError: If issues of this backend cannot be built from
+            their JSON
+        :return: The issue
+        :rtype: bugjira.issue.Issue
+        """
+        raise ValueError(f"{self.generator_type} issues cannot be built "
+                         "from raw JSON")
+
+    def get_lazy_issue(self, key) -> Issue:
+        """Return an issue that is only looked up when its backend data is
+        first read, together with every other lazy issue of this broker that
+        is still waiting to be looked up (see bugjira.lazy.LazyLoader)
+
+        :param key: The key of the issue
+        :type key: str
+        :return: The lazy issue
+        :rtype: bugjira.issue.LazyIssue
+        """
+        issue = self.lazy_issue_class(key=key, instance=self.instance)
+        self._lazy_loader.add(issue)
+        return issue
+
+    def get_issues(self, keys) -> [IssueResult]:
+        """Look up many issues using as few backend requests as possible. The
+        keys are split into chunks of at most bulk_lookup_size keys, and the
+        chunks are looked up concurrently. Within a
+        bugjira.hedging.hedging() block, each chunk lookup is hedged.
+
+        :param keys: The keys to look up
+        :type keys: [str]
+        :return: A list of IssueResult objects in the same order as the input
+            keys
+        :rtype: [IssueResult]
+        """
+        chunks = [keys[start:start + self.bulk_lookup_size]
+                  for start in range(0, len(keys), self.bulk_lookup_size)]
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return [result
+                    for chunk in executor.map(self._lookup_chunk, chunks)
+                    for result in chunk]
+
+    def _lookup_chunk(self, keys) -> [IssueResult]:
+        if is_hedging():
+            return self.hedger.call("get_issues", self._get_issue_chunk, keys)
+        return self._get_issue_chunk(keys)
+
+    def _get_issue_chunk(self, keys) -> [IssueResult]:
+        # Override in subclasses
+        pass
+
+    def get_updated(self, keys, since) -> [Issue]:
+        # Override in subclasses
+        pass
+
+    def get_links(self, issues, link_types=None, remote=True) -> dict:
+        # Override in subclasses
+        pass
+
+    def add_links(self, links) -> [LinkResult]:
+        # Override in subclasses
+        pass
+
+    def search_pages(self, query, page_size=None, field_ids=None, start=0):
+        # Override in subclasses
+        pass
+
+    def update_issues(self, issues, fields) -> [IssueResult]:
+        # Override in subclasses
+        pass
+
+    def create_issues(self, specs) -> [IssueResult]:
+        # Override in subclasses
+        pass
+
+    def get_comments(self, issues, since=None):
+        # Override in subclasses
+        pass
+
+    def get_history(self, issues, field_names=None):
+        # Override in subclasses
+        pass
+
+    def _get_history_names(self, field_names) -> dict:
+        """Return a dict that maps the names a backend's history uses for the
+        requested fields to their configured names, or None if the broker has
+        no field configuration and every change should be returned.
+
+        :param field_names: The configured field names to include, or None
+            for every configured field
+        :type field_names: [str]
+        :raises ValueError: If a field name is not configured for the
+            backend, or if field names are given to a broker without a config
+        :return: A dict of configured field names, or None
+        :rtype: dict
+        """
+        if not self.config and field_names is None:
+            return None
+        names = {}
+        for field in self.get_fields(field_names):
+            names[self._get_field_id(field)] = field.name
+            names[field.name] = field.name
+        return names
+
+    def get_attachments(self, issue) -> [Attachment]:
+        # Override in subclasses
+        pass
+
+    def upload_attachment(self, issue, path, filename=None,
+                          description="") -> Attachment:
+        # Override in subclasses
+        pass
+
+    def _open_attachment(self, attachment, headers):
+        # Override in subclasses
+        pass
+
+    def download_attachment(self, attachment, dest, resume=True) -> str:
+        """Stream an attachment's contents to a file, attachment_chunk_size
+        bytes at a time. The contents are written to dest + ".part", which is
+        only renamed to dest once its length (and sha256 digest, if the
+        attachment has one) has been verified. If a partial file is left over
+        from an interrupted download, only the remaining bytes are requested
+        using an HTTP Range header; servers that ignore the range send the
+        whole attachment again.
+
+        :param attachment: The attachment to download
+        :type attachment: bugjira.attachment.Attachment
+        :param dest: The file to write
+        :type dest: str
+        :param resume: If True, continue from a partial file left by an
+            earlier download, defaults to True
+        :type resume: bool, optional
+        :raises BrokerAttachmentException: If the download fails or the
+            downloaded contents do not match the attachment's size or sha256
+            digest. A partial file that is merely short is kept so that the
+            download can be resumed.
+        :return: The path of the downloaded file
+        :rtype: str
+        """
+        partial = dest + PARTIAL_SUFFIX
+        offset = 0
+        if resume and os.path.exists(partial):
+            offset = os.path.getsize(partial)
+        if attachment.size is not None and offset > attachment.size:
+            offset = 0
+        try:
+            digest = self._download_to(attachment, partial, offset)
+        except Exception as e:
+            raise _backend_error(BrokerAttachmentException, e)
+        size = os.path.getsize(partial)
+        if attachment.size is not None and size != attachment.size:
+            if size > attachment.size:
+                os.remove(partial)
+            raise BrokerAttachmentException(
+                f"Attachment {attachment.id} of {attachment.key} is {size} "
+                f"bytes, expected {attachment.size}")
+        if digest is not None and \
+                digest.hexdigest() != attachment.sha256.lower():
+            os.remove(partial)
+            raise BrokerAttachmentException(
+                f"Attachment {attachment.id} of {attachment.key} does not "
+                f"match its sha256 digest")
+        os.replace(partial, dest)
+        return dest
+
+    def _download_to(self, attachment, partial, offset):
+        """Append an attachment's contents from offset onwards to a partial
+        file, hashing the file's contents along the way if the attachment has
+        a sha256 digest.
+
+        :param attachment: The attachment to download
+        :type attachment: bugjira.attachment.Attachment
+        :param partial: The partial file
+        :type partial: str
+        :param offset: The number of bytes already in the partial file
+        :type offset: int
+        :return: A sha256 hash of the partial file's contents, or None if the
+            attachment has no sha256 digest
+        :rtype: hashlib.sha256
+        """
+        digest = None
+        if attachment.sha256:
+            digest = hashlib.sha256()
+            if offset:
+                digest = sha256_file(partial, self.attachment_chunk_size)
+        if offset and offset == attachment.size:
+            return digest
+        # Ask for the stored bytes so that the length can be verified
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        response = self._open_attachment(attachment, headers)
+        try:
+            response.raise_for_status()
+            if offset and response.status_code != PARTIAL_CONTENT:
+                offset = 0
+                if digest is not None:
+                    digest = hashlib.sha256()
+            with open(partial, "ab" if offset else "wb") as target:
+                for chunk in response.iter_content(
+                        self.attachment_chunk_size):
+                    target.write(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+        finally:
+            response.close()
+        return digest
+
+    def project(self, issue, field_names=None) -> dict:
+        """Return a dict containing the issue's key and the normalized values
+        of the requested configured fields.
+
+        :param issue: The issue to project
+        :type issue: bugjira.issue.Issue
+        :param field_names: The configured field names to include, defaults
+            to None, which includes every configured field
+        :type field_names: [str], optional
+        :raises ValueError: If a field name is not configured for the backend
+        :return: A dict mapping "key" and each field name to a value
+        :rtype: dict
+        """
+        row = {"key": issue.key}
+        for field in self.get_fields(field_names):
+            row[field.name] = normalize_value(
+                self.get_field_value(issue, field))
+        return row
+
+    def get_field_value(self, issue, field):
+        # Override in subclasses
+        pass
+
+    def update_value(self, field, value):
+        """Return a value read from a field of an issue (see
+        get_field_value) in the form update_issues takes for that field.
+        Subclasses override this when the backend takes another form than
+        the normalized value.
+
+        :param field: A field from the field registry
+        :type field: bugjira.field.BugjiraField
+        :param value: The field value
+        :type value: object
+        :return: The value to pass to update_issues
+        :rtype: object
+        """
+        return normalize_value(value)
+
+    def get_fields(self, field_names=None) -> list:
+        """Return fields from the field registry
+
+        :param field_names: The configured names (or backend identifiers) of
+            the fields to return, defaults to None, which returns every
+            configured field
+        :type field_names: [str], optional
+        :raises ValueError: If a field name is not configured for the backend
+        :return: A list of BugjiraField instances
+        :rtype: list
+        """
+        if field_names is None:
+            self._get_field_map()
+            return self._fields
+        field_map = self._get_field_map()
+        fields = []
+        for name in field_names:
+            field = field_map.get(name)
+            if field is None:
+                raise ValueError(
+                    f"{name} is not a configured {self.generator_type} field"
+                )
+            fields.append(field)
+        return fields
+
+    def resolve_fields(self, fields) -> dict:
+        """Translate a dict keyed by configured field names into a dict keyed
+        by the identifiers the backend uses for those fields.
+
+        :param fields: A dict mapping configured field names to values
+        :type fields: dict
+        :raises ValueError: If a field name is not present in the field
+            configuration for this broker's backend
+        :return: A dict mapping backend field identifiers to values
+        :rtype: dict
+        """
+        resolved = {}
+        for field, value in zip(self.get_fields(list(fields)),
+                                fields.values()):
+            resolved[self._get_field_id(field)] = value
+        return resolved
+
+    def _get_field_map(self) -> dict:
+        """Return a dict that maps both the configured name and the backend
+        identifier of each field in the field registry to the field itself.
+        The fields are loaded from the registry once and then cached.
+
+        :raises ValueError: If the broker was created without a config, since
+            the field registry cannot be loaded without one
+        :return: A dict of BugjiraField instances
+        :rtype: dict
+        """
+        if not self.config:
+            raise ValueError("field names can only be resolved when the "
+                             "broker is created with a config")
+        if self._fields is None:
+            with self._lock:
+                if self._fields is None:
+                    generator = field_generator.factory.get_field_generator(
+                        self.generator_type, self.config
+                    )
+                    self._fields = generator.get_fields()
+        field_map = {}
+        for field in self._fields:
+            field_map[self._get_field_id(field)] = field
+            field_map[field.name] = field
+        return field_map
+
+    def _get_field_id(self, field) -> str:
+        """Return the identifier the backend uses for the input field
+
+        :param field: A field from the field registry
+        :type field: bugjira.field.BugjiraField
+        :return: The backend identifier for the field
+        :rtype: str
+        """
+        return field.name
+
 
 class BugzillaBroker(Broker):
     """A Broker for interacting with bugzilla"""
 
-    def __init__(self, config=None, backend=None) -> None:
+    generator_type = BUGZILLA
+    issue_class = BugzillaIssue
+    lazy_issue_class = LazyBugzillaIssue
+    bulk_lookup_size = 500
+
+    def __init__(self, config=None, backend=None, instance=None) -> None:
         """Init method for the BugzillaBroker class
 
         :param config: A dict containing config information for the bugzilla
@@ -46,13 +663,48 @@ class BugzillaBroker(Broker):
         :param backend: A pre-initialized bugzilla api backend object, defaults
             to None
         :type backend: bugzilla.Bugzilla, optional
+        :param instance: The name of the configured instance, defaults to
+            None for the default instance
+        :type instance: str, optional
         """
-        super().__init__(config, backend)
+        super().__init__(config, backend, instance)
         if self.backend is None:
             config = Config.from_config(config_dict=config)
             url = config.get("bugzilla").get("URL")
             api_key = config.get("bugzilla").get("api_key")
-            self.backend = Bugzilla(url, api_key=api_key)
+            transport = get_transport_config(config.get("bugzilla"))
+            self.limiter = get_limiter(config.get("bugzilla"), BUGZILLA,
+                                       instance)
+            self.dispatcher = get_dispatcher(config.get("bugzilla"))
+            self.circuit = get_circuit_breaker(config.get("bugzilla"),
+                                               BUGZILLA, instance)
+            self._use_client_pool(
+                lambda: self._create_client(url, api_key, transport))
+        elif config and config.get("bugzilla"):
+            # Calls to a backend passed to the broker can be capped too
+            self.dispatcher = get_dispatcher(config.get("bugzilla"))
+
+    def _create_client(self, url, api_key, transport) -> Bugzilla:
+        """Create a bugzilla client whose session uses the transport settings
+
+        :param url: The bugzilla URL
+        :type url: str
+        :param api_key: The bugzilla API key
+        :type api_key: str
+        :param transport: The transport settings
+        :type transport: bugjira.config.TransportConfig
+        :return: The client
+        :rtype: bugzilla.Bugzilla
+        """
+        session = requests.Session()
+        configure_session(session, transport,
+                          self.limiter or self.dispatcher, self.circuit)
+        # The session's adapters replace the timeout python-bugzilla sends
+        # every request with (300 seconds) by the configured one
+        return Bugzilla(url, api_key=api_key, requests_session=session)
+
+    def _get_session(self, client):
+        return client.get_requests_session()
 
     def add_comment(self, issue, comment) -> None:
         """Adds a comment to an existing Issue
@@ -68,7 +720,7 @@ class BugzillaBroker(Broker):
             update = self.backend.build_update(comment=comment)
             self.backend.update_bugs([issue.key], update)
         except Exception as e:
-            raise BrokerAddCommentException(e)
+            raise _backend_error(BrokerAddCommentException, e)
 
     def get_issue(self, key) -> BugzillaIssue:
         """Return an Issue that wraps a bugzilla bug returned by the backend
@@ -83,14 +735,441 @@ class BugzillaBroker(Broker):
         try:
             bug = self.backend.getbug(key)
         except Exception as e:
-            raise BrokerLookupException(e)
-        return BugzillaIssue(key=key, bugzilla=bug)
+            raise _backend_error(BrokerLookupException, e)
+        return self._wrap_issue(key, bug)
+
+    def _wrap_issue(self, key, backend_issue) -> BugzillaIssue:
+        """Return a BugzillaIssue of this broker's instance that wraps a bug
+        returned by the backend
+        """
+        return BugzillaIssue(key=key, bugzilla=backend_issue,
+                             instance=self.instance)
+
+    def _get_issue_chunk(self, keys) -> [IssueResult]:
+        """Look up a chunk of bugs with a single getbugs call
+
+        :param keys: The bugzilla bug ids to look up
+        :type keys: [str]
+        :return: A list of IssueResult objects in the same order as the input
+            keys
+        :rtype: [IssueResult]
+        """
+        try:
+            bugs = self.backend.getbugs(keys, permissive=True)
+        except Exception as e:
+            error = _backend_error(BrokerLookupException, e)
+            return [IssueResult(key=key, error=error) for key in keys]
+        found = {str(bug.id): bug for bug in bugs if bug}
+        results = []
+        for key in keys:
+            bug = found.get(key)
+            if bug is None:
+                error = BrokerLookupException(f"Bug {key} was not found")
+                results.append(IssueResult(key=key, error=error))
+            else:
+                results.append(IssueResult(
+                    key=key, issue=self._wrap_issue(key, bug)))
+        return results
+
+    def get_updated(self, keys, since) -> [BugzillaIssue]:
+        """Return the bugs among keys that have changed since a time, using
+        one query for each chunk of up to bulk_lookup_size bugs
+
+        :param keys: The bugzilla bug ids to check
+        :type keys: [str]
+        :param since: The time, naive times being taken to be UTC
+        :type since: datetime.datetime
+        :raises BrokerLookupException: If the backend's query method raises
+            an Exception
+        :return: The changed bugs
+        :rtype: [BugzillaIssue]
+        """
+        since = parse_datetime(since).strftime(BUGZILLA_DATE_FORMAT)
+        issues = []
+        for start in range(0, len(keys), self.bulk_lookup_size):
+            query = {"id": keys[start:start + self.bulk_lookup_size],
+                     "last_change_time": since}
+            try:
+                bugs = self.backend.query(query)
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            issues.extend(self._wrap_issue(str(bug.id), bug) for bug in bugs)
+        return issues
+
+    def get_links(self, issues, link_types=None, remote=True) -> dict:
+        """Return the links leading out of each of the input bugs. Dependency
+        links are reported as DEPENDS_ON and BLOCKS links, and external
+        tracker references to JIRA issues as EXTERNAL links. No requests are
+        made, since the links are part of the bug data.
+
+        :param issues: Issues that wrap bugzilla bugs
+        :type issues: [bugjira.issue.Issue]
+        :param link_types: The link types to return, defaults to None, which
+            returns all link types
+        :type link_types: [str], optional
+        :param remote: Unused, since bugzilla has no links that need requests
+            of their own, defaults to True
+        :type remote: bool, optional
+        :return: A dict mapping each issue key to a list of IssueLinks
+        :rtype: dict
+        """
+        links = {}
+        for issue in issues:
+            bug = issue.bugzilla
+            found = []
+            for link_type in DEPENDS_ON, BLOCKS:
+                for target in getattr(bug, link_type, None) or []:
+                    found.append(IssueLink(source=issue.key,
+                                           target=str(target),
+                                           link_type=link_type))
+            for external in getattr(bug, "external_bugs", None) or []:
+                target = str(external.get("ext_bz_bug_id", ""))
+                if is_jira_key(target):
+                    found.append(IssueLink(source=issue.key, target=target,
+                                           link_type=EXTERNAL))
+            links[issue.key] = [link for link in found if not link_types or
+                                link.link_type in link_types]
+        return links
+
+    def search_pages(self, query, page_size=None, field_ids=None, start=0):
+        """Run a bugzilla query one page at a time. Results are ordered by bug
+        id so that pages do not overlap.
+
+        :param query: A query dict, e.g. from the backend's build_query or
+            url_to_query methods
+        :type query: dict
+        :param page_size: The number of bugs per page, defaults to None,
+            which uses the broker's page_size
+        :type page_size: int, optional
+        :param field_ids: The bugzilla fields to fetch, defaults to None,
+            which fetches the backend's default fields
+        :type field_ids: [str], optional
+        :param start: The number of results to skip, defaults to 0
+        :type start: int, optional
+        :raises BrokerLookupException: If the backend's query method raises
+            an Exception
+        :yield: A list of BugzillaIssues for each page of results
+        :rtype: Iterator[[BugzillaIssue]]
+        """
+        page_size = page_size or self.page_size
+        query = dict(query)
+        query.setdefault("order", "bug_id")
+        if field_ids:
+            query["include_fields"] = ["id"] + list(field_ids)
+        offset = start
+        while True:
+            try:
+                bugs = self.backend.query(
+                    dict(query, limit=page_size, offset=offset))
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            if bugs:
+                yield [self._wrap_issue(str(bug.id), bug) for bug in bugs]
+            if len(bugs) < page_size:
+                return
+            offset += len(bugs)
+
+    def get_comments(self, issues, since=None):
+        """Fetch the comments on many bugs, using one request for each chunk
+        of up to bulk_lookup_size bugs. The chunks are fetched concurrently.
+        Every comment is fetched, since the backend's get_comments method
+        cannot pass new_since, and comments that are not newer than a bug's
+        since time are dropped here, so since saves no traffic on bugzilla.
+
+        :param issues: The issues whose comments to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param since: Only return comments created after this time, either
+            one datetime for every issue or a dict mapping issue keys to
+            datetimes, defaults to None
+        :type since: datetime.datetime or dict, optional
+        :raises BrokerLookupException: If the backend fails to return the
+            comments
+        :yield: The comments on each bug, oldest first, in the order of the
+            input issues
+        :rtype: Iterator[bugjira.comment.Comment]
+        """
+        keys = [issue.key for issue in issues]
+        chunks = [keys[start:start + self.bulk_lookup_size]
+                  for start in range(0, len(keys), self.bulk_lookup_size)]
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for comments in executor.map(
+                    lambda chunk: self._get_comment_chunk(chunk, since),
+                    chunks):
+                yield from comments
+
+    def _get_comment_chunk(self, keys, since) -> [Comment]:
+        """Fetch the comments on a chunk of bugs with a single request. The
+        backend's get_comments method cannot pass new_since, so comments
+        older than each bug's since time are dropped here instead.
+        """
+        thresholds = {key: since_for(since, key) for key in keys}
+        try:
+            response = self.backend.get_comments(keys)
+        except Exception as e:
+            raise _backend_error(BrokerLookupException, e)
+        bugs = (response or {}).get("bugs", {})
+        comments = []
+        for key in keys:
+            for raw in bugs.get(key, {}).get("comments", []):
+                comment = Comment(
+                    key=key, id=str(raw["id"]),
+                    author=raw.get("creator") or raw.get("author"),
+                    created=parse_datetime(raw.get("creation_time") or
+                                           raw.get("time")),
+                    body=raw.get("text") or "")
+                if is_new(comment, thresholds[key]):
+                    comments.append(comment)
+        return comments
+
+    def get_history(self, issues, field_names=None):
+        """Fetch the change history of many bugs, using one request for each
+        chunk of up to bulk_lookup_size bugs. The chunks are fetched
+        concurrently.
+
+        :param issues: The issues whose history to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param field_names: The configured names of the fields whose changes
+            to return, defaults to None, which returns changes to every
+            configured field
+        :type field_names: [str], optional
+        :raises ValueError: If a field name is not configured for bugzilla
+        :raises BrokerLookupException: If the backend fails to return the
+            history
+        :yield: The changes to each bug, oldest first, in the order of the
+            input issues
+        :rtype: Iterator[bugjira.history.HistoryRecord]
+        """
+        names = self._get_history_names(field_names)
+        keys = [issue.key for issue in issues]
+        chunks = [keys[start:start + self.bulk_lookup_size]
+                  for start in range(0, len(keys), self.bulk_lookup_size)]
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for records in executor.map(
+                    lambda chunk: self._get_history_chunk(chunk, names),
+                    chunks):
+                yield from records
+
+    def _get_history_chunk(self, keys, names) -> [HistoryRecord]:
+        """Fetch the history of a chunk of bugs with a single request"""
+        try:
+            response = self.backend.bugs_history_raw(keys)
+        except Exception as e:
+            raise _backend_error(BrokerLookupException, e)
+        histories = {str(bug.get("id")): bug.get("history") or []
+                     for bug in (response or {}).get("bugs", [])}
+        records = []
+        for key in keys:
+            for event in histories.get(key, []):
+                when = parse_datetime(event.get("when"))
+                for change in event.get("changes", []):
+                    field = change.get("field_name")
+                    if names is not None:
+                        field = names.get(field)
+                        if field is None:
+                            continue
+                    records.append(HistoryRecord(
+                        key=key, field=field,
+                        from_value=change.get("removed"),
+                        to_value=change.get("added"),
+                        when=when, who=event.get("who")))
+        return records
+
+    def get_attachments(self, issue) -> [Attachment]:
+        """Return the attachments of a bug. Only the attachments' metadata is
+        requested; their contents are fetched by download_attachment.
+
+        :param issue: An issue that wraps a bugzilla bug
+        :type issue: bugjira.issue.Issue
+        :raises BrokerLookupException: If the backend's get_attachments
+            method raises an Exception
+        :return: The bug's attachments
+        :rtype: [bugjira.attachment.Attachment]
+        """
+        try:
+            response = self.backend.get_attachments(
+                [issue.key], None, exclude_fields=["data"])
+        except Exception as e:
+            raise _backend_error(BrokerLookupException, e)
+        raw_attachments = (response or {}).get("bugs", {}).get(issue.key, [])
+        return [self._make_attachment(issue.key, raw["id"],
+                                      raw.get("file_name", ""),
+                                      size=raw.get("size"),
+                                      content_type=raw.get("content_type"))
+                for raw in raw_attachments]
+
+    def upload_attachment(self, issue, path, filename=None,
+                          description="") -> Attachment:
+        """Attach a file to a bug. Bugzilla's API only accepts attachment
+        contents inline in the request, so unlike downloads, uploads to
+        bugzilla hold the whole file in memory.
+
+        :param issue: The issue to attach the file to
+        :type issue: bugjira.issue.Issue
+        :param path: The file to upload
+        :type path: str
+        :param filename: The name to give the attachment, defaults to None,
+            which uses the file's base name
+        :type filename: str, optional
+        :param description: The attachment's description, defaults to "",
+            which uses the attachment's name
+        :type description: str, optional
+        :raises BrokerAttachmentException: If the backend's attachfile method
+            raises an Exception
+        :return: The new attachment
+        :rtype: bugjira.attachment.Attachment
+        """
+        filename = filename or os.path.basename(path)
+        try:
+            with open(path, "rb") as source:
+                attachment_id = self.backend.attachfile(
+                    [issue.key], source, description or filename,
+                    file_name=filename)
+        except Exception as e:
+            raise _backend_error(BrokerAttachmentException, e)
+        if isinstance(attachment_id, list):
+            attachment_id = attachment_id[0]
+        return self._make_attachment(issue.key, attachment_id, filename,
+                                     size=os.path.getsize(path))
+
+    def _make_attachment(self, key, attachment_id, filename,
+                         **kwargs) -> Attachment:
+        """Return an Attachment whose url points at bugzilla's
+        attachment.cgi page, which serves the raw attachment contents
+        """
+        base_url = self.backend.url
+        for api_path in "xmlrpc.cgi", "rest/", "rest":
+            if base_url.endswith(api_path):
+                base_url = base_url[:-len(api_path)]
+                break
+        return Attachment(
+            key=key, id=str(attachment_id), filename=filename,
+            url=f"{base_url}attachment.cgi?id={attachment_id}",
+            instance=self.instance, **kwargs)
+
+    def _open_attachment(self, attachment, headers):
+        """Start a streaming request for an attachment's contents using the
+        backend's HTTP session and credentials
+
+        :param attachment: The attachment to download
+        :type attachment: bugjira.attachment.Attachment
+        :param headers: Extra request headers, e.g. a Range header
+        :type headers: dict
+        :return: The response
+        :rtype: requests.Response
+        """
+        session = self.backend.get_requests_session()
+        return session.get(attachment.url, headers=headers, stream=True,
+                           params=self.backend._session.get_auth_params())
+
+    def get_field_value(self, issue, field):
+        """Return the value of a field of the bug wrapped by an issue
+
+        :param issue: An issue that wraps a bugzilla bug
+        :type issue: bugjira.issue.Issue
+        :param field: A bugzilla field from the field registry
+        :type field: bugjira.field.BugzillaField
+        :return: The field value, or None if the bug has no such field
+        :rtype: object
+        """
+        return getattr(issue.bugzilla, field.name, None)
+
+    def update_issues(self, issues, fields) -> [IssueResult]:
+        """Apply the same field changes to many bugs using a single multi-id
+        update_bugs call.
+
+        :param issues: The issues to update
+        :type issues: [bugjira.issue.Issue]
+        :param fields: A dict mapping configured field names to new values
+        :type fields: dict
+        :raises ValueError: If a field name is not configured for bugzilla
+        :return: A list of IssueResult objects in the same order as the input
+            issues
+        :rtype: [IssueResult]
+        """
+        update = self._build_request(self.backend.build_update,
+                                     self.resolve_fields(fields))
+        try:
+            response = self.backend.update_bugs(
+                [issue.key for issue in issues], update
+            )
+        except Exception as e:
+            error = _backend_error(BrokerUpdateException, e)
+            return [IssueResult(key=issue.key, error=error)
+                    for issue in issues]
+        changes = {str(bug.get("id")): bug
+                   for bug in (response or {}).get("bugs", [])
+                   if isinstance(bug, dict)}
+        return [IssueResult(key=issue.key, issue=issue,
+                            response=changes.get(issue.key))
+                for issue in issues]
+
+    def create_issues(self, specs) -> [IssueResult]:
+        """Create many bugs concurrently using a bounded thread pool, since
+        bugzilla has no bulk create method.
+
+        :param specs: A list of dicts mapping configured field names to the
+            values for each new bug
+        :type specs: [dict]
+        :raises ValueError: If a field name is not configured for bugzilla
+        :return: A list of IssueResult objects in the same order as the input
+            specs
+        :rtype: [IssueResult]
+        """
+        createinfos = [self._build_request(self.backend.build_createbug,
+                                           self.resolve_fields(spec))
+                       for spec in specs]
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._create_issue, createinfos))
+
+    def _create_issue(self, createinfo) -> IssueResult:
+        """Create a single bug
+
+        :param createinfo: A dict suitable for the backend's createbug method
+        :type createinfo: dict
+        :return: The result of the create operation
+        :rtype: IssueResult
+        """
+        try:
+            bug = self.backend.createbug(createinfo)
+            key = str(bug.id)
+        except Exception as e:
+            return IssueResult(
+                error=_backend_error(BrokerCreateException, e))
+        return IssueResult(key=key, issue=self._wrap_issue(key, bug))
+
+    def _build_request(self, builder, fields) -> dict:
+        """Return a request dict built by one of the backend's build_* methods.
+        Fields that the builder knows about are passed through it so that it
+        can handle differences between bugzilla versions; any other fields
+        (e.g. custom "cf_" fields) are added to the dict as-is.
+
+        :param builder: The backend method used to build the request, e.g.
+            build_update or build_createbug
+        :type builder: callable
+        :param fields: A dict mapping bugzilla field names to values
+        :type fields: dict
+        :return: The request dict
+        :rtype: dict
+        """
+        parameters = inspect.signature(builder).parameters
+        known = {k: v for k, v in fields.items() if k in parameters}
+        request = builder(**known)
+        request.update({k: v for k, v in fields.items() if k not in known})
+        return request
 
 
 class JiraBroker(Broker):
     """A Broker for interacting with JIRA"""
 
-    def __init__(self, config=None, backend=None) -> None:
+    generator_type = JIRA_TYPE
+    issue_class = JiraIssue
+    lazy_issue_class = LazyJiraIssue
+    # The maximum number of issues JIRA accepts in one bulk create request
+    bulk_create_size = 50
+    # The number of bytes read at a time when streaming search responses
+    stream_chunk_size = 65536
+
+    def __init__(self, config=None, backend=None, instance=None) -> None:
         """Init method for the JiraBroker class
 
         :param config: A dict containing config information for the Jira
@@ -99,13 +1178,52 @@ class JiraBroker(Broker):
         :param backend: A pre-initialized Jira api backend object, defaults to
             None
         :type backend: jira.JIRA, optional
+        :param instance: The name of the configured instance, defaults to
+            None for the default instance
+        :type instance: str, optional
         """
-        super().__init__(config, backend)
+        super().__init__(config, backend, instance)
         if self.backend is None:
             config = Config.from_config(config_dict=config)
             url = config.get("jira").get("URL")
             token_auth = config.get("jira").get("token_auth")
-            self.backend = JIRA(url, token_auth=token_auth)
+            transport = get_transport_config(config.get("jira"))
+            self.limiter = get_limiter(config.get("jira"), JIRA_TYPE,
+                                       instance)
+            self.dispatcher = get_dispatcher(config.get("jira"))
+            self.circuit = get_circuit_breaker(config.get("jira"), JIRA_TYPE,
+                                               instance)
+            self._use_client_pool(
+                lambda: self._create_client(url, token_auth, transport))
+        elif config and config.get("jira"):
+            # Calls to a backend passed to the broker can be capped too
+            self.dispatcher = get_dispatcher(config.get("jira"))
+
+    def _create_client(self, url, token_auth, transport) -> JIRA:
+        """Create a jira client whose session uses the transport settings
+
+        :param url: The jira URL
+        :type url: str
+        :param token_auth: The jira API token
+        :type token_auth: str
+        :param transport: The transport settings
+        :type transport: bugjira.config.TransportConfig
+        :return: The client
+        :rtype: jira.JIRA
+        """
+        proxies = None
+        if transport.proxy:
+            proxies = {"http": transport.proxy, "https": transport.proxy}
+        client = JIRA(url, token_auth=token_auth,
+                      timeout=get_timeout(transport), proxies=proxies)
+        session = self._get_session(client)
+        if session is not None:
+            configure_session(session, transport,
+                              self.limiter or self.dispatcher, self.circuit)
+        return client
+
+    def _get_session(self, client):
+        return getattr(client, "_session", None)
 
     def add_comment(self, issue, comment) -> None:
         """Adds a comment to an existing Issue
@@ -120,7 +1238,7 @@ class JiraBroker(Broker):
         try:
             self.backend.add_comment(issue.key, comment)
         except Exception as e:
-            raise BrokerAddCommentException(e)
+            raise _backend_error(BrokerAddCommentException, e)
 
     def get_issue(self, key) -> JiraIssue:
         """Return an Issue that wraps a JIRA issue returned by the backend
@@ -135,5 +1253,606 @@ class JiraBroker(Broker):
         try:
             issue = self.backend.issue(key)
         except Exception as e:
-            raise BrokerLookupException(e)
-        return JiraIssue(key=key, jira_issue=issue)
+            raise _backend_error(BrokerLookupException, e)
+        return self._wrap_issue(key, issue)
+
+    def _wrap_issue(self, key, backend_issue) -> JiraIssue:
+        """Return a JiraIssue of this broker's instance that wraps an issue
+        returned by the backend
+        """
+        return JiraIssue(key=key, jira_issue=backend_issue,
+                         instance=self.instance)
+
+    def _get_issue_chunk(self, keys) -> [IssueResult]:
+        """Look up a chunk of JIRA issues with a single JQL search
+
+        :param keys: The jira issue keys to look up
+        :type keys: [str]
+        :return: A list of IssueResult objects in the same order as the input
+            keys
+        :rtype: [IssueResult]
+        """
+        jql = f"key in ({','.join(keys)})"
+        try:
+            issues = self.backend.search_issues(jql, maxResults=len(keys),
+                                                validate_query=False)
+        except Exception as e:
+            error = _backend_error(BrokerLookupException, e)
+            return [IssueResult(key=key, error=error) for key in keys]
+        # JIRA returns keys in upper case regardless of the case used in the
+        # query
+        found = {issue.key.upper(): issue for issue in issues}
+        results = []
+        for key in keys:
+            jira_issue = found.get(key.upper())
+            if jira_issue is None:
+                error = BrokerLookupException(f"Issue {key} was not found")
+                results.append(IssueResult(key=key, error=error))
+            else:
+                results.append(IssueResult(
+                    key=key, issue=self._wrap_issue(key, jira_issue)))
+        return results
+
+    def get_updated(self, keys, since) -> [JiraIssue]:
+        """Return the JIRA issues among keys that have been updated since a
+        time, using one JQL search for each chunk of up to bulk_lookup_size
+        issues. JQL compares absolute times in the timezone of the user's
+        JIRA profile, so the search asks for the issues updated in the last
+        so many minutes instead, rounded up.
+
+        :param keys: The jira issue keys to check
+        :type keys: [str]
+        :param since: The time, naive times being taken to be UTC
+        :type since: datetime.datetime
+        :raises BrokerLookupException: If the backend's search_issues method
+            raises an Exception
+        :return: The updated issues
+        :rtype: [JiraIssue]
+        """
+        elapsed = datetime.now(timezone.utc) - parse_datetime(since)
+        minutes = max(1, math.ceil(elapsed.total_seconds() / 60))
+        issues = []
+        for start in range(0, len(keys), self.bulk_lookup_size):
+            chunk = keys[start:start + self.bulk_lookup_size]
+            jql = f'key in ({",".join(chunk)}) AND updated >= "-{minutes}m"'
+            try:
+                found = self.backend.search_issues(
+                    jql, maxResults=len(chunk), validate_query=False)
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            issues.extend(self._wrap_issue(issue.key, issue)
+                          for issue in found)
+        return issues
+
+    def get_links(self, issues, link_types=None, remote=True) -> dict:
+        """Return the links leading out of each of the input issues. JIRA
+        issue links are reported using the name of their link type, and remote
+        links to bugzilla bugs as REMOTE links. Remote links are not part of
+        the issue data, so they are fetched concurrently, one request per
+        issue, and only if REMOTE links are requested.
+
+        :param issues: Issues that wrap JIRA issues
+        :type issues: [bugjira.issue.Issue]
+        :param link_types: The link types to return, defaults to None, which
+            returns all link types
+        :type link_types: [str], optional
+        :param remote: False to leave out remote links whatever the link
+            types, defaults to True
+        :type remote: bool, optional
+        :return: A dict mapping each issue key to a list of IssueLinks
+        :rtype: dict
+        """
+        links = {}
+        for issue in issues:
+            found = []
+            fields = getattr(issue.jira_issue, "fields", None)
+            for link in getattr(fields, "issuelinks", None) or []:
+                linked = getattr(link, "outwardIssue", None) or \
+                    getattr(link, "inwardIssue", None)
+                if linked is not None:
+                    found.append(IssueLink(source=issue.key,
+                                           target=linked.key,
+                                           link_type=link.type.name))
+            links[issue.key] = [link for link in found if not link_types or
+                                link.link_type in link_types]
+        if remote and (not link_types or REMOTE in link_types):
+            with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                remote = executor.map(self._get_remote_links, issues)
+                for issue, remote_links in zip(issues, remote):
+                    links[issue.key].extend(remote_links)
+        return links
+
+    def _get_remote_links(self, issue) -> [IssueLink]:
+        """Return REMOTE links to the bugzilla bugs referenced by an issue's
+        JIRA remote links. Remote links to anything other than a bugzilla bug
+        are ignored.
+
+        :param issue: An issue that wraps a JIRA issue
+        :type issue: bugjira.issue.Issue
+        :raises BrokerLookupException: If the remote links cannot be fetched
+        :return: A list of IssueLinks
+        :rtype: [IssueLink]
+        """
+        try:
+            remote_links = self.backend.remote_links(issue.key)
+        except Exception as e:
+            raise _backend_error(BrokerLookupException, e)
+        found = []
+        for remote_link in remote_links:
+            url = getattr(getattr(remote_link, "object", None), "url", "")
+            target = bugzilla_key_from_url(url or "")
+            if target:
+                found.append(IssueLink(source=issue.key, target=target,
+                                       link_type=REMOTE))
+        return found
+
+    def add_links(self, links) -> [LinkResult]:
+        """Create JIRA issue links concurrently. Each link is created from
+        its source issue to its target issue, using its link_type as the
+        name of the JIRA link type (e.g. "Blocks", for "source blocks
+        target").
+
+        :param links: The links to create
+        :type links: [bugjira.links.IssueLink]
+        :return: A list of LinkResult objects in the same order as the input
+            links
+        :rtype: [bugjira.links.LinkResult]
+        """
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._add_link, links))
+
+    def _add_link(self, link) -> LinkResult:
+        try:
+            self.backend.create_issue_link(link.link_type, link.source,
+                                           link.target)
+        except Exception as e:
+            return LinkResult(
+                link=link, error=_backend_error(BrokerUpdateException, e))
+        return LinkResult(link=link)
+
+    def search_pages(self, query, page_size=None, field_ids=None, start=0):
+        """Run a JQL search one page at a time
+
+        :param query: A JQL search string
+        :type query: str
+        :param page_size: The number of issues per page, defaults to None,
+            which uses the broker's page_size
+        :type page_size: int, optional
+        :param field_ids: The JIRA field ids to fetch, defaults to None, which
+            fetches all fields
+        :type field_ids: [str], optional
+        :param start: The number of results to skip, defaults to 0
+        :type start: int, optional
+        :raises BrokerLookupException: If the backend's search_issues method
+            raises an Exception
+        :yield: A list of JiraIssues for each page of results
+        :rtype: Iterator[[JiraIssue]]
+        """
+        page_size = page_size or self.page_size
+        fields = ",".join(field_ids) if field_ids else "*all"
+        while True:
+            try:
+                issues = self.backend.search_issues(
+                    query, startAt=start, maxResults=page_size, fields=fields)
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            if issues:
+                yield [self._wrap_issue(issue.key, issue)
+                       for issue in issues]
+            if len(issues) < page_size:
+                return
+            start += len(issues)
+
+    def stream_search(self, query, page_size=None, field_ids=None, start=0):
+        """Run a JQL search one page at a time, decoding each response
+        incrementally so that issues are yielded as soon as they have been
+        read. Only the requested fields are kept on each issue, and the raw
+        response text is discarded as it is decoded, so memory use is bounded
+        by the size of one issue rather than one page. The jira library has
+        no streaming API, so this uses the backend's HTTP session directly.
+
+        :param query: A JQL search string
+        :type query: str
+        :param page_size: The number of issues per page, defaults to None,
+            which uses the broker's page_size
+        :type page_size: int, optional
+        :param field_ids: The JIRA field ids to fetch, defaults to None, which
+            fetches all fields
+        :type field_ids: [str], optional
+        :param start: The number of results to skip, defaults to 0
+        :type start: int, optional
+        :raises BrokerLookupException: If the search request fails or its
+            response cannot be decoded
+        :yield: The JiraIssues matching the query
+        :rtype: Iterator[JiraIssue]
+        """
+        page_size = page_size or self.page_size
+        params = {
+            "jql": query,
+            "maxResults": page_size,
+            "fields": ",".join(field_ids) if field_ids else "*all",
+        }
+        while True:
+            count = 0
+            try:
+                response = self.backend._session.get(
+                    self.backend._get_url("search"),
+                    params=dict(params, startAt=start), stream=True)
+                try:
+                    raw_issues = JsonArrayStream(
+                        response.iter_content(self.stream_chunk_size),
+                        "issues")
+                    for raw in raw_issues:
+                        count += 1
+                        yield self._issue_from_raw(raw, field_ids)
+                finally:
+                    response.close()
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            if not count:
+                return
+            start += count
+            total = raw_issues.meta.get("total")
+            if total is not None and start >= total:
+                return
+            # JIRA caps maxResults, so a page shorter than the page size
+            # asked for only ends the search if it is shorter than the page
+            # size the server used
+            served = raw_issues.meta.get("maxResults")
+            if served is not None and count < served:
+                return
+
+    def issue_from_raw(self, raw) -> JiraIssue:
+        """Build a JiraIssue from the decoded JSON for one issue, as returned
+        by the REST API or pushed by a webhook
+
+        :param raw: The decoded JSON for the issue
+        :type raw: dict
+        :raises ValueError: If the JSON has no issue key
+        :return: The JiraIssue
+        :rtype: JiraIssue
+        """
+        if not isinstance(raw, dict) or not raw.get("key"):
+            raise ValueError("raw JIRA issue JSON must have a key")
+        return self._issue_from_raw(raw)
+
+    def _issue_from_raw(self, raw, field_ids=None) -> JiraIssue:
+        """Build a JiraIssue from the raw JSON for one issue, keeping only the
+        requested fields
+
+        :param raw: The decoded JSON for the issue
+        :type raw: dict
+        :param field_ids: The JIRA field ids to keep, defaults to None, which
+            keeps all fields
+        :type field_ids: [str], optional
+        :return: The JiraIssue
+        :rtype: JiraIssue
+        """
+        if field_ids:
+            fields = raw.get("fields") or {}
+            raw["fields"] = {field_id: fields.get(field_id)
+                             for field_id in field_ids}
+        jira_issue = JiraResourceIssue(self.backend._options,
+                                       self.backend._session, raw=raw)
+        return self._wrap_issue(raw["key"], jira_issue)
+
+    def get_comments(self, issues, since=None):
+        """Fetch the comments on many JIRA issues. JIRA returns the comments
+        of one issue per request, so the issues are fetched concurrently,
+        each one page at a time. When an issue has a since time, its
+        comments are paged newest first and paging stops at the first
+        comment that is not newer, so old comments are not fetched again.
+
+        :param issues: The issues whose comments to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param since: Only return comments created after this time, either
+            one datetime for every issue or a dict mapping issue keys to
+            datetimes, defaults to None
+        :type since: datetime.datetime or dict, optional
+        :raises BrokerLookupException: If the backend fails to return the
+            comments
+        :yield: The comments on each issue, oldest first, in the order of
+            the input issues
+        :rtype: Iterator[bugjira.comment.Comment]
+        """
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for comments in executor.map(
+                    lambda issue: self._get_issue_comments(
+                        issue.key, since_for(since, issue.key)),
+                    issues):
+                yield from comments
+
+    def _get_issue_comments(self, key, since) -> [Comment]:
+        """Page through the comments on a single JIRA issue
+
+        :param key: The issue key
+        :type key: str
+        :param since: Only return comments created after this time
+        :type since: datetime.datetime
+        :return: The comments, oldest first
+        :rtype: [bugjira.comment.Comment]
+        """
+        comments = []
+        start = 0
+        while True:
+            try:
+                page = self.backend.comments(
+                    key, start_at=start, max_results=self.page_size,
+                    order_by="-created" if since else "created")
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+            for resource in page:
+                comment = Comment(
+                    key=key, id=str(resource.id),
+                    author=normalize_value(getattr(resource, "author", None)),
+                    created=parse_datetime(resource.created),
+                    body=getattr(resource, "body", None) or "")
+                if not is_new(comment, since):
+                    comments.reverse()
+                    return comments
+                comments.append(comment)
+            if len(page) < self.page_size:
+                break
+            start += len(page)
+        if since:
+            comments.reverse()
+        return comments
+
+    def get_history(self, issues, field_names=None):
+        """Fetch the changelogs of many JIRA issues. JIRA returns the
+        changelog of one issue per request, so the issues are fetched
+        concurrently. Changelogs that JIRA truncates in the issue response
+        are paged through the changelog endpoint.
+
+        :param issues: The issues whose history to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param field_names: The configured names of the fields whose changes
+            to return, defaults to None, which returns changes to every
+            configured field
+        :type field_names: [str], optional
+        :raises ValueError: If a field name is not configured for jira
+        :raises BrokerLookupException: If the backend fails to return a
+            changelog
+        :yield: The changes to each issue, oldest first, in the order of the
+            input issues
+        :rtype: Iterator[bugjira.history.HistoryRecord]
+        """
+        names = self._get_history_names(field_names)
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for records in executor.map(
+                    lambda issue: self._get_issue_history(issue.key, names),
+                    issues):
+                yield from records
+
+    def _get_issue_history(self, key, names) -> [HistoryRecord]:
+        """Fetch the changelog of a single JIRA issue
+
+        :param key: The issue key
+        :type key: str
+        :param names: A dict mapping JIRA field ids and names to configured
+            field names, or None to return every change
+        :type names: dict
+        :return: The changes, oldest first
+        :rtype: [bugjira.history.HistoryRecord]
+        """
+        try:
+            jira_issue = self.backend.issue(key, fields="created",
+                                            expand="changelog")
+            changelog = jira_issue.raw.get("changelog") or {}
+            histories = list(changelog.get("histories") or [])
+            total = changelog.get("total", len(histories))
+            while len(histories) < total:
+                page = self.backend._get_json(
+                    f"issue/{key}/changelog",
+                    params={"startAt": len(histories),
+                            "maxResults": self.page_size})
+                if not page.get("values"):
+                    break
+                histories.extend(page["values"])
+        except Exception as e:
+            raise _backend_error(BrokerLookupException, e)
+        records = []
+        # The order of changelog entries differs between JIRA versions
+        for when, history in sorted(
+                ((parse_datetime(history.get("created")), history)
+                 for history in histories),
+                key=lambda entry: entry[0]):
+            who = normalize_value(history.get("author"))
+            for item in history.get("items", []):
+                field = item.get("fieldId") or item.get("field")
+                if names is not None:
+                    field = names.get(field) or names.get(item.get("field"))
+                    if field is None:
+                        continue
+                records.append(HistoryRecord(
+                    key=key, field=field,
+                    from_value=item.get("fromString"),
+                    to_value=item.get("toString"),
+                    when=when, who=who))
+        return records
+
+    def get_attachments(self, issue) -> [Attachment]:
+        """Return the attachments of a JIRA issue. The attachment field of the
+        wrapped issue is used if it was fetched; otherwise it is requested.
+
+        :param issue: An issue that wraps a JIRA issue
+        :type issue: bugjira.issue.Issue
+        :raises BrokerLookupException: If the issue's attachments cannot be
+            fetched
+        :return: The issue's attachments
+        :rtype: [bugjira.attachment.Attachment]
+        """
+        fields = getattr(issue.jira_issue, "fields", None)
+        if not hasattr(fields, "attachment"):
+            try:
+                fields = self.backend.issue(issue.key,
+                                            fields="attachment").fields
+            except Exception as e:
+                raise _backend_error(BrokerLookupException, e)
+        return [self._attachment_from_resource(issue.key, resource)
+                for resource in getattr(fields, "attachment", None) or []]
+
+    def upload_attachment(self, issue, path, filename=None,
+                          description="") -> Attachment:
+        """Attach a file to a JIRA issue. The file is streamed to JIRA as a
+        multipart request rather than read into memory. JIRA attachments have
+        no description, so the description is ignored.
+
+        :param issue: The issue to attach the file to
+        :type issue: bugjira.issue.Issue
+        :param path: The file to upload
+        :type path: str
+        :param filename: The name to give the attachment, defaults to None,
+            which uses the file's base name
+        :type filename: str, optional
+        :param description: Unused, defaults to ""
+        :type description: str, optional
+        :raises BrokerAttachmentException: If the backend's add_attachment
+            method raises an Exception
+        :return: The new attachment
+        :rtype: bugjira.attachment.Attachment
+        """
+        filename = filename or os.path.basename(path)
+        try:
+            with open(path, "rb") as source:
+                resource = self.backend.add_attachment(issue.key, source,
+                                                       filename)
+        except Exception as e:
+            raise _backend_error(BrokerAttachmentException, e)
+        return self._attachment_from_resource(issue.key, resource)
+
+    def _attachment_from_resource(self, key, resource) -> Attachment:
+        return Attachment(key=key, id=str(resource.id),
+                          filename=resource.filename,
+                          size=getattr(resource, "size", None),
+                          content_type=getattr(resource, "mimeType", None),
+                          url=resource.content, instance=self.instance)
+
+    def _open_attachment(self, attachment, headers):
+        """Start a streaming request for an attachment's contents using the
+        backend's HTTP session
+
+        :param attachment: The attachment to download
+        :type attachment: bugjira.attachment.Attachment
+        :param headers: Extra request headers, e.g. a Range header
+        :type headers: dict
+        :return: The response
+        :rtype: requests.Response
+        """
+        return self.backend._session.get(
+            attachment.url, headers=dict(headers, Accept="*/*"), stream=True)
+
+    def get_field_value(self, issue, field):
+        """Return the value of a field of the JIRA issue wrapped by an issue
+
+        :param issue: An issue that wraps a JIRA issue
+        :type issue: bugjira.issue.Issue
+        :param field: A jira field from the field registry
+        :type field: bugjira.field.JiraField
+        :return: The field value, or None if the issue has no such field
+        :rtype: object
+        """
+        fields = getattr(issue.jira_issue, "fields", None)
+        return getattr(fields, field.jira_field_id, None)
+
+    def update_value(self, field, value):
+        """Return a value read from a field of a JIRA issue in the form
+        update_issues takes for that field: entities such as users and
+        options become references like {"name": "alice"}, and a status
+        becomes its name, which is performed as the transition of that name.
+
+        :param field: A jira field from the field registry
+        :type field: bugjira.field.JiraField
+        :param value: The field value
+        :type value: object
+        :return: The value to pass to update_issues
+        :rtype: object
+        """
+        if field.jira_field_id == "status":
+            return normalize_value(value)
+        return jira_update_value(value)
+
+    def update_issues(self, issues, fields) -> [IssueResult]:
+        """Apply the same field changes to many JIRA issues. The JIRA REST API
+        has no bulk edit endpoint, so the edits are run concurrently in a
+        bounded thread pool.
+
+        :param issues: The issues to update
+        :type issues: [bugjira.issue.Issue]
+        :param fields: A dict mapping configured field names to new values
+        :type fields: dict
+        :raises ValueError: If a field name is not configured for jira
+        :return: A list of IssueResult objects in the same order as the input
+            issues
+        :rtype: [IssueResult]
+        """
+        resolved = self.resolve_fields(fields)
+        with ContextThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(
+                lambda issue: self._update_issue(issue, resolved), issues
+            ))
+
+    def _update_issue(self, issue, fields) -> IssueResult:
+        """Edit a single JIRA issue. The status field cannot be edited
+        directly in JIRA, so a status value is treated as the name or id of
+        a transition to perform after the other fields are edited.
+
+        :param issue: The issue to update
+        :type issue: bugjira.issue.Issue
+        :param fields: A dict mapping JIRA field ids to new values
+        :type fields: dict
+        :return: The result of the update
+        :rtype: IssueResult
+        """
+        fields = dict(fields)
+        status = fields.pop("status", None)
+        try:
+            jira_issue = issue.jira_issue
+            if jira_issue is None:
+                jira_issue = self.backend.issue(issue.key, fields="status")
+            if fields:
+                jira_issue.update(fields=fields)
+            if status is not None:
+                self.backend.transition_issue(jira_issue, status)
+        except Exception as e:
+            return IssueResult(
+                key=issue.key, error=_backend_error(BrokerUpdateException, e))
+        return IssueResult(key=issue.key, issue=issue)
+
+    def create_issues(self, specs) -> [IssueResult]:
+        """Create many JIRA issues using the bulk create endpoint, sending the
+        specs in chunks no larger than the endpoint accepts.
+
+        :param specs: A list of dicts mapping configured field names to the
+            values for each new issue
+        :type specs: [dict]
+        :raises ValueError: If a field name is not configured for jira
+        :return: A list of IssueResult objects in the same order as the input
+            specs
+        :rtype: [IssueResult]
+        """
+        field_list = [self.resolve_fields(spec) for spec in specs]
+        results = []
+        for start in range(0, len(field_list), self.bulk_create_size):
+            chunk = field_list[start:start + self.bulk_create_size]
+            try:
+                created = self.backend.create_issues(chunk, prefetch=False)
+            except Exception as e:
+                error = _backend_error(BrokerCreateException, e)
+                results.extend(IssueResult(error=error) for _ in chunk)
+                continue
+            for item in created:
+                if item.get("error"):
+                    results.append(IssueResult(
+                        error=BrokerCreateException(item["error"]),
+                        response=item))
+                else:
+                    jira_issue = item["issue"]
+                    results.append(IssueResult(
+                        key=jira_issue.key,
+                        issue=self._wrap_issue(jira_issue.key, jira_issue),
+                        response=item))
+        return results
+
+    def _get_field_id(self, field) -> str:
+        return field.jira_field_id
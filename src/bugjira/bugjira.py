@@ -1,19 +1,56 @@
+import os
+
+from bugjira import deadline, hedging, scheduling
+from bugjira.attachment import (
+    Attachment,
+    AttachmentResult,
+    attachment_filename
+)
 from bugjira.broker import BugzillaBroker, JiraBroker
-from bugjira.config import Config
+from bugjira.cache import CacheStats, IssueCache
+from bugjira.circuit import CircuitStats
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.concurrency import LimiterStats
+from bugjira.config import (
+    CacheConfig,
+    Config,
+    LocalStoreConfig,
+    WebhookConfig,
+    get_instance_config
+)
+from bugjira.crawler import Crawler
+from bugjira.diff import ChangeSet, Differ
+from bugjira.exceptions import BrokerTimeoutException
+from bugjira.export import JSONL, export_issues, get_export_writer
+from bugjira.hedging import HedgeStats
 from bugjira.issue import Issue
-from bugjira.util import is_bugzilla_key, is_jira_key
+from bugjira.keys import classify_key
+from bugjira.links import IssueLink, LinkGraphNode
+from bugjira.local import COMMENT_BATCH_SIZE, LocalResult, LocalStore
+from bugjira.mirror import Mirror
+from bugjira.prefetch import Prefetcher
+from bugjira.result import IssueResult
+from bugjira.routing import INSTANCE_SEPARATOR, Router
+from bugjira.scheduling import ContextThreadPoolExecutor
+from bugjira.table import IssueTable
+from bugjira.transport import PoolStats
+from bugjira.watch import Subscription, Watcher
+from bugjira.webhooks import DELETED, ChangeEvent, WebhookReceiver
 
 
 class Bugjira:
     """API abstraction layer object for a bugzilla backend and a jira
-    backend."""
+    backend. A Bugjira object may be shared by many threads, and used in
+    child processes after fork(); see bugjira.session.ClientPool."""
 
     def __init__(
         self, config_path="", config_dict=None, bugzilla=None, jira=None
     ):
         """Init method for the Bugjira class. Note that if both config_dict and
         config_path parameters are provided, the config_dict will take
-        precedence.
+        precedence. A broker is created for the default bugzilla and jira
+        instances and for each named instance in the config's instances
+        section.
 
         :param config_path: Absolute path to a json config file, defaults to ""
         :type config_path: str, optional
@@ -36,10 +73,148 @@ class Bugjira:
         self._bugzilla_broker = BugzillaBroker(
             config=self.config, backend=bugzilla
         )
-        self.bugzilla = self._bugzilla_broker.backend
-
         self._jira_broker = JiraBroker(config=self.config, backend=jira)
-        self.jira = self._jira_broker.backend
+
+        self._router = Router(self._bugzilla_broker, self._jira_broker)
+        instances = (self.config or {}).get("instances") or {}
+        for name, settings in instances.get(BUGZILLA, {}).items():
+            self._router.add_instance(
+                BUGZILLA, name,
+                BugzillaBroker(
+                    config=get_instance_config(self.config, BUGZILLA, name),
+                    instance=name),
+                hints=settings.get("hints", []))
+        for name, settings in instances.get(JIRA, {}).items():
+            self._router.add_instance(
+                JIRA, name,
+                JiraBroker(
+                    config=get_instance_config(self.config, JIRA, name),
+                    instance=name),
+                projects=settings.get("projects", []))
+        self._watcher = Watcher(self)
+        # The cache that get_issue and get_issues serve issues from, if
+        # enabled in the config (see bugjira.cache)
+        self.cache = None
+        cache = CacheConfig(**((self.config or {}).get("cache") or {}))
+        if cache.enabled:
+            self.cache = IssueCache(cache.ttl, cache.max_size)
+        # The store that local_query answers from, if enabled in the config
+        # (see bugjira.local)
+        self.local_store = None
+        local_store = LocalStoreConfig(
+            **((self.config or {}).get("local_store") or {}))
+        if local_store.enabled:
+            self.local_store = LocalStore(local_store.path,
+                                          local_store.text_fields)
+
+    @property
+    def bugzilla(self):
+        """The calling thread's client for the default bugzilla instance.
+        A client assigned here is shared by every thread, as if it had been
+        passed to the constructor.
+        """
+        return self._bugzilla_broker.backend
+
+    @bugzilla.setter
+    def bugzilla(self, bugzilla) -> None:
+        self._bugzilla_broker.backend = bugzilla
+
+    @property
+    def jira(self):
+        """The calling thread's client for the default jira instance. A
+        client assigned here is shared by every thread, as if it had been
+        passed to the constructor.
+        """
+        return self._jira_broker.backend
+
+    @jira.setter
+    def jira(self, jira) -> None:
+        self._jira_broker.backend = jira
+
+    @staticmethod
+    def priority(name):
+        """Return a context manager that sends the requests made within its
+        with block, including those made by lazy issues and background
+        threads started within it, with a priority class. When a backend's
+        adaptive concurrency limit is reached, waiting requests are let
+        through by weighted fair queuing of their classes (see
+        bugjira.scheduling.PRIORITY_WEIGHTS), so interactive lookups are not
+        stuck behind bulk jobs.
+
+        :param name: bugjira.scheduling.INTERACTIVE, NORMAL or BULK
+        :type name: str
+        :raises ValueError: If the name is not a priority class
+        :return: The context manager
+        """
+        return scheduling.priority(name)
+
+    @staticmethod
+    def deadline(timeout):
+        """Return a context manager that gives all the backend requests made
+        within its with block, including those of bulk operations and
+        background threads started within it, at most timeout seconds in
+        total. Each request's timeout is cut to the time left, no request is
+        sent once the deadline has passed, and an operation that fails
+        because of it raises BrokerTimeoutException (bulk lookups report it
+        in their results instead). Deadlines only apply to the clients
+        Bugjira creates from its config.
+
+        :param timeout: Seconds
+        :type timeout: float
+        :raises ValueError: If the timeout is not positive
+        :return: The context manager
+        """
+        return deadline.deadline(timeout)
+
+    def hedging_stats(self) -> [HedgeStats]:
+        """Return the hedging statistics of every configured instance, one
+        entry per instance and operation
+
+        :rtype: [bugjira.hedging.HedgeStats]
+        """
+        return [stats for broker in self._router.brokers()
+                for stats in broker.hedging_stats()]
+
+    def circuit_stats(self) -> [CircuitStats]:
+        """Return the circuit breaker state of every configured instance
+        whose circuit breaker is enabled. While an instance's breaker is
+        open, its requests fail at once with BrokerCircuitOpenException.
+
+        :return: One CircuitStats per instance
+        :rtype: [bugjira.circuit.CircuitStats]
+        """
+        return [stats for stats in (broker.circuit_stats()
+                                    for broker in self._router.brokers())
+                if stats is not None]
+
+    def cache_stats(self) -> CacheStats:
+        """Return the issue cache's counters
+
+        :return: The stats, or None if the cache is not enabled
+        :rtype: bugjira.cache.CacheStats
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    def concurrency_stats(self) -> [LimiterStats]:
+        """Return the adaptive concurrency limit of every configured instance
+        whose limiter is enabled
+
+        :return: One LimiterStats per instance
+        :rtype: [bugjira.concurrency.LimiterStats]
+        """
+        return [stats for stats in (broker.concurrency_stats()
+                                    for broker in self._router.brokers())
+                if stats is not None]
+
+    def pool_stats(self) -> [PoolStats]:
+        """Return the HTTP connection pool statistics of every configured
+        instance, to help size the transport settings' pool_maxsize
+
+        :return: One PoolStats per broker and host
+        :rtype: [bugjira.transport.PoolStats]
+        """
+        return [stats for broker in self._router.brokers()
+                for stats in broker.pool_stats()]
 
     def add_comment(self, issue, comment) -> None:
         """Add a comment to an existing Issue
@@ -53,38 +228,1059 @@ class Bugjira:
             raise ValueError(f"issue must be an Issue: {str(issue)}")
         if not isinstance(comment, str):
             raise ValueError(f"comment must be a str: {str(comment)}")
-        broker = self._get_broker(issue.key)
+        broker = self._router.for_issue(issue)
         broker.add_comment(issue, comment)
+        self._changed(broker, [issue.key])
 
-    def get_issue(self, key) -> Issue:
+    def get_issue(self, key, lazy=False, priority=None, timeout=None,
+                  hedge=False) -> Issue:
         """Return an Issue using the correct Broker based on the key input
 
-        :param key: The lookup key
+        :param key: The lookup key, optionally qualified with the name of the
+            instance it belongs to, e.g. "partner:123456"
         :type key: str
+        :param lazy: If True, return the Issue immediately and look it up the
+            first time its bugzilla or jira_issue attribute is read. Lazy
+            issues that are still waiting to be looked up at that point are
+            looked up together with bulk requests. Lookup errors are raised
+            when the attribute is read. Defaults to False.
+        :type lazy: bool, optional
+        :param priority: The priority class of the requests, e.g.
+            bugjira.scheduling.INTERACTIVE, defaults to None, which uses the
+            current priority (see Bugjira.priority)
+        :type priority: str, optional
+        :param timeout: The most seconds the lookup may take, defaults to
+            None, which only applies the current deadline (see
+            Bugjira.deadline)
+        :type timeout: float, optional
+        :param hedge: If True, send the lookup again if it is slower than
+            the 95th percentile of recent lookups, and keep the first answer
+            (see bugjira.hedging), defaults to False
+        :type hedge: bool, optional
+        :raises BrokerTimeoutException: If the lookup does not finish in time
         :return: A bugjira Issue that wraps the bugzilla or jira returned by
             the broker
         :rtype: Issue
         """
         if not isinstance(key, str):
             raise ValueError(f"key must be a string: {key}")
-        broker = self._get_broker(key)
-        return broker.get_issue(key)
+        broker, key = self._router.route(key)
+        if lazy:
+            return broker.get_lazy_issue(key)
+        if self.cache is not None:
+            issue = self.cache.get(broker.generator_type, broker.instance,
+                                   key)
+            if issue is not None:
+                return issue
+        with scheduling.priority(priority), deadline.deadline(timeout):
+            if hedge:
+                issue = broker.hedger.call("get_issue",
+                                           broker.within_deadline,
+                                           broker.get_issue, key)
+            else:
+                issue = broker.within_deadline(broker.get_issue, key)
+        if self.cache is not None:
+            self.cache.put(broker.generator_type, broker.instance, key, issue)
+        if self.local_store is not None:
+            self.local_store.put(broker, [issue])
+        return issue
+
+    def get_issues(self, keys, lazy=False, priority=None, timeout=None,
+                   hedge=False) -> [IssueResult]:
+        """Look up many issues at once. Keys are grouped by instance, each
+        instance looks up its keys with bulk requests, and the instances are
+        queried in parallel.
+
+        :param keys: The lookup keys, optionally qualified with the names of
+            the instances they belong to
+        :type keys: [str]
+        :param lazy: If True, return lazy issues (see get_issue) without
+            looking them up; they are looked up together when the first of
+            them is used. Defaults to False.
+        :type lazy: bool, optional
+        :param priority: The priority class of the requests, e.g.
+            bugjira.scheduling.INTERACTIVE, defaults to None, which uses the
+            current priority (see Bugjira.priority)
+        :type priority: str, optional
+        :param timeout: The most seconds the lookups may take, defaults to
+            None, which only applies the current deadline (see
+            Bugjira.deadline)
+        :type timeout: float, optional
+        :param hedge: If True, send each bulk lookup request again if it is
+            slower than the 95th percentile of recent ones, and keep the
+            first answer (see bugjira.hedging), defaults to False
+        :type hedge: bool, optional
+        :raises ValueError: If a key is not a str or is neither a bugzilla nor
+            a jira key
+        :return: A list of IssueResult objects in the same order as the input
+            keys
+        :rtype: [IssueResult]
+        """
+        groups = {}
+        for position, key in enumerate(keys):
+            if not isinstance(key, str):
+                raise ValueError(f"key must be a string: {key}")
+            broker, backend_key = self._router.route(key)
+            groups.setdefault(broker, []).append((position, backend_key))
+        if lazy:
+            return [IssueResult(key=key,
+                                issue=self.get_issue(key, lazy=True))
+                    for key in keys]
+        results = [None] * len(keys)
+        if self.cache is not None:
+            groups = self._get_cached(groups, keys, results)
+        if not groups:
+            return results
+        with scheduling.priority(priority), deadline.deadline(timeout), \
+                hedging.hedging(hedge), \
+                ContextThreadPoolExecutor(max_workers=len(groups)) as executor:
+            lookups = {
+                broker: executor.submit(broker.within_deadline,
+                                        broker.get_issues,
+                                        [key for _, key in indexed])
+                for broker, indexed in groups.items()
+            }
+            for broker, indexed in groups.items():
+                try:
+                    looked_up = lookups[broker].result()
+                except deadline.DeadlineExceeded as e:
+                    looked_up = [IssueResult(key=key, error=e)
+                                 for _, key in indexed]
+                found = []
+                for (position, _), result in zip(indexed, looked_up):
+                    if result.ok:
+                        found.append(result.issue)
+                        if self.cache is not None:
+                            self.cache.put(broker.generator_type,
+                                           broker.instance, result.key,
+                                           result.issue)
+                    # Report results under the keys as the caller gave them
+                    result.key = keys[position]
+                    results[position] = result
+                if self.local_store is not None:
+                    self.local_store.put(broker, found)
+            if deadline.expired():
+                self._mark_timeouts(results)
+        return results
+
+    def _get_cached(self, groups, keys, results) -> dict:
+        """Fill in the results of the keys whose issues are cached
+
+        :param groups: A dict mapping brokers to (position, key) pairs
+        :type groups: dict
+        :param keys: The keys as the caller gave them
+        :type keys: [str]
+        :param results: The results, by position
+        :type results: list
+        :return: The groups without the cached keys
+        :rtype: dict
+        """
+        missing = {}
+        for broker, indexed in groups.items():
+            for position, backend_key in indexed:
+                issue = self.cache.get(broker.generator_type, broker.instance,
+                                       backend_key)
+                if issue is None:
+                    missing.setdefault(broker, []).append(
+                        (position, backend_key))
+                else:
+                    results[position] = IssueResult(key=keys[position],
+                                                    issue=issue)
+        return missing
+
+    def _mark_timeouts(self, results) -> None:
+        """Replace the errors of results that failed because the deadline
+        passed with BrokerTimeoutExceptions
+        """
+        for result in results:
+            if result.error is not None and \
+                    not isinstance(result.error, BrokerTimeoutException):
+                error = BrokerTimeoutException(
+                    f"{result.key}: deadline exceeded")
+                error.__cause__ = result.error
+                result.error = error
+
+    def search(self, query, backend, page_size=None, fields=None,
+               prefetch=1, stream=False, instance=None, priority=None,
+               start=0):
+        """Search one backend and yield the matching issues, fetching them one
+        page at a time. The next pages are fetched in the background while the
+        caller works through the current one, so at most prefetch + 2 pages
+        are held in memory.
+
+        :param query: A JQL string for jira, or a query dict for bugzilla
+            (e.g. from the bugzilla backend's build_query or url_to_query
+            methods)
+        :type query: str or dict
+        :param backend: The backend to search, either bugjira.common.BUGZILLA
+            or bugjira.common.JIRA
+        :type backend: str
+        :param page_size: The number of issues per page, defaults to None,
+            which uses the broker's default page size
+        :type page_size: int, optional
+        :param fields: The configured names of the fields to fetch, defaults
+            to None, which fetches the backend's default fields
+        :type fields: [str], optional
+        :param prefetch: The number of pages to fetch ahead of the caller,
+            defaults to 1. Use 0 to fetch each page only when it is needed.
+        :type prefetch: int, optional
+        :param stream: If True, decode each JIRA search response
+            incrementally, so that only one issue at a time is held in memory
+            instead of whole pages; prefetch then counts issues rather than
+            pages. Only supported for jira. Defaults to False.
+        :type stream: bool, optional
+        :param instance: The name of the configured instance to search,
+            defaults to None, which searches the backend's default instance
+        :type instance: str, optional
+        :param priority: The priority class of the search requests, e.g.
+            bugjira.scheduling.INTERACTIVE, defaults to None, which uses the
+            current priority (see Bugjira.priority)
+        :type priority: str, optional
+        :param start: The number of matching issues to skip, e.g. to resume
+            an export of the search, defaults to 0
+        :type start: int, optional
+        :raises ValueError: If the backend, instance or priority is not
+            valid, if a field name is not configured for the backend, or if
+            stream is requested for bugzilla
+        :yield: The Issues matching the query
+        :rtype: Iterator[Issue]
+        """
+        broker = self._get_backend_broker(backend, instance)
+        field_ids = None
+        if fields:
+            field_ids = list(broker.resolve_fields(dict.fromkeys(fields)))
+        if stream:
+            if backend != JIRA:
+                raise ValueError("stream is only supported for jira")
+            yield from scheduling.iter_with_priority(Prefetcher(
+                broker.iter_dispatched(broker.stream_search(
+                    query, page_size, field_ids, start)),
+                prefetch),
+                priority)
+            return
+        pages = broker.iter_dispatched(
+            broker.search_pages(query, page_size, field_ids, start))
+        for page in scheduling.iter_with_priority(Prefetcher(pages, prefetch),
+                                                  priority):
+            # Issues with only some of their fields are not stored, since
+            # they would hide the other fields' stored values
+            if self.local_store is not None and not fields:
+                self.local_store.put(broker, page)
+            yield from page
+
+    def crawl(self, shards, workers=4, checkpoint_path=None, page_size=None,
+              fields=None):
+        """Crawl a very large search split into shards (see
+        bugjira.crawler.jira_date_shards and bugjira.crawler.bugzilla_id_shards)
+        with several shards searched in parallel. Results are merged into a
+        single stream in which each issue appears once.
+
+        :param shards: The shards to crawl
+        :type shards: [bugjira.crawler.Shard]
+        :param workers: The number of shards searched at once, defaults to 4
+        :type workers: int, optional
+        :param checkpoint_path: A file in which to record each shard's
+            progress, defaults to None. If the file already exists, the crawl
+            continues from the recorded progress.
+        :type checkpoint_path: str, optional
+        :param page_size: The number of issues per page, defaults to None,
+            which uses each broker's default page size
+        :type page_size: int, optional
+        :param fields: The configured names of the fields to fetch, defaults
+            to None, which fetches the backend's default fields
+        :type fields: [str], optional
+        :return: An iterator over the Issues found by the shards
+        :rtype: Iterator[Issue]
+        """
+        return iter(Crawler(self, shards, workers, checkpoint_path,
+                            page_size, fields))
+
+    def mirror(self, path, query, fields, defaults=None, values=None,
+               comments=True, link_type="Blocks", bugzilla_instance=None,
+               jira_instance=None, workers=4) -> Mirror:
+        """Return a Mirror that copies the bugzilla bugs matching a query to
+        JIRA issues each time its sync method is called. The mapping between
+        bugs and issues, and the watermark of the last sync, are kept in a
+        SQLite database, so each sync only reads the bugs changed since the
+        last one and only writes their changed fields and new comments.
+        Syncs are safe to rerun after a failure.
+
+        :param path: The SQLite database file that holds the mapping
+        :type path: str
+        :param query: A bugzilla query dict selecting the bugs to mirror
+        :type query: dict
+        :param fields: A dict mapping configured bugzilla field names to the
+            configured names of the JIRA fields they are copied to
+        :type fields: dict
+        :param defaults: The values of other JIRA fields for new issues, by
+            configured field name, e.g. the project and issue type, defaults
+            to None
+        :type defaults: dict, optional
+        :param values: A dict mapping bugzilla field names to dicts that
+            translate their values to JIRA values, defaults to None
+        :type values: dict, optional
+        :param comments: Whether to copy comments, defaults to True
+        :type comments: bool, optional
+        :param link_type: The JIRA link type used to mirror bugzilla
+            dependencies, defaults to "Blocks". None does not create links.
+        :type link_type: str, optional
+        :param bugzilla_instance: The name of the configured bugzilla
+            instance, defaults to None for the default instance
+        :type bugzilla_instance: str, optional
+        :param jira_instance: The name of the configured JIRA instance,
+            defaults to None for the default instance
+        :type jira_instance: str, optional
+        :param workers: The most write batches run at once, defaults to 4
+        :type workers: int, optional
+        :raises ValueError: If query or fields is not a dict, if an instance
+            is not configured, or if a field name is not configured for its
+            backend
+        :return: The mirror, which should be closed when it is no longer
+            needed
+        :rtype: bugjira.mirror.Mirror
+        """
+        return Mirror(self, path, query, fields, defaults, values, comments,
+                      link_type, bugzilla_instance, jira_instance, workers)
+
+    def project(self, issue, fields=None) -> dict:
+        """Return a dict containing an issue's key and the normalized values of
+        its configured fields, suitable for serializing to JSON.
+
+        :param issue: The issue to project
+        :type issue: bugjira.issue.Issue
+        :param fields: The configured names of the fields to include, defaults
+            to None, which includes every field configured for the issue's
+            backend
+        :type fields: [str], optional
+        :raises ValueError: If the issue is not an Issue, or if a field name is
+            not configured for the issue's backend
+        :return: A dict mapping "key" and each field name to a value
+        :rtype: dict
+        """
+        if not isinstance(issue, Issue):
+            raise ValueError(f"issue must be an Issue: {str(issue)}")
+        return self._router.for_issue(issue).project(issue, fields)
+
+    def diff(self, old, new, fields=None) -> ChangeSet:
+        """Return the fields whose normalized values differ between two
+        snapshots of an issue. Either snapshot may be a dict returned by the
+        project method, e.g. one kept from an earlier lookup, but at least
+        one must be an Issue so that its backend is known.
+
+        :param old: The old snapshot
+        :type old: bugjira.issue.Issue or dict
+        :param new: The new snapshot
+        :type new: bugjira.issue.Issue or dict
+        :param fields: The configured names of the fields to compare,
+            defaults to None, which compares every configured field
+        :type fields: [str], optional
+        :raises ValueError: If neither snapshot is an Issue, if the issues
+            belong to different instances, or if a field name is not
+            configured for the issue's backend
+        :return: The changed fields. Their payload() can be passed to
+            update_issues, in the form the backend takes when new is an Issue
+        :rtype: bugjira.diff.ChangeSet
+        """
+        broker = self._get_diff_broker(old, new)
+        return Differ(broker, fields).diff(old, new)
+
+    def diff_many(self, pairs, fields=None) -> [ChangeSet]:
+        """Diff many pairs of snapshots (see the diff method). The fields are
+        resolved once per instance rather than once per pair.
+
+        :param pairs: (old, new) pairs of snapshots
+        :type pairs: Iterable[tuple]
+        :param fields: The configured names of the fields to compare,
+            defaults to None, which compares every configured field
+        :type fields: [str], optional
+        :raises ValueError: As for the diff method
+        :return: One ChangeSet per pair, in the same order as the input
+        :rtype: [bugjira.diff.ChangeSet]
+        """
+        differs = {}
+        results = []
+        for old, new in pairs:
+            broker = self._get_diff_broker(old, new)
+            differ = differs.get(broker)
+            if differ is None:
+                differ = differs[broker] = Differ(broker, fields)
+            results.append(differ.diff(old, new))
+        return results
+
+    def local_query(self, filters=None, text=None, backend=None,
+                    instance=None, fields=None, limit=None) -> LocalResult:
+        """Answer a query from the local store (see bugjira.local) without
+        making any requests. The store holds the issues this object has
+        looked up or found by searching, and the comments it has fetched,
+        as they were when they were fetched; the result says how long ago
+        that was, and which of the issues are known to have changed since.
+
+        :param filters: A dict mapping configured field names to the value
+            the field must have, a list of values it may have, or None if it
+            must be unset, defaults to None
+        :type filters: dict, optional
+        :param text: A full-text query (in SQLite FTS5 syntax) that the
+            configured text fields or a comment must match, defaults to None
+        :type text: str, optional
+        :param backend: Only return issues of this backend, either
+            bugjira.common.BUGZILLA or bugjira.common.JIRA, defaults to None
+        :type backend: str, optional
+        :param instance: The name of a configured instance to return issues
+            of, of backend if it is given, defaults to None for every
+            instance, or only the default instance if backend is given
+        :type instance: str, optional
+        :param fields: The configured names of the fields to return,
+            defaults to None, which returns every stored field
+        :type fields: [str], optional
+        :param limit: The most issues to return, defaults to None
+        :type limit: int, optional
+        :raises ValueError: If the local store is not enabled, if the
+            backend or instance is not configured, if a field name is not
+            configured for any backend queried, or if the text query is not
+            valid
+        :return: The matching issues' projections, ordered by key
+        :rtype: bugjira.local.LocalResult
+        """
+        if self.local_store is None:
+            raise ValueError("the local store is not enabled in the config")
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError(f"filters must be a dict: {str(filters)}")
+        if backend is not None:
+            brokers = [self._get_backend_broker(backend, instance)]
+        elif instance is not None:
+            brokers = [broker for broker in self._router.brokers()
+                       if broker.instance == instance]
+            if not brokers:
+                raise ValueError(f"{instance} is not a configured instance")
+        else:
+            brokers = [self._bugzilla_broker, self._jira_broker]
+        names = set()
+        for broker in brokers:
+            names.update(field.name for field in broker.get_fields())
+        for name in list(filters or {}) + list(fields or []):
+            if name not in names:
+                raise ValueError(f"{name} is not a configured field")
+        result = self.local_store.query(filters, text, backend, instance,
+                                        limit)
+        if fields is not None:
+            result.rows = [{name: row.get(name)
+                            for name in ["key"] + list(fields)}
+                           for row in result.rows]
+        return result
+
+    def _get_diff_broker(self, old, new):
+        """Private method to return the Broker of a pair of snapshots
+
+        :raises ValueError: If neither snapshot is an Issue, or if they
+            belong to different instances
+        :rtype: bugjira.broker.Broker
+        """
+        brokers = {self._router.for_issue(snapshot) for snapshot in (old, new)
+                   if isinstance(snapshot, Issue)}
+        if not brokers:
+            raise ValueError("old or new must be an Issue: "
+                             f"{str(old)}, {str(new)}")
+        if len(brokers) > 1:
+            raise ValueError("old and new must be issues of the same "
+                             f"instance: {old.key}, {new.key}")
+        return brokers.pop()
+
+    def export(self, issues, path, fmt=JSONL, fields=None,
+               resume=False) -> int:
+        """Stream issues into an export file, writing each issue's projected
+        fields (see the project method) as it arrives so that memory use stays
+        bounded. With resume=True, an interrupted export is continued from its
+        last checkpoint: the issues are skipped up to and including the last
+        key it wrote, so they must be supplied in the same order as before,
+        e.g. by re-running the same search ordered by key. Issues created
+        before that key since the export started are not exported.
+
+        :param issues: The issues to export, e.g. from the search method
+        :type issues: Iterable[bugjira.issue.Issue]
+        :param path: The file to write for jsonl, or the directory to write
+            for parquet
+        :type path: str
+        :param fmt: bugjira.export.JSONL or bugjira.export.PARQUET, defaults
+            to JSONL
+        :type fmt: str, optional
+        :param fields: The configured names of the fields to export, defaults
+            to None, which exports every configured field
+        :type fields: [str], optional
+        :param resume: If True, continue an existing export, defaults to False
+        :type resume: bool, optional
+        :raises ExportException: If resuming, and the last key written is not
+            among the issues
+        :return: The number of issues written
+        :rtype: int
+        """
+        with get_export_writer(fmt, path, resume) as writer:
+            return export_issues(self, issues, writer, fields,
+                                 resume_after=writer.last_key)
+
+    def watch(self, keys, callback, interval=60, fields=None,
+              on_error=None) -> Subscription:
+        """Call a function whenever one of a set of issues changes. Every key
+        watched through this Bugjira object is polled by one background
+        thread, using one batched query per instance per interval that only
+        returns the issues updated since the last poll. The callback is
+        called from that thread with a bugjira.watch.IssueChange holding the
+        changed fields' old and new values, and only when a watched field's
+        value has changed. Keys can be added to and removed from the
+        returned subscription while it is running.
+
+        :param keys: The keys to watch, as accepted by get_issue
+        :type keys: [str]
+        :param callback: Called with an IssueChange for each change
+        :type callback: Callable
+        :param interval: The seconds between polls, defaults to 60. When
+            subscriptions have different intervals, all keys are polled at
+            the shortest one.
+        :type interval: float, optional
+        :param fields: The configured names of the fields to watch, defaults
+            to None, which watches every configured field
+        :type fields: [str], optional
+        :param on_error: Called with the exception when a poll or the
+            callback fails, defaults to None, which ignores errors. Failed
+            polls are retried at the next interval.
+        :type on_error: Callable, optional
+        :raises ValueError: If the interval is not positive, a key is not
+            valid, or a field is not configured for a key's backend
+        :return: The subscription
+        :rtype: bugjira.watch.Subscription
+        """
+        if not callable(callback):
+            raise ValueError(f"callback must be callable: {callback}")
+        if interval <= 0:
+            raise ValueError(f"interval must be positive: {interval}")
+        return self._watcher.subscribe(keys, callback, interval, fields,
+                                       on_error)
+
+    def apply_event(self, event) -> None:
+        """Apply a change pushed by a backend (see bugjira.webhooks): replace
+        the issue in the cache and the local store if the event carries the
+        whole issue, or drop it from the cache and mark it stale in the
+        local store otherwise, and pass the change to the watchers of the
+        issue (see watch), which would otherwise only see it at their next
+        poll
+
+        :param event: The event
+        :type event: bugjira.webhooks.ChangeEvent
+        :raises ValueError: If the event's backend or instance is not
+            configured, or if it carries JSON that its backend cannot build
+            an issue from (see Broker.issue_from_raw)
+        """
+        if not isinstance(event, ChangeEvent):
+            raise ValueError(f"event must be a ChangeEvent: {str(event)}")
+        broker = self._get_backend_broker(event.backend, event.instance)
+        issue = None
+        if event.raw is not None and event.action != DELETED:
+            issue = broker.issue_from_raw(event.raw)
+        if self.cache is not None:
+            if issue is None:
+                self.cache.invalidate(broker.generator_type, broker.instance,
+                                      event.key)
+            else:
+                self.cache.put(broker.generator_type, broker.instance,
+                               event.key, issue)
+        if self.local_store is not None:
+            if event.action == DELETED:
+                self.local_store.delete(broker, event.key)
+            elif issue is not None:
+                self.local_store.put(broker, [issue])
+            else:
+                self.local_store.mark_stale(broker, [event.key])
+        if event.action != DELETED:
+            self._watcher.notify(broker, event.key, issue)
+
+    def serve_webhooks(self, host="127.0.0.1", port=0) -> WebhookReceiver:
+        """Start an HTTP server that applies the events pushed to it by
+        jira webhooks and bugzilla to this Bugjira object (see
+        bugjira.webhooks.WebhookReceiver). The token and bugzilla payload
+        format are taken from the config's webhooks section.
+
+        :param host: The address to listen on, defaults to "127.0.0.1"
+        :type host: str, optional
+        :param port: The port to listen on, defaults to 0, which picks a
+            free port
+        :type port: int, optional
+        :return: The running receiver; call its stop method to stop it
+        :rtype: bugjira.webhooks.WebhookReceiver
+        """
+        webhooks = WebhookConfig(**((self.config or {}).get("webhooks") or
+                                    {}))
+        return WebhookReceiver(self, host, port, webhooks.token,
+                               webhooks.bugzilla).start()
+
+    def to_table(self, issues, fields=None) -> IssueTable:
+        """Convert a batch of issues into a columnar IssueTable. Each column's
+        type is taken from the data_type of the field in the field
+        registry: "category" fields are dictionary-encoded, "datetime" fields
+        become datetime64 arrays and "number" fields become float arrays.
+        Requires the optional numpy dependency.
+
+        :param issues: The issues to convert
+        :type issues: Iterable[bugjira.issue.Issue]
+        :param fields: The configured names of the fields to include,
+            defaults to None, which includes every configured field
+        :type fields: [str], optional
+        :raises ValueError: If a "datetime" field value is not an ISO 8601
+            timestamp
+        :return: The table
+        :rtype: bugjira.table.IssueTable
+        """
+        data_types = {}
+        for broker in self._router.brokers():
+            if not broker.config:
+                continue
+            for field in broker.get_fields():
+                if field.data_type and (fields is None or
+                                        field.name in fields):
+                    data_types.setdefault(field.name, field.data_type)
+        return IssueTable.from_rows(
+            (self.project(issue, fields) for issue in issues), data_types)
+
+    def walk_links(self, roots, depth=1, link_types=None):
+        """Walk the graph of links between issues breadth-first, starting from
+        the root issues and following links up to the given depth. Each level
+        of the graph is looked up with bulk requests per backend, so the
+        number of requests grows with the depth of the graph rather than the
+        number of issues in it. Each issue is visited at most once, whether
+        its key is qualified with an instance name or not. Links between the
+        issues of a named instance are followed on that instance. JIRA
+        remote links, which take a request per issue, are not fetched for the
+        issues at the maximum depth, whose links are not followed.
+
+        :param roots: The keys or Issues to start from
+        :type roots: [str or bugjira.issue.Issue]
+        :param depth: The maximum number of links to follow from a root,
+            defaults to 1
+        :type depth: int, optional
+        :param link_types: The link types to follow (see bugjira.links),
+            defaults to None, which follows all link types
+        :type link_types: [str], optional
+        :raises ValueError: If a root is neither a str nor an Issue
+        :yield: A LinkGraphNode for each issue visited, along with the links
+            that lead out of it
+        :rtype: Iterator[LinkGraphNode]
+        """
+        frontier = []
+        visited = set()
+        for root in roots:
+            if isinstance(root, Issue):
+                root = self._qualify(root.key, root.instance)
+            if not isinstance(root, str):
+                raise ValueError(f"root must be a str or an Issue: {root}")
+            if self._link_identity(root) not in visited:
+                visited.add(self._link_identity(root))
+                frontier.append(root)
+        for level in range(depth + 1):
+            if not frontier:
+                return
+            nodes = [LinkGraphNode(key=result.key, depth=level,
+                                   issue=result.issue, error=result.error)
+                     for result in self.get_issues(frontier)]
+            self._add_links(nodes, link_types, remote=level < depth)
+            frontier = []
+            for node in nodes:
+                yield node
+                if level == depth:
+                    continue
+                for link in node.links:
+                    identity = self._link_identity(link.target)
+                    if identity not in visited:
+                        visited.add(identity)
+                        frontier.append(link.target)
+
+    def _add_links(self, nodes, link_types, remote=True) -> None:
+        """Private method to fill in the links attribute of each successfully
+        looked up node, using one get_links call per backend. If a backend
+        fails to return links, its nodes' error attributes are set instead.
+        Backends report links by bare keys, so the links of a named instance
+        to issues on the same backend are qualified with the instance name.
+
+        :param nodes: The nodes in one level of a link graph
+        :type nodes: [LinkGraphNode]
+        :param link_types: The link types to follow
+        :type link_types: [str]
+        :param remote: False to skip fetching JIRA remote links, defaults to
+            True
+        :type remote: bool, optional
+        """
+        # A node's key may be qualified with an instance name, while its
+        # issue's key is not, so nodes are matched by position instead
+        found = [node for node in nodes if node.issue is not None]
+        groups = self._group_by_broker([node.issue for node in found])
+        for broker, indexed in groups.items():
+            issues = [issue for _, issue in indexed]
+            try:
+                links = broker.get_links(issues, link_types, remote)
+            except Exception as e:
+                for position, _ in indexed:
+                    found[position].error = e
+                continue
+            for position, issue in indexed:
+                qualified = (self._qualify_link(broker, link)
+                             for link in links.get(issue.key, []))
+                found[position].links = [
+                    link for link in qualified
+                    if self._is_known_key(link.target)
+                ]
+
+    def _qualify_link(self, broker, link) -> IssueLink:
+        """Private method to qualify the keys of a link reported by a Broker
+        for a named instance with the instance name, if they are keys of the
+        broker's backend
+
+        :param broker: The Broker that reported the link
+        :type broker: bugjira.broker.Broker
+        :param link: The link
+        :type link: bugjira.links.IssueLink
+        :return: The link, with its keys qualified where needed
+        :rtype: bugjira.links.IssueLink
+        """
+        if broker.instance is None:
+            return link
+        source, target = link.source, link.target
+        if classify_key(target)[0] == broker.generator_type:
+            target = self._qualify(target, broker.instance)
+        return IssueLink(source=self._qualify(source, broker.instance),
+                         target=target, link_type=link.link_type)
+
+    @staticmethod
+    def _qualify(key, instance) -> str:
+        """Private method to qualify a bare key with an instance name, unless
+        the instance is the default one (None)
+        """
+        if instance is None:
+            return key
+        return f"{instance}{INSTANCE_SEPARATOR}{key}"
+
+    def _link_identity(self, key):
+        """Private method to return what identifies the issue a key refers
+        to while walking links, so that qualified and bare keys for the same
+        issue are visited once
+
+        :param key: The key
+        :type key: str
+        :return: A (Broker, key) tuple, or the key itself if it cannot be
+            routed
+        :rtype: tuple or str
+        """
+        try:
+            return self._router.route(key)
+        except ValueError:
+            return key
+
+    def _is_known_key(self, key) -> bool:
+        """Private method to check whether a key can be routed to a Broker,
+        including keys qualified with the name of a configured instance
+
+        :param key: The key to check
+        :type key: str
+        :return: True if a Broker can handle the key
+        :rtype: bool
+        """
+        try:
+            self._router.route(key)
+        except ValueError:
+            return False
+        return True
+
+    def update_issues(self, issues, fields, priority=None) -> [IssueResult]:
+        """Apply the same field changes to many issues. Field names are
+        resolved through the field configuration of each issue's backend, so
+        every field name must be configured for every backend involved.
+        Bugzilla bugs are updated with a single multi-id request, and JIRA
+        issues are edited concurrently.
+
+        :param issues: The issues to update
+        :type issues: [bugjira.issue.Issue]
+        :param fields: A dict mapping configured field names to new values
+        :type fields: dict
+        :param priority: The priority class of the requests, e.g.
+            bugjira.scheduling.INTERACTIVE, defaults to None, which uses the
+            current priority (see Bugjira.priority)
+        :type priority: str, optional
+        :raises ValueError: If an input is not an Issue, if fields is not a
+            dict, or if a field name is not configured for a backend
+        :return: A list of IssueResult objects in the same order as the input
+            issues
+        :rtype: [IssueResult]
+        """
+        if not isinstance(fields, dict):
+            raise ValueError(f"fields must be a dict: {str(fields)}")
+        results = [None] * len(issues)
+        with scheduling.priority(priority):
+            for broker, indexed in self._group_by_broker(issues).items():
+                positions, batch = zip(*indexed)
+                for position, result in zip(
+                        positions,
+                        broker.dispatch(broker.update_issues, batch, fields)):
+                    results[position] = result
+                self._changed(broker, [issue.key for issue in batch])
+        return results
+
+    def _changed(self, broker, keys) -> None:
+        """Private method to drop issues that this object has changed from
+        the issue cache, and mark them stale in the local store
+
+        :param broker: The broker of the issues' instance
+        :type broker: bugjira.broker.Broker
+        :param keys: The issues' keys on their instance
+        :type keys: [str]
+        """
+        if self.cache is not None:
+            for key in keys:
+                self.cache.invalidate(broker.generator_type, broker.instance,
+                                      key)
+        if self.local_store is not None:
+            self.local_store.mark_stale(broker, keys)
+
+    def create_issues(self, specs, backend, instance=None,
+                      priority=None) -> [IssueResult]:
+        """Create many new issues in one backend. Each spec is a dict keyed by
+        configured field names, so the same specs can be used with either
+        backend as long as the field names are configured for both. JIRA
+        issues are created with the bulk create endpoint, while bugzilla bugs
+        are created concurrently.
+
+        :param specs: A list of dicts mapping configured field names to the
+            values for each new issue
+        :type specs: [dict]
+        :param backend: The backend to create the issues in, either
+            bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance to create the
+            issues in, defaults to None for the backend's default instance
+        :type instance: str, optional
+        :param priority: The priority class of the requests, e.g.
+            bugjira.scheduling.INTERACTIVE, defaults to None, which uses the
+            current priority (see Bugjira.priority)
+        :type priority: str, optional
+        :raises ValueError: If a spec is not a dict, if the backend or
+            instance is not valid, or if a field name is not configured for
+            the backend
+        :return: A list of IssueResult objects in the same order as the input
+            specs
+        :rtype: [IssueResult]
+        """
+        for spec in specs:
+            if not isinstance(spec, dict):
+                raise ValueError(f"spec must be a dict: {str(spec)}")
+        broker = self._get_backend_broker(backend, instance)
+        with scheduling.priority(priority):
+            return broker.dispatch(broker.create_issues, specs)
+
+    def get_comments(self, issues, since=None):
+        """Stream the comments on many issues as backend-independent Comment
+        records. Bugzilla comments are fetched for many bugs per request,
+        and JIRA comments are paged concurrently for several issues at once.
+        Pass since to fetch only the comments created after the last one you
+        have seen, either as one datetime for every issue or as a dict
+        mapping issue keys to datetimes (naive datetimes are taken to be
+        UTC).
+
+        :param issues: The issues whose comments to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param since: Only return comments created after this time, defaults
+            to None, which returns every comment
+        :type since: datetime.datetime or dict, optional
+        :raises ValueError: If an input is not an Issue
+        :raises BrokerLookupException: If a backend fails to return comments
+        :yield: The comments, grouped by backend, then by issue in input
+            order, oldest first
+        :rtype: Iterator[bugjira.comment.Comment]
+        """
+        for broker, indexed in self._group_by_broker(issues).items():
+            comments = broker.get_comments([issue for _, issue in indexed],
+                                           since)
+            if self.local_store is None:
+                yield from comments
+                continue
+            batch = []
+            for comment in comments:
+                batch.append(comment)
+                if len(batch) == COMMENT_BATCH_SIZE:
+                    self.local_store.add_comments(broker, batch)
+                    batch = []
+                yield comment
+            self.local_store.add_comments(broker, batch)
+
+    def get_history(self, issues, fields=None):
+        """Stream the field changes of many issues as backend-independent
+        HistoryRecord objects, e.g. to find when each issue changed status.
+        Bugzilla history is fetched for many bugs per request, and JIRA
+        changelogs are fetched concurrently for several issues at once. Only
+        changes to configured fields are returned, and each record names the
+        field by its configured name.
+
+        :param issues: The issues whose history to fetch
+        :type issues: [bugjira.issue.Issue]
+        :param fields: The configured names of the fields whose changes to
+            return, defaults to None, which returns changes to every
+            configured field
+        :type fields: [str], optional
+        :raises ValueError: If an input is not an Issue, or if a field name is
+            not configured for the issue's backend
+        :raises BrokerLookupException: If a backend fails to return history
+        :yield: The changes, grouped by backend, then by issue in input
+            order, oldest first
+        :rtype: Iterator[bugjira.history.HistoryRecord]
+        """
+        for broker, indexed in self._group_by_broker(issues).items():
+            yield from broker.get_history([issue for _, issue in indexed],
+                                          fields)
+
+    def iter_attachments(self, issue):
+        """Yield the attachments of an issue. Only the attachments' metadata
+        is fetched; use download_attachment to fetch their contents.
+
+        :param issue: The issue whose attachments to list
+        :type issue: bugjira.issue.Issue
+        :raises ValueError: If the issue is not an Issue
+        :yield: The issue's attachments
+        :rtype: Iterator[bugjira.attachment.Attachment]
+        """
+        if not isinstance(issue, Issue):
+            raise ValueError(f"issue must be an Issue: {str(issue)}")
+        yield from self._router.for_issue(issue).get_attachments(issue)
+
+    def download_attachment(self, attachment, dest, resume=True) -> str:
+        """Download an attachment to a file, streaming its contents in fixed
+        size chunks so that memory use does not depend on the size of the
+        attachment. The file only appears at dest once its length, and its
+        sha256 digest if the attachment has one, have been verified. An
+        interrupted download resumes where it stopped if the server supports
+        range requests.
+
+        :param attachment: The attachment to download, e.g. from
+            iter_attachments
+        :type attachment: bugjira.attachment.Attachment
+        :param dest: The file to write
+        :type dest: str
+        :param resume: If True, continue an earlier interrupted download of
+            the same file, defaults to True
+        :type resume: bool, optional
+        :raises ValueError: If the attachment is not an Attachment
+        :raises BrokerAttachmentException: If the download fails or cannot be
+            verified
+        :return: The path of the downloaded file
+        :rtype: str
+        """
+        if not isinstance(attachment, Attachment):
+            raise ValueError(
+                f"attachment must be an Attachment: {str(attachment)}")
+        broker = self._router.for_issue(attachment)
+        return broker.download_attachment(attachment, dest, resume)
+
+    def download_attachments(self, attachments, dest_dir, workers=4,
+                             resume=True) -> [AttachmentResult]:
+        """Download many attachments in parallel into a directory. Each file
+        is named after its issue key, attachment id and file name, so
+        attachments with the same name do not overwrite each other.
+
+        :param attachments: The attachments to download
+        :type attachments: [bugjira.attachment.Attachment]
+        :param dest_dir: The directory to download to, which is created if
+            it does not exist
+        :type dest_dir: str
+        :param workers: The number of attachments downloaded at once,
+            defaults to 4
+        :type workers: int, optional
+        :param resume: If True, continue earlier interrupted downloads,
+            defaults to True
+        :type resume: bool, optional
+        :raises ValueError: If an input is not an Attachment
+        :return: A list of AttachmentResult objects in the same order as the
+            input attachments
+        :rtype: [bugjira.attachment.AttachmentResult]
+        """
+        for attachment in attachments:
+            if not isinstance(attachment, Attachment):
+                raise ValueError(
+                    f"attachment must be an Attachment: {str(attachment)}")
+        os.makedirs(dest_dir, exist_ok=True)
+
+        def download(attachment):
+            dest = os.path.join(dest_dir, attachment_filename(attachment))
+            try:
+                path = self.download_attachment(attachment, dest, resume)
+            except Exception as e:
+                return AttachmentResult(attachment=attachment, error=e)
+            return AttachmentResult(attachment=attachment, path=path)
+
+        with ContextThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(download, attachments))
+
+    def upload_attachment(self, issue, path, filename=None,
+                          description="") -> Attachment:
+        """Attach a file to an issue. Uploads to JIRA are streamed from the
+        file; bugzilla's API requires the contents inline, so uploads to
+        bugzilla read the whole file into memory.
+
+        :param issue: The issue to attach the file to
+        :type issue: bugjira.issue.Issue
+        :param path: The file to upload
+        :type path: str
+        :param filename: The name to give the attachment, defaults to None,
+            which uses the file's base name
+        :type filename: str, optional
+        :param description: A description of the attachment (bugzilla only),
+            defaults to ""
+        :type description: str, optional
+        :raises ValueError: If the issue is not an Issue
+        :raises BrokerAttachmentException: If the upload fails
+        :return: The new attachment
+        :rtype: bugjira.attachment.Attachment
+        """
+        if not isinstance(issue, Issue):
+            raise ValueError(f"issue must be an Issue: {str(issue)}")
+        return self._router.for_issue(issue).upload_attachment(
+            issue, path, filename, description)
+
+    def _get_backend_broker(self, backend, instance=None):
+        """Private method to return the Broker for a backend type
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of a configured instance, defaults to None
+            for the backend's default instance
+        :type instance: str, optional
+        :raises ValueError: If the backend or instance is not valid
+        :return: The Broker for the backend
+        :rtype: bugjira.broker.Broker
+        """
+        return self._router.get(backend, instance)
+
+    def _group_by_broker(self, issues) -> dict:
+        """Private method to group issues by the Broker that handles them,
+        remembering each issue's position in the input.
+
+        :param issues: The issues to group
+        :type issues: [bugjira.issue.Issue]
+        :raises ValueError: If an input is not an Issue
+        :return: A dict mapping each Broker to a list of (position, issue)
+            tuples
+        :rtype: dict
+        """
+        groups = {}
+        for position, issue in enumerate(issues):
+            if not isinstance(issue, Issue):
+                raise ValueError(f"issue must be an Issue: {str(issue)}")
+            broker = self._router.for_issue(issue)
+            groups.setdefault(broker, []).append((position, issue))
+        return groups
 
     def _get_broker(self, key):
         """Private method to return the correct backend Broker based on the
         input key.
 
-        :param key: Either a bugzilla bug id or a Jira issue key
+        :param key: Either a bugzilla bug id or a Jira issue key, optionally
+            qualified with the name of the instance it belongs to
         :type key: str
         :raises ValueError: If the input key is not a bugzilla id or a jira
             issue key
         :return: The correct Broker to handle operations on the Issue
         :rtype: bugjira.broker.Broker
         """
-        if is_bugzilla_key(key):
-            return self._bugzilla_broker
-
-        if is_jira_key(key):
-            return self._jira_broker
-
-        raise ValueError("key does not appear to be bugzilla or jira ID")
+        return self._router.route(key)[0]
@@ -0,0 +1,134 @@
+"""A cache of looked up issues (see Bugjira.get_issue). Entries expire
+after a time to live, and are replaced or dropped as soon as a webhook
+reports a change (see bugjira.webhooks), so with webhooks configured the
+time to live is only a safety net for missed events.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from pydantic import BaseModel
+
+from bugjira.session import register_lock_owner
+
+
+class CacheStats(BaseModel):
+    """A snapshot of an IssueCache's counters"""
+
+    size: int
+    hits: int
+    misses: int
+    # The number of entries dropped because their issue changed
+    invalidations: int
+    # The number of entries dropped because they expired or the cache was
+    # full
+    evictions: int
+
+
+class IssueCache:
+    """A thread-safe, size-bounded cache of issues, keyed by backend,
+    instance and key. The least recently used entry is dropped when the
+    cache is full.
+    """
+
+    def __init__(self, ttl=300.0, max_size=10000):
+        """Init method
+
+        :param ttl: The seconds an entry is served for, defaults to 300.0.
+            None serves entries until they are invalidated.
+        :type ttl: float, optional
+        :param max_size: The most entries kept, defaults to 10000
+        :type max_size: int, optional
+        :raises ValueError: If ttl or max_size is not positive
+        """
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be positive: {ttl}")
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1: {max_size}")
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    def get(self, backend, instance, key):
+        """Return a cached issue, or None if it is not cached or has expired
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance, or None
+        :type instance: str
+        :param key: The issue's key on its instance
+        :type key: str
+        :rtype: bugjira.issue.Issue
+        """
+        entry_key = (backend, instance, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[entry_key]
+                self._evictions += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, backend, instance, key, issue) -> None:
+        """Cache an issue, replacing any cached version of it
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance, or None
+        :type instance: str
+        :param key: The issue's key on its instance
+        :type key: str
+        :param issue: The issue
+        :type issue: bugjira.issue.Issue
+        """
+        entry_key = (backend, instance, key)
+        with self._lock:
+            self._entries[entry_key] = (issue, time.monotonic())
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, backend, instance, key) -> bool:
+        """Drop an issue from the cache
+
+        :return: True if the issue was cached
+        :rtype: bool
+        """
+        with self._lock:
+            if self._entries.pop((backend, instance, key), None) is None:
+                return False
+            self._invalidations += 1
+            return True
+
+    def clear(self) -> None:
+        """Drop every issue from the cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache's counters
+
+        :rtype: CacheStats
+        """
+        with self._lock:
+            return CacheStats(size=len(self._entries), hits=self._hits,
+                              misses=self._misses,
+                              invalidations=self._invalidations,
+                              evictions=self._evictions)
+
+    def _expired(self, entry, now) -> bool:
+        return self.ttl is not None and now - entry[1] >= self.ttl
@@ -0,0 +1,217 @@
+"""Circuit breakers, which stop a broker from sending requests to a backend
+that is down. A breaker is closed while requests succeed. After
+failure_threshold requests in a row fail (no response, or a 5xx response),
+it opens, and requests fail at once with BrokerCircuitOpenException instead
+of each waiting for its own timeout. After reset_timeout seconds it is half
+open: a few probe requests are let through, and the first probe's outcome
+closes the breaker again or reopens it.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from pydantic import BaseModel
+
+from bugjira.concurrency import SERVER_ERROR
+from bugjira.exceptions import BrokerCircuitOpenException
+from bugjira.session import register_lock_owner
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitStats(BaseModel):
+    """A snapshot of a CircuitBreaker"""
+
+    backend: str
+    # The name of the configured instance, or None for the default instance
+    instance: Optional[str] = None
+    # CLOSED, OPEN or HALF_OPEN
+    state: str
+    # The number of requests in a row that have failed
+    failures: int
+    # The number of times the breaker has opened
+    opened: int
+    # The number of requests failed at once because the breaker was open
+    rejected: int
+    # Seconds until an open breaker lets probes through; None unless open
+    retry_in: Optional[float] = None
+
+
+def is_failure(status) -> bool:
+    """Return True if an HTTP status means the server is failing"""
+    return status is not None and status >= SERVER_ERROR
+
+
+class CircuitBreaker:
+    """The circuit breaker of one broker. Callers wrap each request in
+    guard(), which raises BrokerCircuitOpenException while the breaker is
+    open.
+    """
+
+    def __init__(self, backend, instance=None, failure_threshold=5,
+                 reset_timeout=30.0, half_open_probes=1):
+        """Init method
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance, defaults to
+            None for the default instance
+        :type instance: str, optional
+        :param failure_threshold: The number of requests in a row that must
+            fail to open the breaker, defaults to 5
+        :type failure_threshold: int, optional
+        :param reset_timeout: The seconds an open breaker waits before it
+            lets probes through, defaults to 30.0
+        :type reset_timeout: float, optional
+        :param half_open_probes: The number of probe requests a half open
+            breaker lets through at once, defaults to 1
+        :type half_open_probes: int, optional
+        :raises ValueError: If a setting is out of range
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1: "
+                             f"{failure_threshold}")
+        if reset_timeout <= 0:
+            raise ValueError(f"reset_timeout must be positive: "
+                             f"{reset_timeout}")
+        if half_open_probes < 1:
+            raise ValueError("half_open_probes must be at least 1: "
+                             f"{half_open_probes}")
+        self.backend = backend
+        self.instance = instance
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._failures = 0
+        self._opened = 0
+        self._rejected = 0
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    @property
+    def state(self) -> str:
+        """CLOSED, OPEN or HALF_OPEN"""
+        with self._lock:
+            self._update_state(time.monotonic())
+            return self._state
+
+    def admit(self) -> bool:
+        """Let a request through, or fail it if the breaker is open
+
+        :raises BrokerCircuitOpenException: If the breaker is open, or half
+            open with all its probes in flight
+        :return: True if the request is a probe, to be passed to record
+        :rtype: bool
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._update_state(now)
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and \
+                    self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            retry_in = self._retry_in(now)
+        name = self.backend if self.instance is None else \
+            f"{self.backend} instance {self.instance}"
+        message = f"circuit open for {name}"
+        if retry_in is not None:
+            message += f"; retrying in {retry_in:.1f}s"
+        raise BrokerCircuitOpenException(message)
+
+    def record(self, probe, failed=False, counted=True) -> None:
+        """Record the outcome of a request let through by admit
+
+        :param probe: The value returned by admit
+        :type probe: bool
+        :param failed: True if the request failed, defaults to False
+        :type failed: bool, optional
+        :param counted: False if the outcome says nothing about the server's
+            health (e.g. the request was cancelled), defaults to True
+        :type counted: bool, optional
+        """
+        with self._lock:
+            if probe:
+                self._probes -= 1
+            if not counted:
+                return
+            if probe and self._state == HALF_OPEN:
+                if failed:
+                    self._open(time.monotonic())
+                else:
+                    self._state = CLOSED
+                    self._failures = 0
+            elif self._state == CLOSED:
+                if not failed:
+                    self._failures = 0
+                    return
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._open(time.monotonic())
+            # Requests that were sent before the breaker opened say nothing
+            # about whether the server has recovered since
+
+    @contextmanager
+    def guard(self):
+        """Let a request through, and record its outcome. Yields a dict
+        whose "status" the caller sets to the response's HTTP status, and
+        whose "count" the caller sets to False if the outcome should not be
+        recorded. A request that raises without a status counts as failed.
+
+        :raises BrokerCircuitOpenException: If the breaker is open
+        """
+        probe = self.admit()
+        outcome = {"status": None, "count": True}
+        try:
+            yield outcome
+        except BaseException:
+            self.record(probe, failed=outcome["status"] is None or
+                        is_failure(outcome["status"]),
+                        counted=outcome["count"])
+            raise
+        self.record(probe, failed=is_failure(outcome["status"]),
+                    counted=outcome["count"])
+
+    def stats(self) -> CircuitStats:
+        """Return a snapshot of the breaker's state and counters
+
+        :return: The stats
+        :rtype: CircuitStats
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._update_state(now)
+            return CircuitStats(
+                backend=self.backend, instance=self.instance,
+                state=self._state, failures=self._failures,
+                opened=self._opened, rejected=self._rejected,
+                retry_in=self._retry_in(now))
+
+    def _after_fork(self) -> None:
+        # The probes in flight belong to the parent's threads
+        self._probes = 0
+
+    def _open(self, now) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._opened += 1
+
+    def _update_state(self, now) -> None:
+        if self._state == OPEN and \
+                now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+
+    def _retry_in(self, now):
+        if self._state != OPEN:
+            return None
+        return max(0.0, self._opened_at + self.reset_timeout - now)
@@ -0,0 +1,136 @@
+import argparse
+import sys
+
+from bugjira.bugjira import Bugjira
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.export import (
+    JSONL,
+    PARQUET,
+    export_issues,
+    get_export_writer
+)
+from bugjira.prefetch import Prefetcher
+
+
+def _iter_keys(bugjira, keys, chunk_size, prefetch):
+    """Look up keys in chunks, yielding the issues that were found and
+    reporting the ones that were not on stderr. The next chunks are looked up
+    in the background while the current one is being exported.
+    """
+    chunks = (bugjira.get_issues(keys[start:start + chunk_size])
+              for start in range(0, len(keys), chunk_size))
+    for chunk in Prefetcher(chunks, prefetch):
+        for result in chunk:
+            if result.ok:
+                yield result.issue
+            else:
+                print(f"{result.key}: {result.error}", file=sys.stderr)
+
+
+def _skip_exported(bugjira, keys, last_key) -> [str]:
+    """Return the keys that come after the last key an interrupted export
+    wrote. Keys whose lookup failed wrote no row, so the position of the last
+    key is used rather than the number of rows written. Exported rows hold
+    keys as their backend knows them, so the input keys are compared in the
+    same form: normalized, and without any instance qualifier.
+    """
+    if last_key is None:
+        return keys
+    for position, key in enumerate(keys):
+        try:
+            exported = bugjira._router.route(key)[1]
+        except ValueError:
+            exported = key
+        if exported == last_key:
+            return keys[position + 1:]
+    return keys
+
+
+def _read_keys(args) -> [str]:
+    if args.keys_file:
+        with open(args.keys_file) as keys_file:
+            return [line.strip() for line in keys_file if line.strip()]
+    return args.keys
+
+
+def export(args) -> int:
+    """Run the export subcommand
+
+    :param args: The parsed command line arguments
+    :type args: argparse.Namespace
+    :return: The exit status
+    :rtype: int
+    """
+    bugjira = Bugjira(config_path=args.config)
+    with get_export_writer(args.format, args.output, args.resume) as writer:
+        if args.jql or args.bugzilla_query:
+            # The search is run again from the start, rather than from the
+            # number of rows written, so that issues created or moved since
+            # the export started do not shift the resume point
+            if args.jql:
+                issues = bugjira.search(args.jql, JIRA, args.page_size,
+                                        args.fields, args.prefetch)
+            else:
+                query = bugjira.bugzilla.url_to_query(args.bugzilla_query)
+                issues = bugjira.search(query, BUGZILLA, args.page_size,
+                                        args.fields, args.prefetch)
+            export_issues(bugjira, issues, writer, args.fields,
+                          resume_after=writer.last_key)
+        else:
+            keys = _skip_exported(bugjira, _read_keys(args),
+                                  writer.last_key)
+            issues = _iter_keys(bugjira, keys, args.page_size or 500,
+                                args.prefetch)
+            export_issues(bugjira, issues, writer, args.fields)
+    print(f"Exported {writer.count} issues to {args.output}")
+    return 0
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="bugjira",
+        description="Command line tools for bugzilla and jira")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export",
+        help="Export issues to JSON Lines or Parquet files")
+    export_parser.set_defaults(func=export)
+    export_parser.add_argument("--config", required=True,
+                               help="Path to a bugjira config file")
+    source = export_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jql", help="A JQL search to export")
+    source.add_argument("--bugzilla-query", metavar="URL",
+                        help="A bugzilla search URL to export")
+    source.add_argument("--keys", nargs="+",
+                        help="Bugzilla ids and/or jira keys to export")
+    source.add_argument("--keys-file",
+                        help="A file containing one key per line to export")
+    export_parser.add_argument("--output", required=True,
+                               help="The file (jsonl) or directory (parquet) "
+                                    "to export to")
+    export_parser.add_argument("--format", choices=[JSONL, PARQUET],
+                               default=JSONL)
+    export_parser.add_argument("--fields", nargs="+",
+                               help="Configured field names to export "
+                                    "(default: all configured fields)")
+    export_parser.add_argument("--page-size", type=int,
+                               help="Number of issues to fetch per request")
+    export_parser.add_argument("--prefetch", type=int, default=1,
+                               help="Number of pages to fetch ahead of the "
+                                    "writer (default: 1)")
+    export_parser.add_argument("--resume", action="store_true",
+                               help="Continue an interrupted export after "
+                                    "the last key it wrote; searches must "
+                                    "return the issues in the same order, "
+                                    "e.g. ORDER BY key")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = get_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""The objects in this module describe issue comments, as returned by
+Bugjira.get_comments.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from bugjira.util import parse_datetime
+
+
+class Comment(BaseModel):
+    """A comment on a bugzilla bug or a JIRA issue, in a form that does not
+    depend on the backend. The created attribute is a timezone-aware UTC
+    datetime.
+    """
+
+    key: str
+    id: str
+    author: Optional[str] = None
+    created: Optional[datetime] = None
+    body: str = ""
+
+
+def since_for(since, key):
+    """Return the time after which comments on an issue are wanted
+
+    :param since: None, a single timestamp for every issue, or a dict
+        mapping issue keys to timestamps
+    :type since: datetime.datetime or dict
+    :param key: The issue key
+    :type key: str
+    :return: The timestamp in UTC, or None if every comment is wanted
+    :rtype: datetime.datetime
+    """
+    if isinstance(since, dict):
+        since = since.get(key)
+    return parse_datetime(since)
+
+
+def is_new(comment, since) -> bool:
+    """Return True if a comment was created after since, or since is None"""
+    return since is None or (comment.created is not None and
+                             comment.created > since)
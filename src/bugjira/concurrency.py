@@ -0,0 +1,250 @@
+"""Adaptive limits on the number of requests a broker has in flight. The
+limit follows the additive increase, multiplicative decrease (AIMD) scheme
+of TCP congestion control: it grows by about one request per round trip
+while latency stays near its baseline, and is cut by a constant factor when
+the server throttles (429), fails (5xx) or slows down markedly. A baseline
+is kept per operation, so that a bulk search is not taken for a slow
+lookup. Requests that have to wait for a slot are let through in weighted
+fair order of their priority classes (see bugjira.scheduling.Dispatcher).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from bugjira.scheduling import Dispatcher
+
+
+# HTTP statuses that mean the server is overloaded
+TOO_MANY_REQUESTS = 429
+SERVER_ERROR = 500
+
+# The name under which requests without an operation share a baseline
+DEFAULT_OPERATION = "*"
+# The most operations a limiter keeps separate baselines for; later
+# operations share the default baseline
+MAX_OPERATIONS = 256
+
+
+class LimiterStats(BaseModel):
+    """A snapshot of an AdaptiveLimiter"""
+
+    backend: str
+    # The name of the configured instance, or None for the default instance
+    instance: Optional[str] = None
+    # The number of requests allowed in flight at once
+    limit: int
+    in_flight: int
+    # The number of requests that have waited for a free slot
+    waited: int
+    # The number of requests of each priority class waiting now
+    waiting: Dict[str, int] = {}
+    # The total seconds requests of each priority class have waited
+    wait_time: Dict[str, float] = {}
+    successes: int
+    # The number of 429 and 5xx responses
+    throttled: int
+    # The number of responses slower than latency_tolerance times baseline
+    latency_spikes: int
+    # The number of times the limit was cut
+    decreases: int
+    # Seconds; the baseline of the last response's operation, None until
+    # the first response
+    baseline_latency: Optional[float] = None
+    last_latency: Optional[float] = None
+    # The baseline latency of each operation
+    baseline_latencies: Dict[str, float] = {}
+
+
+def is_throttled(status) -> bool:
+    """Return True if an HTTP status means the server is overloaded"""
+    return status is not None and (status == TOO_MANY_REQUESTS or
+                                   status >= SERVER_ERROR)
+
+
+class AdaptiveLimiter(Dispatcher):
+    """Limits the number of requests in flight, adapting the limit to the
+    server's responses. Callers wrap each request in slot(), which blocks
+    while the limit is reached, and queues the request by its priority class
+    (see bugjira.scheduling.Dispatcher). A single overload event often fails
+    every request in flight, so the limit is only cut once for the requests
+    that were already in flight when it was last cut. Latency spikes are
+    judged against the baseline of the request's operation, since e.g. a
+    bulk search normally takes much longer than a single lookup.
+    """
+
+    def __init__(self, backend, instance=None, initial_limit=8,
+                 min_limit=1, max_limit=64, backoff=0.5,
+                 latency_tolerance=2.0, baseline_drift=0.05):
+        """Init method
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance, defaults to
+            None for the default instance
+        :type instance: str, optional
+        :param initial_limit: The starting limit, defaults to 8
+        :type initial_limit: int, optional
+        :param min_limit: The lowest limit, defaults to 1
+        :type min_limit: int, optional
+        :param max_limit: The highest limit, defaults to 64
+        :type max_limit: int, optional
+        :param backoff: The factor the limit is multiplied by when it is cut,
+            defaults to 0.5
+        :type backoff: float, optional
+        :param latency_tolerance: How many times the baseline latency of its
+            operation a response may take before it counts as a latency
+            spike, defaults to 2.0
+        :type latency_tolerance: float, optional
+        :param baseline_drift: How far the baseline moves towards a slower
+            latency with each response, so that it follows a server that has
+            become slower for good, defaults to 0.05
+        :type baseline_drift: float, optional
+        :raises ValueError: If the limits or factors are out of range
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= "
+                             "initial_limit <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError(f"backoff must be between 0 and 1: {backoff}")
+        if latency_tolerance <= 1:
+            raise ValueError("latency_tolerance must be greater than 1: "
+                             f"{latency_tolerance}")
+        super().__init__(initial_limit)
+        self.backend = backend
+        self.instance = instance
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.baseline_drift = baseline_drift
+        self._limit = float(initial_limit)
+        self._successes = 0
+        self._throttled = 0
+        self._latency_spikes = 0
+        self._decreases = 0
+        self._baselines = {}
+        self._last_operation = DEFAULT_OPERATION
+        self._last_latency = None
+        self._last_decrease = float("-inf")
+
+    def release(self, started, status=None, failed=False, adapt=True,
+                operation=None) -> None:
+        """Free a slot and adapt the limit to the outcome of its request
+
+        :param started: The time returned by acquire
+        :type started: float
+        :param status: The HTTP status of the response, defaults to None
+        :type status: int, optional
+        :param failed: True if the request failed without a response (e.g.
+            timed out), which counts as a latency spike, defaults to False
+        :type failed: bool, optional
+        :param adapt: False if the request was never sent (e.g. it was
+            cancelled), so the limit is left as it is, defaults to True
+        :type adapt: bool, optional
+        :param operation: The name of the request's operation (see
+            bugjira.transport.operation_name), whose baseline latency the
+            request's latency is compared with, defaults to None, which uses
+            a shared baseline
+        :type operation: str, optional
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight -= 1
+            if adapt:
+                self._adapt(started, now, status, failed,
+                            self._baseline_key(operation))
+            self._lock.notify_all()
+
+    def _adapt(self, started, now, status, failed, operation) -> None:
+        """Adapt the limit to the outcome of a request. The caller must hold
+        the lock.
+        """
+        latency = now - started
+        self._last_latency = latency
+        self._last_operation = operation
+        if is_throttled(status):
+            self._throttled += 1
+            self._decrease(started, now)
+        elif failed or self._is_spike(latency, operation):
+            self._latency_spikes += 1
+            self._decrease(started, now)
+        else:
+            self._successes += 1
+            self._update_baseline(latency, operation)
+            # About one more request per round trip at the current limit
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    @contextmanager
+    def slot(self, priority=None, operation=None):
+        """Hold a slot for the duration of a request. Yields a dict whose
+        "status" the caller sets to the response's HTTP status, and whose
+        "adapt" the caller sets to False if the outcome should not change the
+        limit. A request that raises without a status counts as failed.
+
+        :param priority: The request's priority class, defaults to None,
+            which uses the current priority
+        :type priority: str, optional
+        :param operation: The name of the request's operation, defaults to
+            None (see release)
+        :type operation: str, optional
+        """
+        outcome = {"status": None, "adapt": True}
+        started = self.acquire(priority)
+        try:
+            yield outcome
+        except BaseException:
+            self.release(started, outcome["status"],
+                         failed=outcome["status"] is None,
+                         adapt=outcome["adapt"], operation=operation)
+            raise
+        self.release(started, outcome["status"], adapt=outcome["adapt"],
+                     operation=operation)
+
+    def stats(self) -> LimiterStats:
+        """Return a snapshot of the limiter's state and counters
+
+        :return: The stats
+        :rtype: LimiterStats
+        """
+        with self._lock:
+            return LimiterStats(
+                backend=self.backend, instance=self.instance,
+                limit=self.limit, in_flight=self._in_flight,
+                waited=self._waited, waiting=self._queue.waiting(),
+                wait_time=dict(self._wait_time), successes=self._successes,
+                throttled=self._throttled,
+                latency_spikes=self._latency_spikes,
+                decreases=self._decreases,
+                baseline_latency=self._baselines.get(self._last_operation),
+                last_latency=self._last_latency,
+                baseline_latencies=dict(self._baselines))
+
+    def _baseline_key(self, operation) -> str:
+        if operation is None or (operation not in self._baselines and
+                                 len(self._baselines) >= MAX_OPERATIONS):
+            return DEFAULT_OPERATION
+        return operation
+
+    def _is_spike(self, latency, operation) -> bool:
+        baseline = self._baselines.get(operation)
+        return baseline is not None and \
+            latency > baseline * self.latency_tolerance
+
+    def _update_baseline(self, latency, operation) -> None:
+        baseline = self._baselines.get(operation)
+        if baseline is None or latency < baseline:
+            self._baselines[operation] = latency
+        else:
+            self._baselines[operation] = \
+                baseline + (latency - baseline) * self.baseline_drift
+
+    def _decrease(self, started, now) -> None:
+        if started < self._last_decrease:
+            # Sent before the last cut, so already accounted for
+            return
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        self._last_decrease = now
+        self._decreases += 1
@@ -1,6 +1,71 @@
 import json
+from typing import Dict, List, Optional
+
+from pydantic import (
+    ConfigDict,
+    BaseModel,
+    confloat,
+    conint,
+    constr,
+    field_validator
+)
+
+
+class TransportConfig(BaseModel):
+    """HTTP transport settings for a backend's requests sessions (see
+    bugjira.transport)
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    # The number of hosts, and the number of connections per host, that each
+    # client's connection pool keeps open for reuse
+    pool_connections: conint(ge=1) = 10
+    pool_maxsize: conint(ge=1) = 10
+    # Wait for a free connection instead of opening (and then discarding)
+    # one beyond pool_maxsize
+    pool_block: bool = False
+    # Seconds; None waits forever (or uses the client library's default)
+    connect_timeout: confloat(gt=0) = None
+    read_timeout: confloat(gt=0) = None
+    # Ask for gzip-compressed responses
+    gzip: bool = True
+    # The proxy URL for both http and https requests
+    proxy: constr(strip_whitespace=True, min_length=1) = None
+    # The number of requests sent at once, across all threads, while the
+    # adaptive concurrency limit is disabled; requests beyond it wait their
+    # turn by priority class. None sends every request at once.
+    max_in_flight: conint(ge=1) = None
+
+
+class ConcurrencyConfig(BaseModel):
+    """Settings for a backend's adaptive concurrency limit (see
+    bugjira.concurrency.AdaptiveLimiter)
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    enabled: bool = False
+    initial_limit: conint(ge=1) = 8
+    min_limit: conint(ge=1) = 1
+    max_limit: conint(ge=1) = 64
+    # The factor the limit is multiplied by on throttling or latency spikes
+    backoff: confloat(gt=0, lt=1) = 0.5
+    # How many times the baseline latency counts as a latency spike
+    latency_tolerance: confloat(gt=1) = 2.0
 
-from pydantic import ConfigDict, BaseModel, field_validator, constr
+
+class CircuitBreakerConfig(BaseModel):
+    """Settings for a backend's circuit breaker (see
+    bugjira.circuit.CircuitBreaker)
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    enabled: bool = False
+    # The number of requests in a row that must fail to open the breaker
+    failure_threshold: conint(ge=1) = 5
+    # Seconds an open breaker fails requests at once before probing
+    reset_timeout: confloat(gt=0) = 30.0
+    # The number of probe requests let through at once while half open
+    half_open_probes: conint(ge=1) = 1
 
 
 class BugzillaConfig(BaseModel):
@@ -9,6 +74,9 @@ class BugzillaConfig(BaseModel):
     URL: constr(strip_whitespace=True, min_length=1)
     api_key: constr(strip_whitespace=True, min_length=1)
     field_data_plugin_name: constr(strip_whitespace=True, min_length=1)
+    transport: TransportConfig = None
+    concurrency: ConcurrencyConfig = None
+    circuit_breaker: CircuitBreakerConfig = None
 
 
 class JiraConfig(BaseModel):
@@ -17,6 +85,84 @@ class JiraConfig(BaseModel):
     URL: constr(strip_whitespace=True, min_length=1)
     token_auth: constr(strip_whitespace=True, min_length=1)
     field_data_plugin_name: constr(strip_whitespace=True, min_length=1)
+    transport: TransportConfig = None
+    concurrency: ConcurrencyConfig = None
+    circuit_breaker: CircuitBreakerConfig = None
+
+
+class BugzillaInstanceConfig(BugzillaConfig):
+    # Key prefixes that, like the instance name, route keys such as
+    # "partner:123456" to this instance
+    hints: List[str] = []
+
+
+class JiraInstanceConfig(JiraConfig):
+    # The project keys whose issues live on this instance
+    projects: List[str] = []
+
+
+class InstancesConfig(BaseModel):
+    """Additional named bugzilla and jira instances, alongside the default
+    instances configured in the bugzilla and jira sections
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    bugzilla: Dict[str, BugzillaInstanceConfig] = {}
+    jira: Dict[str, JiraInstanceConfig] = {}
+
+
+class CacheConfig(BaseModel):
+    """Settings for the issue cache (see bugjira.cache.IssueCache)"""
+    model_config = ConfigDict(extra='forbid')
+
+    enabled: bool = False
+    # Seconds an issue is served from the cache; None serves it until a
+    # webhook reports a change
+    ttl: Optional[confloat(gt=0)] = 300.0
+    max_size: conint(ge=1) = 10000
+
+
+class LocalStoreConfig(BaseModel):
+    """Settings for the local store of issues (see bugjira.local)"""
+    model_config = ConfigDict(extra='forbid')
+
+    enabled: bool = False
+    # The SQLite database file; ":memory:" keeps the store in memory
+    path: str = ":memory:"
+    # The configured names of the fields indexed for full-text search, along
+    # with the comments
+    text_fields: List[str] = ["summary"]
+
+
+class BugzillaPushConfig(BaseModel):
+    """Where the parts of a change event are found in the JSON payloads
+    pushed by bugzilla (see bugjira.webhooks). Paths are dotted, e.g.
+    "bug.id". The defaults match the payloads of bugzilla's webhooks.
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    key: str = "bug.id"
+    action: str = "event.action"
+    time: str = "event.time"
+    # The list of changes, and the names of each change's field, old value
+    # and new value
+    changes: str = "event.changes"
+    field: str = "field"
+    old: str = "removed"
+    new: str = "added"
+    # The actions that mean the bug was created or deleted; any other
+    # action is an update
+    created: List[str] = ["create"]
+    deleted: List[str] = ["delete"]
+
+
+class WebhookConfig(BaseModel):
+    """Settings for the webhook receiver (see bugjira.webhooks)"""
+    model_config = ConfigDict(extra='forbid')
+
+    # A secret that pushed events must carry in a "token" query parameter
+    token: constr(min_length=1) = None
+    bugzilla: BugzillaPushConfig = BugzillaPushConfig()
 
 
 class BugjiraConfigDict(BaseModel):
@@ -24,9 +170,13 @@ class BugjiraConfigDict(BaseModel):
 
     bugzilla: BugzillaConfig
     jira: JiraConfig
+    instances: InstancesConfig = None
     # The field_data_path attribute is optional since it is only used by
     # the default field data generator plugin.
     field_data_path: str = None
+    cache: CacheConfig = None
+    webhooks: WebhookConfig = None
+    local_store: LocalStoreConfig = None
 
 
 class Config(BaseModel):
@@ -66,3 +216,28 @@ class Config(BaseModel):
         raise ValueError(
             "from_config requires config_path or config_dict parameters"
         )
+
+
+def get_instance_config(config, backend, name) -> dict:
+    """Return a config dict for one of the named instances in a config dict's
+    instances section. The result is a copy of the config whose bugzilla or
+    jira section is replaced by the instance's settings, so that it can be
+    passed to a broker like any other config dict.
+
+    :param config: A validated config dict
+    :type config: dict
+    :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+    :type backend: str
+    :param name: The name of the instance
+    :type name: str
+    :raises KeyError: If there is no such instance
+    :return: The config dict for the instance
+    :rtype: dict
+    """
+    section = dict(config["instances"][backend][name])
+    for routing_key in "hints", "projects":
+        section.pop(routing_key, None)
+    instance_config = {key: value for key, value in config.items()
+                       if key != "instances"}
+    instance_config[backend] = section
+    return instance_config
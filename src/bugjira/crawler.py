@@ -0,0 +1,243 @@
+"""The objects in this module split one large search into independent shards
+that can be crawled in parallel (see Bugjira.crawl), so that a crawl is not
+held to the speed of a single pagination cursor.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.prefetch import put_until_stopped
+from bugjira.scheduling import ContextThreadPoolExecutor
+
+
+# The format JQL uses for date/time literals
+JQL_DATE_FORMAT = "%Y/%m/%d %H:%M"
+
+
+class Shard(BaseModel):
+    """A self-contained part of a larger search. The query is a JQL string
+    for jira or a query dict for bugzilla, and the name identifies the shard
+    in checkpoints. The instance names the configured instance to search,
+    or is None for the backend's default instance.
+    """
+
+    name: str
+    backend: str
+    query: Any
+    instance: Optional[str] = None
+
+
+def jira_date_shards(jql, start, end, step, date_field="created") -> [Shard]:
+    """Split a JQL search into shards covering consecutive date windows. Each
+    shard is ordered by key so that it can be resumed from an offset.
+
+    :param jql: The JQL search to split. Any ORDER BY clause is replaced.
+    :type jql: str
+    :param start: The start of the first window
+    :type start: datetime.datetime
+    :param end: The end of the last window
+    :type end: datetime.datetime
+    :param step: The length of each window
+    :type step: datetime.timedelta
+    :param date_field: The date field to split on, e.g. "created" or
+        "updated", defaults to "created"
+    :type date_field: str, optional
+    :return: The shards
+    :rtype: [Shard]
+    """
+    jql = re.split(r"\s+order\s+by\s+", jql, flags=re.IGNORECASE)[0].strip()
+    shards = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + step, end)
+        window = (f'{date_field} >= "{window_start:{JQL_DATE_FORMAT}}" AND '
+                  f'{date_field} < "{window_end:{JQL_DATE_FORMAT}}"')
+        query = f"({jql}) AND {window}" if jql else window
+        shards.append(Shard(
+            name=f"{date_field}:{window_start.isoformat()}",
+            backend=JIRA,
+            query=f"{query} ORDER BY key ASC"))
+        window_start = window_end
+    return shards
+
+
+def bugzilla_id_shards(query, start_id, end_id, shard_size) -> [Shard]:
+    """Split a bugzilla query into shards covering consecutive bug id ranges,
+    using bugzilla's advanced search (f/o/v) parameters.
+
+    :param query: The query dict to split
+    :type query: dict
+    :param start_id: The first bug id to include
+    :type start_id: int
+    :param end_id: The bug id at which to stop (exclusive)
+    :type end_id: int
+    :param shard_size: The number of bug ids in each shard
+    :type shard_size: int
+    :return: The shards
+    :rtype: [Shard]
+    """
+    # Use advanced search parameter numbers that the query does not already
+    used = [int(key[1:]) for key in query
+            if re.fullmatch(r"f[0-9]+", key)]
+    first = max(used, default=0) + 1
+    shards = []
+    for low in range(start_id, end_id, shard_size):
+        high = min(low + shard_size, end_id)
+        shard_query = dict(query)
+        shard_query.update({
+            f"f{first}": "bug_id", f"o{first}": "greaterthaneq",
+            f"v{first}": str(low),
+            f"f{first + 1}": "bug_id", f"o{first + 1}": "lessthan",
+            f"v{first + 1}": str(high),
+        })
+        shards.append(Shard(name=f"bug_id:{low}", backend=BUGZILLA,
+                            query=shard_query))
+    return shards
+
+
+class Checkpoint:
+    """Records how far each shard of a crawl has been consumed, in a json
+    file that is rewritten atomically after every page.
+    """
+
+    def __init__(self, path=None):
+        """Init method
+
+        :param path: The checkpoint file, defaults to None, which keeps the
+            checkpoint in memory only
+        :type path: str, optional
+        """
+        self.path = path
+        self.offsets = {}
+        self.completed = set()
+        if path and os.path.exists(path):
+            with open(path) as checkpoint:
+                data = json.load(checkpoint)
+            self.offsets = data.get("offsets", {})
+            self.completed = set(data.get("completed", []))
+
+    def advance(self, shard_name, offset) -> None:
+        self.offsets[shard_name] = offset
+        self._save()
+
+    def complete(self, shard_name) -> None:
+        self.completed.add(shard_name)
+        self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with open(self.path + ".tmp", "w") as checkpoint:
+            json.dump({"offsets": self.offsets,
+                       "completed": sorted(self.completed)}, checkpoint)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class Crawler:
+    """Crawls shards in parallel with a thread pool and merges their results
+    into one deduplicated stream. Pages are passed from the workers to the
+    consumer through a bounded queue, so memory use is limited to a few pages
+    per worker no matter how large the crawl is.
+    """
+
+    # The number of pages that may wait in the queue for each worker
+    pages_per_worker = 2
+
+    def __init__(self, bugjira, shards, workers=4, checkpoint_path=None,
+                 page_size=None, fields=None):
+        """Init method
+
+        :param bugjira: The Bugjira instance whose brokers run the searches
+        :type bugjira: bugjira.bugjira.Bugjira
+        :param shards: The shards to crawl
+        :type shards: [Shard]
+        :param workers: The number of shards crawled at once, defaults to 4
+        :type workers: int, optional
+        :param checkpoint_path: A file for per-shard checkpoints, defaults to
+            None. If the file exists, completed shards are skipped and the
+            others continue from their last checkpoint.
+        :type checkpoint_path: str, optional
+        :param page_size: The number of issues per page, defaults to None
+        :type page_size: int, optional
+        :param fields: The configured names of the fields to fetch, defaults
+            to None
+        :type fields: [str], optional
+        """
+        self.bugjira = bugjira
+        self.shards = shards
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.page_size = page_size
+        self.fields = fields
+
+    def __iter__(self):
+        """Yield each issue found by the shards once, in no particular order
+
+        :raises Exception: Any exception raised while crawling a shard
+        """
+        pending = [shard for shard in self.shards
+                   if shard.name not in self.checkpoint.completed]
+        if not pending:
+            return
+        pages = queue.Queue(maxsize=self.workers * self.pages_per_worker)
+        stop = threading.Event()
+        seen = set()
+        executor = ContextThreadPoolExecutor(max_workers=self.workers)
+        futures = []
+        try:
+            for shard in pending:
+                futures.append(executor.submit(self._crawl_shard, shard,
+                                               pages, stop))
+            remaining = len(pending)
+            while remaining:
+                shard_name, offset, item = pages.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item is None:
+                    self.checkpoint.complete(shard_name)
+                    remaining -= 1
+                    continue
+                for issue in item:
+                    if issue.key not in seen:
+                        seen.add(issue.key)
+                        yield issue
+                self.checkpoint.advance(shard_name, offset)
+        finally:
+            stop.set()
+            # Unblock any workers waiting for room in the queue
+            while not pages.empty():
+                pages.get_nowait()
+            # Shards that have not started yet are not started at all
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _crawl_shard(self, shard, pages, stop) -> None:
+        """Run one shard's search, putting (shard name, offset, page) tuples
+        on the queue, then (shard name, offset, None) when it is done, or the
+        exception that stopped it.
+        """
+        offset = self.checkpoint.offsets.get(shard.name, 0)
+        try:
+            broker = self.bugjira._get_backend_broker(shard.backend,
+                                                      shard.instance)
+            field_ids = None
+            if self.fields:
+                field_ids = list(
+                    broker.resolve_fields(dict.fromkeys(self.fields)))
+            for page in broker.iter_dispatched(broker.search_pages(
+                    shard.query, self.page_size, field_ids, start=offset)):
+                offset += len(page)
+                if not put_until_stopped(pages, (shard.name, offset, page),
+                                         stop):
+                    return
+            put_until_stopped(pages, (shard.name, offset, None), stop)
+        except Exception as e:
+            put_until_stopped(pages, (shard.name, offset, e), stop)
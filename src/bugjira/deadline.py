@@ -0,0 +1,169 @@
+"""Deadlines for backend calls. A deadline is held in a context variable,
+so, like the priority class (see bugjira.scheduling), it follows a call into
+the threads the brokers start for it. Every HTTP request sent by a broker's
+clients is given at most the time left before the deadline (see
+bugjira.transport.BrokerHTTPAdapter), and no request is sent once it has
+passed. Calls to clients passed to a broker are waited for until the deadline
+instead (see call_within). The same module lets a request be cancelled, which
+is how the losing attempt of a hedged call is stopped (see bugjira.hedging).
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from urllib3.util import Timeout
+
+from bugjira.exceptions import BrokerTimeoutException
+
+
+_deadline = contextvars.ContextVar("bugjira_deadline", default=None)
+_cancelled = contextvars.ContextVar("bugjira_cancelled", default=None)
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised instead of sending a request once the deadline has passed"""
+
+
+class RequestCancelled(requests.RequestException):
+    """Raised in a request whose result is no longer wanted"""
+
+
+@contextmanager
+def deadline(timeout):
+    """Give the backend calls made within the with block at most timeout
+    seconds in total. Nested deadlines cannot extend an outer one. If the
+    block raises after the deadline has passed, the exception is replaced
+    by a BrokerTimeoutException. A timeout of None leaves the current
+    deadline unchanged.
+
+    :param timeout: Seconds, or None
+    :type timeout: float
+    :raises ValueError: If the timeout is not positive
+    :raises BrokerTimeoutException: If the block fails because the deadline
+        passed
+    """
+    if timeout is None:
+        yield
+        return
+    if timeout <= 0:
+        raise ValueError(f"timeout must be positive: {timeout}")
+    expires = time.monotonic() + timeout
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None
+                          else min(current, expires))
+    try:
+        yield
+    except BrokerTimeoutException:
+        raise
+    except Exception as e:
+        if expired():
+            raise BrokerTimeoutException(
+                f"deadline of {timeout}s exceeded") from e
+        raise
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Return the seconds left before the current deadline, or None if
+    there is no deadline. The result is negative once it has passed.
+    """
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def expired() -> bool:
+    """Return True if there is a deadline and it has passed"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def request_timeout(timeout):
+    """Return a requests timeout that does not go past the current deadline
+
+    :param timeout: The timeout the request would otherwise use: None, a
+        number of seconds or a (connect, read) tuple
+    :type timeout: float or tuple
+    :raises DeadlineExceeded: If the deadline has passed
+    :return: The timeout to send the request with
+    :rtype: float or tuple
+    """
+    left = remaining()
+    if left is None or isinstance(timeout, Timeout):
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return tuple(left if part is None else min(part, left)
+                     for part in timeout)
+    return min(timeout, left)
+
+
+def call_within(fn, *args):
+    """Call fn(*args) and wait for it until the current deadline at most.
+    This is for clients whose requests do not go through
+    bugjira.transport.BrokerHTTPAdapter, and so cannot be cut short: if
+    there is a deadline, the call runs in another thread, which is left to
+    finish in the background if the deadline passes first.
+
+    :param fn: The call
+    :type fn: Callable
+    :raises DeadlineExceeded: If the deadline passes before the call returns
+    :return: What fn returns
+    """
+    left = remaining()
+    if left is None:
+        return fn(*args)
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    answers = queue.SimpleQueue()
+
+    def run():
+        try:
+            answers.put((True, fn(*args)))
+        except BaseException as e:
+            answers.put((False, e))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,),
+                     name="bugjira-deadline", daemon=True).start()
+    try:
+        ok, value = answers.get(timeout=left)
+    except queue.Empty:
+        raise DeadlineExceeded("deadline exceeded") from None
+    if not ok:
+        raise value
+    return value
+
+
+@contextmanager
+def cancellable(event):
+    """Make the requests sent within the with block raise RequestCancelled
+    once an event is set
+
+    :param event: The event that cancels the requests
+    :type event: threading.Event
+    """
+    token = _cancelled.set(event)
+    try:
+        yield
+    finally:
+        _cancelled.reset(token)
+
+
+def is_cancelled() -> bool:
+    """Return True if the current requests have been cancelled"""
+    event = _cancelled.get()
+    return event is not None and event.is_set()
+
+
+def check_cancelled() -> None:
+    """Raise RequestCancelled if the current requests have been cancelled"""
+    if is_cancelled():
+        raise RequestCancelled("request cancelled")
@@ -0,0 +1,150 @@
+"""Field-level diffs of issue snapshots (see Bugjira.diff). Issues are
+compared through the field registry of their backend, using the normalized
+value of each configured field (see bugjira.util.normalize_value), so that
+only the fields that have really changed are reported, and an update can
+send just those.
+"""
+
+from typing import Any, Dict
+
+from pydantic import BaseModel
+
+from bugjira.issue import Issue
+from bugjira.util import normalize_value, parse_datetime
+
+
+# The values that all mean a field is not set
+_EMPTY = (None, "", [], {})
+
+
+class FieldChange(BaseModel):
+    """The old and new normalized values of a changed field"""
+
+    old: Any = None
+    new: Any = None
+
+
+class ChangeSet(BaseModel):
+    """The changed fields of an issue, by configured field name"""
+
+    key: str
+    changes: Dict[str, FieldChange] = {}
+    # The new values of the changed fields in the form the backend takes
+    # (see Broker.update_value), when the new snapshot is an Issue
+    updates: Dict[str, Any] = {}
+
+    @property
+    def changed(self) -> bool:
+        """True if any field has changed"""
+        return bool(self.changes)
+
+    def payload(self) -> dict:
+        """Return the fields to update to turn the old snapshot into the new
+        one, in the form taken by Bugjira.update_issues. When the new
+        snapshot is an Issue, each value is in the form its backend takes,
+        e.g. {"name": "alice"} for a JIRA user. When it is a dict, the new
+        normalized values are used, which JIRA only takes for fields with
+        plain values such as the summary, labels or status.
+
+        :rtype: dict
+        """
+        return {name: self.updates.get(name, change.new)
+                for name, change in self.changes.items()}
+
+
+class Differ:
+    """Compares snapshots of the issues of one broker. The fields are looked
+    up in the broker's field registry once, so a Differ is cheap to reuse
+    for many pairs of snapshots.
+    """
+
+    def __init__(self, broker, field_names=None):
+        """Init method
+
+        :param broker: The broker of the issues' instance
+        :type broker: bugjira.broker.Broker
+        :param field_names: The configured names of the fields to compare,
+            defaults to None, which compares every configured field
+        :type field_names: [str], optional
+        :raises ValueError: If a field name is not configured for the
+            broker's backend
+        """
+        self.broker = broker
+        self.fields = broker.get_fields(field_names)
+
+    def snapshot(self, issue) -> dict:
+        """Return an issue's key and the normalized values of the fields
+        (see Broker.project), which can be kept and diffed later
+
+        :param issue: The issue
+        :type issue: bugjira.issue.Issue
+        :rtype: dict
+        """
+        row = {"key": issue.key}
+        for field in self.fields:
+            row[field.name] = normalize_value(
+                self.broker.get_field_value(issue, field))
+        return row
+
+    def diff(self, old, new) -> ChangeSet:
+        """Return the fields whose values differ between two snapshots of an
+        issue. Unset, empty string and empty list values are all taken to be
+        unset, datetime fields (see BugjiraField.data_type) are compared as
+        instants, and lists are compared regardless of order.
+
+        :param old: The old snapshot, as an Issue or a dict returned by
+            snapshot
+        :type old: bugjira.issue.Issue or dict
+        :param new: The new snapshot, as an Issue or a dict
+        :type new: bugjira.issue.Issue or dict
+        :return: The changes, keyed by the new snapshot's key
+        :rtype: ChangeSet
+        """
+        new_issue = new if isinstance(new, Issue) else None
+        old = self._row(old)
+        new = self._row(new)
+        changes = {}
+        updates = {}
+        for field in self.fields:
+            old_value = old.get(field.name)
+            new_value = new.get(field.name)
+            if _comparable(field, old_value) != _comparable(field, new_value):
+                changes[field.name] = FieldChange(old=old_value,
+                                                  new=new_value)
+                if new_issue is not None:
+                    updates[field.name] = self.broker.update_value(
+                        field, self.broker.get_field_value(new_issue, field))
+        return ChangeSet(key=new.get("key") or old.get("key"),
+                         changes=changes, updates=updates)
+
+    def diff_many(self, pairs) -> [ChangeSet]:
+        """Diff many pairs of snapshots
+
+        :param pairs: (old, new) pairs, as accepted by diff
+        :type pairs: Iterable[tuple]
+        :return: One ChangeSet per pair, in order
+        :rtype: [ChangeSet]
+        """
+        return [self.diff(old, new) for old, new in pairs]
+
+    def _row(self, snapshot) -> dict:
+        if isinstance(snapshot, Issue):
+            return self.snapshot(snapshot)
+        if isinstance(snapshot, dict):
+            return snapshot
+        raise ValueError(f"snapshot must be an Issue or a dict: "
+                         f"{str(snapshot)}")
+
+
+def _comparable(field, value):
+    """Return the form of a normalized value that is compared"""
+    if value in _EMPTY:
+        return None
+    if field.data_type == "datetime":
+        try:
+            return parse_datetime(value)
+        except (TypeError, ValueError):
+            return value
+    if isinstance(value, list):
+        return sorted(value, key=repr)
+    return value
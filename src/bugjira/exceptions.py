@@ -14,9 +14,33 @@ class BrokerLookupException(BrokerException):
     pass
 
 
+class BrokerUpdateException(BrokerException):
+    pass
+
+
+class BrokerCreateException(BrokerException):
+    pass
+
+
 class FieldDataGeneratorException(Exception):
     pass
 
 
 class PluginLoaderException(Exception):
     pass
+
+
+class ExportException(Exception):
+    pass
+
+
+class BrokerAttachmentException(BrokerException):
+    pass
+
+
+class BrokerTimeoutException(BrokerException):
+    pass
+
+
+class BrokerCircuitOpenException(BrokerException):
+    pass
@@ -0,0 +1,373 @@
+"""The objects in this module write projected issues (see Bugjira.project) to
+export files incrementally, so that exports of any size run in bounded memory
+and can be resumed from the last checkpoint that was saved.
+"""
+
+import glob
+import itertools
+import json
+import os
+
+from bugjira.exceptions import ExportException
+
+
+JSONL = "jsonl"
+PARQUET = "parquet"
+
+
+class ExportWriter:
+    """The base class for export writers. Subclasses implement the write,
+    close, _flushed_state, _restore and _recover methods.
+
+    Every time rows are flushed to disk, a checkpoint recording how many rows
+    the export holds is saved next to it. Resuming an export rolls it back to
+    its last checkpoint, dropping any rows written after it, so that offset
+    rows are known to be exported.
+    """
+
+    def __init__(self, path, resume=False):
+        """Init method
+
+        :param path: The path to export to
+        :type path: str
+        :param resume: If True, append to an existing export instead of
+            replacing it, defaults to False
+        :type resume: bool, optional
+        """
+        self.path = path
+        # The number of rows written by this writer
+        self.count = 0
+        # The number of rows, and the key of the last row, that earlier runs
+        # of the export wrote
+        self.offset = 0
+        self.last_key = None
+        # The number of rows written by this writer that are on disk
+        self._flushed = 0
+        if resume:
+            checkpoint = self._read_checkpoint()
+            if checkpoint is None:
+                self.offset, self.last_key = self._recover()
+            else:
+                self._restore(checkpoint)
+                self.offset = checkpoint["offset"]
+                self.last_key = checkpoint["last_key"]
+        elif os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def checkpoint_path(self) -> str:
+        """The file that the export's checkpoint is saved in"""
+        return self.path + ".checkpoint"
+
+    def write(self, row) -> None:
+        # Override in subclasses
+        pass
+
+    def close(self) -> None:
+        # Override in subclasses
+        pass
+
+    def _flushed_state(self) -> dict:
+        # Override in subclasses
+        pass
+
+    def _restore(self, checkpoint) -> None:
+        # Override in subclasses
+        pass
+
+    def _recover(self):
+        # Override in subclasses
+        pass
+
+    def _checkpoint(self, rows, last_key) -> None:
+        """Save a checkpoint once rows more rows, ending with the row with
+        last_key, have been flushed to disk
+        """
+        if not rows:
+            return
+        self._flushed += rows
+        checkpoint = dict(self._flushed_state(),
+                          offset=self.offset + self._flushed,
+                          last_key=last_key)
+        with open(self.checkpoint_path + ".tmp", "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def _read_checkpoint(self):
+        """Return the saved checkpoint, or None if there is none"""
+        try:
+            with open(self.checkpoint_path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+
+class JsonLinesExportWriter(ExportWriter):
+    """Writes one JSON object per line. Rows are flushed to disk, and the
+    checkpoint saved, every flush_interval rows.
+    """
+
+    flush_interval = 1000
+    # The number of bytes read at a time when looking for the last line
+    block_size = 65536
+
+    def __init__(self, path, resume=False):
+        super().__init__(path, resume)
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._last_key = None
+
+    def write(self, row) -> None:
+        self._file.write(json.dumps(row) + "\n")
+        self._last_key = row["key"]
+        self.count += 1
+        if self.count % self.flush_interval == 0:
+            self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        self._file.close()
+
+    def _flush(self) -> None:
+        self._file.flush()
+        self._checkpoint(self.count - self._flushed, self._last_key)
+
+    def _flushed_state(self) -> dict:
+        return {"size": self._file.tell()}
+
+    def _restore(self, checkpoint) -> None:
+        """Drop the rows written after the checkpoint"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as file:
+            file.truncate(checkpoint["size"])
+
+    def _recover(self):
+        """Return the number of rows and the last key of an export that has
+        no checkpoint, truncating a partially written last line (e.g. from
+        an interrupted export)
+
+        :return: The number of rows, and the last key written or None if
+            there is no export yet
+        :rtype: tuple
+        """
+        last_key = self._find_last_key()
+        if last_key is None:
+            return 0, None
+        rows = 0
+        with open(self.path, "rb") as file:
+            for block in iter(lambda: file.read(self.block_size), b""):
+                rows += block.count(b"\n")
+        return rows, last_key
+
+    def _find_last_key(self):
+        """Return the key of the last complete line in an existing export,
+        reading backwards from the end of the file. A partially written last
+        line (e.g. from an interrupted export) is truncated.
+
+        :return: The last key written, or None if there is no export yet
+        :rtype: str
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb+") as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            block = b""
+            while position > 0 and block.count(b"\n") < 2:
+                step = min(self.block_size, position)
+                position -= step
+                file.seek(position)
+                block = file.read(step) + block
+            lines = block.split(b"\n")
+            if lines[-1]:
+                file.truncate(end - len(lines[-1]))
+            if len(lines) < 2 or not lines[-2].strip():
+                return None
+            return json.loads(lines[-2])["key"]
+
+
+class ParquetExportWriter(ExportWriter):
+    """Writes rows to a directory of Parquet files, one file per row group.
+    Each file is written to a temporary name and then renamed, so an
+    interrupted export never leaves a partial file behind. The column types
+    are inferred from the first row group and reused for the rest. Requires
+    the optional pyarrow dependency.
+    """
+
+    row_group_size = 10000
+
+    def __init__(self, path, resume=False):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ExportException(
+                "pyarrow is required to export to parquet") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._rows = []
+        self._schema = None
+        os.makedirs(path, exist_ok=True)
+        super().__init__(path, resume)
+        if not resume:
+            for part in self._get_parts():
+                os.remove(part)
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.path, "_checkpoint.json")
+
+    def write(self, row) -> None:
+        self._rows.append({key: self._to_column_value(value)
+                           for key, value in row.items()})
+        self.count += 1
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def close(self) -> None:
+        if self._rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Write the buffered rows to a new part file"""
+        pa = self._pa
+        if self._schema is None:
+            schema = pa.Table.from_pylist(self._rows).schema
+            # Columns that are empty in the first row group default to
+            # strings rather than the null type
+            self._schema = pa.schema([
+                field.with_type(pa.string())
+                if pa.types.is_null(field.type) else field
+                for field in schema
+            ])
+        table = pa.Table.from_pylist(self._rows, schema=self._schema)
+        part = os.path.join(self.path,
+                            f"part-{len(self._get_parts()):05d}.parquet")
+        self._pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self._checkpoint(len(self._rows), self._rows[-1]["key"])
+        self._rows = []
+
+    def _flushed_state(self) -> dict:
+        return {"parts": len(self._get_parts())}
+
+    def _restore(self, checkpoint) -> None:
+        """Delete the part files written after the checkpoint, and reuse the
+        schema of the last part file that is kept
+        """
+        parts = self._get_parts()
+        for part in parts[checkpoint["parts"]:] + self._get_tmp_parts():
+            os.remove(part)
+        del parts[checkpoint["parts"]:]
+        if parts:
+            self._schema = self._pq.read_schema(parts[-1])
+
+    def _recover(self):
+        """Return the number of rows and the last key of an export that has
+        no checkpoint, and reuse the last part file's schema
+
+        :return: The number of rows, and the last key written or None if
+            there is no export yet
+        :rtype: tuple
+        """
+        for part in self._get_tmp_parts():
+            os.remove(part)
+        parts = self._get_parts()
+        rows = sum(self._pq.read_metadata(part).num_rows for part in parts)
+        return rows, self._find_last_key()
+
+    def _get_parts(self) -> [str]:
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def _get_tmp_parts(self) -> [str]:
+        return glob.glob(os.path.join(self.path, "part-*.parquet.tmp"))
+
+    def _find_last_key(self):
+        """Return the key of the last row in the last part file, and reuse
+        that file's schema for the rest of the export.
+
+        :return: The last key written, or None if there is no export yet
+        :rtype: str
+        """
+        parts = self._get_parts()
+        if not parts:
+            return None
+        self._schema = self._pq.read_schema(parts[-1])
+        keys = self._pq.read_table(parts[-1], columns=["key"]).column("key")
+        return keys[-1].as_py() if len(keys) else None
+
+    @staticmethod
+    def _to_column_value(value):
+        """Parquet columns need a consistent type, so dicts (and lists that
+        contain them) are stored as JSON strings.
+        """
+        if isinstance(value, dict) or (
+                isinstance(value, list) and
+                any(isinstance(item, (dict, list)) for item in value)):
+            return json.dumps(value)
+        return value
+
+
+def get_export_writer(fmt, path, resume=False) -> ExportWriter:
+    """Return an ExportWriter for the given format
+
+    :param fmt: The export format, either JSONL or PARQUET
+    :type fmt: str
+    :param path: The file (jsonl) or directory (parquet) to export to
+    :type path: str
+    :param resume: If True, append to an existing export, defaults to False
+    :type resume: bool, optional
+    :raises ValueError: If the format is not supported
+    :return: The ExportWriter
+    :rtype: ExportWriter
+    """
+    if fmt == JSONL:
+        return JsonLinesExportWriter(path, resume)
+    if fmt == PARQUET:
+        return ParquetExportWriter(path, resume)
+    raise ValueError(f"format must be {JSONL} or {PARQUET}: {fmt}")
+
+
+def export_issues(bugjira, issues, writer, fields=None, skip=0,
+                  resume_after=None) -> int:
+    """Project each issue through the field configuration and write it
+
+    :param bugjira: The Bugjira instance used to project the issues
+    :type bugjira: bugjira.bugjira.Bugjira
+    :param issues: The issues to export, e.g. from Bugjira.search
+    :type issues: Iterable[bugjira.issue.Issue]
+    :param writer: An open ExportWriter
+    :type writer: ExportWriter
+    :param fields: The configured names of the fields to export, defaults to
+        None, which exports every configured field
+    :type fields: [str], optional
+    :param skip: The number of issues to skip before writing, defaults to 0
+    :type skip: int, optional
+    :param resume_after: If set, skip issues up to and including the issue
+        with this key, e.g. the last key of a resumed writer, defaults to
+        None
+    :type resume_after: str, optional
+    :raises ExportException: If resume_after is set but that key is never
+        seen, since the issues must then be in a different order than when
+        the export was started
+    :return: The number of issues written
+    :rtype: int
+    """
+    skipping = resume_after is not None
+    written = 0
+    for issue in itertools.islice(issues, skip, None):
+        if skipping:
+            skipping = issue.key != resume_after
+            continue
+        writer.write(bugjira.project(issue, fields))
+        written += 1
+    if skipping:
+        raise ExportException(
+            f"Cannot resume: key {resume_after} was not found in the input")
+    return written
@@ -1,15 +1,30 @@
-from pydantic import BaseModel, ConfigDict, constr
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, constr, field_validator
 
 """The objects in this module are used internally to represent field
 configuration information for the bugzilla and jira backends used by bugjira.
 """
 
+# The data types a field can declare (see bugjira.table)
+DATA_TYPES = ("string", "category", "datetime", "number")
+
 
 class BugjiraField(BaseModel):
     """The base field class
     """
     model_config = ConfigDict(extra="forbid")
     name: constr(strip_whitespace=True, min_length=1)
+    # The optional data_type is used to choose a column type when issues are
+    # converted to an IssueTable
+    data_type: Optional[str] = None
+
+    @field_validator("data_type")
+    def validate_data_type(cls, data_type):
+        if data_type is not None and data_type not in DATA_TYPES:
+            raise ValueError(f"data_type must be one of "
+                             f"{', '.join(DATA_TYPES)}: {data_type}")
+        return data_type
 
 
 class BugzillaField(BugjiraField):
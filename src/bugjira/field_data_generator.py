@@ -1,5 +1,6 @@
 import abc
 import json
+import threading
 from typing import List
 
 from pydantic import BaseModel, ConfigDict, ValidationError
@@ -8,6 +9,12 @@ from stevedore import driver
 from bugjira.common import BUGZILLA, JIRA, PLUGIN_NAMESPACE
 from bugjira.exceptions import FieldDataGeneratorException
 from bugjira.field import BugzillaField, JiraField
+from bugjira.session import register_lock_owner
+
+
+# The keys of a backend's config section that hold credentials, which do not
+# affect its field configuration and must not end up in cache keys
+CREDENTIAL_KEYS = ("api_key", "token_auth")
 
 
 class ValidFieldData(BaseModel):
@@ -85,23 +92,51 @@ class JiraFieldDataGenerator(FieldDataGenerator):
         return self.field_data.get("jira_field_data", [])
 
 
+def field_config_key(generator_type, config) -> tuple:
+    """Return the key under which the field generator factories cache the
+    generators for a backend. The config of a named instance (see
+    bugjira.config.get_instance_config) replaces the backend's section, so
+    each instance gets generators for its own field configuration.
+    Credentials are left out of the key.
+
+    :param generator_type: A generator type
+    :type generator_type: str
+    :param config: A valid bugjira config dict
+    :type config: dict
+    :return: The cache key
+    :rtype: tuple
+    """
+    config = config or {}
+    section = {name: value
+               for name, value in (config.get(generator_type) or {}).items()
+               if name not in CREDENTIAL_KEYS}
+    return (generator_type,
+            json.dumps([section,
+                        config.get("field_data_path")],
+                       sort_keys=True, default=str))
+
+
 class FieldDataGeneratorFactory:
     """Factory class that returns the FieldDataGenerator associated with the
     input generator_type. Uses stevedore's DriverManager to load an instance of
     the correct plugin class. The DriverManager looks in the namespace defined
     in common.PLUGIN_NAMESPACE for the plugin named in the bugjira config file.
+    The factory may be used from several threads at once; each plugin is
+    loaded only once per field configuration (see field_config_key).
     """
 
     def __init__(self):
         self.field_data_generators = {}
+        self._lock = threading.Lock()
+        register_lock_owner(self)
 
     def get_field_data_generator(self,
                                  generator_type,
                                  config) -> FieldDataGenerator:
         """Returns the FieldDataGenerator associated with the input
-        generator_type. Uses the _get_field_data_plugin_instance to get an
-        instance if it is not already present in the field_data_generators
-        dict.
+        generator_type and config. Uses the _get_field_data_plugin_instance to
+        get an instance if it is not already present in the
+        field_data_generators dict.
 
         :param generator_type: A generator type
         :type generator_type: str
@@ -110,11 +145,16 @@ class FieldDataGeneratorFactory:
         :return: The FieldDataGenerator associated with the generator type
         :rtype: FieldDataGenerator
         """
-        generator = self.field_data_generators.get(generator_type, None)
-        if not generator:
-            generator = self._get_field_data_plugin_instance(generator_type,
-                                                             config)
-            self.field_data_generators[generator_type] = generator
+        key = field_config_key(generator_type, config)
+        generator = self.field_data_generators.get(key, None)
+        if generator:
+            return generator
+        with self._lock:
+            generator = self.field_data_generators.get(key, None)
+            if not generator:
+                generator = self._get_field_data_plugin_instance(
+                    generator_type, config)
+                self.field_data_generators[key] = generator
         return generator
 
     def _get_field_data_plugin_instance(self,
@@ -1,7 +1,11 @@
+import threading
+
 from bugjira.common import BUGZILLA, JIRA
 from bugjira.field import BugjiraField, BugzillaField, JiraField
 from bugjira.field_data_generator import factory \
     as field_data_generator_factory
+from bugjira.field_data_generator import field_config_key
+from bugjira.session import register_lock_owner
 
 
 class FieldGenerator:
@@ -67,15 +71,20 @@ class FieldGenerator:
 
 class FieldGeneratorFactory:
     """Factory class that returns the FieldGenerator associated with the input
-    generator_type.
+    generator_type. The factory may be used from several threads at once;
+    each FieldGenerator is created only once per field configuration, so
+    named instances with different field settings get their own (see
+    bugjira.field_data_generator.field_config_key).
     """
     def __init__(self):
         self._generators = {}
+        self._lock = threading.Lock()
+        register_lock_owner(self)
 
     def get_field_generator(self, generator_type, config) -> FieldGenerator:
-        """Return the FieldGenerator associated with the generator_type.
-        Instantiate the FieldGenerator first if it is not already in the
-        factory's _generators dict under the generator_type key.
+        """Return the FieldGenerator associated with the generator_type and
+        config. Instantiate the FieldGenerator first if it is not already in
+        the factory's _generators dict under their field_config_key.
 
         :param generator_type: The desired field generator type
         :type generator_type: str
@@ -84,10 +93,15 @@ class FieldGeneratorFactory:
         :return: The FieldGenerator corresponding to the generator type
         :rtype: FieldGenerator
         """
-        generator = self._generators.get(generator_type, None)
-        if not generator:
-            generator = FieldGenerator(generator_type, config)
-            self._generators[generator_type] = generator
+        key = field_config_key(generator_type, config)
+        generator = self._generators.get(key, None)
+        if generator:
+            return generator
+        with self._lock:
+            generator = self._generators.get(key, None)
+            if not generator:
+                generator = FieldGenerator(generator_type, config)
+                self._generators[key] = generator
         return generator
 
 
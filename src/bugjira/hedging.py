@@ -0,0 +1,253 @@
+"""Hedged calls, which cut the tail latency of idempotent reads: if a call
+has not answered within the 95th percentile of its recent latencies, the
+same call is sent again, the first answer is kept, and the other attempt is
+cancelled (see bugjira.deadline.cancellable).
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from pydantic import BaseModel
+
+from bugjira import deadline
+from bugjira.session import register_lock_owner
+
+
+_hedging = contextvars.ContextVar("bugjira_hedging", default=False)
+
+_OK = "ok"
+_ERROR = "error"
+
+
+class HedgeStats(BaseModel):
+    """The hedging statistics of one operation of one broker"""
+
+    backend: str
+    # The name of the configured instance, or None for the default instance
+    instance: Optional[str] = None
+    operation: str
+    # The number of latencies the hedge delay is computed from
+    samples: int
+    # Seconds; None until there are enough samples to hedge
+    delay: Optional[float] = None
+    calls: int
+    # The number of calls that sent a second attempt
+    hedged: int
+    # The number of hedged calls answered first by the second attempt
+    hedge_wins: int
+
+
+@contextmanager
+def hedging(enabled=True):
+    """Hedge the idempotent reads made within the with block (see
+    Broker.get_issues)
+
+    :param enabled: Whether to hedge, defaults to True
+    :type enabled: bool, optional
+    """
+    token = _hedging.set(enabled)
+    try:
+        yield
+    finally:
+        _hedging.reset(token)
+
+
+def is_hedging() -> bool:
+    """Return True if reads in the current context are hedged"""
+    return _hedging.get()
+
+
+class LatencyTracker:
+    """The most recent latencies of an operation"""
+
+    def __init__(self, size=256):
+        """Init method
+
+        :param size: The number of latencies kept, defaults to 256
+        :type size: int, optional
+        """
+        self._latencies = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def record(self, latency) -> None:
+        self._latencies.append(latency)
+
+    def percentile(self, fraction):
+        """Return a percentile of the recorded latencies, or None if there
+        are none
+
+        :param fraction: The percentile as a fraction, e.g. 0.95
+        :type fraction: float
+        :rtype: float
+        """
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Hedger:
+    """Sends hedged calls for one broker, keeping latency statistics per
+    operation. Calls are only hedged once an operation has min_samples
+    recorded latencies; until then they run in the calling thread. The
+    latency recorded for a hedged call is the time the whole call took, so
+    that slow first attempts that lose to a second one still count.
+    """
+
+    def __init__(self, backend, instance=None, percentile=0.95,
+                 min_samples=20, min_delay=0.01):
+        """Init method
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the configured instance, defaults to
+            None for the default instance
+        :type instance: str, optional
+        :param percentile: The latency percentile after which a second
+            attempt is sent, defaults to 0.95
+        :type percentile: float, optional
+        :param min_samples: The number of latencies needed before calls are
+            hedged, defaults to 20
+        :type min_samples: int, optional
+        :param min_delay: The shortest hedge delay in seconds, defaults to
+            0.01
+        :type min_delay: float, optional
+        """
+        self.backend = backend
+        self.instance = instance
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._trackers = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    def delay(self, operation):
+        """Return the hedge delay of an operation in seconds, or None if it
+        does not have enough recorded latencies yet
+        """
+        with self._lock:
+            tracker = self._trackers.get(operation)
+            if tracker is None or len(tracker) < self.min_samples:
+                return None
+            return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def call(self, operation, fn, *args):
+        """Call fn(*args), sending a second attempt if the first has not
+        answered after the operation's hedge delay. Whichever attempt answers
+        first wins; the other is cancelled. If the first answer is an error
+        and the other attempt is still running, its answer is used instead.
+
+        :param operation: The name the operation's latencies are kept under
+        :type operation: str
+        :param fn: The idempotent call
+        :type fn: Callable
+        :raises bugjira.deadline.DeadlineExceeded: If the current deadline
+            passes before an attempt answers
+        :return: The result of the winning attempt
+        """
+        delay = self.delay(operation)
+        self._count(operation, "calls")
+        started = time.monotonic()
+        if delay is None:
+            result = fn(*args)
+            self._record(operation, time.monotonic() - started)
+            return result
+        answers = queue.SimpleQueue()
+        cancels = [self._start(operation, fn, args, answers, 0)]
+        try:
+            try:
+                answer = answers.get(timeout=self._wait_time(delay))
+            except queue.Empty:
+                if deadline.expired():
+                    raise deadline.DeadlineExceeded("deadline exceeded")
+                self._count(operation, "hedged")
+                cancels.append(self._start(operation, fn, args, answers, 1))
+                answer = self._get_answer(answers)
+            kind, value, attempt = answer
+            if kind == _ERROR and len(cancels) > 1:
+                # The other attempt may still succeed
+                kind, value, attempt = self._get_answer(answers)
+                if kind == _ERROR:
+                    value = answer[1]
+            if attempt == 1:
+                self._count(operation, "hedge_wins")
+            if kind == _ERROR:
+                raise value
+            self._record(operation, time.monotonic() - started)
+            return value
+        finally:
+            for cancel in cancels:
+                cancel.set()
+
+    def stats(self) -> [HedgeStats]:
+        """Return the hedging statistics of every operation
+
+        :rtype: [HedgeStats]
+        """
+        with self._lock:
+            operations = sorted(set(self._trackers) | set(self._counts))
+        return [HedgeStats(
+            backend=self.backend, instance=self.instance,
+            operation=operation, samples=len(self._trackers.get(
+                operation, ())),
+            delay=self.delay(operation),
+            calls=self._counts.get(operation, {}).get("calls", 0),
+            hedged=self._counts.get(operation, {}).get("hedged", 0),
+            hedge_wins=self._counts.get(operation, {}).get("hedge_wins", 0))
+            for operation in operations]
+
+    def _start(self, operation, fn, args, answers, attempt):
+        """Run one attempt in a new thread, in a copy of the caller's context
+
+        :return: The event that cancels the attempt
+        :rtype: threading.Event
+        """
+        cancel = threading.Event()
+
+        def run():
+            with deadline.cancellable(cancel):
+                try:
+                    value = fn(*args)
+                except Exception as e:
+                    answers.put((_ERROR, e, attempt))
+                    return
+            answers.put((_OK, value, attempt))
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+        return cancel
+
+    def _get_answer(self, answers):
+        try:
+            return answers.get(timeout=self._wait_time(None))
+        except queue.Empty:
+            raise deadline.DeadlineExceeded("deadline exceeded")
+
+    def _wait_time(self, delay):
+        """Return how long to wait for an answer: the delay, cut short by the
+        current deadline, or None to wait forever
+        """
+        left = deadline.remaining()
+        if left is None:
+            return delay
+        left = max(0.0, left)
+        return left if delay is None else min(delay, left)
+
+    def _record(self, operation, latency) -> None:
+        with self._lock:
+            self._trackers.setdefault(operation,
+                                      LatencyTracker()).record(latency)
+
+    def _count(self, operation, counter) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(operation, {})
+            counts[counter] = counts.get(counter, 0) + 1
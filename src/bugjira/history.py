@@ -0,0 +1,24 @@
+"""The objects in this module describe changes to issue fields, as returned by
+Bugjira.get_history.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class HistoryRecord(BaseModel):
+    """A single field change of a bugzilla bug or a JIRA issue, in a form
+    that does not depend on the backend. The field is the configured field
+    name (or the backend's name for the field if the broker has no field
+    configuration), the values are the backend's string representations of
+    the old and new values, and when is a timezone-aware UTC datetime.
+    """
+
+    key: str
+    field: str
+    from_value: Optional[str] = None
+    to_value: Optional[str] = None
+    when: Optional[datetime] = None
+    who: Optional[str] = None
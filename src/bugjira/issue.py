@@ -1,9 +1,12 @@
-from typing import Any
+from typing import Any, Optional
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, PrivateAttr, field_validator
 
 from bugjira.util import is_bugzilla_key, is_jira_key
 
+# The attributes that hold backend data, which lazy issues load on access
+_BACKEND_ATTRIBUTES = frozenset(("bugzilla", "jira_issue"))
+
 
 class Issue(BaseModel):
     """BaseModel representing either a bugzilla bug or a jira issue.
@@ -14,6 +17,21 @@ class Issue(BaseModel):
     key: str
     bugzilla: Any = None
     jira_issue: Any = None
+    # The name of the configured instance the issue belongs to, or None for
+    # the default instance of its backend
+    instance: Optional[str] = None
+    # The batch of lazy issues (see bugjira.lazy) that will look up this
+    # issue, if it is a lazy issue that has not been loaded yet
+    _loader: Any = PrivateAttr(default=None)
+    # The exception raised when a lazy issue could not be looked up
+    _error: Optional[Exception] = PrivateAttr(default=None)
+
+    @property
+    def is_loaded(self) -> bool:
+        """False if this is a lazy issue whose backend data has not been
+        looked up yet
+        """
+        return self._loader is None
 
 
 class BugzillaIssue(Issue):
@@ -32,3 +50,29 @@ class JiraIssue(Issue):
             raise ValueError(f"{key} is not a \
                 valid JIRA key")
         return key
+
+
+class LazyIssue(Issue):
+    """An issue created with only its key (see Bugjira.get_issue). Its
+    backend data is looked up, along with that of every other lazy issue
+    still waiting to be loaded, the first time its bugzilla or jira_issue
+    attribute is read.
+    """
+
+    def __getattribute__(self, name):
+        if name in _BACKEND_ATTRIBUTES:
+            private = object.__getattribute__(self, "__pydantic_private__")
+            if private:
+                if private["_loader"] is not None:
+                    private["_loader"].load(self)
+                if private["_error"] is not None:
+                    raise private["_error"]
+        return super().__getattribute__(name)
+
+
+class LazyBugzillaIssue(LazyIssue, BugzillaIssue):
+    pass
+
+
+class LazyJiraIssue(LazyIssue, JiraIssue):
+    pass
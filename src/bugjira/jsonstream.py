@@ -0,0 +1,191 @@
+"""Incremental decoding of large JSON documents whose bulk is a single array,
+such as JIRA search responses.
+"""
+
+import codecs
+import json
+import re
+
+
+_WHITESPACE = " \t\n\r"
+# The characters that end a string or escape the next one inside a string
+_STRING_SPECIAL = re.compile(r'["\\]')
+# The characters that change the nesting outside strings
+_STRUCTURE = re.compile(r'["{}\[\]]')
+# The characters that end a number, true, false or null
+_SCALAR_END = re.compile(r'[\s,:\]}]')
+
+
+class JsonArrayStream:
+    """Decodes a JSON object from a stream of text or byte chunks, yielding
+    the items of one of its array members as soon as each item has been
+    read. Only the item being decoded is held in memory; the text of each
+    item is dropped as soon as it has been decoded. The object's other
+    members are collected in the meta attribute as they are read, so they are
+    complete once iteration has finished. Each value is decoded once, when
+    a scan of the chunks as they arrive has found its end, so the time taken
+    grows linearly with the size of the document.
+    """
+
+    def __init__(self, chunks, array_key):
+        """Init method
+
+        :param chunks: An iterable of str or bytes (utf-8) chunks, e.g. a
+            requests response's iter_content()
+        :type chunks: Iterable
+        :param array_key: The name of the array member whose items to yield
+        :type array_key: str
+        """
+        self.array_key = array_key
+        self.meta = {}
+        self._chunks = iter(chunks)
+        self._bytes_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._exhausted = False
+        # The state of the scan for the end of the value being decoded
+        self._scalar = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def __iter__(self):
+        self._expect("{")
+        while True:
+            char = self._peek()
+            if char == "}":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            key = self._decode()
+            self._expect(":")
+            if key != self.array_key:
+                self.meta[key] = self._decode()
+                continue
+            self._expect("[")
+            while True:
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    break
+                if char == ",":
+                    self._pos += 1
+                    continue
+                yield self._decode()
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, discarding the text that has
+        already been decoded.
+
+        :return: False if there are no more chunks
+        :rtype: bool
+        """
+        chunk = self._next_chunk()
+        self._buffer = self._buffer[self._pos:] + (chunk or "")
+        self._pos = 0
+        return chunk is not None
+
+    def _next_chunk(self):
+        """Return the next non-empty chunk as text, or None if there are no
+        more chunks
+        """
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                chunk = self._bytes_decoder.decode(chunk)
+            if chunk:
+                return chunk
+        self._exhausted = True
+        return None
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it
+
+        :raises ValueError: If the stream ends
+        """
+        while True:
+            while self._pos < len(self._buffer) and \
+                    self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def _expect(self, char) -> None:
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, "
+                             f"found {found!r}")
+        self._pos += 1
+
+    def _decode(self):
+        """Decode the next JSON value, reading more chunks until it is
+        complete. The chunks are scanned for the end of the value as they
+        arrive, and the value is decoded once. A number, true, false or null
+        that ends exactly at the end of the buffer may be truncated, so it is
+        only complete once a delimiter has arrived or the stream is
+        exhausted.
+
+        :raises json.JSONDecodeError: If the stream ends in the middle of a
+            value or contains invalid JSON
+        """
+        self._peek()
+        self._scalar = self._buffer[self._pos] not in "{[\""
+        self._depth = 0
+        self._in_string = self._escape = False
+        parts = []
+        complete = self._scan(self._buffer, self._pos)
+        while not complete:
+            chunk = self._next_chunk()
+            if chunk is None:
+                break
+            parts.append(chunk)
+            complete = self._scan(chunk, 0)
+        if parts:
+            self._buffer = self._buffer[self._pos:] + "".join(parts)
+            self._pos = 0
+        value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+        return value
+
+    def _scan(self, text, pos) -> bool:
+        """Scan text that continues the value being decoded for the value's
+        end, keeping the nesting depth and string state for the next chunk
+
+        :param text: The text to scan
+        :type text: str
+        :param pos: Where to start scanning
+        :type pos: int
+        :return: True if the value ends in the text
+        :rtype: bool
+        """
+        if self._scalar:
+            return _SCALAR_END.search(text, pos) is not None
+        while pos < len(text):
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+            else:
+                match = _STRUCTURE.search(text, pos)
+            if match is None:
+                return False
+            pos = match.end()
+            char = match.group()
+            if char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = not self._in_string
+                if not self._in_string and self._depth == 0:
+                    return True
+            elif char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return True
+        return False
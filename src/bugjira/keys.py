@@ -0,0 +1,142 @@
+"""Classification and normalization of issue keys. The patterns are compiled
+once and matched against whole keys, and a single combined pattern both
+classifies and normalizes a key, so routing large batches of keys costs one
+regex match per key.
+"""
+
+import re
+from urllib.parse import parse_qs, urlparse
+
+from bugjira.common import BUGZILLA, JIRA
+
+
+# The group that partition_keys puts keys that are not bugzilla or jira keys
+# in
+INVALID = "invalid"
+
+BUGZILLA_KEY_PATTERN = re.compile(r"[0-9]+")
+JIRA_KEY_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9_]*[-_][0-9]+")
+# Matches a bugzilla id or a jira key, allowing surrounding whitespace. The
+# project group is non-greedy so that in keys such as "MY_PROJ_12" the
+# separator is the last "_" or "-".
+_KEY_PATTERN = re.compile(
+    r"\s*(?:(?P<bugzilla>[0-9]+)|"
+    r"(?P<project>[A-Za-z][A-Za-z0-9_]*?)[-_](?P<number>[0-9]+))\s*")
+
+
+def classify_key(key):
+    """Classify and normalize a key. Whitespace is stripped, jira keys are
+    upper-cased and use "-" as their separator (so " foo_12 " becomes
+    "FOO-12"), and bugzilla show_bug URLs and jira browse URLs are reduced to
+    the key they reference.
+
+    :param key: The key to classify
+    :type key: str
+    :raises ValueError: If the key is not a str
+    :return: A (backend, normalized key) tuple, where backend is
+        bugjira.common.BUGZILLA, bugjira.common.JIRA, or None if the input is
+        not a key
+    :rtype: tuple
+    """
+    if not isinstance(key, str):
+        raise ValueError(f"Key must be a str: {key}")
+    match = _KEY_PATTERN.fullmatch(key)
+    if match is None and "://" in key:
+        url_key = key_from_url(key)
+        if url_key is not None:
+            match = _KEY_PATTERN.fullmatch(url_key)
+    if match is None:
+        return None, key
+    bugzilla_key = match.group("bugzilla")
+    if bugzilla_key is not None:
+        return BUGZILLA, bugzilla_key
+    return JIRA, f"{match.group('project').upper()}-{match.group('number')}"
+
+
+def normalize_key(key):
+    """Return the normalized form of a key (see classify_key)
+
+    :param key: The key to normalize
+    :type key: str
+    :raises ValueError: If the input is not a bugzilla or jira key
+    :return: The normalized key
+    :rtype: str
+    """
+    backend, normalized = classify_key(key)
+    if backend is None:
+        raise ValueError(f"{key} does not appear to be bugzilla or jira ID")
+    return normalized
+
+
+def key_from_url(url):
+    """Return the key referenced by a bugzilla show_bug URL or a jira issue
+    URL (e.g. .../browse/FOO-1 or a board URL with a selectedIssue
+    parameter), or None if the URL does not reference one
+
+    :param url: The URL to parse
+    :type url: str
+    :return: The key, not yet normalized, or None
+    :rtype: str
+    """
+    parsed = urlparse(url.strip())
+    query = parse_qs(parsed.query)
+    if parsed.path.endswith("show_bug.cgi"):
+        for key in query.get("id", []):
+            if BUGZILLA_KEY_PATTERN.fullmatch(key):
+                return key
+        return None
+    for key in query.get("selectedIssue", []):
+        if JIRA_KEY_PATTERN.fullmatch(key):
+            return key
+    segments = [segment for segment in parsed.path.split("/") if segment]
+    if segments and JIRA_KEY_PATTERN.fullmatch(segments[-1]):
+        return segments[-1]
+    return None
+
+
+def url_host(key):
+    """Return the lower-cased host name of a key that is a URL, or None"""
+    if "://" not in key:
+        return None
+    return urlparse(key.strip()).hostname
+
+
+def partition_keys(keys) -> dict:
+    """Classify, normalize and deduplicate many keys in a single pass,
+    grouping them by backend. Within each group, keys keep the order in
+    which they were first seen.
+
+    :param keys: The keys to partition
+    :type keys: Iterable[str]
+    :return: A dict mapping bugjira.common.BUGZILLA and bugjira.common.JIRA
+        to lists of unique normalized keys, and INVALID to a list of the
+        inputs that are not keys
+    :rtype: dict
+    """
+    # dicts rather than sets, so that first-seen order is kept
+    bugzilla_keys = {}
+    jira_keys = {}
+    invalid = []
+    fullmatch = _KEY_PATTERN.fullmatch
+    for key in keys:
+        if not isinstance(key, str):
+            invalid.append(key)
+            continue
+        match = fullmatch(key)
+        if match is None:
+            backend, normalized = classify_key(key)
+            if backend == BUGZILLA:
+                bugzilla_keys[normalized] = None
+            elif backend == JIRA:
+                jira_keys[normalized] = None
+            else:
+                invalid.append(key)
+            continue
+        bugzilla_key = match.group("bugzilla")
+        if bugzilla_key is not None:
+            bugzilla_keys[bugzilla_key] = None
+        else:
+            jira_keys[f"{match.group('project').upper()}-"
+                      f"{match.group('number')}"] = None
+    return {BUGZILLA: list(bugzilla_keys), JIRA: list(jira_keys),
+            INVALID: invalid}
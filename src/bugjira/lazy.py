@@ -0,0 +1,117 @@
+"""Deferred, batched lookups for lazy issues (see Bugjira.get_issue)."""
+
+import threading
+
+from bugjira.session import register_lock_owner
+
+
+class LazyLoader:
+    """Collects the lazy issues created by one broker until the backend data
+    of one of them is needed, then looks up every pending issue at once with
+    the broker's bulk lookup. Scattered accesses to lazy issues thus turn
+    into a few bulk requests instead of one request per issue.
+
+    The lookup is made without holding the loader's lock: lazy issues
+    created meanwhile go into the next batch, and threads that need an
+    issue of the batch being looked up wait for that batch alone.
+    """
+
+    def __init__(self, broker):
+        """Init method
+
+        :param broker: The broker used to look up pending issues
+        :type broker: bugjira.broker.Broker
+        """
+        self.broker = broker
+        # The batch that new lazy issues are added to
+        self._batch = None
+        # The batches being looked up
+        self._loading = set()
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    def add(self, issue) -> None:
+        """Register a lazy issue to be looked up with the next batch
+
+        :param issue: An issue created with only its key
+        :type issue: bugjira.issue.LazyIssue
+        """
+        with self._lock:
+            if self._batch is None:
+                self._batch = _Batch(self)
+            issue._loader = self._batch
+            self._batch.issues.setdefault(issue.key, []).append(issue)
+
+    def _start(self, batch) -> bool:
+        """Close a batch to new issues
+
+        :return: True if the caller is to look the batch up, or False if
+            another thread already is
+        :rtype: bool
+        """
+        with self._lock:
+            if batch.started:
+                return False
+            batch.started = True
+            if self._batch is batch:
+                self._batch = None
+            self._loading.add(batch)
+            return True
+
+    def _finish(self, batch) -> None:
+        with self._lock:
+            self._loading.discard(batch)
+        batch.done.set()
+
+    def _after_fork(self) -> None:
+        # The threads looking batches up are not copied into the child, so
+        # the child looks them up again when they are next needed
+        for batch in self._loading:
+            batch.started = False
+            batch.done = threading.Event()
+        self._loading = set()
+
+
+class _Batch:
+    """The lazy issues that are looked up together. It is the _loader of
+    each of its issues until they are loaded.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        # The issues, by key
+        self.issues = {}
+        self.started = False
+        self.done = threading.Event()
+
+    def load(self, issue) -> None:
+        """Look up every issue of the batch, or wait for the thread that is
+        looking them up. The backend data of each issue is filled in, or, if
+        its lookup failed, the error is recorded so that it is raised when
+        the issue's backend data is read.
+
+        :param issue: The lazy issue whose backend data is needed
+        :type issue: bugjira.issue.LazyIssue
+        """
+        if not self.loader._start(self):
+            self.done.wait()
+            return
+        try:
+            try:
+                broker = self.loader.broker
+                results = broker.dispatch(broker.get_issues, list(self.issues))
+            except Exception as e:
+                results = [None] * len(self.issues)
+                error = e
+            for key, result in zip(self.issues, results):
+                for pending_issue in self.issues[key]:
+                    if result is None:
+                        pending_issue._error = error
+                    elif result.ok:
+                        pending_issue.bugzilla = result.issue.bugzilla
+                        pending_issue.jira_issue = result.issue.jira_issue
+                    else:
+                        pending_issue._error = result.error
+                    pending_issue._loader = None
+        finally:
+            self.loader._finish(self)
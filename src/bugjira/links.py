@@ -0,0 +1,57 @@
+"""The objects in this module describe links between issues, as returned by
+Bugjira.walk_links.
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from bugjira.issue import Issue
+
+
+# Link types that bugjira derives from backend-specific link data. JIRA issue
+# links are reported using the name of their JIRA link type (e.g. "Blocks").
+DEPENDS_ON = "depends_on"
+BLOCKS = "blocks"
+# Bugzilla external tracker references
+EXTERNAL = "external"
+# JIRA remote links
+REMOTE = "remote"
+
+
+class IssueLink(BaseModel):
+    """A directed link from one issue key to another"""
+    model_config = ConfigDict(frozen=True)
+
+    source: str
+    target: str
+    link_type: str
+
+
+class LinkResult(BaseModel):
+    """The outcome of creating a single link. The error attribute is set if
+    the link could not be created.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    link: IssueLink
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the link was created"""
+        return self.error is None
+
+
+class LinkGraphNode(BaseModel):
+    """An issue visited while walking a link graph, along with the links that
+    lead out of it. The issue attribute is None and the error attribute is
+    set if the issue could not be looked up.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    key: str
+    depth: int
+    issue: Optional[Issue] = None
+    error: Optional[Exception] = None
+    links: List[IssueLink] = []
@@ -0,0 +1,317 @@
+"""A local store of projected issues (see Bugjira.local_query). When it is
+enabled, the issues that Bugjira looks up or finds by searching are stored
+in SQLite along with the comments it fetches, so that questions such as
+"which bugs in component X are in status Y" can be answered in
+milliseconds without a request. Every configured field is indexed, and the
+text fields and comments are indexed for full-text search. Results say
+when their issues were fetched, and which of them are known to have
+changed since.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from bugjira.routing import INSTANCE_SEPARATOR
+from bugjira.session import register_lock_owner
+
+
+# The number of fetched comments stored at a time
+COMMENT_BATCH_SIZE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY,
+    backend TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    key TEXT NOT NULL,
+    row TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    stale INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (backend, instance, key)
+);
+CREATE TABLE IF NOT EXISTS field_values (
+    issue INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value
+);
+CREATE INDEX IF NOT EXISTS field_values_by_value
+    ON field_values (name, value, issue);
+CREATE INDEX IF NOT EXISTS field_values_by_issue ON field_values (issue);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    backend TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    key TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    UNIQUE (backend, instance, comment)
+);
+CREATE INDEX IF NOT EXISTS comments_by_issue
+    ON comments (backend, instance, key);
+CREATE VIRTUAL TABLE IF NOT EXISTS issue_text USING fts5(text);
+CREATE VIRTUAL TABLE IF NOT EXISTS comment_text USING fts5(text);
+"""
+
+
+class LocalResult(BaseModel):
+    """The issues matching a local query"""
+
+    # The projected issues (see Bugjira.project), with keys qualified by
+    # instance for named instances
+    rows: List[dict] = []
+    # When the least recently fetched issue was fetched, and how many seconds
+    # ago that was
+    oldest: Optional[datetime] = None
+    staleness: Optional[float] = None
+    # The keys of the issues that are known to have changed since they were
+    # fetched, e.g. from a webhook or an update
+    stale: List[str] = []
+
+
+class LocalStore:
+    """A thread-safe SQLite store of projected issues and their comments"""
+
+    def __init__(self, path=":memory:", text_fields=("summary",)):
+        """Init method
+
+        :param path: The database file, defaults to ":memory:"
+        :type path: str, optional
+        :param text_fields: The configured names of the fields to index for
+            full-text search along with the comments, defaults to
+            ("summary",)
+        :type text_fields: [str], optional
+        :raises ImportError: If python's SQLite library was built without
+            the FTS5 full-text search extension
+        """
+        self.path = path
+        self.text_fields = list(text_fields)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self._db.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._db.close()
+            if "fts5" not in str(e):
+                raise
+            raise ImportError(
+                "the local store requires SQLite's FTS5 extension, which "
+                f"SQLite {sqlite3.sqlite_version} lacks: {e}")
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def put(self, broker, issues) -> None:
+        """Store the projections of issues, replacing any stored versions
+
+        :param broker: The broker of the issues' instance
+        :type broker: bugjira.broker.Broker
+        :param issues: The issues
+        :type issues: [bugjira.issue.Issue]
+        """
+        rows = [broker.project(issue) for issue in issues]
+        if not rows:
+            return
+        backend, instance = broker.generator_type, broker.instance or ""
+        fetched = time.time()
+        with self._lock, self._db:
+            for row in rows:
+                issue_id = self._store_row(backend, instance, row, fetched)
+                self._db.execute("DELETE FROM field_values WHERE issue = ?",
+                                 (issue_id,))
+                self._db.executemany(
+                    "INSERT INTO field_values (issue, name, value) "
+                    "VALUES (?, ?, ?)",
+                    [(issue_id, name, item) for name, value in row.items()
+                     if name != "key" for item in _index_values(value)])
+                self._db.execute("DELETE FROM issue_text WHERE rowid = ?",
+                                 (issue_id,))
+                text = " ".join(str(row[name]) for name in self.text_fields
+                                if row.get(name) is not None)
+                self._db.execute(
+                    "INSERT INTO issue_text (rowid, text) VALUES (?, ?)",
+                    (issue_id, text))
+
+    def _store_row(self, backend, instance, row, fetched) -> int:
+        """Insert or replace an issue's row, returning its id. The caller
+        must hold the lock and a transaction.
+        """
+        found = self._db.execute(
+            "SELECT id FROM issues WHERE backend = ? AND instance = ? AND "
+            "key = ?", (backend, instance, row["key"])).fetchone()
+        if found is None:
+            return self._db.execute(
+                "INSERT INTO issues (backend, instance, key, row, fetched, "
+                "stale) VALUES (?, ?, ?, ?, ?, 0)",
+                (backend, instance, row["key"], json.dumps(row, default=str),
+                 fetched)).lastrowid
+        self._db.execute(
+            "UPDATE issues SET row = ?, fetched = ?, stale = 0 WHERE id = ?",
+            (json.dumps(row, default=str), fetched, found[0]))
+        return found[0]
+
+    def add_comments(self, broker, comments) -> None:
+        """Store comments for full-text search. Comments that are already
+        stored are skipped.
+
+        :param broker: The broker of the comments' instance
+        :type broker: bugjira.broker.Broker
+        :param comments: The comments
+        :type comments: [bugjira.comment.Comment]
+        """
+        backend, instance = broker.generator_type, broker.instance or ""
+        with self._lock, self._db:
+            for comment in comments:
+                added = self._db.execute(
+                    "INSERT OR IGNORE INTO comments (backend, instance, key, "
+                    "comment) VALUES (?, ?, ?, ?)",
+                    (backend, instance, comment.key, comment.id))
+                if added.rowcount == 1:
+                    self._db.execute(
+                        "INSERT INTO comment_text (rowid, text) "
+                        "VALUES (?, ?)", (added.lastrowid, comment.body))
+
+    def mark_stale(self, broker, keys) -> None:
+        """Record that issues have changed since they were stored
+
+        :param broker: The broker of the issues' instance
+        :type broker: bugjira.broker.Broker
+        :param keys: The issues' keys on their instance
+        :type keys: [str]
+        """
+        backend, instance = broker.generator_type, broker.instance or ""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE issues SET stale = 1 WHERE backend = ? AND "
+                "instance = ? AND key = ?",
+                [(backend, instance, key) for key in keys])
+
+    def delete(self, broker, key) -> None:
+        """Drop an issue and its comments
+
+        :param broker: The broker of the issue's instance
+        :type broker: bugjira.broker.Broker
+        :param key: The issue's key on its instance
+        :type key: str
+        """
+        backend, instance = broker.generator_type, broker.instance or ""
+        with self._lock, self._db:
+            found = self._db.execute(
+                "SELECT id FROM issues WHERE backend = ? AND instance = ? "
+                "AND key = ?", (backend, instance, key)).fetchone()
+            if found is not None:
+                self._db.execute("DELETE FROM field_values WHERE issue = ?",
+                                 found)
+                self._db.execute("DELETE FROM issue_text WHERE rowid = ?",
+                                 found)
+                self._db.execute("DELETE FROM issues WHERE id = ?", found)
+            self._db.execute(
+                "DELETE FROM comment_text WHERE rowid IN (SELECT id FROM "
+                "comments WHERE backend = ? AND instance = ? AND key = ?)",
+                (backend, instance, key))
+            self._db.execute(
+                "DELETE FROM comments WHERE backend = ? AND instance = ? AND "
+                "key = ?", (backend, instance, key))
+
+    def query(self, filters=None, text=None, backend=None, instance=None,
+              limit=None) -> LocalResult:
+        """Return the stored issues that match every filter
+
+        :param filters: A dict mapping configured field names to the value
+            the field must have, a list of values it may have, or None if it
+            must be unset. A list field matches if any of its items does.
+            Defaults to None.
+        :type filters: dict, optional
+        :param text: A full-text query (in SQLite FTS5 syntax, e.g. "crash
+            AND startup") that the text fields or a comment must match,
+            defaults to None
+        :type text: str, optional
+        :param backend: Only return issues of this backend, defaults to None
+        :type backend: str, optional
+        :param instance: Only return issues of this named instance, of
+            backend if it is given, defaults to None for every instance, or
+            only the default instance if backend is given
+        :type instance: str, optional
+        :param limit: The most issues to return, defaults to None
+        :type limit: int, optional
+        :raises ValueError: If the text query is not valid
+        :return: The matching issues, ordered by key
+        :rtype: LocalResult
+        """
+        where, params = [], []
+        if backend is not None:
+            where.append("backend = ?")
+            params.append(backend)
+        if backend is not None or instance is not None:
+            where.append("instance = ?")
+            params.append(instance or "")
+        for name, value in (filters or {}).items():
+            values = value if isinstance(value, list) else [value]
+            wanted = [item for value in values
+                      for item in _index_values(value)]
+            matches = []
+            if wanted:
+                matches.append(
+                    "id IN (SELECT issue FROM field_values WHERE name = ? "
+                    f"AND value IN ({', '.join('?' * len(wanted))}))")
+                params += [name] + wanted
+            if any(value in (None, "", [], {}) for value in values):
+                matches.append("id NOT IN (SELECT issue FROM field_values "
+                               "WHERE name = ?)")
+                params.append(name)
+            where.append(f"({' OR '.join(matches)})" if matches else "0")
+        if text is not None:
+            where.append(
+                "(id IN (SELECT rowid FROM issue_text WHERE issue_text "
+                "MATCH ?) OR id IN (SELECT issues.id FROM comment_text JOIN "
+                "comments ON comments.id = comment_text.rowid JOIN issues "
+                "USING (backend, instance, key) WHERE comment_text MATCH ?))")
+            params += [text, text]
+        sql = "SELECT backend, instance, key, row, fetched, stale FROM issues"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY backend, instance, length(key), key"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        try:
+            with self._lock:
+                found = self._db.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"invalid local query: {e}") from e
+        result = LocalResult()
+        oldest = None
+        for _, instance, key, row, fetched, stale in found:
+            row = json.loads(row)
+            if instance:
+                row["key"] = f"{instance}{INSTANCE_SEPARATOR}{key}"
+            result.rows.append(row)
+            if stale:
+                result.stale.append(row["key"])
+            oldest = fetched if oldest is None else min(oldest, fetched)
+        if oldest is not None:
+            result.oldest = datetime.fromtimestamp(oldest, timezone.utc)
+            result.staleness = max(0.0, time.time() - oldest)
+        return result
+
+
+def _index_values(value) -> list:
+    """Return the values stored in the index for a normalized field value"""
+    if value in (None, "", [], {}):
+        return []
+    if isinstance(value, list):
+        return [item for value in value for item in _index_values(value)]
+    if isinstance(value, dict):
+        return [json.dumps(value, sort_keys=True, default=str)]
+    if isinstance(value, bool):
+        return [int(value)]
+    if isinstance(value, (int, float, str)):
+        return [value]
+    return [str(value)]
@@ -0,0 +1,683 @@
+"""Mirroring of bugzilla bugs into JIRA issues (see Bugjira.mirror). A
+Mirror keeps a SQLite table mapping each mirrored bug to its JIRA issue,
+along with the field values last written, the comments copied and the
+links created. Each sync only reads the bugs changed since the previous
+sync, and only writes what has changed since, so the cost of a sync grows
+with the churn rather than with the number of mirrored bugs.
+
+Every write is recorded before it is made and confirmed after, so a sync
+that is interrupted can be run again without duplicating anything: field
+updates are simply repeated, comments carry a marker that is looked for
+before they are posted again, and a bug whose JIRA issue may or may not
+have been created is reported rather than created twice.
+"""
+
+import json
+import re
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from bugjira.broker import BUGZILLA_DATE_FORMAT
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.diff import Differ
+from bugjira.issue import JiraIssue
+from bugjira.links import BLOCKS, DEPENDS_ON, IssueLink
+from bugjira.scheduling import ContextThreadPoolExecutor
+from bugjira.util import parse_datetime
+
+
+# The first line of every copied comment, which identifies the bugzilla
+# comment it was copied from
+COMMENT_MARKER = "[bugzilla comment {id}]"
+_COMMENT_MARKER_RE = re.compile(r"^\[bugzilla comment (\S+)\]")
+
+# The JIRA field that is set with a transition rather than an edit, and so
+# cannot be set when an issue is created
+_STATUS_FIELD_ID = "status"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    bug TEXT PRIMARY KEY,
+    issue TEXT,
+    snapshot TEXT,
+    comments_since TEXT,
+    creating INTEGER NOT NULL DEFAULT 0,
+    dirty INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS comments (
+    comment TEXT PRIMARY KEY,
+    bug TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (source, target)
+);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# The most parameters sent in one SQLite statement
+_CHUNK_SIZE = 500
+
+
+class MirrorRecord(BaseModel):
+    """The mirrored state of one bug"""
+
+    bug: str
+    # The key of the JIRA issue, or None until it has been created
+    issue: Optional[str] = None
+    # The normalized values of the mirrored bug fields, as last written
+    snapshot: Optional[Dict[str, Any]] = None
+    # The creation time of the last comment copied
+    comments_since: Optional[datetime] = None
+    # True while the JIRA issue is being created, and after a creation
+    # whose outcome is unknown
+    creating: bool = False
+    # True if the bug could not be mirrored, so that it is read again by the
+    # next sync
+    dirty: bool = False
+
+
+class MirrorStats(BaseModel):
+    """What one Mirror.sync did"""
+
+    # The number of bugs read
+    read: int = 0
+    created: int = 0
+    updated: int = 0
+    comments: int = 0
+    links: int = 0
+    # Why each bug that could not be mirrored failed, by bug id. They are
+    # retried by the next sync.
+    errors: Dict[str, str] = {}
+    # The time the next sync reads changes from
+    watermark: Optional[datetime] = None
+
+
+class MirrorStore:
+    """The SQLite database of a Mirror. It is only used from the thread
+    that runs the sync.
+    """
+
+    def __init__(self, path):
+        """Init method
+
+        :param path: The database file, or ":memory:"
+        :type path: str
+        """
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def get_watermark(self) -> Optional[datetime]:
+        row = self._db.execute("SELECT value FROM state WHERE name = ?",
+                               ("watermark",)).fetchone()
+        return None if row is None else parse_datetime(row[0])
+
+    def set_watermark(self, watermark) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)",
+                ("watermark", watermark.isoformat()))
+
+    def get(self, bugs) -> dict:
+        """Return a dict mapping the bugs that have a record to it
+
+        :param bugs: The bug ids
+        :type bugs: [str]
+        :rtype: dict
+        """
+        records = {}
+        for chunk in _chunks(list(bugs)):
+            rows = self._db.execute(
+                "SELECT bug, issue, snapshot, comments_since, creating, dirty "
+                f"FROM issues WHERE bug IN ({_placeholders(chunk)})", chunk)
+            for bug, issue, snapshot, since, creating, dirty in rows:
+                records[bug] = MirrorRecord(
+                    bug=bug, issue=issue,
+                    snapshot=None if snapshot is None else json.loads(
+                        snapshot),
+                    comments_since=parse_datetime(since),
+                    creating=creating, dirty=dirty)
+        return records
+
+    def dirty(self) -> [str]:
+        """Return the bugs that the last sync could not mirror"""
+        return [row[0] for row in self._db.execute(
+            "SELECT bug FROM issues WHERE dirty = 1")]
+
+    def begin_create(self, bugs) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO issues (bug) VALUES (?)",
+                [(bug,) for bug in bugs])
+            self._db.executemany(
+                "UPDATE issues SET creating = 1 WHERE bug = ?",
+                [(bug,) for bug in bugs])
+
+    def created(self, bug, issue, snapshot) -> MirrorRecord:
+        with self._db:
+            self._db.execute(
+                "UPDATE issues SET issue = ?, snapshot = ?, creating = 0 "
+                "WHERE bug = ?", (issue, json.dumps(snapshot), bug))
+        return MirrorRecord(bug=bug, issue=issue, snapshot=snapshot)
+
+    def create_failed(self, bug) -> None:
+        """Record that a bug's JIRA issue was certainly not created"""
+        with self._db:
+            self._db.execute(
+                "UPDATE issues SET creating = 0, dirty = 1 WHERE bug = ?",
+                (bug,))
+
+    def synced(self, bug, snapshot) -> None:
+        with self._db:
+            self._db.execute(
+                "UPDATE issues SET snapshot = ? WHERE bug = ?",
+                (json.dumps(snapshot), bug))
+
+    def set_dirty(self, bugs, dirty=True) -> None:
+        with self._db:
+            self._db.executemany("UPDATE issues SET dirty = ? WHERE bug = ?",
+                                 [(int(dirty), bug) for bug in bugs])
+
+    def add_mapping(self, bug, issue) -> None:
+        with self._db:
+            self._db.execute("INSERT OR IGNORE INTO issues (bug) VALUES (?)",
+                             (bug,))
+            self._db.execute(
+                "UPDATE issues SET issue = ?, creating = 0, dirty = 1 "
+                "WHERE bug = ?", (issue, bug))
+
+    def remove_mapping(self, bug) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM issues WHERE bug = ?", (bug,))
+            self._db.execute("DELETE FROM comments WHERE bug = ?", (bug,))
+
+    def get_comments(self, comments) -> dict:
+        """Return a dict mapping the comments that have been recorded to
+        True if they were posted, or False if they may have been
+        """
+        states = {}
+        for chunk in _chunks(list(comments)):
+            rows = self._db.execute(
+                "SELECT comment, done FROM comments "
+                f"WHERE comment IN ({_placeholders(chunk)})", chunk)
+            states.update((comment, bool(done)) for comment, done in rows)
+        return states
+
+    def begin_comments(self, comments) -> None:
+        """Record that comments are about to be posted
+
+        :param comments: (comment id, bug id) pairs
+        :type comments: [tuple]
+        """
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO comments (comment, bug) VALUES (?, ?)",
+                comments)
+
+    def comments_done(self, bug, comments, since) -> None:
+        """Record that comments on a bug were posted, and the creation time
+        of the last comment copied
+        """
+        with self._db:
+            self._db.executemany(
+                "UPDATE comments SET done = 1 WHERE comment = ?",
+                [(comment,) for comment in comments])
+            if since is not None:
+                self._db.execute(
+                    "UPDATE issues SET comments_since = ? WHERE bug = ?",
+                    (since.isoformat(), bug))
+
+    def known_links(self, links) -> set:
+        """Return those of the (source, target) bug pairs that are linked"""
+        links = list(links)
+        known = set()
+        for chunk in _chunks(links):
+            known.update(
+                (source, target) for source, target in self._db.execute(
+                    "SELECT source, target FROM links WHERE source IN "
+                    f"({_placeholders(chunk)})",
+                    [source for source, _ in chunk]))
+        return known & set(links)
+
+    def add_links(self, links) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO links (source, target) VALUES (?, ?)",
+                links)
+
+
+class Mirror:
+    """Mirrors the bugzilla bugs matching a query into JIRA issues. Each
+    call to sync creates an issue for each new bug, copies the changes to
+    the mirrored fields and the new comments, and creates a JIRA link for
+    each dependency between mirrored bugs. Links are only ever added.
+    """
+
+    # Seconds subtracted from the watermark when asking for the bugs changed
+    # since, to allow for clock skew between us and the server. Bugs read
+    # twice are diffed with what was last written, so nothing is written
+    # twice.
+    overlap = 60
+
+    def __init__(self, bugjira, path, query, fields, defaults=None,
+                 values=None, comments=True, link_type="Blocks",
+                 bugzilla_instance=None, jira_instance=None, workers=4):
+        """Init method
+
+        :param bugjira: The Bugjira object to mirror with
+        :type bugjira: bugjira.bugjira.Bugjira
+        :param path: The SQLite database file that holds the mapping
+        :type path: str
+        :param query: A bugzilla query dict selecting the bugs to mirror
+        :type query: dict
+        :param fields: A dict mapping configured bugzilla field names to the
+            configured names of the JIRA fields they are copied to
+        :type fields: dict
+        :param defaults: The values of other JIRA fields for new issues, by
+            configured field name, e.g. the project and issue type, defaults
+            to None
+        :type defaults: dict, optional
+        :param values: A dict mapping bugzilla field names to dicts that
+            translate their normalized values to JIRA values, defaults to
+            None, which copies values as they are. The JIRA value of a status
+            is the name of the transition to perform.
+        :type values: dict, optional
+        :param comments: Whether to copy comments, defaults to True
+        :type comments: bool, optional
+        :param link_type: The JIRA link type that a blocking bug's issue is
+            linked to the blocked bug's issue with, defaults to "Blocks".
+            None does not create links.
+        :type link_type: str, optional
+        :param bugzilla_instance: The name of the configured bugzilla
+            instance, defaults to None for the default instance
+        :type bugzilla_instance: str, optional
+        :param jira_instance: The name of the configured JIRA instance,
+            defaults to None for the default instance
+        :type jira_instance: str, optional
+        :param workers: The most write batches run at once, defaults to 4
+        :type workers: int, optional
+        :raises ValueError: If query or fields is not a dict, if an instance
+            is not configured, or if a field name is not configured for its
+            backend
+        """
+        if not isinstance(query, dict):
+            raise ValueError(f"query must be a dict: {str(query)}")
+        if not isinstance(fields, dict) or not fields:
+            raise ValueError(f"fields must be a non-empty dict: "
+                             f"{str(fields)}")
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1: {workers}")
+        self._bugjira = bugjira
+        self._bugzilla = bugjira._get_backend_broker(BUGZILLA,
+                                                     bugzilla_instance)
+        self._jira = bugjira._get_backend_broker(JIRA, jira_instance)
+        self._differ = Differ(self._bugzilla, list(fields))
+        jira_fields = self._jira.get_fields(list(fields.values()))
+        if defaults:
+            self._jira.get_fields(list(defaults))
+        self._transitions = {
+            name for name, field in zip(fields, jira_fields)
+            if getattr(field, "jira_field_id", None) == _STATUS_FIELD_ID}
+        self.query = query
+        self.fields = fields
+        self.defaults = defaults or {}
+        self.values = values or {}
+        self.comments = comments
+        self.link_type = link_type
+        self.jira_instance = jira_instance
+        self.workers = workers
+        self.store = MirrorStore(path)
+
+    def close(self) -> None:
+        """Close the database"""
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_mapping(self, bug, issue) -> None:
+        """Record that a bug is mirrored by an existing JIRA issue, e.g. one
+        made by earlier scripts, or one whose creation was interrupted. The
+        next sync overwrites the issue's mirrored fields and copies the
+        comments that do not carry a marker.
+
+        :param bug: The bug id
+        :type bug: str
+        :param issue: The JIRA issue key
+        :type issue: str
+        """
+        self.store.add_mapping(str(bug), issue)
+
+    def remove_mapping(self, bug) -> None:
+        """Forget a bug's mirror, so that the next sync that reads the bug
+        creates a new JIRA issue for it
+
+        :param bug: The bug id
+        :type bug: str
+        """
+        self.store.remove_mapping(str(bug))
+
+    def sync(self) -> MirrorStats:
+        """Mirror the bugs changed since the last sync, along with the bugs
+        that the last sync could not mirror
+
+        :raises BrokerLookupException: If the changed bugs cannot be read,
+            in which case the watermark is not moved
+        :return: What the sync did
+        :rtype: MirrorStats
+        """
+        stats = MirrorStats()
+        started = datetime.now(timezone.utc)
+        bugs = self._read(stats)
+        records = self.store.get(bugs)
+        self._create(bugs, records, stats)
+        self._update(bugs, records, stats)
+        if self.comments:
+            self._copy_comments(bugs, records, stats)
+        if self.link_type:
+            self._copy_links(bugs, records, stats)
+        self.store.set_dirty([bug for bug in bugs if bug not in stats.errors],
+                             dirty=False)
+        self.store.set_dirty(stats.errors)
+        self.store.set_watermark(started)
+        stats.watermark = started
+        return stats
+
+    def _read(self, stats) -> dict:
+        """Return a dict mapping the ids of the bugs to mirror to the bugs"""
+        query = dict(self.query)
+        watermark = self.store.get_watermark()
+        if watermark is not None:
+            query["last_change_time"] = (
+                watermark - timedelta(seconds=self.overlap)).strftime(
+                    BUGZILLA_DATE_FORMAT)
+        bugs = {issue.key: issue for issue in self._bugjira.search(
+            query, BUGZILLA, instance=self._bugzilla.instance)}
+        dirty = [bug for bug in self.store.dirty() if bug not in bugs]
+        if dirty:
+            for result in self._bugzilla.get_issues(dirty):
+                if result.ok:
+                    bugs[result.key] = result.issue
+                else:
+                    stats.errors[result.key] = str(result.error)
+        stats.read = len(bugs)
+        return bugs
+
+    def _create(self, bugs, records, stats) -> None:
+        """Create the JIRA issues of new bugs. Fields that are set with a
+        transition are left out of the snapshot, so that _update sets them.
+        """
+        new = []
+        for bug in bugs:
+            record = records.get(bug)
+            if record is not None and record.issue is not None:
+                continue
+            if record is not None and record.creating:
+                stats.errors[bug] = (
+                    "an earlier sync was interrupted while creating its "
+                    "JIRA issue; record the issue with add_mapping, or "
+                    "call remove_mapping to create one")
+                continue
+            new.append(bug)
+        if not new:
+            return
+        snapshots = {}
+        for bug in new:
+            snapshots[bug] = {
+                name: value
+                for name, value in self._differ.snapshot(bugs[bug]).items()
+                if name not in self._transitions}
+        specs = [dict(self.defaults, **self._translate(
+            {name: value for name, value in snapshots[bug].items()
+             if name != "key" and value not in (None, "", [], {})}))
+            for bug in new]
+        self.store.begin_create(new)
+        results = self._bugjira.create_issues(specs, JIRA, self.jira_instance)
+        for bug, result in zip(new, results):
+            if result.ok:
+                records[bug] = self.store.created(bug, result.key,
+                                                  snapshots[bug])
+                stats.created += 1
+                continue
+            stats.errors[bug] = str(result.error)
+            if result.response is not None:
+                # JIRA rejected this issue; the request as a whole did not
+                # fail, so nothing was created
+                self.store.create_failed(bug)
+
+    def _update(self, bugs, records, stats) -> None:
+        """Write the changed fields of mirrored bugs. Issues with the same
+        changes are updated with one update_issues call, and the calls are
+        run concurrently.
+        """
+        groups = {}
+        for bug, issue in bugs.items():
+            record = records.get(bug)
+            if record is None or record.issue is None or \
+                    bug in stats.errors:
+                continue
+            snapshot = self._differ.snapshot(issue)
+            changes = self._differ.diff(record.snapshot or {"key": bug},
+                                        snapshot)
+            if not changes.changed:
+                continue
+            payload = self._translate(changes.payload())
+            group = json.dumps(payload, sort_keys=True, default=str)
+            groups.setdefault(group, (payload, []))[1].append(
+                (bug, record.issue, snapshot))
+        if not groups:
+            return
+        with ContextThreadPoolExecutor(max_workers=self.workers) as executor:
+            updates = [(members, executor.submit(
+                self._bugjira.update_issues,
+                [JiraIssue(key=issue, instance=self.jira_instance)
+                 for _, issue, _ in members], payload))
+                for payload, members in groups.values()]
+            for members, update in updates:
+                try:
+                    results = update.result()
+                except Exception as e:
+                    results = [e] * len(members)
+                for (bug, _, snapshot), result in zip(members, results):
+                    error = result if isinstance(result, Exception) else \
+                        result.error
+                    if error is not None:
+                        stats.errors[bug] = str(error)
+                        continue
+                    self.store.synced(bug, snapshot)
+                    records[bug].snapshot = snapshot
+                    stats.updated += 1
+
+    def _copy_comments(self, bugs, records, stats) -> None:
+        """Post the comments made on mirrored bugs since their last copied
+        comment, in order, to their JIRA issues. Issues are posted to
+        concurrently.
+        """
+        mapped = {bug: records[bug].issue for bug in bugs
+                  if bug in records and records[bug].issue is not None and
+                  bug not in stats.errors}
+        if not mapped:
+            return
+        since = {bug: records[bug].comments_since -
+                 timedelta(seconds=self.overlap)
+                 for bug in mapped if records[bug].comments_since}
+        try:
+            comments = list(self._bugjira.get_comments(
+                [bugs[bug] for bug in mapped], since))
+        except Exception as e:
+            for bug in mapped:
+                stats.errors[bug] = str(e)
+            return
+        states = self.store.get_comments(comment.id for comment in comments)
+        uncertain = {comment.key for comment in comments
+                     if states.get(comment.id) is False}
+        if uncertain:
+            for comment_id in self._find_posted(mapped, uncertain, stats):
+                states[comment_id] = True
+        by_bug = {}
+        for comment in comments:
+            if comment.key not in stats.errors:
+                by_bug.setdefault(comment.key, []).append(comment)
+        todo = {bug: [comment for comment in found
+                      if not states.get(comment.id)]
+                for bug, found in by_bug.items()}
+        self.store.begin_comments((comment.id, bug)
+                                  for bug, new in todo.items()
+                                  for comment in new)
+        with ContextThreadPoolExecutor(max_workers=self.workers) as executor:
+            posts = [(bug, executor.submit(self._post_comments, mapped[bug],
+                                           new))
+                     for bug, new in todo.items() if new]
+            for bug, post in posts:
+                posted, error = post.result()
+                for comment in posted:
+                    states[comment.id] = True
+                stats.comments += len(posted)
+                if error is not None:
+                    stats.errors[bug] = str(error)
+        for bug, found in by_bug.items():
+            done = [comment.id for comment in found if states.get(comment.id)]
+            if done:
+                self.store.comments_done(bug, done,
+                                         _copied_until(found, states))
+
+    def _find_posted(self, mapped, bugs, stats) -> set:
+        """Look for the markers of the comments that an earlier sync may
+        have posted to the JIRA issues of bugs
+
+        :return: The ids of the bugzilla comments found
+        :rtype: set
+        """
+        issues = [JiraIssue(key=mapped[bug], instance=self.jira_instance)
+                  for bug in bugs]
+        posted = set()
+        try:
+            for comment in self._bugjira.get_comments(issues):
+                match = _COMMENT_MARKER_RE.match(comment.body)
+                if match:
+                    posted.add(match.group(1))
+        except Exception as e:
+            for bug in bugs:
+                stats.errors[bug] = str(e)
+            return set()
+        return posted
+
+    def _post_comments(self, issue, comments) -> tuple:
+        """Post comments to one JIRA issue in order, stopping at the first
+        that fails
+
+        :return: The comments posted, and the exception that stopped the
+            posting or None
+        :rtype: tuple
+        """
+        posted = []
+        jira_issue = JiraIssue(key=issue, instance=self.jira_instance)
+        for comment in comments:
+            try:
+                self._bugjira.add_comment(jira_issue,
+                                          _comment_body(comment))
+            except Exception as e:
+                return posted, e
+            posted.append(comment)
+        return posted, None
+
+    def _copy_links(self, bugs, records, stats) -> None:
+        """Link the JIRA issues of mirrored bugs that block one another"""
+        mapped = [bugs[bug] for bug in bugs
+                  if bug in records and records[bug].issue is not None and
+                  bug not in stats.errors]
+        if not mapped:
+            return
+        pairs = set()
+        for found in self._bugzilla.get_links(mapped,
+                                              [DEPENDS_ON, BLOCKS]).values():
+            for link in found:
+                if link.link_type == BLOCKS:
+                    pairs.add((link.source, link.target))
+                else:
+                    pairs.add((link.target, link.source))
+        pairs -= self.store.known_links(pairs)
+        issues = {bug: record.issue for bug, record in self.store.get(
+            {bug for pair in pairs for bug in pair}).items()
+            if record.issue is not None}
+        pairs = sorted(pair for pair in pairs
+                       if pair[0] in issues and pair[1] in issues)
+        if not pairs:
+            return
+        results = self._jira.add_links([
+            IssueLink(source=issues[source], target=issues[target],
+                      link_type=self.link_type)
+            for source, target in pairs])
+        done = []
+        for pair, result in zip(pairs, results):
+            if result.ok:
+                done.append(pair)
+            else:
+                bug = pair[0] if pair[0] in bugs else pair[1]
+                stats.errors[bug] = str(result.error)
+        self.store.add_links(done)
+        stats.links += len(done)
+
+    def _translate(self, payload) -> dict:
+        """Translate bugzilla field names and values to JIRA ones"""
+        translated = {}
+        for name, value in payload.items():
+            table = self.values.get(name)
+            if table is not None:
+                if isinstance(value, list):
+                    value = [_lookup(table, item) for item in value]
+                else:
+                    value = _lookup(table, value)
+            translated[self.fields[name]] = value
+        return translated
+
+
+def _comment_body(comment) -> str:
+    """Return the text of a copied comment"""
+    header = COMMENT_MARKER.format(id=comment.id)
+    if comment.author:
+        header += f" {comment.author} wrote:"
+    return f"{header}\n\n{comment.body}"
+
+
+def _copied_until(comments, states):
+    """Return the creation time of the last of a bug's comments, oldest
+    first, before the first one that has not been copied
+    """
+    until = None
+    for comment in comments:
+        if not states.get(comment.id):
+            break
+        until = comment.created or until
+    return until
+
+
+def _lookup(table, value):
+    try:
+        return table.get(value, value)
+    except TypeError:
+        # Unhashable values are not translated
+        return value
+
+
+def _chunks(items):
+    for start in range(0, len(items), _CHUNK_SIZE):
+        yield items[start:start + _CHUNK_SIZE]
+
+
+def _placeholders(chunk) -> str:
+    return ", ".join("?" * len(chunk))
@@ -0,0 +1,99 @@
+"""Helpers for overlapping network requests with the work done by the
+consumer of their results.
+"""
+
+import contextvars
+import queue
+import threading
+
+
+# How often a blocked producer checks whether it has been stopped, in seconds
+_POLL_INTERVAL = 0.1
+
+_ITEM = "item"
+_DONE = "done"
+_ERROR = "error"
+
+
+def put_until_stopped(items, item, stop) -> bool:
+    """Put an item on a bounded queue, giving up if the stop event is set
+    while waiting for room.
+
+    :param items: The queue
+    :type items: queue.Queue
+    :param item: The item to put on the queue
+    :type item: object
+    :param stop: An event that is set when the consumer has gone away
+    :type stop: threading.Event
+    :return: False if the consumer stopped before the item was queued
+    :rtype: bool
+    """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class Prefetcher:
+    """Iterates over an iterable (typically one that fetches a page of
+    results per item) in a background thread, keeping up to depth items ready
+    ahead of the consumer. While the consumer works through page N, page N+1
+    is already being fetched. If the consumer stops early, the background
+    thread stops after its current item.
+    """
+
+    def __init__(self, iterable, depth=1):
+        """Init method
+
+        :param iterable: The iterable to prefetch from
+        :type iterable: Iterable
+        :param depth: The maximum number of items fetched ahead of the
+            consumer, defaults to 1. A depth of 0 disables prefetching.
+        :type depth: int, optional
+        """
+        self.iterable = iterable
+        self.depth = depth
+
+    def __iter__(self):
+        if self.depth <= 0:
+            yield from self.iterable
+            return
+        items = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        # The producer sends its requests with the consumer's priority
+        context = contextvars.copy_context()
+        producer = threading.Thread(target=context.run,
+                                    args=(self._produce, items, stop),
+                                    daemon=True)
+        producer.start()
+        try:
+            while True:
+                kind, item = items.get()
+                if kind == _DONE:
+                    return
+                if kind == _ERROR:
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Make room so that a producer blocked on a full queue notices
+            # the stop event promptly
+            while not items.empty():
+                items.get_nowait()
+
+    def _produce(self, items, stop) -> None:
+        iterator = iter(self.iterable)
+        try:
+            for item in iterator:
+                if not put_until_stopped(items, (_ITEM, item), stop):
+                    return
+            put_until_stopped(items, (_DONE, None), stop)
+        except Exception as e:
+            put_until_stopped(items, (_ERROR, e), stop)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
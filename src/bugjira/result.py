@@ -0,0 +1,24 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from bugjira.issue import Issue
+
+
+class IssueResult(BaseModel):
+    """BaseModel representing the outcome of a bulk operation for a single
+    issue. Exactly one of the issue or error attributes is expected to be
+    set by the broker that performed the operation.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    key: Optional[str] = None
+    issue: Optional[Issue] = None
+    error: Optional[Exception] = None
+    # The raw value returned by the backend for this item, if any
+    response: Any = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the operation succeeded for this issue"""
+        return self.error is None
@@ -0,0 +1,156 @@
+"""Routing of issue keys to the brokers of the bugzilla and jira instances a
+Bugjira object is configured with.
+"""
+
+from urllib.parse import urlparse
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.keys import classify_key, url_host
+
+
+# The separator between an instance name (or hint) and a key, as in
+# "partner:123456" or "partner:FOO-1"
+INSTANCE_SEPARATOR = ":"
+
+
+class Router:
+    """Maps issue keys to brokers. A key may be qualified with the name (or
+    a hint) of the instance it belongs to, e.g. "partner:123456", or be a URL
+    pasted from the browser, which is routed to the instance with the same
+    host. Otherwise bugzilla ids go to the default bugzilla instance, and
+    jira keys go to the instance that hosts their project, or the default
+    jira instance. Keys are normalized (see bugjira.keys.classify_key) as
+    they are routed.
+    """
+
+    def __init__(self, bugzilla, jira):
+        """Init method
+
+        :param bugzilla: The broker for the default bugzilla instance
+        :type bugzilla: bugjira.broker.BugzillaBroker
+        :param jira: The broker for the default jira instance
+        :type jira: bugjira.broker.JiraBroker
+        """
+        self.bugzilla = bugzilla
+        self.jira = jira
+        self._instances = {BUGZILLA: {}, JIRA: {}}
+        self._prefixes = {}
+        self._projects = {}
+        self._hosts = {}
+        self._add_host(bugzilla)
+        self._add_host(jira)
+
+    def add_instance(self, backend, name, broker, hints=(), projects=()):
+        """Register the broker of a named instance
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param name: The name of the instance
+        :type name: str
+        :param broker: The instance's broker
+        :type broker: bugjira.broker.Broker
+        :param hints: Other key prefixes that route to the instance,
+            defaults to ()
+        :type hints: [str], optional
+        :param projects: The jira project keys hosted by the instance,
+            defaults to ()
+        :type projects: [str], optional
+        :raises ValueError: If the name, a hint or a project is already
+            routed to another instance
+        """
+        for prefix in [name, *hints]:
+            if prefix in self._prefixes:
+                raise ValueError(f"{prefix} is used by more than one instance")
+            self._prefixes[prefix] = broker
+        for project in projects:
+            project = project.upper()
+            if project in self._projects:
+                raise ValueError(
+                    f"project {project} is routed to more than one instance")
+            self._projects[project] = broker
+        self._instances[backend][name] = broker
+        self._add_host(broker)
+
+    def _add_host(self, broker) -> None:
+        """Route URLs on the host of a broker's configured URL to the broker"""
+        if not broker.config:
+            return
+        url = broker.config.get(broker.generator_type, {}).get("URL", "")
+        host = urlparse(url).hostname
+        if host:
+            self._hosts.setdefault(host, broker)
+
+    def get(self, backend, instance=None):
+        """Return the broker for an instance
+
+        :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+        :type backend: str
+        :param instance: The name of the instance, defaults to None, which
+            returns the default instance's broker
+        :type instance: str, optional
+        :raises ValueError: If the backend or instance is not valid
+        :return: The broker
+        :rtype: bugjira.broker.Broker
+        """
+        if backend not in self._instances:
+            raise ValueError(
+                f"backend must be {BUGZILLA} or {JIRA}: {backend}")
+        if instance is None:
+            return self.bugzilla if backend == BUGZILLA else self.jira
+        broker = self._instances[backend].get(instance)
+        if broker is None:
+            raise ValueError(f"no {backend} instance named {instance}")
+        return broker
+
+    def brokers(self) -> list:
+        """Return the brokers of every instance, defaults first"""
+        return [self.bugzilla, self.jira,
+                *self._instances[BUGZILLA].values(),
+                *self._instances[JIRA].values()]
+
+    def route(self, key):
+        """Return the broker for a key, along with the key as that broker's
+        backend knows it (i.e. without any instance qualifier)
+
+        :param key: A bugzilla id or jira key, optionally qualified with an
+            instance name or hint
+        :type key: str
+        :raises ValueError: If the key is not a bugzilla id or jira key, or
+            does not match the backend of the instance it is qualified with
+        :return: A (broker, key) tuple
+        :rtype: tuple
+        """
+        prefix, separator, rest = key.partition(INSTANCE_SEPARATOR)
+        if separator and prefix in self._prefixes:
+            broker = self._prefixes[prefix]
+            backend, rest = classify_key(rest)
+            if backend != broker.generator_type:
+                raise ValueError(f"{rest} is not a {broker.generator_type} "
+                                 f"key for {prefix}")
+            return broker, rest
+        backend, normalized = classify_key(key)
+        if backend is None:
+            raise ValueError("key does not appear to be bugzilla or jira ID")
+        broker = self._hosts.get(url_host(key))
+        if broker is not None and broker.generator_type == backend:
+            return broker, normalized
+        if backend == BUGZILLA:
+            return self.bugzilla, normalized
+        project = normalized.rsplit("-", 1)[0]
+        return self._projects.get(project, self.jira), normalized
+
+    def for_issue(self, issue):
+        """Return the broker for an issue (or any object with key and instance
+        attributes, such as an Attachment). Objects returned by a broker
+        record the instance they came from; others are routed by key.
+
+        :param issue: The issue
+        :type issue: bugjira.issue.Issue
+        :raises ValueError: If the issue cannot be routed
+        :return: The broker
+        :rtype: bugjira.broker.Broker
+        """
+        instance = getattr(issue, "instance", None)
+        if instance is not None:
+            return self.get(classify_key(issue.key)[0] or JIRA, instance)
+        return self.route(issue.key)[0]
@@ -0,0 +1,299 @@
+"""Priority classes for backend requests. The current priority is held in a
+context variable, so it follows a call into the threads that the brokers
+start for it (see ContextThreadPoolExecutor), and it decides the order in
+which requests waiting for a slot of a broker's Dispatcher, or of its
+adaptive concurrency limit (see bugjira.concurrency.AdaptiveLimiter), are
+let through.
+"""
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from bugjira import deadline
+from bugjira.session import register_lock_owner
+
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+
+# The share of a saturated backend each class gets while all of them are
+# waiting. Interactive requests are let through sixteen times as often as
+# bulk ones, but bulk requests are never starved.
+PRIORITY_WEIGHTS = {INTERACTIVE: 16, NORMAL: 4, BULK: 1}
+
+_current_priority = contextvars.ContextVar("bugjira_priority",
+                                           default=NORMAL)
+
+
+def validate_priority(name) -> str:
+    """Return a priority class name, if it is valid
+
+    :param name: The name
+    :type name: str
+    :raises ValueError: If the name is not a priority class
+    :return: The name
+    :rtype: str
+    """
+    if name not in PRIORITY_WEIGHTS:
+        raise ValueError(f"priority must be one of "
+                         f"{', '.join(PRIORITY_WEIGHTS)}: {name}")
+    return name
+
+
+def get_priority() -> str:
+    """Return the priority class of requests sent from the current context"""
+    return _current_priority.get()
+
+
+@contextmanager
+def priority(name):
+    """Send the requests made within the with block with a priority class.
+    Blocks can be nested; the innermost one wins. A name of None leaves the
+    current priority unchanged.
+
+    :param name: INTERACTIVE, NORMAL, BULK or None
+    :type name: str
+    :raises ValueError: If the name is not a priority class
+    """
+    if name is None:
+        yield
+        return
+    token = _current_priority.set(validate_priority(name))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def iter_with_priority(iterable, name):
+    """Yield the items of an iterable, computing each one with a priority
+    class, without changing the priority of the code consuming them
+
+    :param iterable: The iterable, e.g. a generator that sends requests
+    :type iterable: Iterable
+    :param name: INTERACTIVE, NORMAL, BULK or None
+    :type name: str
+    """
+    if name is None:
+        yield from iterable
+        return
+    validate_priority(name)
+    iterator = iter(iterable)
+    while True:
+        with priority(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """A ThreadPoolExecutor that runs each task in a copy of the context it
+    was submitted from, so that the task's requests keep the submitter's
+    priority class
+    """
+
+    def submit(*args, **kwargs):
+        # The executor and the task are unpacked from args, rather than
+        # declared as positional-only parameters (python 3.8+), so that the
+        # task's own keyword arguments may include "self" or "fn"
+        self, fn, *args = args
+        context = contextvars.copy_context()
+        return super(ContextThreadPoolExecutor, self).submit(
+            context.run, fn, *args, **kwargs)
+
+
+class _Ticket:
+    __slots__ = ("priority", "finish")
+
+    def __init__(self, priority, finish):
+        self.priority = priority
+        self.finish = finish
+
+
+class FairQueue:
+    """A weighted fair queue of waiting requests, using self-clocked fair
+    queuing: each request is stamped with a virtual finish time that
+    advances by 1 / weight of its class, and the request with the earliest
+    finish time goes first. Not thread-safe; the owner must hold a lock.
+    """
+
+    def __init__(self, weights=None):
+        """Init method
+
+        :param weights: The weight of each priority class, defaults to None,
+            which uses PRIORITY_WEIGHTS
+        :type weights: dict, optional
+        """
+        self.weights = weights or PRIORITY_WEIGHTS
+        self._heap = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, priority):
+        """Add a request of a priority class to the queue
+
+        :param priority: The priority class
+        :type priority: str
+        :return: A ticket identifying the request
+        :rtype: object
+        """
+        start = max(self._virtual_time, self._last_finish.get(priority, 0.0))
+        ticket = _Ticket(priority, start + 1 / self.weights[priority])
+        self._last_finish[priority] = ticket.finish
+        heapq.heappush(self._heap, (ticket.finish, next(self._sequence),
+                                    ticket))
+        return ticket
+
+    def head(self):
+        """Return the ticket of the request that goes next, or None"""
+        return self._heap[0][2] if self._heap else None
+
+    def pop(self):
+        """Remove the request that goes next from the queue and return its
+        ticket
+        """
+        ticket = heapq.heappop(self._heap)[2]
+        self._virtual_time = ticket.finish
+        return ticket
+
+    def remove(self, ticket) -> None:
+        """Remove a request that gave up waiting"""
+        self._heap = [entry for entry in self._heap if entry[2] is not ticket]
+        heapq.heapify(self._heap)
+
+    def waiting(self) -> dict:
+        """Return the number of waiting requests of each priority class"""
+        counts = dict.fromkeys(self.weights, 0)
+        for _, _, ticket in self._heap:
+            counts[ticket.priority] += 1
+        return counts
+
+
+class Dispatcher:
+    """Limits the number of a broker's requests in flight to a fixed number
+    of slots. Callers wrap each request in slot(), which blocks while every
+    slot is taken, and requests that have to wait are let through in
+    weighted fair order of their priority classes (see FairQueue). This is
+    what makes priorities take effect while the adaptive concurrency limit,
+    which builds on it, is disabled.
+    """
+
+    def __init__(self, limit=10):
+        """Init method
+
+        :param limit: The number of requests allowed in flight, defaults to
+            10
+        :type limit: int, optional
+        :raises ValueError: If the limit is less than 1
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1: {limit}")
+        self._limit = limit
+        self._in_flight = 0
+        self._waited = 0
+        self._queue = FairQueue()
+        self._wait_time = dict.fromkeys(self._queue.weights, 0.0)
+        # Notified whenever a slot is freed
+        self._lock = threading.Condition()
+        register_lock_owner(self)
+
+    @property
+    def limit(self) -> int:
+        """The number of requests currently allowed in flight"""
+        return int(self._limit)
+
+    def acquire(self, priority=None) -> float:
+        """Wait for a free slot and take it. Requests that find no free slot,
+        or other requests already waiting, wait their turn in the fair queue.
+
+        :param priority: The request's priority class, defaults to None,
+            which uses the current priority
+        :type priority: str, optional
+        :raises ValueError: If the priority is not a priority class
+        :raises bugjira.deadline.DeadlineExceeded: If the current deadline
+            passes while the request is waiting
+        :return: The time.monotonic() time the slot was taken, to be passed
+            to release
+        :rtype: float
+        """
+        priority = validate_priority(priority or get_priority())
+        with self._lock:
+            if self._in_flight >= self.limit or len(self._queue):
+                self._wait(priority)
+            self._in_flight += 1
+        return time.monotonic()
+
+    def _wait(self, priority) -> None:
+        """Wait in the fair queue until the request is at its head and a slot
+        is free, or until the current deadline passes. The caller must hold
+        the lock.
+        """
+        self._waited += 1
+        enqueued = time.monotonic()
+        ticket = self._queue.push(priority)
+        try:
+            while self._queue.head() is not ticket or \
+                    self._in_flight >= self.limit:
+                left = deadline.remaining()
+                if left is not None and left <= 0:
+                    raise deadline.DeadlineExceeded("deadline exceeded")
+                self._lock.wait(left)
+        except BaseException:
+            self._queue.remove(ticket)
+            self._lock.notify_all()
+            raise
+        self._queue.pop()
+        self._wait_time[priority] += time.monotonic() - enqueued
+        # The next request in the queue may fit too
+        self._lock.notify_all()
+
+    def release(self, started=None) -> None:
+        """Free a slot
+
+        :param started: The time returned by acquire, defaults to None
+        :type started: float, optional
+        """
+        with self._lock:
+            self._in_flight -= 1
+            self._lock.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None, operation=None):
+        """Hold a slot for the duration of a request. Yields a dict of the
+        request's outcome, as AdaptiveLimiter.slot does, which a Dispatcher
+        ignores.
+
+        :param priority: The request's priority class, defaults to None,
+            which uses the current priority
+        :type priority: str, optional
+        :param operation: The name of the request's operation, defaults to
+            None
+        :type operation: str, optional
+        """
+        started = self.acquire(priority)
+        try:
+            yield {"status": None, "adapt": True}
+        finally:
+            self.release(started)
+
+    def waiting(self) -> dict:
+        """Return the number of requests of each priority class waiting now"""
+        with self._lock:
+            return self._queue.waiting()
+
+    def _after_fork(self) -> None:
+        # The requests in flight and waiting belong to the parent's threads
+        self._in_flight = 0
+        self._queue = FairQueue()
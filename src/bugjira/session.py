@@ -0,0 +1,130 @@
+"""Pools of backend API clients that let brokers be shared by many threads
+and survive fork(). The bugzilla.Bugzilla and jira.JIRA clients each hold a
+requests session, which is neither safe to use from several threads at once
+nor usable in a child process once the parent has started using it.
+"""
+
+import os
+import threading
+import weakref
+
+
+# Incremented in child processes after fork(), so that pools can tell that
+# the clients they hold were created by the parent
+_fork_generation = 0
+# The objects whose _lock attribute is replaced in child processes after
+# fork(), in case another thread of the parent held it when fork() was called
+_lock_owners = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    global _fork_generation
+    _fork_generation += 1
+    for owner in list(_lock_owners):
+        if isinstance(owner._lock, threading.Condition):
+            owner._lock = threading.Condition()
+        else:
+            owner._lock = threading.Lock()
+        if hasattr(owner, "_after_fork"):
+            owner._after_fork()
+
+
+def register_lock_owner(owner) -> None:
+    """Give an object a new threading.Lock (or threading.Condition, if that
+    is what it uses) as its _lock attribute in child processes after fork().
+    A lock that another thread held at the time of the fork would otherwise
+    never be released in the child. If the object has an _after_fork method,
+    it is called next, e.g. to forget the work of the parent's threads.
+
+    :param owner: The object, which must support weak references
+    :type owner: object
+    """
+    _lock_owners.add(owner)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class _Lease:
+    """Holds the client a thread has checked out of a pool. It is stored in
+    a threading.local, so it is dropped when the thread exits, which returns
+    the client to the pool.
+    """
+
+    def __init__(self, pool, client, generation):
+        self.client = client
+        self.generation = generation
+        weakref.finalize(self, pool._release, client, generation)
+
+
+class ClientPool:
+    """Hands every thread its own backend client. A thread keeps the client
+    it was given for as long as it runs, and when it exits the client is put
+    back in the pool for the next thread, so that short-lived worker threads
+    do not each have to create (and authenticate) a new client. Clients
+    created before a fork() are never used by the child process; it creates
+    new ones instead.
+    """
+
+    def __init__(self, create_client):
+        """Init method
+
+        :param create_client: A callable that returns a new client
+        :type create_client: Callable
+        """
+        self._create_client = create_client
+        self._idle = []
+        self._clients = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        register_lock_owner(self)
+
+    def get(self):
+        """Return the calling thread's client, checking one out of the pool
+        or creating one if the thread does not have one yet
+
+        :return: The client
+        :rtype: object
+        """
+        lease = getattr(self._local, "lease", None)
+        if lease is not None and lease.generation == _fork_generation:
+            return lease.client
+        generation = _fork_generation
+        client = None
+        with self._lock:
+            while self._idle and client is None:
+                client, client_generation = self._idle.pop()
+                if client_generation != generation:
+                    # Created by a parent process, whose connections it
+                    # shares
+                    client = None
+        if client is None:
+            client = self._create_client()
+            with self._lock:
+                self._clients = [
+                    (pooled, client_generation)
+                    for pooled, client_generation in self._clients
+                    if client_generation == generation]
+                self._clients.append((client, generation))
+        self._local.lease = _Lease(self, client, generation)
+        return client
+
+    def clients(self) -> list:
+        """Return every client this process has created, whether in use or
+        waiting in the pool
+        """
+        with self._lock:
+            return [client for client, generation in self._clients
+                    if generation == _fork_generation]
+
+    @property
+    def idle(self) -> int:
+        """The number of clients waiting in the pool"""
+        return len(self._idle)
+
+    def _release(self, client, generation) -> None:
+        if generation != _fork_generation:
+            return
+        with self._lock:
+            self._idle.append((client, generation))
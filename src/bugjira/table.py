@@ -0,0 +1,337 @@
+"""The objects in this module hold batches of projected issues in columnar
+form, so that filters and aggregations run as vectorized numpy operations
+instead of Python loops over Issue objects. numpy is an optional dependency.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from bugjira.util import parse_datetime
+
+
+STRING = "string"
+CATEGORY = "category"
+DATETIME = "datetime"
+NUMBER = "number"
+
+
+class CategoricalColumn:
+    """A dictionary-encoded column: each row holds an integer code that
+    indexes into the list of distinct categories, and -1 for missing values.
+    """
+
+    def __init__(self, codes, categories):
+        """Init method
+
+        :param codes: An integer array of category codes
+        :type codes: numpy.ndarray
+        :param categories: The distinct values, indexed by code
+        :type categories: [object]
+        """
+        self.codes = codes
+        self.categories = list(categories)
+        self._index = {category: code
+                       for code, category in enumerate(self.categories)}
+
+    @classmethod
+    def from_values(cls, values):
+        """Dictionary-encode a sequence of values. Multi-valued entries (e.g.
+        a bug with several components) are joined into a single category.
+
+        :param values: The values to encode
+        :type values: Iterable[object]
+        :return: The encoded column
+        :rtype: CategoricalColumn
+        """
+        index = {}
+        codes = []
+        for value in values:
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value) or None
+            if value is None:
+                codes.append(-1)
+            else:
+                codes.append(index.setdefault(value, len(index)))
+        return cls(np.array(codes, dtype=np.int32), index)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, selection):
+        return CategoricalColumn(self.codes[selection], self.categories)
+
+    def __eq__(self, value):
+        """Return a boolean mask of the rows equal to value"""
+        return self.codes == self._index.get(value, -2)
+
+    def __ne__(self, value):
+        return ~(self == value)
+
+    __hash__ = None
+
+    def isin(self, values):
+        """Return a boolean mask of the rows whose value is in values
+
+        :param values: The values to match
+        :type values: Iterable[object]
+        :return: A boolean mask
+        :rtype: numpy.ndarray
+        """
+        codes = [self._index[value] for value in values
+                 if value in self._index]
+        return np.isin(self.codes, codes)
+
+    def to_numpy(self):
+        """Return the decoded values as an object array"""
+        lookup = np.array(self.categories + [None], dtype=object)
+        return lookup[self.codes]
+
+
+def _to_datetime64(value):
+    """Convert a normalized date value (an ISO 8601 string) to a UTC
+    numpy.datetime64, or NaT if it is missing.
+
+    :raises ValueError: If the value is not an ISO 8601 timestamp
+    """
+    try:
+        parsed = parse_datetime(value)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"invalid datetime value {value!r}")
+    if parsed is None:
+        return np.datetime64("NaT")
+    return np.datetime64(parsed.replace(tzinfo=None), "ms")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _build_column(values, data_type):
+    """Build a typed column from a list of normalized values
+
+    :param values: The values for the column, one per row
+    :type values: list
+    :param data_type: One of the data types defined in this module, or None
+    :type data_type: str
+    :return: The column
+    :rtype: numpy.ndarray or CategoricalColumn
+    """
+    if data_type == CATEGORY:
+        return CategoricalColumn.from_values(values)
+    if data_type == DATETIME:
+        return np.array([_to_datetime64(value) for value in values],
+                        dtype="datetime64[ms]")
+    if data_type == NUMBER:
+        return np.array([_to_float(value) for value in values],
+                        dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+class GroupBy:
+    """The result of IssueTable.group_by. Aggregations return a dict mapping
+    each group's value to the aggregate for that group.
+    """
+
+    def __init__(self, table, codes, groups):
+        self._table = table
+        self._codes = codes
+        self._groups = groups
+
+    def count(self) -> dict:
+        """Return the number of rows in each group"""
+        counts = np.bincount(self._codes, minlength=len(self._groups))
+        return dict(zip(self._groups, counts.tolist()))
+
+    def sum(self, column) -> dict:
+        """Return the sum of a numeric column for each group, ignoring NaN"""
+        values = self._table.column(column)
+        present = ~np.isnan(values)
+        sums = np.bincount(self._codes[present], weights=values[present],
+                           minlength=len(self._groups))
+        return dict(zip(self._groups, sums.tolist()))
+
+    def mean(self, column) -> dict:
+        """Return the mean of a numeric column for each group, ignoring NaN"""
+        values = self._table.column(column)
+        present = ~np.isnan(values)
+        sums = np.bincount(self._codes[present], weights=values[present],
+                           minlength=len(self._groups))
+        counts = np.bincount(self._codes[present],
+                             minlength=len(self._groups))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return dict(zip(self._groups, (sums / counts).tolist()))
+
+    def min(self, column) -> dict:
+        """Return the minimum of a numeric or datetime column per group,
+        ignoring missing values
+        """
+        return self._reduce(column, np.fmin)
+
+    def max(self, column) -> dict:
+        """Return the maximum of a numeric or datetime column per group,
+        ignoring missing values
+        """
+        return self._reduce(column, np.fmax)
+
+    def _reduce(self, column, ufunc) -> dict:
+        values = self._table.column(column)
+        order = np.argsort(self._codes, kind="stable")
+        codes = self._codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        reduced = ufunc.reduceat(values[order], starts)
+        return {self._groups[code]: value
+                for code, value in zip(codes[starts].tolist(),
+                                       reduced.tolist())}
+
+
+class IssueTable:
+    """A columnar batch of projected issues. Each column is a numpy array or
+    a CategoricalColumn with one entry per issue, and the "key" column holds
+    the issue keys.
+    """
+
+    def __init__(self, columns):
+        """Init method
+
+        :param columns: A dict mapping column names to columns of equal length
+        :type columns: dict
+        """
+        if np is None:
+            raise ImportError("numpy is required to use IssueTable")
+        self._columns = columns
+
+    @classmethod
+    def from_rows(cls, rows, data_types=None):
+        """Build a table from projected rows (see Bugjira.project)
+
+        :param rows: Dicts mapping column names to normalized values
+        :type rows: Iterable[dict]
+        :param data_types: A dict mapping column names to data types,
+            defaults to None, which stores every column as objects
+        :type data_types: dict, optional
+        :raises ValueError: If a value in a "datetime" column is not an ISO
+            8601 timestamp
+        :return: The table
+        :rtype: IssueTable
+        """
+        if np is None:
+            raise ImportError("numpy is required to use IssueTable")
+        data_types = data_types or {}
+        values = {}
+        count = 0
+        for row in rows:
+            for name, value in row.items():
+                values.setdefault(name, [None] * count).append(value)
+            count += 1
+            for column in values.values():
+                if len(column) < count:
+                    column.append(None)
+        columns = {}
+        for name, column in values.items():
+            try:
+                columns[name] = _build_column(column, data_types.get(name))
+            except ValueError as e:
+                raise ValueError(f"column {name}: {e}") from e
+        return cls(columns)
+
+    def __len__(self):
+        for column in self._columns.values():
+            return len(column)
+        return 0
+
+    @property
+    def columns(self) -> [str]:
+        """The names of the table's columns"""
+        return list(self._columns)
+
+    def column(self, name):
+        """Return a column by name
+
+        :param name: The column name
+        :type name: str
+        :raises KeyError: If there is no such column
+        :return: The column
+        :rtype: numpy.ndarray or CategoricalColumn
+        """
+        return self._columns[name]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def filter(self, mask):
+        """Return a new table containing only the rows selected by a boolean
+        mask, e.g. ``table.filter(table["status"] == "NEW")``
+
+        :param mask: A boolean array with one entry per row
+        :type mask: numpy.ndarray
+        :return: The filtered table
+        :rtype: IssueTable
+        """
+        return IssueTable({name: column[mask]
+                           for name, column in self._columns.items()})
+
+    def count(self, mask=None) -> int:
+        """Return the number of rows, or the number selected by a mask"""
+        if mask is None:
+            return len(self)
+        return int(np.count_nonzero(mask))
+
+    def group_by(self, name) -> GroupBy:
+        """Group the rows by the values of a column. Rows with a missing
+        value are left out of every group.
+
+        :param name: The column to group by. Lists in an untyped column are
+            grouped as tuples of their items.
+        :type name: str
+        :raises ValueError: If an untyped column holds values that cannot
+            be grouped, e.g. dicts
+        :return: A GroupBy that can compute per-group aggregates
+        :rtype: GroupBy
+        """
+        column = self.column(name)
+        if isinstance(column, CategoricalColumn):
+            present = column.codes >= 0
+            return GroupBy(self.filter(present), column.codes[present],
+                           column.categories)
+        if column.dtype.kind == "f":
+            present = ~np.isnan(column)
+        elif column.dtype.kind == "M":
+            present = ~np.isnat(column)
+        else:
+            present = np.array([value is not None for value in column],
+                               dtype=bool)
+            codes, groups = _group_objects(name, column[present])
+            return GroupBy(self.filter(present), codes, groups)
+        groups, codes = np.unique(column[present], return_inverse=True)
+        return GroupBy(self.filter(present), codes, groups.tolist())
+
+
+def _group_objects(name, values):
+    """Return the group codes and the sorted distinct values of an object
+    column. Lists (e.g. keywords) are grouped as tuples of their items.
+
+    :raises ValueError: If a value cannot be grouped, e.g. a dict
+    """
+    keys = []
+    for value in values:
+        if isinstance(value, list):
+            value = tuple(value)
+        try:
+            hash(value)
+        except TypeError:
+            raise ValueError(f"column {name}: cannot group by {value!r}")
+        keys.append(value)
+    groups = list(dict.fromkeys(keys))
+    try:
+        groups.sort()
+    except TypeError:
+        pass
+    index = {group: code for code, group in enumerate(groups)}
+    return np.array([index[key] for key in keys], dtype=np.intp), groups
@@ -0,0 +1,316 @@
+"""HTTP transport settings for the requests sessions of the backend clients,
+and statistics about their connection pools.
+"""
+
+import re
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from bugjira import deadline
+from bugjira.circuit import CircuitBreaker
+from bugjira.concurrency import AdaptiveLimiter
+from bugjira.config import (
+    CircuitBreakerConfig,
+    ConcurrencyConfig,
+    TransportConfig
+)
+from bugjira.scheduling import Dispatcher
+
+
+# The schemes whose adapters are replaced by configure_session
+SCHEMES = ("http://", "https://")
+
+# The method name of an XML-RPC call, as bugzilla's client sends it near the
+# start of the request body
+_XMLRPC_METHOD = re.compile(rb"<methodName>([^<]+)</methodName>")
+
+
+class PoolStats(BaseModel):
+    """Connection pool statistics for one host of one broker, summed over
+    the clients of all the threads using the broker. Connections are only
+    reused while they are idle in the pool, so a high number of connections
+    relative to requests, or no idle connections under load, suggests that
+    pool_maxsize is too small.
+    """
+
+    backend: str
+    # The name of the configured instance, or None for the default instance
+    instance: Optional[str] = None
+    host: str
+    # The number of clients (one per thread) with a pool for the host
+    clients: int = 0
+    # The maximum number of connections kept open, in total
+    maxsize: int = 0
+    # The number of connections opened since the pools were created
+    connections: int = 0
+    # The number of requests sent since the pools were created
+    requests: int = 0
+    # The number of open connections waiting to be reused
+    idle: int = 0
+
+
+def get_transport_config(section) -> TransportConfig:
+    """Return the transport settings of a bugzilla or jira config section
+
+    :param section: The bugzilla or jira section of a bugjira config dict
+    :type section: dict
+    :return: The settings, with defaults for any that are not configured
+    :rtype: bugjira.config.TransportConfig
+    """
+    return TransportConfig(**(section.get("transport") or {}))
+
+
+def get_limiter(section, backend, instance=None):
+    """Return the adaptive concurrency limiter configured by a bugzilla or
+    jira config section
+
+    :param section: The bugzilla or jira section of a bugjira config dict
+    :type section: dict
+    :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+    :type backend: str
+    :param instance: The name of the configured instance, defaults to None
+    :type instance: str, optional
+    :raises ValueError: If the configured limits are inconsistent
+    :return: The limiter, or None if it is disabled
+    :rtype: bugjira.concurrency.AdaptiveLimiter
+    """
+    concurrency = ConcurrencyConfig(**(section.get("concurrency") or {}))
+    if not concurrency.enabled:
+        return None
+    return AdaptiveLimiter(
+        backend, instance,
+        initial_limit=min(concurrency.initial_limit, concurrency.max_limit),
+        min_limit=concurrency.min_limit, max_limit=concurrency.max_limit,
+        backoff=concurrency.backoff,
+        latency_tolerance=concurrency.latency_tolerance)
+
+
+def get_dispatcher(section):
+    """Return the Dispatcher capping the requests in flight that is
+    configured by a bugzilla or jira config section
+
+    :param section: The bugzilla or jira section of a bugjira config dict
+    :type section: dict
+    :return: The dispatcher, or None if max_in_flight is not configured
+    :rtype: bugjira.scheduling.Dispatcher
+    """
+    transport = get_transport_config(section)
+    if transport.max_in_flight is None:
+        return None
+    return Dispatcher(transport.max_in_flight)
+
+
+def get_circuit_breaker(section, backend, instance=None):
+    """Return the circuit breaker configured by a bugzilla or jira config
+    section
+
+    :param section: The bugzilla or jira section of a bugjira config dict
+    :type section: dict
+    :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+    :type backend: str
+    :param instance: The name of the configured instance, defaults to None
+    :type instance: str, optional
+    :return: The circuit breaker, or None if it is disabled
+    :rtype: bugjira.circuit.CircuitBreaker
+    """
+    settings = CircuitBreakerConfig(**(section.get("circuit_breaker") or {}))
+    if not settings.enabled:
+        return None
+    return CircuitBreaker(
+        backend, instance, failure_threshold=settings.failure_threshold,
+        reset_timeout=settings.reset_timeout,
+        half_open_probes=settings.half_open_probes)
+
+
+def get_timeout(transport):
+    """Return the requests timeout for a transport config
+
+    :param transport: The transport settings
+    :type transport: bugjira.config.TransportConfig
+    :return: A (connect, read) tuple, or None if neither timeout is set
+    :rtype: tuple
+    """
+    if transport.connect_timeout is None and transport.read_timeout is None:
+        return None
+    return (transport.connect_timeout, transport.read_timeout)
+
+
+def operation_name(request) -> str:
+    """Return the name of the operation a request performs, under which the
+    adaptive limiter keeps a baseline latency: the HTTP method and the URL
+    path with ids and keys left out, or the method name of an XML-RPC call,
+    e.g. "GET /rest/api/*/issue/*" or "POST /xmlrpc.cgi Bug.get".
+
+    :param request: The request
+    :type request: requests.PreparedRequest
+    :return: The operation name
+    :rtype: str
+    """
+    path = "/".join("*" if any(char.isdigit() for char in part) else part
+                    for part in urlparse(request.url or "").path.split("/"))
+    name = f"{request.method} {path}"
+    body = request.body
+    if isinstance(body, str):
+        body = body.encode()
+    if isinstance(body, bytes):
+        match = _XMLRPC_METHOD.search(body, 0, 512)
+        if match:
+            name += " " + match.group(1).decode(errors="replace")
+    return name
+
+
+class BrokerHTTPAdapter(HTTPAdapter):
+    """The HTTPAdapter mounted on the sessions of a broker's clients. It sends
+    each request with the configured timeout, if there is one, capped at the
+    time left before the current deadline (see bugjira.deadline), drops
+    requests that have been cancelled, fails requests at once while the
+    broker's CircuitBreaker is open, and sends each request in a slot of the
+    broker's Dispatcher, or of its AdaptiveLimiter, to which it reports the
+    response's status and latency and the request's operation (see
+    operation_name).
+    """
+
+    def __init__(self, limiter=None, circuit=None, timeout=None, **kwargs):
+        """Init method
+
+        :param limiter: The limiter or dispatcher shared by all of a broker's
+            sessions, defaults to None
+        :type limiter: bugjira.concurrency.AdaptiveLimiter or
+            bugjira.scheduling.Dispatcher, optional
+        :param circuit: The circuit breaker shared by all of a broker's
+            sessions, defaults to None
+        :type circuit: bugjira.circuit.CircuitBreaker, optional
+        :param timeout: The timeout to send every request with, in place of
+            the one the client sends it with (see get_timeout), defaults to
+            None, which keeps the client's
+        :type timeout: tuple, optional
+        """
+        self.limiter = limiter
+        self.circuit = circuit
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        deadline.check_cancelled()
+        if self.timeout is not None:
+            timeout = self.timeout
+        timeout = deadline.request_timeout(timeout)
+        if self.circuit is None:
+            return self._send_limited(request, timeout, **kwargs)
+        with self.circuit.guard() as outcome:
+            try:
+                response = self._send_limited(request, timeout, **kwargs)
+            except requests.RequestException:
+                # Requests that were cancelled, or cut short by the caller's
+                # deadline, say nothing about the server's health
+                if deadline.is_cancelled() or deadline.expired():
+                    outcome["count"] = False
+                raise
+            outcome["status"] = response.status_code
+        return response
+
+    def _send_limited(self, request, timeout, **kwargs):
+        if self.limiter is None:
+            return self._send(request, timeout, **kwargs)
+        with self.limiter.slot(operation=operation_name(request)) as outcome:
+            try:
+                response = self._send(request, timeout, **kwargs)
+            except requests.RequestException:
+                # Requests that were cancelled, or cut short by the caller's
+                # deadline, say nothing about the server's load
+                if deadline.is_cancelled() or deadline.expired():
+                    outcome["adapt"] = False
+                raise
+            outcome["status"] = response.status_code
+        return response
+
+    def _send(self, request, timeout, **kwargs):
+        deadline.check_cancelled()
+        response = super().send(
+            request, timeout=deadline.request_timeout(timeout), **kwargs)
+        if deadline.is_cancelled():
+            # Nobody is waiting for the response; free its connection
+            response.close()
+            deadline.check_cancelled()
+        return response
+
+
+def configure_session(session, transport, limiter=None,
+                      circuit=None) -> None:
+    """Apply transport settings to a requests session: mount HTTP adapters
+    with the configured pool sizes and timeouts, set the Accept-Encoding
+    header and set the proxy.
+
+    :param session: The session to configure
+    :type session: requests.Session
+    :param transport: The transport settings
+    :type transport: bugjira.config.TransportConfig
+    :param limiter: A limiter or dispatcher to send every request through
+        (see BrokerHTTPAdapter), defaults to None
+    :type limiter: bugjira.concurrency.AdaptiveLimiter or
+        bugjira.scheduling.Dispatcher, optional
+    :param circuit: A circuit breaker to send every request through (see
+        BrokerHTTPAdapter), defaults to None
+    :type circuit: bugjira.circuit.CircuitBreaker, optional
+    """
+    for scheme in SCHEMES:
+        pool_settings = {"pool_connections": transport.pool_connections,
+                         "pool_maxsize": transport.pool_maxsize,
+                         "pool_block": transport.pool_block}
+        session.mount(scheme, BrokerHTTPAdapter(
+            limiter, circuit, get_timeout(transport), **pool_settings))
+    session.headers["Accept-Encoding"] = \
+        "gzip, deflate" if transport.gzip else "identity"
+    if transport.proxy:
+        session.proxies.update({"http": transport.proxy,
+                                "https": transport.proxy})
+
+
+def _iter_pools(session):
+    """Yield the urllib3 connection pools of a session's HTTP adapters"""
+    adapters = getattr(session, "adapters", None)
+    if not isinstance(adapters, dict):
+        return
+    for adapter in set(adapters.values()):
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        managers = [adapter.poolmanager, *adapter.proxy_manager.values()]
+        for manager in managers:
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    yield pool
+
+
+def get_pool_stats(sessions, backend, instance=None) -> [PoolStats]:
+    """Return the connection pool statistics of a broker's sessions, one
+    PoolStats per host
+
+    :param sessions: The sessions of the broker's clients
+    :type sessions: [requests.Session]
+    :param backend: Either bugjira.common.BUGZILLA or bugjira.common.JIRA
+    :type backend: str
+    :param instance: The name of the broker's instance, defaults to None
+    :type instance: str, optional
+    :return: The statistics, sorted by host
+    :rtype: [PoolStats]
+    """
+    stats = {}
+    for session in sessions:
+        for pool in _iter_pools(session):
+            host = pool.host if pool.port is None else \
+                f"{pool.host}:{pool.port}"
+            entry = stats.setdefault(host, PoolStats(
+                backend=backend, instance=instance, host=host))
+            entry.clients += 1
+            entry.connections += pool.num_connections
+            entry.requests += pool.num_requests
+            if pool.pool is not None:
+                entry.maxsize += pool.pool.maxsize
+                entry.idle += sum(1 for connection in list(pool.pool.queue)
+                                  if connection is not None)
+    return [stats[host] for host in sorted(stats)]
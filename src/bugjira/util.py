@@ -1,4 +1,9 @@
 import re
+from datetime import date, datetime, timezone
+from urllib.parse import parse_qs, urlparse
+from xmlrpc.client import DateTime
+
+from bugjira.keys import BUGZILLA_KEY_PATTERN, JIRA_KEY_PATTERN
 
 
 def is_bugzilla_key(key):
@@ -12,10 +17,7 @@ def is_bugzilla_key(key):
     """
     if not isinstance(key, str):
         raise ValueError(f"Key must be a str: {key}")
-    bz = re.compile("^[0-9]+$")
-    if bz.match(key):
-        return True
-    return False
+    return BUGZILLA_KEY_PATTERN.fullmatch(key) is not None
 
 
 def is_jira_key(key):
@@ -29,7 +31,118 @@ def is_jira_key(key):
     """
     if not isinstance(key, str):
         raise ValueError(f"Key must be a str: {key}")
-    jira = re.compile("[a-zA-Z]+[-_][0-9]+")
-    if jira.match(key):
-        return True
-    return False
+    return JIRA_KEY_PATTERN.fullmatch(key) is not None
+
+
+def bugzilla_key_from_url(url):
+    """returns the bugzilla bug ID referenced by a bugzilla show_bug URL, or
+    None if the URL does not reference a bug by its numeric ID
+
+    :param url: The URL to parse
+    :type url: str
+    :return: The bug ID, or None
+    :rtype: str
+    """
+    parsed = urlparse(url)
+    if not parsed.path.endswith("show_bug.cgi"):
+        return None
+    for key in parse_qs(parsed.query).get("id", []):
+        if is_bugzilla_key(key):
+            return key
+    return None
+
+
+# A trailing "Z" or "+HHMM" UTC offset, which datetime.fromisoformat only
+# accepts from python 3.11 on
+_UTC_OFFSET_PATTERN = re.compile(r"(Z|[+-]\d{2}:?\d{2})$")
+
+# The attributes used to reduce a JIRA entity (a user, status, option, issue,
+# etc.) to a single value, in order of preference
+_JIRA_ENTITY_KEYS = ("name", "value", "key", "accountId", "displayName", "id")
+
+
+def normalize_value(value):
+    """returns a JSON-serializable representation of a field value read from
+    a bugzilla bug or a JIRA issue. Dates are converted to ISO 8601 strings,
+    and JIRA entities such as users, statuses and options are reduced to
+    their name, value or key.
+
+    :param value: The field value to normalize
+    :type value: object
+    :return: The normalized value
+    :rtype: object
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, DateTime):
+        value = datetime.strptime(value.value, "%Y%m%dT%H:%M:%S")
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple, set)):
+        return [normalize_value(item) for item in value]
+    raw = getattr(value, "raw", None)
+    if isinstance(raw, dict):
+        value = raw
+    if isinstance(value, dict):
+        # JIRA entities always carry a "self" link to their REST resource
+        if "self" in value:
+            for key in _JIRA_ENTITY_KEYS:
+                if value.get(key) is not None:
+                    return normalize_value(value[key])
+        return {key: normalize_value(item) for key, item in value.items()}
+    return str(value)
+
+
+def jira_update_value(value):
+    """returns a field value read from a JIRA issue in the form the JIRA
+    REST API takes when the field is edited. JIRA entities such as users,
+    options and components are reduced to a reference by the attribute that
+    normalize_value reduces them to, e.g. {"name": "alice"}, and other
+    values are normalized.
+
+    :param value: The field value
+    :type value: object
+    :return: The value to send in an edit
+    :rtype: object
+    """
+    if isinstance(value, (list, tuple, set)):
+        return [jira_update_value(item) for item in value]
+    raw = getattr(value, "raw", None)
+    if isinstance(raw, dict):
+        value = raw
+    if isinstance(value, dict) and "self" in value:
+        for key in _JIRA_ENTITY_KEYS:
+            if value.get(key) is not None:
+                return {key: normalize_value(value[key])}
+    return normalize_value(value)
+
+
+def parse_datetime(value):
+    """returns a timezone-aware UTC datetime for a timestamp read from a
+    bugzilla bug or a JIRA issue, or None if the value is empty. Naive
+    timestamps (which bugzilla's XMLRPC API returns) are taken to be UTC.
+
+    :param value: An xmlrpc DateTime, a datetime, or an ISO 8601 string
+    :type value: object
+    :raises ValueError: If a string is not an ISO 8601 timestamp
+    :return: The timestamp in UTC, or None
+    :rtype: datetime.datetime
+    """
+    if not value:
+        return None
+    if isinstance(value, DateTime):
+        value = datetime.strptime(value.value, "%Y%m%dT%H:%M:%S")
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(
+            _UTC_OFFSET_PATTERN.sub(_iso_offset, value.strip()))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _iso_offset(match) -> str:
+    """Return a UTC offset matched by _UTC_OFFSET_PATTERN as +HH:MM"""
+    offset = match.group(1)
+    if offset == "Z":
+        return "+00:00"
+    return f"{offset[:3]}:{offset[-2:]}"
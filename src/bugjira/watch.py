@@ -0,0 +1,414 @@
+"""Change subscriptions (see Bugjira.watch). All the keys watched through
+one Bugjira object are polled by a single background thread, with one
+batched "updated since the last poll" query per instance per interval, so
+the cost of a poll grows with the number of changed issues rather than with
+the number of watchers or keys. Subscribers are called with field-level
+diffs, and only when a watched field has actually changed.
+"""
+
+import contextvars
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from pydantic import BaseModel, ConfigDict
+
+from bugjira.diff import Differ, FieldChange
+from bugjira.issue import Issue
+from bugjira.scheduling import ContextThreadPoolExecutor
+from bugjira.session import register_lock_owner
+
+
+class IssueChange(BaseModel):
+    """A change to a watched issue, as passed to watch callbacks"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # The key as it was given to watch
+    key: str
+    # The issue as it is now
+    issue: Issue
+    # The changed fields, by configured field name
+    changes: Dict[str, FieldChange]
+
+
+class Subscription:
+    """A set of watched keys and the callback to call when they change, as
+    returned by Bugjira.watch. Keys can be added and removed while the watch
+    is running.
+    """
+
+    def __init__(self, watcher, callback, interval, fields=None,
+                 on_error=None):
+        """Init method
+
+        :param watcher: The watcher that polls the keys
+        :type watcher: Watcher
+        :param callback: Called with an IssueChange for each change
+        :type callback: Callable
+        :param interval: The seconds between polls
+        :type interval: float
+        :param fields: The configured names of the fields to watch, defaults
+            to None, which watches every configured field
+        :type fields: [str], optional
+        :param on_error: Called with the exception when a poll or the
+            callback fails, defaults to None, which ignores errors
+        :type on_error: Callable, optional
+        """
+        self.callback = callback
+        self.interval = interval
+        self.fields = fields
+        self.on_error = on_error
+        self.keys = frozenset()
+        self._watcher = watcher
+
+    def add(self, keys) -> None:
+        """Watch more keys. Their current state is fetched at once, and
+        later changes are reported.
+
+        :param keys: The keys
+        :type keys: [str]
+        """
+        self._watcher._add(self, keys)
+
+    def remove(self, keys) -> None:
+        """Stop watching some keys
+
+        :param keys: The keys
+        :type keys: [str]
+        """
+        self._watcher._remove(self, keys)
+
+    def cancel(self) -> None:
+        """Stop watching all of the subscription's keys"""
+        self._watcher._cancel(self)
+
+    def _dispatch(self, change) -> None:
+        if self.fields is not None:
+            changes = {name: value for name, value in change.changes.items()
+                       if name in self.fields}
+            if not changes:
+                return
+            change = IssueChange(key=change.key, issue=change.issue,
+                                 changes=changes)
+        try:
+            self.callback(change)
+        except Exception as e:
+            self._report(e)
+
+    def _report(self, error) -> None:
+        if self.on_error is not None:
+            try:
+                self.on_error(error)
+            except Exception:
+                # There is nowhere left to report it
+                pass
+
+
+class Watcher:
+    """Polls the keys of every subscription of a Bugjira object. The first
+    time a key is polled, its issue is looked up to record the state that
+    later changes are compared with. After that, each instance's keys are
+    checked with a single updated-since query (see Broker.get_updated).
+    """
+
+    # Seconds subtracted from the time of the last poll when asking what has
+    # changed since, to allow for clock skew between us and the servers.
+    # Issues that are reported twice are compared with the recorded state,
+    # so nothing is reported twice.
+    overlap = 60
+
+    def __init__(self, bugjira):
+        """Init method
+
+        :param bugjira: The Bugjira object whose keys are watched
+        :type bugjira: bugjira.bugjira.Bugjira
+        """
+        self._bugjira = bugjira
+        self._subscriptions = []
+        # The projected fields of each key, as last seen
+        self._snapshots = {}
+        # A Differ for each broker, made when its keys are first recorded
+        self._differs = {}
+        # The keys whose state has not been recorded yet
+        self._pending = set()
+        # The time of the last successful poll of each broker
+        self._since = {}
+        # Set when a pushed event asks for a poll before the next interval
+        self._urgent = False
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        register_lock_owner(self)
+
+    def subscribe(self, keys, callback, interval, fields=None,
+                  on_error=None) -> Subscription:
+        """Start watching keys, starting the polling thread if it is not
+        running. The arguments are those of Subscription.
+
+        :raises ValueError: If a key is not valid, or a field name is not
+            configured for a key's backend
+        :return: The subscription
+        :rtype: Subscription
+        """
+        subscription = Subscription(self, callback, interval, fields,
+                                    on_error)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        try:
+            subscription.add(keys)
+        except Exception:
+            subscription.cancel()
+            raise
+        return subscription
+
+    def poll(self) -> int:
+        """Poll every watched key once, calling the subscribers of the keys
+        that have changed. This is what the polling thread does every
+        interval.
+
+        :return: The number of changed issues
+        :rtype: int
+        """
+        return self._poll(updates=True)
+
+    def notify(self, broker, key, issue=None) -> None:
+        """Handle a change to an issue pushed by its backend (see
+        bugjira.webhooks). If the event carried the issue, it is compared
+        with the recorded state at once; otherwise the polling thread is
+        woken to poll without waiting for the next interval.
+
+        :param broker: The broker of the issue's instance
+        :type broker: bugjira.broker.Broker
+        :param key: The issue's key on its instance
+        :type key: str
+        :param issue: The issue as it is now, defaults to None
+        :type issue: bugjira.issue.Issue, optional
+        """
+        with self._lock:
+            watched = set(self._snapshots)
+        keys = [watched_key for watched_key in watched
+                if self._bugjira._router.route(watched_key) == (broker, key)]
+        if not keys:
+            return
+        if issue is not None:
+            for watched_key in keys:
+                self._compare(broker, watched_key, issue)
+            return
+        with self._lock:
+            self._urgent = True
+        self._wake.set()
+
+    def _poll(self, updates) -> int:
+        """Record the state of new keys and, if updates is True, check the
+        other keys for changes
+        """
+        with self._lock:
+            watched = set().union(*(subscription.keys for subscription
+                                    in self._subscriptions))
+            for key in set(self._snapshots) - watched:
+                del self._snapshots[key]
+            self._pending &= watched
+            pending = set(self._pending)
+        groups = {}
+        for key in watched:
+            if key in pending or updates:
+                broker, backend_key = self._bugjira._router.route(key)
+                groups.setdefault(broker, {})[backend_key] = key
+        if not groups:
+            return 0
+        with ContextThreadPoolExecutor(max_workers=len(groups)) as executor:
+            polls = [executor.submit(self._poll_broker, broker, keys,
+                                     pending, updates)
+                     for broker, keys in groups.items()]
+            return sum(poll.result() for poll in polls)
+
+    def _poll_broker(self, broker, keys, pending, updates) -> int:
+        """Poll the keys of one broker
+
+        :param broker: The broker
+        :type broker: bugjira.broker.Broker
+        :param keys: A dict mapping the broker's keys to the watched keys
+        :type keys: dict
+        :param pending: The watched keys whose state has not been recorded
+        :type pending: set
+        :param updates: Whether to check the other keys for changes
+        :type updates: bool
+        :return: The number of changed issues
+        :rtype: int
+        """
+        new = [backend_key for backend_key, key in keys.items()
+               if key in pending]
+        if new:
+            if self._since.get(broker) is None:
+                # Changes made after the new keys are recorded must be found
+                # by the next updates poll, even if it is not this one
+                self._since[broker] = datetime.now(timezone.utc)
+            self._record(broker, keys, new)
+        since = self._since.get(broker)
+        known = [backend_key for backend_key, key in keys.items()
+                 if key not in pending]
+        if not updates or not known:
+            if updates and since is None:
+                self._since[broker] = datetime.now(timezone.utc)
+            return 0
+        started = datetime.now(timezone.utc)
+        if since is None:
+            since = started
+        try:
+            issues = broker.dispatch(
+                broker.get_updated, known,
+                since - timedelta(seconds=self.overlap))
+        except Exception as e:
+            self._report(keys.values(), e)
+            return 0
+        self._since[broker] = started
+        changed = 0
+        for issue in issues:
+            key = keys.get(issue.key)
+            if key is not None and self._compare(broker, key, issue):
+                changed += 1
+        return changed
+
+    def _record(self, broker, keys, backend_keys) -> None:
+        """Look up new keys and record their state, without reporting it"""
+        for result in broker.dispatch(broker.get_issues, backend_keys):
+            key = keys[result.key]
+            if not result.ok:
+                self._report([key], result.error)
+                continue
+            try:
+                row = self._differ(broker).snapshot(result.issue)
+            except Exception as e:
+                self._report([key], e)
+                continue
+            with self._lock:
+                self._snapshots[key] = row
+                self._pending.discard(key)
+
+    def _compare(self, broker, key, issue) -> bool:
+        """Compare an issue with its recorded state, and report the fields
+        that have changed
+
+        :return: True if a field has changed
+        :rtype: bool
+        """
+        try:
+            differ = self._differ(broker)
+            row = differ.snapshot(issue)
+        except Exception as e:
+            self._report([key], e)
+            return False
+        with self._lock:
+            old = self._snapshots.get(key)
+            if old is None:
+                # No longer watched
+                return False
+            self._snapshots[key] = row
+            subscriptions = [subscription for subscription
+                             in self._subscriptions
+                             if key in subscription.keys]
+        changes = differ.diff(old, row)
+        if not changes.changed:
+            return False
+        change = IssueChange(key=key, issue=issue, changes=changes.changes)
+        for subscription in subscriptions:
+            subscription._dispatch(change)
+        return True
+
+    def _differ(self, broker) -> Differ:
+        differ = self._differs.get(broker)
+        if differ is None:
+            differ = self._differs[broker] = Differ(broker)
+        return differ
+
+    def _report(self, keys, error) -> None:
+        """Pass an error to the subscribers of any of the keys"""
+        keys = set(keys)
+        with self._lock:
+            subscriptions = [subscription for subscription
+                             in self._subscriptions
+                             if keys & subscription.keys]
+        for subscription in subscriptions:
+            subscription._report(error)
+
+    def _add(self, subscription, keys) -> None:
+        keys = set(keys)
+        for key in keys:
+            if not isinstance(key, str):
+                raise ValueError(f"key must be a string: {key}")
+            broker, _ = self._bugjira._router.route(key)
+            broker.get_fields(subscription.fields)
+        with self._lock:
+            if subscription not in self._subscriptions:
+                raise ValueError("the subscription has been cancelled")
+            subscription.keys = subscription.keys | keys
+            self._pending |= keys - set(self._snapshots)
+            self._start()
+        # Record the new keys' state now rather than after an interval
+        self._wake.set()
+
+    def _remove(self, subscription, keys) -> None:
+        with self._lock:
+            subscription.keys = subscription.keys - set(keys)
+
+    def _cancel(self, subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            subscription.keys = frozenset()
+        # Let the thread stop if nothing is watched any more
+        self._wake.set()
+
+    def _start(self) -> None:
+        """Start the polling thread if it is not running. The caller must
+        hold the lock.
+        """
+        if self._thread is not None:
+            return
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(self._run,),
+                                        name="bugjira-watch", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        finally:
+            # Let _start run a new thread if this one dies
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _loop(self) -> None:
+        """Poll until nothing is watched. A poll that fails is reported to
+        every subscriber, and polling carries on at the next interval.
+        """
+        due = time.monotonic()
+        while True:
+            self._wake.clear()
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+                interval = min(subscription.interval
+                               for subscription in self._subscriptions)
+                urgent, self._urgent = self._urgent, False
+                subscriptions = list(self._subscriptions)
+            now = time.monotonic()
+            try:
+                if now >= due or urgent:
+                    due = now + interval
+                    self._poll(updates=True)
+                else:
+                    self._poll(updates=False)
+            except Exception as e:
+                for subscription in subscriptions:
+                    subscription._report(e)
+            self._wake.wait(max(0.0, due - time.monotonic()))
+
+    def _after_fork(self) -> None:
+        # The polling thread is not copied into the child; it is started
+        # again when keys are next added
+        self._thread = None
+        self._wake = threading.Event()
@@ -0,0 +1,276 @@
+"""Change events pushed by the backends. Jira webhooks and bugzilla push
+payloads are parsed into ChangeEvents, which Bugjira.apply_event uses to
+update its issue cache and wake its watchers. WebhookReceiver is a small
+HTTP server that does both for events posted to it.
+"""
+
+import hmac
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from pydantic import BaseModel
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.config import BugzillaPushConfig
+from bugjira.diff import FieldChange
+from bugjira.util import parse_datetime
+
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# The jira webhook events that carry the whole issue
+JIRA_ISSUE_EVENTS = {
+    "jira:issue_created": CREATED,
+    "jira:issue_updated": UPDATED,
+    "jira:issue_deleted": DELETED,
+}
+
+# The largest payload the receiver accepts, in bytes
+MAX_PAYLOAD_SIZE = 10 * 1024 * 1024
+
+
+class ChangeEvent(BaseModel):
+    """A change to an issue, as pushed by its backend"""
+
+    backend: str
+    # The name of the configured instance, or None for the default instance
+    instance: Optional[str] = None
+    # The issue's key on its instance
+    key: str
+    # CREATED, UPDATED or DELETED
+    action: str = UPDATED
+    time: Optional[datetime] = None
+    # The changed fields, by the backend's field name or id
+    changes: Dict[str, FieldChange] = {}
+    # The issue's JSON, if the payload carries all of it
+    raw: Optional[dict] = None
+
+
+def parse_jira_event(payload, instance=None) -> ChangeEvent:
+    """Parse a jira webhook payload. Issue events carry the whole issue;
+    other events about an issue, e.g. comment_created, are reported as
+    updates without it.
+
+    :param payload: The decoded JSON payload
+    :type payload: dict
+    :param instance: The name of the instance that sent it, defaults to None
+    :type instance: str, optional
+    :raises ValueError: If the payload is not an event about an issue
+    :return: The event
+    :rtype: ChangeEvent
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("jira webhook payload must be a JSON object")
+    issue = payload.get("issue")
+    if not isinstance(issue, dict) or not issue.get("key"):
+        raise ValueError("jira webhook payload has no issue key: "
+                         f"{payload.get('webhookEvent')}")
+    action = JIRA_ISSUE_EVENTS.get(payload.get("webhookEvent"))
+    changes = {}
+    for item in (payload.get("changelog") or {}).get("items") or []:
+        name = item.get("fieldId") or item.get("field")
+        if name:
+            changes[name] = FieldChange(old=item.get("fromString"),
+                                        new=item.get("toString"))
+    timestamp = payload.get("timestamp")
+    return ChangeEvent(
+        backend=JIRA, instance=instance, key=issue["key"],
+        action=action or UPDATED,
+        time=None if timestamp is None else datetime.fromtimestamp(
+            timestamp / 1000, timezone.utc),
+        changes=changes,
+        raw=issue if action is not None and "fields" in issue else None)
+
+
+def parse_bugzilla_event(payload, push=None, instance=None) -> ChangeEvent:
+    """Parse a bugzilla push payload
+
+    :param payload: The decoded JSON payload
+    :type payload: dict
+    :param push: Where the parts of the event are found in the payload,
+        defaults to None, which uses bugzilla's webhook format
+    :type push: bugjira.config.BugzillaPushConfig, optional
+    :param instance: The name of the instance that sent it, defaults to None
+    :type instance: str, optional
+    :raises ValueError: If the payload has no bug id
+    :return: The event
+    :rtype: ChangeEvent
+    """
+    push = push or BugzillaPushConfig()
+    if not isinstance(payload, dict):
+        raise ValueError("bugzilla push payload must be a JSON object")
+    key = _find(payload, push.key)
+    if key in (None, ""):
+        raise ValueError(f"bugzilla push payload has no {push.key}")
+    action = _find(payload, push.action)
+    if action in push.created:
+        action = CREATED
+    elif action in push.deleted:
+        action = DELETED
+    else:
+        action = UPDATED
+    changes = {}
+    for change in _find(payload, push.changes) or []:
+        if isinstance(change, dict) and change.get(push.field):
+            changes[change[push.field]] = FieldChange(
+                old=change.get(push.old), new=change.get(push.new))
+    try:
+        time = parse_datetime(_find(payload, push.time))
+    except (TypeError, ValueError):
+        time = None
+    return ChangeEvent(backend=BUGZILLA, instance=instance, key=str(key),
+                       action=action, time=time, changes=changes)
+
+
+def _find(payload, path):
+    """Return the value at a dotted path in a payload, or None"""
+    value = payload
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class WebhookReceiver:
+    """An HTTP server that applies the events posted to it to a Bugjira
+    object (see Bugjira.apply_event). Jira webhooks are posted to /jira and
+    bugzilla pushes to /bugzilla, or to /jira/<instance> and
+    /bugzilla/<instance> for named instances. The server runs in background
+    threads between start() and stop(), or within a with block.
+    """
+
+    def __init__(self, bugjira, host="127.0.0.1", port=0, token=None,
+                 push=None):
+        """Init method
+
+        :param bugjira: The Bugjira object to apply events to
+        :type bugjira: bugjira.bugjira.Bugjira
+        :param host: The address to listen on, defaults to "127.0.0.1"
+        :type host: str, optional
+        :param port: The port to listen on, defaults to 0, which picks a
+            free port
+        :type port: int, optional
+        :param token: A secret that requests must carry in a "token" query
+            parameter, defaults to None, which accepts any request
+        :type token: str, optional
+        :param push: The format of bugzilla's payloads, defaults to None,
+            which uses bugzilla's webhook format
+        :type push: bugjira.config.BugzillaPushConfig, optional
+        """
+        self.bugjira = bugjira
+        self.host = host
+        self.port = port
+        self.token = token
+        self.push = push or BugzillaPushConfig()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the running server"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "WebhookReceiver":
+        """Start serving in a background thread
+
+        :return: The receiver
+        :rtype: WebhookReceiver
+        """
+        if self._server is not None:
+            return self
+        self._server = ThreadingHTTPServer((self.host, self.port),
+                                           _WebhookHandler)
+        self._server.daemon_threads = True
+        self._server.receiver = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="bugjira-webhooks", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, path, body) -> int:
+        """Apply the event in a posted body
+
+        :param path: The request path, including its query string
+        :type path: str
+        :param body: The request body
+        :type body: bytes
+        :return: The HTTP status to respond with: 204 if the event was
+            applied, 400 if it could not be parsed, 403 if the token is
+            wrong, 404 if the path is not a backend or instance, and 500 if
+            the event could not be applied
+        :rtype: int
+        """
+        url = urlsplit(path)
+        if self.token is not None:
+            token = parse_qs(url.query).get("token", [""])[0]
+            if not hmac.compare_digest(token.encode(), self.token.encode()):
+                return 403
+        parts = [part for part in url.path.split("/") if part]
+        if not 1 <= len(parts) <= 2 or parts[0] not in (BUGZILLA, JIRA):
+            return 404
+        backend, instance = parts[0], (parts[1:] or [None])[0]
+        try:
+            self.bugjira._get_backend_broker(backend, instance)
+        except ValueError:
+            return 404
+        try:
+            payload = json.loads(body)
+            if backend == JIRA:
+                event = parse_jira_event(payload, instance)
+            else:
+                event = parse_bugzilla_event(payload, self.push, instance)
+        except ValueError:
+            return 400
+        try:
+            self.bugjira.apply_event(event)
+        except Exception:
+            return 500
+        return 204
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(400)
+            return
+        if length > MAX_PAYLOAD_SIZE:
+            self.send_error(413)
+            return
+        status = self.server.receiver.handle(self.path,
+                                             self.rfile.read(length))
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Do not write a line to stderr for every event
+        pass
@@ -1,6 +1,11 @@
 import os
+from copy import deepcopy
+
 import pytest
+
+from bugjira import field_generator
 from bugjira.config import Config
+from bugjira.field_data_generator import FieldDataGeneratorFactory
 
 
 @pytest.fixture
@@ -24,6 +29,47 @@ def good_sample_fields_file_path(config_defaults):
     return config_defaults + "/data/sample_fields/sample_fields.json"
 
 
+@pytest.fixture
+def field_config_dict(good_config_dict, good_sample_fields_file_path,
+                      monkeypatch):
+    """A valid config dict whose field_data_path points at the sample fields
+    file. The module-level field generator factories cache their generators,
+    so they are replaced with fresh instances for the duration of the test.
+    """
+    monkeypatch.setattr(field_generator, "factory",
+                        field_generator.FieldGeneratorFactory())
+    monkeypatch.setattr(field_generator, "field_data_generator_factory",
+                        FieldDataGeneratorFactory())
+    config = deepcopy(good_config_dict)
+    config["field_data_path"] = good_sample_fields_file_path
+    return config
+
+
+@pytest.fixture
+def multi_instance_config_dict(good_config_dict):
+    """A valid config dict with a named partner instance of each backend"""
+    config = deepcopy(good_config_dict)
+    config["instances"] = {
+        "bugzilla": {
+            "partnerbz": {
+                "URL": "https://bugzilla.partner.example.com",
+                "api_key": "partner_api_key",
+                "field_data_plugin_name": "default_bugzilla_field_data_plugin",
+                "hints": ["pbz"],
+            }
+        },
+        "jira": {
+            "partner": {
+                "URL": "https://jira.partner.example.com",
+                "token_auth": "partner_token",
+                "field_data_plugin_name": "default_jira_field_data_plugin",
+                "projects": ["PART"],
+            }
+        },
+    }
+    return config
+
+
 @pytest.fixture
 def good_bz_keys():
     return ["123456", "1"]
@@ -41,4 +87,4 @@ def good_jira_keys():
 
 @pytest.fixture
 def bad_jira_keys():
-    return ["23456", "1a", "PCTOOLING123", "123-abc"]
+    return ["23456", "1a", "PCTOOLING123", "123-abc", "ABC-1xyz"]
@@ -1,3 +1,5 @@
+import threading
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, create_autospec
 
 import pytest
@@ -12,6 +14,7 @@ from bugjira.broker import (
     BugzillaBroker,
     JiraBroker,
 )
+from bugjira.links import IssueLink
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -104,3 +107,132 @@ def test_jira_broker_init_with_valid_config(good_config_dict):
     # We won't check the type here because backend is a Mock created via
     # create_autospec, but we'll just make sure the method name is an attribute
     assert jb.backend.issue
+
+
+@pytest.mark.parametrize("broker_class", [BugzillaBroker, JiraBroker])
+def test_broker_backend_per_thread(monkeypatch, good_config_dict,
+                                   broker_class):
+    """
+    GIVEN a broker created from a config
+    WHEN its backend is used from another thread
+    THEN that thread gets its own client, while the creating thread keeps the
+        client created in the constructor
+    """
+    for name in "Bugzilla", "JIRA":
+        monkeypatch.setattr(broker, name,
+                            Mock(side_effect=lambda *args, **kwargs: Mock(_session=None)))
+    shared = broker_class(config=good_config_dict)
+    client = shared.backend
+    other = []
+    thread = threading.Thread(target=lambda: other.append(shared.backend))
+    thread.start()
+    thread.join()
+    assert other[0] is not client
+    assert shared.backend is client
+
+
+def test_broker_backend_assigned():
+    """
+    GIVEN a broker created with a backend
+    WHEN its backend is used from another thread, or replaced
+    THEN every thread uses the same backend
+    """
+    broker = Broker(backend=Mock())
+    other = []
+    thread = threading.Thread(target=lambda: other.append(broker.backend))
+    thread.start()
+    thread.join()
+    assert other[0] is broker.backend
+    backend = Mock()
+    broker.backend = backend
+    assert broker.backend is backend
+
+
+def test_bugzilla_broker_transport(monkeypatch, good_config_dict):
+    """
+    GIVEN a bugzilla config with transport settings
+    WHEN we create a BugzillaBroker
+    THEN its client is given a session configured with them, and the
+        configured timeout
+    """
+    config = dict(good_config_dict)
+    config["bugzilla"] = dict(config["bugzilla"], transport={
+        "pool_maxsize": 20, "connect_timeout": 5, "read_timeout": 60})
+    monkeypatch.setattr(broker, "Bugzilla", Mock())
+    bzb = BugzillaBroker(config=config)
+    kwargs = broker.Bugzilla.call_args.kwargs
+    session = kwargs["requests_session"]
+    assert session.get_adapter("https://bz.example.com")._pool_maxsize == 20
+    assert session.get_adapter("https://bz.example.com").timeout == (5, 60)
+    bzb.backend.get_requests_session.return_value = session
+    assert bzb.pool_stats() == []
+
+
+def test_jira_broker_transport(good_config_dict):
+    """
+    GIVEN a jira config with transport settings
+    WHEN we create a JiraBroker
+    THEN its client is created with the configured timeout and proxy
+    """
+    config = dict(good_config_dict)
+    config["jira"] = dict(config["jira"], transport={
+        "read_timeout": 60, "proxy": "http://proxy.example.com:3128"})
+    JiraBroker(config=config)
+    kwargs = broker.JIRA.call_args.kwargs
+    assert kwargs["timeout"] == (None, 60)
+    assert kwargs["proxies"] == {"http": "http://proxy.example.com:3128",
+                                 "https": "http://proxy.example.com:3128"}
+
+
+def test_bugzilla_get_updated():
+    """
+    GIVEN a bugzilla broker
+    WHEN we ask which of some bugs have changed since a time
+    THEN one query per chunk asks for the bugs by id and last change time
+    """
+    backend = Mock()
+    backend.query.return_value = [Mock(id=2)]
+    bugzilla_broker = BugzillaBroker(backend=backend)
+    bugzilla_broker.bulk_lookup_size = 2
+    issues = bugzilla_broker.get_updated(
+        ["1", "2", "3"], datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc))
+    assert [issue.key for issue in issues] == ["2", "2"]
+    assert [call.args[0] for call in backend.query.call_args_list] == [
+        {"id": ["1", "2"], "last_change_time": "2024-05-01T12:30:00Z"},
+        {"id": ["3"], "last_change_time": "2024-05-01T12:30:00Z"}]
+
+
+def test_jira_get_updated():
+    """
+    GIVEN a jira broker
+    WHEN we ask which of some issues have been updated since a time
+    THEN one JQL search asks for the issues updated in the last minutes
+    """
+    backend = Mock()
+    backend.search_issues.return_value = [Mock(key="FOO-2")]
+    jira_broker = JiraBroker(backend=backend)
+    since = datetime.now(timezone.utc) - timedelta(seconds=150)
+    issues = jira_broker.get_updated(["FOO-1", "FOO-2"], since)
+    assert [issue.key for issue in issues] == ["FOO-2"]
+    backend.search_issues.assert_called_once_with(
+        'key in (FOO-1,FOO-2) AND updated >= "-3m"', maxResults=2,
+        validate_query=False)
+
+
+def test_jira_add_links():
+    """
+    GIVEN a jira broker whose backend fails to create one of two links
+    WHEN we add the links
+    THEN a LinkResult is returned for each link, in order
+    AND only the failed link's result has an error
+    """
+    backend = Mock()
+    backend.create_issue_link.side_effect = [None, Exception("no such type")]
+    links = [IssueLink(source="FOO-1", target="FOO-2", link_type="Blocks"),
+             IssueLink(source="FOO-3", target="FOO-4", link_type="Nope")]
+    jira_broker = JiraBroker(backend=backend)
+    jira_broker.max_workers = 1
+    results = jira_broker.add_links(links)
+    assert [result.link for result in results] == links
+    assert [result.ok for result in results] == [True, False]
+    assert "no such type" in str(results[1].error)
@@ -1,18 +1,33 @@
+import hashlib
+import json
+import os
+import threading
+import time
 from copy import deepcopy
+from datetime import datetime, timezone
 from unittest.mock import Mock, create_autospec
-from xmlrpc.client import Fault
+from xmlrpc.client import DateTime, Fault
 
 import pytest
+import requests
 from bugzilla import Bugzilla
 from jira import JIRA
 from jira.exceptions import JIRAError
 
 import bugjira.broker as broker
+from bugjira.attachment import Attachment
+from bugjira.circuit import CLOSED, OPEN
+from bugjira.common import BUGZILLA, JIRA as JIRA_TYPE
 from bugjira.exceptions import (
-    BrokerLookupException, BrokerAddCommentException
+    BrokerLookupException, BrokerAddCommentException, BrokerCreateException,
+    BrokerUpdateException, BrokerAttachmentException, BrokerTimeoutException,
+    BrokerCircuitOpenException
 )
 from bugjira.bugjira import Bugjira
+from bugjira.field import BugzillaField
+from bugjira.field_data_generator import FieldDataGeneratorFactory
 from bugjira.issue import Issue, BugzillaIssue, JiraIssue
+from bugjira.scheduling import BULK, INTERACTIVE, NORMAL, get_priority
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -47,6 +62,26 @@ def test_init_with_config_dict(good_config_dict):
     assert bugjira.jira
 
 
+def test_assign_clients(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance created from a config
+    WHEN we assign clients to its bugzilla and jira attributes
+    THEN the lookups of every thread use the assigned clients
+    """
+    bugzilla = create_autospec(Bugzilla, instance=True)
+    jira = create_autospec(JIRA, instance=True)
+    sandboxed_bugjira.bugzilla = bugzilla
+    sandboxed_bugjira.jira = jira
+    assert sandboxed_bugjira.bugzilla is bugzilla
+    assert sandboxed_bugjira.jira is jira
+    thread = threading.Thread(target=lambda: (
+        sandboxed_bugjira.get_issue("1"), sandboxed_bugjira.get_issue("FOO-1")))
+    thread.start()
+    thread.join()
+    bugzilla.getbug.assert_called_once()
+    jira.issue.assert_called_once()
+
+
 def test_init_with_config_path(good_config_file_path, good_config_dict):
     """
     GIVEN the Bugjira class' constructor
@@ -328,3 +363,1039 @@ def test_get_issue_bad_jira_issue(sandboxed_bugjira):
     sandboxed_bugjira.jira.issue.side_effect = JIRAError
     with pytest.raises(BrokerLookupException):
         sandboxed_bugjira.get_issue("FOO-666")
+
+
+@pytest.fixture(scope="function")
+def field_bugjira(field_config_dict):
+    return Bugjira(config_dict=field_config_dict)
+
+
+def test_update_issues_bugzilla_single_request(field_bugjira):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we call update_issues with several BugzillaIssues
+    THEN the bugzilla backend's update_bugs method is invoked once with all
+        of the bug ids
+    AND a successful result is returned for each issue in input order
+    """
+    field_bugjira.bugzilla.build_update.return_value = {}
+    issues = [BugzillaIssue(key="1"), BugzillaIssue(key="2")]
+    results = field_bugjira.update_issues(issues, {"status": "ASSIGNED"})
+    assert field_bugjira.bugzilla.update_bugs.call_count == 1
+    ids, update = field_bugjira.bugzilla.update_bugs.call_args.args
+    assert ids == ["1", "2"]
+    field_bugjira.bugzilla.build_update.assert_called_once_with(
+        status="ASSIGNED")
+    assert [result.key for result in results] == ["1", "2"]
+    assert all(result.ok for result in results)
+
+
+def test_update_issues_bugzilla_exception(field_bugjira):
+    """
+    GIVEN a Bugjira instance whose bugzilla backend's update_bugs method
+        raises an Exception
+    WHEN we call update_issues with BugzillaIssues
+    THEN each result should carry a BrokerUpdateException
+    """
+    field_bugjira.bugzilla.build_update.return_value = {}
+    field_bugjira.bugzilla.update_bugs.side_effect = Exception("boom")
+    results = field_bugjira.update_issues([BugzillaIssue(key="1")],
+                                          {"component": "foo"})
+    assert not results[0].ok
+    assert isinstance(results[0].error, BrokerUpdateException)
+
+
+def test_update_issues_mixed_backends(field_bugjira, monkeypatch):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we call update_issues with a mix of jira and bugzilla issues using a
+        field name configured for both backends
+    THEN the results are returned in input order
+    AND each jira issue is edited using its configured jira field id
+    """
+    monkeypatch.setattr(field_bugjira._bugzilla_broker, "resolve_fields",
+                        lambda fields: {"assigned_to": "me"})
+    field_bugjira.bugzilla.build_update.return_value = {}
+    jira_issue = Mock()
+    issues = [JiraIssue(key="FOO-1", jira_issue=jira_issue),
+              BugzillaIssue(key="1")]
+    results = field_bugjira.update_issues(issues, {"Assignee": "me"})
+    assert [result.key for result in results] == ["FOO-1", "1"]
+    jira_issue.update.assert_called_once_with(fields={"assignee": "me"})
+
+
+def test_update_issues_jira_status_transition(field_bugjira, monkeypatch):
+    """
+    GIVEN a Bugjira instance
+    WHEN we call update_issues with a status value for a jira issue
+    THEN the jira backend's transition_issue method is used instead of an edit
+    """
+    monkeypatch.setattr(field_bugjira._jira_broker, "resolve_fields",
+                        lambda fields: {"status": "Closed"})
+    jira_issue = Mock()
+    results = field_bugjira.update_issues(
+        [JiraIssue(key="FOO-1", jira_issue=jira_issue)], {"status": "Closed"})
+    assert results[0].ok
+    assert not jira_issue.update.called
+    field_bugjira.jira.transition_issue.assert_called_once_with(jira_issue,
+                                                                "Closed")
+
+
+def test_update_issues_unknown_field(field_bugjira):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we call update_issues with a field name that is not configured
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError, match="not a configured"):
+        field_bugjira.update_issues([BugzillaIssue(key="1")],
+                                    {"no such field": 1})
+
+
+def test_create_issues_jira_chunks(field_bugjira):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we call create_issues for jira with more specs than fit in one bulk
+        create request
+    THEN the jira backend's create_issues method is called once per chunk
+    AND the results are returned in input order with per-item errors
+    """
+    field_bugjira._jira_broker.bulk_create_size = 2
+
+    def create_issues(field_list, prefetch):
+        created = []
+        for fields in field_list:
+            if fields["issuetype"] == "bad":
+                created.append({"status": "Error", "error": "bad",
+                                "issue": None})
+            else:
+                created.append({"status": "Success", "error": None,
+                                "issue": Mock(key=fields["issuetype"])})
+        return created
+
+    field_bugjira.jira.create_issues.side_effect = create_issues
+    specs = [{"Issue Type": key} for key in ["FOO-1", "bad", "FOO-3"]]
+    results = field_bugjira.create_issues(specs, JIRA_TYPE)
+    assert field_bugjira.jira.create_issues.call_count == 2
+    assert [result.key for result in results] == ["FOO-1", None, "FOO-3"]
+    assert isinstance(results[1].error, BrokerCreateException)
+    assert isinstance(results[2].issue, JiraIssue)
+
+
+def test_create_issues_bugzilla(field_bugjira):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we call create_issues for bugzilla
+    THEN the bugzilla backend's createbug method is called once per spec
+    AND a failed create is reported in that spec's result
+    """
+    field_bugjira.bugzilla.build_createbug.side_effect = \
+        lambda **kwargs: dict(kwargs)
+
+    def createbug(createinfo):
+        if createinfo["component"] == "bad":
+            raise Exception("bad component")
+        return Mock(id=int(createinfo["component"]))
+
+    field_bugjira.bugzilla.createbug.side_effect = createbug
+    specs = [{"component": "10"}, {"component": "bad"}, {"component": "12"}]
+    results = field_bugjira.create_issues(specs, BUGZILLA)
+    assert field_bugjira.bugzilla.createbug.call_count == 3
+    assert [result.key for result in results] == ["10", None, "12"]
+    assert isinstance(results[1].error, BrokerCreateException)
+
+
+def test_create_issues_bad_backend(field_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we call create_issues with an unknown backend
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError, match="backend must be"):
+        field_bugjira.create_issues([{}], "github")
+
+
+def test_get_issues_bulk(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we call get_issues with a mix of bugzilla and jira keys
+    THEN each backend is queried with a single bulk request
+    AND the results are returned in input order, with an error for each key
+        that was not found
+    """
+    sandboxed_bugjira.bugzilla.getbugs.return_value = [Mock(id=1)]
+    sandboxed_bugjira.jira.search_issues.return_value = [Mock(key="FOO-1")]
+    results = sandboxed_bugjira.get_issues(["FOO-1", "1", "2", "foo-2"])
+    assert sandboxed_bugjira.bugzilla.getbugs.call_count == 1
+    assert sandboxed_bugjira.jira.search_issues.call_count == 1
+    assert [result.key for result in results] == ["FOO-1", "1", "2", "foo-2"]
+    assert [result.ok for result in results] == [True, True, False, False]
+    assert isinstance(results[2].error, BrokerLookupException)
+
+
+def test_walk_links(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance whose backends return linked bugs and issues
+    WHEN we call walk_links from a bugzilla root
+    THEN every reachable issue is yielded exactly once with its depth
+    AND each level is looked up with one request per backend
+    """
+    bugs = {
+        1: Mock(id=1, depends_on=[2], blocks=[],
+                external_bugs=[{"ext_bz_bug_id": "FOO-1"}]),
+        2: Mock(id=2, depends_on=[1], blocks=[], external_bugs=[]),
+    }
+    sandboxed_bugjira.bugzilla.getbugs.side_effect = \
+        lambda keys, permissive: [bugs[int(key)] for key in keys]
+    outward = Mock(spec=["key"], key="1")
+    jira_link = Mock(type=Mock(), outwardIssue=outward)
+    jira_link.type.name = "Blocks"
+    jira_issue = Mock(key="FOO-1")
+    jira_issue.fields.issuelinks = [jira_link]
+    sandboxed_bugjira.jira.search_issues.return_value = [jira_issue]
+    sandboxed_bugjira.jira.remote_links.return_value = []
+
+    nodes = list(sandboxed_bugjira.walk_links(["1"], depth=3))
+    assert [(node.key, node.depth) for node in nodes] == [
+        ("1", 0), ("2", 1), ("FOO-1", 1)]
+    assert sandboxed_bugjira.bugzilla.getbugs.call_count == 2
+    assert sandboxed_bugjira.jira.search_issues.call_count == 1
+    assert {link.link_type for link in nodes[0].links} == {
+        "depends_on", "external"}
+
+
+def test_walk_links_link_types_and_depth(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance whose bugzilla backend returns linked bugs
+    WHEN we call walk_links with a restricted set of link types and depth 0
+    THEN only the root is yielded and only matching links are reported
+    """
+    sandboxed_bugjira.bugzilla.getbugs.return_value = [
+        Mock(id=1, depends_on=[2], blocks=[3], external_bugs=[])]
+    nodes = list(sandboxed_bugjira.walk_links(["1"], depth=0,
+                                              link_types=["blocks"]))
+    assert len(nodes) == 1
+    assert [link.target for link in nodes[0].links] == ["3"]
+
+
+def test_walk_links_final_depth_skips_remote_links(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance whose jira backend returns a linked issue
+    WHEN we call walk_links from a jira root with depth 1
+    THEN remote links are fetched for the root but not for the issues at the
+        final depth, whose links are not followed
+    """
+    def search_issues(jql, **kwargs):
+        keys = jql[len("key in ("):-1].split(",")
+        issues = []
+        for key in keys:
+            issue = Mock(key=key)
+            issue.fields.issuelinks = []
+            if key == "FOO-1":
+                link = Mock(type=Mock(), outwardIssue=Mock(spec=["key"],
+                                                           key="FOO-2"))
+                link.type.name = "Blocks"
+                issue.fields.issuelinks = [link]
+            issues.append(issue)
+        return issues
+
+    sandboxed_bugjira.jira.search_issues.side_effect = search_issues
+    sandboxed_bugjira.jira.remote_links.return_value = []
+    nodes = list(sandboxed_bugjira.walk_links(["FOO-1"], depth=1))
+    assert [(node.key, node.depth) for node in nodes] == [
+        ("FOO-1", 0), ("FOO-2", 1)]
+    sandboxed_bugjira.jira.remote_links.assert_called_once_with("FOO-1")
+
+
+def test_walk_links_named_instance(multi_instance_config_dict):
+    """
+    GIVEN an issue on a partner jira instance that links to a bare key in a
+        project that is not routed to the partner instance, and back to
+        itself by its bare key
+    WHEN we call walk_links from it
+    THEN the linked issue is looked up on the partner instance
+    AND the issue linking back to itself is not visited again
+    """
+    bugjira = Bugjira(config_dict=multi_instance_config_dict)
+    partner = bugjira._get_backend_broker(JIRA_TYPE, "partner")
+    partner.backend = create_autospec(JIRA, instance=True)
+
+    def search_issues(jql, **kwargs):
+        issues = []
+        for key in jql[len("key in ("):-1].split(","):
+            target = "BAR-3" if key == "BAR-2" else "BAR-2"
+            link = Mock(type=Mock(), outwardIssue=Mock(spec=["key"],
+                                                       key=target))
+            link.type.name = "Blocks"
+            issue = Mock(key=key)
+            issue.fields.issuelinks = [link]
+            issues.append(issue)
+        return issues
+
+    partner.backend.search_issues.side_effect = search_issues
+    partner.backend.remote_links.return_value = []
+    nodes = list(bugjira.walk_links(["partner:BAR-2"], depth=3))
+    assert [(node.key, node.depth) for node in nodes] == [
+        ("partner:BAR-2", 0), ("partner:BAR-3", 1)]
+    assert [node.issue.instance for node in nodes] == ["partner", "partner"]
+    jqls = [call.args[0]
+            for call in partner.backend.search_issues.call_args_list]
+    assert jqls == ["key in (BAR-2)", "key in (BAR-3)"]
+    bugjira.jira.search_issues.assert_not_called()
+    assert nodes[0].links[0].target == "partner:BAR-3"
+
+
+def test_search_pages(field_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we search jira with a page size smaller than the number of results
+    THEN the backend is queried once per page using the configured field ids
+    AND every matching issue is yielded
+    """
+    pages = [[Mock(key="FOO-1"), Mock(key="FOO-2")], [Mock(key="FOO-3")]]
+    field_bugjira.jira.search_issues.side_effect = pages
+    issues = list(field_bugjira.search("project = FOO", JIRA_TYPE,
+                                       page_size=2, fields=["Assignee"]))
+    assert [issue.key for issue in issues] == ["FOO-1", "FOO-2", "FOO-3"]
+    calls = field_bugjira.jira.search_issues.call_args_list
+    assert [call.kwargs["startAt"] for call in calls] == [0, 2]
+    assert calls[0].kwargs["fields"] == "assignee"
+
+
+def test_search_bugzilla_pages(field_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we search bugzilla
+    THEN the backend's query method is called with limit and offset values
+        ordered by bug id
+    """
+    field_bugjira.bugzilla.query.side_effect = [[Mock(id=1), Mock(id=2)], []]
+    issues = list(field_bugjira.search({"product": "foo"}, BUGZILLA,
+                                       page_size=2))
+    assert [issue.key for issue in issues] == ["1", "2"]
+    queries = [call.args[0]
+               for call in field_bugjira.bugzilla.query.call_args_list]
+    assert [query["offset"] for query in queries] == [0, 2]
+    assert queries[0]["order"] == "bug_id"
+
+
+def test_project(field_bugjira):
+    """
+    GIVEN a Bugjira instance with field configuration
+    WHEN we project a JiraIssue
+    THEN the result contains the key and the normalized configured fields
+    """
+    jira_issue = Mock()
+    jira_issue.fields.issuetype = Mock(
+        raw={"self": "https://jira/rest/api/2/issuetype/1", "name": "Bug"})
+    jira_issue.fields.assignee = None
+    issue = JiraIssue(key="FOO-1", jira_issue=jira_issue)
+    assert field_bugjira.project(issue) == {
+        "key": "FOO-1", "Issue Type": "Bug", "Assignee": None}
+    assert field_bugjira.project(issue, ["Issue Type"]) == {
+        "key": "FOO-1", "Issue Type": "Bug"}
+
+
+def test_to_table(field_bugjira):
+    """
+    GIVEN a Bugjira instance whose field configuration includes data types
+    WHEN we convert a batch of issues to a table
+    THEN the columns are typed according to the field registry
+    """
+    pytest.importorskip("numpy")
+    broker = field_bugjira._bugzilla_broker
+    broker._fields = [BugzillaField(name="status", data_type="category"),
+                      BugzillaField(name="product")]
+    issues = [BugzillaIssue(key=str(n),
+                            bugzilla=Mock(status=status, product="foo"))
+              for n, status in enumerate(["NEW", "NEW", "ON_QA"])]
+    table = field_bugjira.to_table(issues)
+    assert table.columns == ["key", "status", "product"]
+    assert table.group_by("status").count() == {"NEW": 2, "ON_QA": 1}
+
+
+def test_search_stream(field_bugjira):
+    """
+    GIVEN a Bugjira instance whose jira session returns a search response
+    WHEN we search jira with stream=True and a field projection
+    THEN issues are built from the incrementally decoded response
+    AND only the requested fields are kept
+    """
+    body = json.dumps({"startAt": 0, "total": 2, "issues": [
+        {"key": "FOO-1", "fields": {"assignee": None, "extra": "x" * 100}},
+        {"key": "FOO-2", "fields": {"assignee": {"name": "me"}}},
+    ]}).encode()
+    response = Mock()
+    response.iter_content.side_effect = lambda size: [
+        body[start:start + 16] for start in range(0, len(body), 16)]
+    field_bugjira.jira._session = Mock(headers={}, proxies={})
+    field_bugjira.jira._session.get.return_value = response
+    field_bugjira.jira._options = {}
+    issues = list(field_bugjira.search("project = FOO", JIRA_TYPE,
+                                       fields=["Assignee"], stream=True))
+    assert [issue.key for issue in issues] == ["FOO-1", "FOO-2"]
+    assert issues[0].jira_issue.raw["fields"] == {"assignee": None}
+    assert field_bugjira.jira._session.get.call_count == 1
+    assert response.close.called
+
+
+def test_search_stream_capped_page_size(field_bugjira):
+    """
+    GIVEN a Bugjira instance whose jira server returns fewer issues per page
+        than were asked for
+    WHEN we search jira with stream=True
+    THEN the following pages are fetched until the total is reached
+    """
+    pages = [{"startAt": start, "maxResults": 2, "total": 3,
+              "issues": [{"key": f"FOO-{n}", "fields": {}}
+                         for n in range(start + 1, min(start + 2, 3) + 1)]}
+             for start in (0, 2)]
+
+    def get(url, params, stream):
+        body = json.dumps(pages[params["startAt"] // 2]).encode()
+        return Mock(iter_content=lambda size: [body])
+
+    field_bugjira.jira._session = Mock(headers={}, proxies={})
+    field_bugjira.jira._session.get.side_effect = get
+    field_bugjira.jira._options = {}
+    issues = list(field_bugjira.search("project = FOO", JIRA_TYPE,
+                                       page_size=50, stream=True))
+    assert [issue.key for issue in issues] == ["FOO-1", "FOO-2", "FOO-3"]
+    starts = [call.kwargs["params"]["startAt"]
+              for call in field_bugjira.jira._session.get.call_args_list]
+    assert starts == [0, 2]
+
+
+def test_search_stream_bugzilla(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we search bugzilla with stream=True
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        list(sandboxed_bugjira.search({}, BUGZILLA, stream=True))
+
+
+def attachment_response(content, status_code=200):
+    response = Mock(status_code=status_code)
+    response.iter_content.side_effect = lambda size: [
+        content[start:start + 4] for start in range(0, len(content), 4)]
+    return response
+
+
+def test_iter_attachments_bugzilla(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we list the attachments of a bugzilla bug
+    THEN only the attachments' metadata is requested
+    AND each attachment's url points at bugzilla's attachment.cgi page
+    """
+    sandboxed_bugjira.bugzilla.url = "https://bugzilla.example.com/xmlrpc.cgi"
+    sandboxed_bugjira.bugzilla.get_attachments.return_value = {"bugs": {
+        "123": [{"id": 7, "file_name": "sosreport.tar.xz", "size": 42,
+                 "content_type": "application/x-xz"}]}}
+    issue = BugzillaIssue(key="123", bugzilla=Mock())
+    attachments = list(sandboxed_bugjira.iter_attachments(issue))
+    sandboxed_bugjira.bugzilla.get_attachments.assert_called_once_with(
+        ["123"], None, exclude_fields=["data"])
+    assert attachments == [Attachment(
+        key="123", id="7", filename="sosreport.tar.xz", size=42,
+        content_type="application/x-xz",
+        url="https://bugzilla.example.com/attachment.cgi?id=7")]
+
+
+def test_iter_attachments_jira_fetches_field(sandboxed_bugjira):
+    """
+    GIVEN a JiraIssue whose attachment field was not fetched
+    WHEN we list its attachments
+    THEN the attachment field is requested from jira
+    """
+    resource = Mock(id="10", filename="log.txt", size=3,
+                    mimeType="text/plain", content="https://jira/att/10")
+    sandboxed_bugjira.jira.issue.return_value = Mock(
+        fields=Mock(attachment=[resource]))
+    issue = JiraIssue(key="FOO-1", jira_issue=Mock(fields=object()))
+    attachments = list(sandboxed_bugjira.iter_attachments(issue))
+    sandboxed_bugjira.jira.issue.assert_called_once_with(
+        "FOO-1", fields="attachment")
+    assert [(a.id, a.url) for a in attachments] == [
+        ("10", "https://jira/att/10")]
+
+
+def test_download_attachment_resume(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a partial download of a bugzilla attachment
+    WHEN we download the attachment again
+    THEN only the remaining bytes are requested with a Range header
+    AND the completed file is verified against its size and sha256 digest
+    AND the partial file is renamed to the destination
+    """
+    content = b"0123456789abcdef"
+    dest = str(tmp_path / "sosreport")
+    with open(dest + ".part", "wb") as partial:
+        partial.write(content[:6])
+    sandboxed_bugjira.bugzilla._session = Mock(headers={}, proxies={})
+    sandboxed_bugjira.bugzilla._session.get_auth_params.return_value = {}
+    session = sandboxed_bugjira.bugzilla.get_requests_session.return_value
+    session.get.return_value = attachment_response(content[6:], 206)
+    attachment = Attachment(key="123", id="7", filename="sosreport",
+                            size=len(content), url="https://bz/att",
+                            sha256=hashlib.sha256(content).hexdigest())
+    assert sandboxed_bugjira.download_attachment(attachment, dest) == dest
+    assert session.get.call_args.kwargs["headers"]["Range"] == "bytes=6-"
+    assert session.get.call_args.kwargs["stream"]
+    with open(dest, "rb") as downloaded:
+        assert downloaded.read() == content
+    assert not os.path.exists(dest + ".part")
+
+
+def test_download_attachment_range_ignored(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a partial download of a jira attachment
+    WHEN the server ignores the Range header and sends the whole attachment
+    THEN the partial file is overwritten rather than appended to
+    """
+    dest = str(tmp_path / "log.txt")
+    with open(dest + ".part", "wb") as partial:
+        partial.write(b"stale")
+    sandboxed_bugjira.jira._session = Mock(headers={}, proxies={})
+    sandboxed_bugjira.jira._session.get.return_value = attachment_response(
+        b"complete log")
+    attachment = Attachment(key="FOO-1", id="10", filename="log.txt",
+                            size=12, url="https://jira/att/10")
+    sandboxed_bugjira.download_attachment(attachment, dest)
+    with open(dest, "rb") as downloaded:
+        assert downloaded.read() == b"complete log"
+
+
+def test_download_attachment_short(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a jira attachment whose download ends early
+    WHEN we download it
+    THEN a BrokerAttachmentException is raised
+    AND the partial file is kept so the download can be resumed
+    """
+    dest = str(tmp_path / "log.txt")
+    sandboxed_bugjira.jira._session = Mock(headers={}, proxies={})
+    sandboxed_bugjira.jira._session.get.return_value = attachment_response(
+        b"short")
+    attachment = Attachment(key="FOO-1", id="10", filename="log.txt",
+                            size=12, url="https://jira/att/10")
+    with pytest.raises(BrokerAttachmentException):
+        sandboxed_bugjira.download_attachment(attachment, dest)
+    assert not os.path.exists(dest)
+    assert os.path.getsize(dest + ".part") == 5
+
+
+def test_download_attachment_bad_checksum(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a jira attachment with a sha256 digest
+    WHEN the downloaded contents do not match the digest
+    THEN a BrokerAttachmentException is raised
+    AND the partial file is removed
+    """
+    dest = str(tmp_path / "log.txt")
+    sandboxed_bugjira.jira._session = Mock(headers={}, proxies={})
+    sandboxed_bugjira.jira._session.get.return_value = attachment_response(
+        b"corrupt")
+    attachment = Attachment(key="FOO-1", id="10", filename="log.txt",
+                            url="https://jira/att/10",
+                            sha256=hashlib.sha256(b"original").hexdigest())
+    with pytest.raises(BrokerAttachmentException):
+        sandboxed_bugjira.download_attachment(attachment, dest)
+    assert not os.path.exists(dest + ".part")
+
+
+def test_download_attachments(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN several jira attachments, one of which cannot be downloaded
+    WHEN we download them in parallel
+    THEN a result is returned for each attachment in the input order
+    AND the failed download is reported in its result
+    """
+    def get(url, **kwargs):
+        if url.endswith("bad"):
+            raise JIRAError("gone")
+        return attachment_response(b"data")
+
+    sandboxed_bugjira.jira._session = Mock(headers={}, proxies={})
+    sandboxed_bugjira.jira._session.get.side_effect = get
+    attachments = [
+        Attachment(key="FOO-1", id=str(n), filename="../log.txt",
+                   url=f"https://jira/att/{url}")
+        for n, url in enumerate(["good", "bad", "good"])]
+    results = sandboxed_bugjira.download_attachments(
+        attachments, str(tmp_path / "out"))
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, BrokerAttachmentException)
+    assert results[0].path == str(tmp_path / "out" / "FOO-1-0-log.txt")
+    assert sorted(os.listdir(tmp_path / "out")) == [
+        "FOO-1-0-log.txt", "FOO-1-2-log.txt"]
+
+
+def test_upload_attachment_jira(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a file to attach to a jira issue
+    WHEN we upload it
+    THEN the backend is passed an open file rather than its contents
+    AND the new attachment is returned
+    """
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"data")
+    sandboxed_bugjira.jira.add_attachment.return_value = Mock(
+        id="11", filename="log.txt", size=4, mimeType="text/plain",
+        content="https://jira/att/11")
+    issue = JiraIssue(key="FOO-1", jira_issue=Mock())
+    attachment = sandboxed_bugjira.upload_attachment(issue, str(path))
+    args = sandboxed_bugjira.jira.add_attachment.call_args.args
+    assert args[0] == "FOO-1"
+    assert args[1].name == str(path)
+    assert args[2] == "log.txt"
+    assert attachment.id == "11"
+
+
+def test_upload_attachment_bugzilla_error(sandboxed_bugjira, tmp_path):
+    """
+    GIVEN a bugzilla backend that rejects an attachment
+    WHEN we upload it
+    THEN a BrokerAttachmentException is raised
+    """
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"data")
+    sandboxed_bugjira.bugzilla.attachfile.side_effect = Fault(1, "denied")
+    issue = BugzillaIssue(key="123", bugzilla=Mock())
+    with pytest.raises(BrokerAttachmentException):
+        sandboxed_bugjira.upload_attachment(issue, str(path))
+
+
+def test_get_comments_bugzilla_since(sandboxed_bugjira):
+    """
+    GIVEN bugzilla bugs with a since time for each bug
+    WHEN we fetch their comments
+    THEN all the bugs' comments are fetched in one request
+    AND only the comments newer than each bug's since time are returned
+    """
+    sandboxed_bugjira.bugzilla.get_comments.return_value = {"bugs": {
+        "1": {"comments": [
+            {"id": 10, "creator": "a@example.com", "text": "old",
+             "creation_time": DateTime("20230101T00:00:00")},
+            {"id": 11, "creator": "b@example.com", "text": "new",
+             "creation_time": DateTime("20230301T00:00:00")}]},
+        "2": {"comments": [
+            {"id": 20, "creator": "c@example.com", "text": "new too",
+             "creation_time": DateTime("20230201T00:00:00")}]}}}
+    issues = [BugzillaIssue(key=key, bugzilla=Mock()) for key in ("1", "2")]
+    since = {"1": datetime(2023, 2, 1), "2": datetime(2023, 1, 1)}
+    comments = list(sandboxed_bugjira.get_comments(issues, since))
+    sandboxed_bugjira.bugzilla.get_comments.assert_called_once_with(
+        ["1", "2"])
+    assert [(c.key, c.id, c.body) for c in comments] == [
+        ("1", "11", "new"), ("2", "20", "new too")]
+    assert comments[0].created == datetime(2023, 3, 1, tzinfo=timezone.utc)
+
+
+def test_get_comments_bugzilla_all(sandboxed_bugjira):
+    """
+    GIVEN bugzilla bugs and no since time
+    WHEN we fetch their comments
+    THEN the backend's get_comments method is used
+    """
+    sandboxed_bugjira.bugzilla.get_comments.return_value = {"bugs": {}}
+    issues = [BugzillaIssue(key="1", bugzilla=Mock())]
+    assert list(sandboxed_bugjira.get_comments(issues)) == []
+    sandboxed_bugjira.bugzilla.get_comments.assert_called_once_with(["1"])
+
+
+def test_get_comments_jira_since(sandboxed_bugjira, monkeypatch):
+    """
+    GIVEN a jira issue with more comments than fit on one page
+    WHEN we fetch the comments newer than a since time
+    THEN comments are paged newest first until an older one is found
+    AND the new comments are returned oldest first
+    """
+    monkeypatch.setattr(broker.JiraBroker, "page_size", 2)
+    pages = [
+        [Mock(id="4", created="2023-04-01T00:00:00.000+0000", body="d"),
+         Mock(id="3", created="2023-03-01T00:00:00.000+0000", body="c")],
+        [Mock(id="2", created="2023-02-01T00:00:00.000+0000", body="b"),
+         Mock(id="1", created="2023-01-01T00:00:00.000+0000", body="a")],
+    ]
+    sandboxed_bugjira.jira.comments.side_effect = pages
+    issue = JiraIssue(key="FOO-1", jira_issue=Mock())
+    comments = list(sandboxed_bugjira.get_comments(
+        [issue], since=datetime(2023, 1, 15, tzinfo=timezone.utc)))
+    assert [comment.id for comment in comments] == ["2", "3", "4"]
+    assert sandboxed_bugjira.jira.comments.call_count == 2
+    assert sandboxed_bugjira.jira.comments.call_args.kwargs == {
+        "start_at": 2, "max_results": 2, "order_by": "-created"}
+
+
+def test_get_comments_jira_error(sandboxed_bugjira):
+    """
+    GIVEN a jira backend that fails to return comments
+    WHEN we fetch comments
+    THEN a BrokerLookupException is raised
+    """
+    sandboxed_bugjira.jira.comments.side_effect = JIRAError("nope")
+    issue = JiraIssue(key="FOO-1", jira_issue=Mock())
+    with pytest.raises(BrokerLookupException):
+        list(sandboxed_bugjira.get_comments([issue]))
+
+
+def test_get_history_bugzilla(field_bugjira):
+    """
+    GIVEN bugzilla bugs with changes to configured and unconfigured fields
+    WHEN we fetch their history
+    THEN the history of all the bugs is fetched in one request
+    AND only changes to configured fields are returned
+    """
+    field_bugjira.bugzilla.bugs_history_raw.return_value = {"bugs": [
+        {"id": 2, "history": [
+            {"when": DateTime("20230102T00:00:00"), "who": "b@example.com",
+             "changes": [{"field_name": "status", "removed": "NEW",
+                          "added": "ASSIGNED"},
+                         {"field_name": "cc", "removed": "",
+                          "added": "c@example.com"}]}]},
+        {"id": 1, "history": [
+            {"when": DateTime("20230101T00:00:00"), "who": "a@example.com",
+             "changes": [{"field_name": "component", "removed": "foo",
+                          "added": "bar"}]}]}]}
+    issues = [BugzillaIssue(key=key, bugzilla=Mock()) for key in ("1", "2")]
+    records = list(field_bugjira.get_history(issues))
+    field_bugjira.bugzilla.bugs_history_raw.assert_called_once_with(
+        ["1", "2"])
+    assert [(r.key, r.field, r.from_value, r.to_value, r.who)
+            for r in records] == [
+        ("1", "component", "foo", "bar", "a@example.com"),
+        ("2", "status", "NEW", "ASSIGNED", "b@example.com")]
+    assert records[1].when == datetime(2023, 1, 2, tzinfo=timezone.utc)
+
+
+def test_get_history_jira_paged(field_bugjira):
+    """
+    GIVEN a jira issue whose embedded changelog is truncated
+    WHEN we fetch its history for one field
+    THEN the rest of the changelog is paged from the changelog endpoint
+    AND changes are returned oldest first under the configured field name
+    """
+    def history(created, field, old, new):
+        return {"created": created, "author": None, "items": [
+            {"field": field, "fieldId": field, "fromString": old,
+             "toString": new}]}
+
+    field_bugjira.jira.issue.return_value = Mock(raw={"changelog": {
+        "total": 3, "histories": [
+            history("2023-01-03T00:00:00.000+0000", "assignee", "b", "c"),
+            history("2023-01-02T00:00:00.000+0000", "priority", "1", "2")]}})
+    field_bugjira.jira._get_json = Mock(return_value={"values": [
+        history("2023-01-01T00:00:00.000+0000", "assignee", None, "b")]})
+    issue = JiraIssue(key="FOO-1", jira_issue=Mock())
+    records = list(field_bugjira.get_history([issue], fields=["Assignee"]))
+    field_bugjira.jira._get_json.assert_called_once_with(
+        "issue/FOO-1/changelog", params={"startAt": 2, "maxResults": 100})
+    assert [(r.field, r.from_value, r.to_value) for r in records] == [
+        ("Assignee", None, "b"), ("Assignee", "b", "c")]
+
+
+def test_get_history_unknown_field(field_bugjira):
+    """
+    GIVEN a Bugjira instance with a field configuration
+    WHEN we fetch history for a field that is not configured
+    THEN a ValueError is raised
+    """
+    issue = BugzillaIssue(key="1", bugzilla=Mock())
+    with pytest.raises(ValueError):
+        list(field_bugjira.get_history([issue], fields=["bogus"]))
+
+
+def test_get_issue_lazy_batches_lookups(sandboxed_bugjira):
+    """
+    GIVEN several lazy bugzilla issues
+    WHEN the backend data of one of them is read
+    THEN all of them are looked up with a single bulk request
+    AND reading the others' backend data makes no further requests
+    """
+    bugs = [Mock(id=n) for n in (1, 2, 3)]
+    sandboxed_bugjira.bugzilla.getbugs.return_value = bugs
+    issues = [sandboxed_bugjira.get_issue(key, lazy=True)
+              for key in ("1", "2", "3")]
+    assert isinstance(issues[0], BugzillaIssue)
+    assert issues[0].key == "1"
+    assert not issues[0].is_loaded
+    sandboxed_bugjira.bugzilla.getbugs.assert_not_called()
+    assert issues[1].bugzilla is bugs[1]
+    sandboxed_bugjira.bugzilla.getbugs.assert_called_once_with(
+        ["1", "2", "3"], permissive=True)
+    assert issues[0].bugzilla is bugs[0]
+    assert issues[2].bugzilla is bugs[2]
+    assert all(issue.is_loaded for issue in issues)
+    assert sandboxed_bugjira.bugzilla.getbugs.call_count == 1
+
+
+def test_get_issue_lazy_lookup_does_not_block(sandboxed_bugjira):
+    """
+    GIVEN a lazy bugzilla issue whose lookup is in progress in one thread
+    WHEN another thread creates a lazy issue and reads it
+    THEN the issue is created at once, and looked up in a second batch
+    AND a third thread reading the first issue waits for its batch
+    """
+    started, release = threading.Event(), threading.Event()
+
+    def getbugs(keys, permissive):
+        if keys == ["1"]:
+            started.set()
+            assert release.wait(5)
+        return [Mock(id=int(key)) for key in keys]
+
+    sandboxed_bugjira.bugzilla.getbugs.side_effect = getbugs
+    first = sandboxed_bugjira.get_issue("1", lazy=True)
+    read = threading.Thread(target=lambda: first.bugzilla)
+    read.start()
+    assert started.wait(5)
+    waiting = threading.Thread(target=lambda: first.bugzilla)
+    waiting.start()
+    second = sandboxed_bugjira.get_issue("2", lazy=True)
+    assert second.bugzilla.id == 2
+    assert not first.is_loaded
+    release.set()
+    read.join(5)
+    waiting.join(5)
+    assert first.bugzilla.id == 1
+    assert [call.args[0] for call in
+            sandboxed_bugjira.bugzilla.getbugs.call_args_list] == [
+        ["1"], ["2"]]
+
+
+def test_get_issues_lazy_not_found(sandboxed_bugjira):
+    """
+    GIVEN lazy jira issues, one of which does not exist
+    WHEN their backend data is read
+    THEN the missing issue raises a BrokerLookupException
+    AND the other issue is loaded by the same search
+    """
+    sandboxed_bugjira.jira.search_issues.return_value = [Mock(key="FOO-1")]
+    results = sandboxed_bugjira.get_issues(["FOO-1", "FOO-2"], lazy=True)
+    assert all(result.ok for result in results)
+    with pytest.raises(BrokerLookupException):
+        results[1].issue.jira_issue
+    assert results[0].issue.jira_issue.key == "FOO-1"
+    assert sandboxed_bugjira.jira.search_issues.call_count == 1
+
+
+def test_get_issues_multi_instance(multi_instance_config_dict):
+    """
+    GIVEN a Bugjira instance configured with a partner jira instance
+    WHEN we look up keys from both jira instances in one call
+    THEN each instance looks up its own keys with its own backend
+    AND the issues record the instance they came from
+    """
+    bugjira = Bugjira(config_dict=multi_instance_config_dict)
+    partner = bugjira._get_backend_broker(JIRA_TYPE, "partner")
+    partner.backend = create_autospec(JIRA, instance=True)
+    assert partner is not bugjira._jira_broker
+    bugjira.jira.search_issues.return_value = [Mock(key="FOO-1")]
+    partner.backend.search_issues.return_value = [Mock(key="PART-1"),
+                                                  Mock(key="BAR-2")]
+    results = bugjira.get_issues(["FOO-1", "PART-1", "partner:BAR-2"])
+    assert [result.key for result in results] == [
+        "FOO-1", "PART-1", "partner:BAR-2"]
+    assert [result.issue.instance for result in results] == [
+        None, "partner", "partner"]
+    assert partner.backend.search_issues.call_args.args[0] == \
+        "key in (PART-1,BAR-2)"
+    bugjira.add_comment(results[2].issue, "routed back to partner")
+    partner.backend.add_comment.assert_called_once_with(
+        "BAR-2", "routed back to partner")
+
+
+def test_fields_per_instance(field_config_dict, multi_instance_config_dict,
+                             monkeypatch):
+    """
+    GIVEN a Bugjira instance configured with a partner jira instance whose
+        field data plugin provides other fields
+    WHEN we get the fields of each jira instance
+    THEN each instance has the fields of its own plugin
+    """
+    config = dict(multi_instance_config_dict,
+                  field_data_path=field_config_dict["field_data_path"])
+    config["instances"]["jira"]["partner"]["field_data_plugin_name"] = \
+        "partner_plugin"
+    get_plugin = FieldDataGeneratorFactory._get_field_data_plugin_instance
+
+    def get_partner_plugin(self, generator_type, config):
+        if config[generator_type]["field_data_plugin_name"] == \
+                "partner_plugin":
+            return Mock(get_field_data=lambda: [
+                {"name": "team", "jira_field_id": "customfield_1"}])
+        return get_plugin(self, generator_type, config)
+    monkeypatch.setattr(FieldDataGeneratorFactory,
+                        "_get_field_data_plugin_instance", get_partner_plugin)
+    bugjira = Bugjira(config_dict=config)
+    partner = bugjira._get_backend_broker(JIRA_TYPE, "partner")
+    assert [field.name for field in partner.get_fields()] == ["team"]
+    default_fields = [field.name for field in
+                      bugjira._jira_broker.get_fields()]
+    assert default_fields and "team" not in default_fields
+
+
+def test_concurrency_stats(sandboxed_bugjira, good_config_dict):
+    """
+    GIVEN Bugjira instances created from configs without concurrency
+        settings, and with the adaptive limits enabled
+    WHEN we ask for their concurrency stats
+    THEN there are no limiters by default
+    AND there is an adaptive limiter for each backend once they are enabled
+    """
+    assert sandboxed_bugjira.concurrency_stats() == []
+    config = deepcopy(good_config_dict)
+    for backend in BUGZILLA, JIRA_TYPE:
+        config[backend]["concurrency"] = {"enabled": True}
+    stats = Bugjira(config_dict=config).concurrency_stats()
+    assert [entry.backend for entry in stats] == [BUGZILLA, JIRA_TYPE]
+    assert all(entry.limit == 8 for entry in stats)
+
+
+def test_per_call_priority(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we look up issues with a priority, per call or with a with block
+    THEN the backend requests are sent with that priority
+    """
+    priorities = []
+
+    def getbugs(*args, **kwargs):
+        priorities.append(get_priority())
+        return [Mock(id=1)]
+
+    sandboxed_bugjira.bugzilla.getbugs.side_effect = getbugs
+    sandboxed_bugjira.get_issues(["1"], priority=INTERACTIVE)
+    with sandboxed_bugjira.priority(BULK):
+        sandboxed_bugjira.get_issues(["1"])
+    sandboxed_bugjira.get_issues(["1"])
+    assert priorities == [INTERACTIVE, BULK, NORMAL]
+    with pytest.raises(ValueError):
+        sandboxed_bugjira.get_issues(["1"], priority="urgent")
+
+
+def test_get_issue_timeout(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance whose backend is slower than a timeout
+    WHEN we look up issues with the timeout
+    THEN get_issue raises a BrokerTimeoutException, and get_issues reports
+        one in its results
+    """
+    def slow(*args, **kwargs):
+        time.sleep(0.05)
+        raise requests.ReadTimeout()
+
+    sandboxed_bugjira.bugzilla.getbug.side_effect = slow
+    sandboxed_bugjira.bugzilla.getbugs.side_effect = slow
+    with pytest.raises(BrokerTimeoutException):
+        sandboxed_bugjira.get_issue("1", timeout=0.01)
+    results = sandboxed_bugjira.get_issues(["1", "2"], timeout=0.01)
+    assert all(isinstance(result.error, BrokerTimeoutException)
+               for result in results)
+
+
+def test_get_issue_timeout_injected_backends(good_config_dict):
+    """
+    GIVEN a Bugjira instance with backends passed to its constructor, which
+        hang without ever timing out
+    WHEN we look up issues with a timeout
+    THEN get_issue raises a BrokerTimeoutException, and get_issues reports
+        one in its results, once the timeout has passed
+    """
+    release = threading.Event()
+
+    def hang(*args, **kwargs):
+        release.wait(5)
+        return []
+
+    bugzilla = create_autospec(Bugzilla, instance=True)
+    bugzilla.getbug.side_effect = hang
+    bugzilla.getbugs.side_effect = hang
+    bugjira = Bugjira(config_dict=good_config_dict, bugzilla=bugzilla,
+                      jira=create_autospec(JIRA, instance=True))
+    assert not bugjira._bugzilla_broker.enforces_deadlines
+    started = time.monotonic()
+    try:
+        with pytest.raises(BrokerTimeoutException):
+            bugjira.get_issue("1", timeout=0.05)
+        results = bugjira.get_issues(["1", "2"], timeout=0.05)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert all(isinstance(result.error, BrokerTimeoutException)
+               for result in results)
+    assert [result.key for result in results] == ["1", "2"]
+
+
+def test_get_issue_hedged(sandboxed_bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we look up an issue with hedge=True
+    THEN the lookup goes through the broker's hedger
+    """
+    sandboxed_bugjira.get_issue("FOO-1", hedge=True)
+    stats = sandboxed_bugjira.hedging_stats()
+    assert [(entry.backend, entry.operation, entry.calls)
+            for entry in stats] == [(JIRA_TYPE, "get_issue", 1)]
+
+
+def test_circuit_breaker_isolates_backends(good_config_dict):
+    """
+    GIVEN a Bugjira instance with circuit breakers enabled, whose bugzilla
+        backend is down
+    WHEN we look up bugzilla and jira keys together, repeatedly
+    THEN once the bugzilla circuit opens, bugzilla keys fail at once with
+        BrokerCircuitOpenException, and jira keys are still found
+    """
+    config = deepcopy(good_config_dict)
+    for backend in BUGZILLA, JIRA_TYPE:
+        config[backend]["circuit_breaker"] = {"enabled": True}
+    bugjira = Bugjira(config_dict=config)
+    breaker = bugjira._bugzilla_broker.circuit
+    bugjira.jira.search_issues.return_value = [Mock(key="FOO-1")]
+
+    def getbugs(*args, **kwargs):
+        with breaker.guard():
+            raise requests.ConnectionError("connection refused")
+
+    bugjira.bugzilla.getbugs.side_effect = getbugs
+    bugjira.bugzilla.getbug.side_effect = getbugs
+    for _ in range(breaker.failure_threshold):
+        bug, issue = bugjira.get_issues(["1", "FOO-1"])
+        assert isinstance(bug.error, BrokerLookupException)
+        assert issue.error is None
+    bug, issue = bugjira.get_issues(["1", "FOO-1"])
+    assert isinstance(bug.error, BrokerCircuitOpenException)
+    assert issue.error is None
+    with pytest.raises(BrokerCircuitOpenException):
+        bugjira.get_issue("1")
+    states = {stats.backend: stats.state
+              for stats in bugjira.circuit_stats()}
+    assert states == {BUGZILLA: OPEN, JIRA_TYPE: CLOSED}
+
+
+def test_issue_cache(field_config_dict):
+    """
+    GIVEN a Bugjira instance with the issue cache enabled
+    WHEN we look up issues repeatedly, and update one of them
+    THEN cached issues are not looked up again until they are updated
+    """
+    bugjira = Bugjira(config_dict=dict(field_config_dict,
+                                       cache={"enabled": True}))
+    bugjira.bugzilla.getbugs.return_value = [Mock(id=1), Mock(id=2)]
+    bugjira.bugzilla.build_update.return_value = {}
+    first = bugjira.get_issues(["1", "2"])
+    assert [result.key for result in first] == ["1", "2"]
+    assert bugjira.get_issue("1") is first[0].issue
+    bugjira.bugzilla.getbug.assert_not_called()
+    bugjira.update_issues([first[1].issue], {"status": "ASSIGNED"})
+    bugjira.bugzilla.getbugs.return_value = [Mock(id=2)]
+    second = bugjira.get_issues(["1", "2"])
+    assert second[0].issue is first[0].issue
+    assert bugjira.bugzilla.getbugs.call_args.args[0] == ["2"]
+    stats = bugjira.cache_stats()
+    assert (stats.hits, stats.invalidations) == (2, 1)
+    assert Bugjira(config_dict=field_config_dict).cache_stats() is None
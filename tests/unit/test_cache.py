@@ -0,0 +1,78 @@
+import pytest
+
+from bugjira import cache
+from bugjira.cache import IssueCache
+from bugjira.common import BUGZILLA, JIRA
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_cache_hits_and_misses():
+    """
+    GIVEN an issue cache
+    WHEN issues are cached, looked up and invalidated
+    THEN cached issues are returned, keyed by backend, instance and key
+    """
+    issues = IssueCache()
+    issues.put(JIRA, None, "FOO-1", "issue")
+    assert issues.get(JIRA, None, "FOO-1") == "issue"
+    assert issues.get(JIRA, "partner", "FOO-1") is None
+    assert issues.get(BUGZILLA, None, "FOO-1") is None
+    assert issues.invalidate(JIRA, None, "FOO-1") is True
+    assert issues.invalidate(JIRA, None, "FOO-1") is False
+    assert issues.get(JIRA, None, "FOO-1") is None
+    stats = issues.stats()
+    assert (stats.size, stats.hits, stats.misses,
+            stats.invalidations) == (0, 1, 3, 1)
+
+
+def test_cache_expiry(clock):
+    """
+    GIVEN an issue cache with a time to live
+    WHEN an entry is older than the time to live
+    THEN it is no longer served
+    """
+    issues = IssueCache(ttl=10)
+    issues.put(JIRA, None, "FOO-1", "issue")
+    clock.now += 9
+    assert issues.get(JIRA, None, "FOO-1") == "issue"
+    clock.now += 1
+    assert issues.get(JIRA, None, "FOO-1") is None
+    assert issues.stats().evictions == 1
+    forever = IssueCache(ttl=None)
+    forever.put(JIRA, None, "FOO-1", "issue")
+    clock.now += 1e9
+    assert forever.get(JIRA, None, "FOO-1") == "issue"
+
+
+def test_cache_max_size():
+    """
+    GIVEN a full issue cache
+    WHEN another issue is cached
+    THEN the least recently used entry is dropped
+    """
+    issues = IssueCache(max_size=2)
+    issues.put(JIRA, None, "FOO-1", 1)
+    issues.put(JIRA, None, "FOO-2", 2)
+    issues.get(JIRA, None, "FOO-1")
+    issues.put(JIRA, None, "FOO-3", 3)
+    assert issues.get(JIRA, None, "FOO-2") is None
+    assert issues.get(JIRA, None, "FOO-1") == 1
+    assert issues.get(JIRA, None, "FOO-3") == 3
+    with pytest.raises(ValueError):
+        IssueCache(max_size=0)
+    with pytest.raises(ValueError):
+        IssueCache(ttl=0)
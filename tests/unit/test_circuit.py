@@ -0,0 +1,191 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+from pydantic import ValidationError
+from requests.adapters import HTTPAdapter
+
+from bugjira import circuit, deadline
+from bugjira.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.exceptions import (
+    BrokerCircuitOpenException,
+    BrokerTimeoutException
+)
+from bugjira.transport import BrokerHTTPAdapter, get_circuit_breaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "monotonic", clock)
+    return clock
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.record(breaker.admit(), failed=True)
+
+
+def test_opens_after_consecutive_failures(clock):
+    """
+    GIVEN a closed circuit breaker
+    WHEN failure_threshold requests in a row fail
+    THEN it opens, and only then
+    """
+    breaker = CircuitBreaker(JIRA, failure_threshold=3)
+    fail(breaker, 2)
+    breaker.record(breaker.admit())
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+    assert breaker.stats().failures == 2
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.stats().opened == 1
+
+
+def test_open_breaker_fails_fast(clock):
+    """
+    GIVEN an open circuit breaker
+    WHEN requests are made before reset_timeout has passed
+    THEN they fail at once with BrokerCircuitOpenException
+    """
+    breaker = CircuitBreaker(BUGZILLA, "partner", failure_threshold=1,
+                             reset_timeout=10)
+    fail(breaker)
+    clock.now += 4
+    with pytest.raises(BrokerCircuitOpenException,
+                       match="bugzilla instance partner; retrying in 6.0s"):
+        breaker.admit()
+    stats = breaker.stats()
+    assert stats.rejected == 1
+    assert stats.retry_in == 6
+
+
+def test_half_open_probe_closes(clock):
+    """
+    GIVEN an open circuit breaker
+    WHEN reset_timeout has passed and a probe succeeds
+    THEN only half_open_probes requests are let through until the probe
+        answers, and then the breaker closes
+    """
+    breaker = CircuitBreaker(JIRA, failure_threshold=1, reset_timeout=10)
+    fail(breaker)
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    probe = breaker.admit()
+    assert probe is True
+    with pytest.raises(BrokerCircuitOpenException):
+        breaker.admit()
+    breaker.record(probe)
+    assert breaker.state == CLOSED
+    assert breaker.admit() is False
+
+
+def test_half_open_probe_reopens(clock):
+    """
+    GIVEN a half open circuit breaker
+    WHEN its probe fails
+    THEN it opens again for another reset_timeout
+    """
+    breaker = CircuitBreaker(JIRA, failure_threshold=1, reset_timeout=10)
+    fail(breaker)
+    clock.now += 10
+    fail(breaker)
+    assert breaker.state == OPEN
+    stats = breaker.stats()
+    assert (stats.opened, stats.retry_in) == (2, 10)
+
+
+def test_guard_outcomes(clock):
+    """
+    GIVEN a circuit breaker
+    WHEN guarded requests get responses, raise, or are not counted
+    THEN 5xx responses and errors count as failures, other responses reset
+        the failures, and uncounted requests change nothing
+    """
+    breaker = CircuitBreaker(JIRA, failure_threshold=10)
+    with breaker.guard() as outcome:
+        outcome["status"] = 503
+    with pytest.raises(requests.ConnectionError):
+        with breaker.guard():
+            raise requests.ConnectionError()
+    with pytest.raises(requests.Timeout):
+        with breaker.guard() as outcome:
+            outcome["count"] = False
+            raise requests.Timeout()
+    assert breaker.stats().failures == 2
+    for status in 404, 429:
+        with breaker.guard() as outcome:
+            outcome["status"] = status
+    assert breaker.stats().failures == 0
+
+
+def test_get_circuit_breaker():
+    """
+    GIVEN config sections with and without circuit breaker settings
+    WHEN we get their circuit breakers
+    THEN the settings of an enabled breaker are used, and there is no
+        breaker unless it is enabled
+    """
+    breaker = get_circuit_breaker({"circuit_breaker": {"enabled": True}},
+                                  JIRA)
+    assert (breaker.failure_threshold, breaker.reset_timeout,
+            breaker.half_open_probes) == (5, 30.0, 1)
+    breaker = get_circuit_breaker(
+        {"circuit_breaker": {"enabled": True, "failure_threshold": 2,
+                             "reset_timeout": 5}},
+        BUGZILLA, "partner")
+    assert (breaker.backend, breaker.instance) == (BUGZILLA, "partner")
+    assert (breaker.failure_threshold, breaker.reset_timeout) == (2, 5)
+    assert get_circuit_breaker({}, JIRA) is None
+    assert get_circuit_breaker({"circuit_breaker": {"enabled": False}},
+                               JIRA) is None
+    with pytest.raises(ValidationError):
+        get_circuit_breaker({"circuit_breaker": {"failure_threshold": 0}},
+                            JIRA)
+
+
+def test_adapter_circuit(monkeypatch):
+    """
+    GIVEN a broker adapter with a circuit breaker
+    WHEN its requests get 5xx responses
+    THEN the breaker opens, and later requests fail without being sent
+    """
+    send = Mock(return_value=Mock(status_code=502))
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    breaker = CircuitBreaker(JIRA, failure_threshold=2)
+    adapter = BrokerHTTPAdapter(circuit=breaker)
+    adapter.send(Mock())
+    adapter.send(Mock())
+    with pytest.raises(BrokerCircuitOpenException):
+        adapter.send(Mock())
+    assert send.call_count == 2
+
+
+def test_adapter_circuit_ignores_deadline(clock, monkeypatch):
+    """
+    GIVEN a broker adapter with a circuit breaker
+    WHEN a request times out because the caller's deadline passed
+    THEN the breaker does not count it as a failure
+    """
+    def send(*args, **kwargs):
+        clock.now += 61
+        raise requests.ReadTimeout()
+
+    monkeypatch.setattr(deadline.time, "monotonic", clock)
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    breaker = CircuitBreaker(JIRA, failure_threshold=1)
+    adapter = BrokerHTTPAdapter(circuit=breaker)
+    with pytest.raises(BrokerTimeoutException):
+        with deadline.deadline(60):
+            adapter.send(Mock())
+    assert breaker.state == CLOSED
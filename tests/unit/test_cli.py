@@ -0,0 +1,96 @@
+import json
+from unittest.mock import Mock, create_autospec
+
+import pytest
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+import bugjira.cli as cli
+from bugjira.bugjira import Bugjira
+from bugjira.common import JIRA as JIRA_TYPE
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def bugjira(multi_instance_config_dict, monkeypatch):
+    bugjira = Bugjira(config_dict=multi_instance_config_dict)
+    bugjira._bugzilla_broker._fields = []
+    bugjira._jira_broker._fields = []
+    partner = bugjira._get_backend_broker(JIRA_TYPE, "partner")
+    partner._fields = []
+    bugjira.bugzilla.getbugs.side_effect = lambda ids, permissive: [
+        Mock(id=int(bug_id)) for bug_id in ids]
+    bugjira.jira.search_issues.side_effect = lambda jql, **kwargs: [
+        Mock(key=key) for key in jql[len("key in ("):-1].split(",")]
+    partner.backend.search_issues.side_effect = \
+        bugjira.jira.search_issues.side_effect
+    monkeypatch.setattr(cli, "Bugjira", lambda config_path: bugjira)
+    return bugjira
+
+
+def export(tmp_path, *args):
+    return cli.main(["export", "--config", "bugjira.json", "--output",
+                     str(tmp_path / "export.jsonl"), *args])
+
+
+def export_keys(tmp_path, keys, *args):
+    keys_path = tmp_path / "keys.txt"
+    keys_path.write_text("\n".join(keys) + "\n")
+    return export(tmp_path, "--keys-file", str(keys_path), *args)
+
+
+def exported(tmp_path):
+    with open(tmp_path / "export.jsonl") as export:
+        return [json.loads(line)["key"] for line in export]
+
+
+def test_export_resume_keys(bugjira, tmp_path):
+    """
+    GIVEN an export of a list of keys
+    WHEN we resume it with more keys
+    THEN only the keys after the exported ones are looked up and exported
+    """
+    assert export_keys(tmp_path, ["1", "  foo_1 "]) == 0
+    bugjira.jira.search_issues.reset_mock()
+    assert export_keys(tmp_path, ["1", "  foo_1 ", "partner:BAR-2", "3"],
+                       "--resume") == 0
+    assert exported(tmp_path) == ["1", "FOO-1", "BAR-2", "3"]
+    jqls = [call.args[0] for call in bugjira.jira.search_issues.call_args_list]
+    assert not any("FOO-1" in jql for jql in jqls)
+
+
+def test_export_resume_keys_after_failed_lookup(bugjira, tmp_path):
+    """
+    GIVEN an export of a list of keys where one lookup failed
+    WHEN we resume it with more keys
+    THEN the keys exported before are not exported again
+    """
+    bugjira.bugzilla.getbugs.side_effect = lambda ids, permissive: [
+        Mock(id=int(bug_id)) for bug_id in ids if bug_id != "2"]
+    assert export_keys(tmp_path, ["1", "2", "3"]) == 0
+    assert export_keys(tmp_path, ["1", "2", "3", "4"], "--resume") == 0
+    assert exported(tmp_path) == ["1", "3", "4"]
+
+
+def test_export_resume_search(bugjira, tmp_path):
+    """
+    GIVEN an interrupted export of a jira search
+    WHEN we resume it after an exported issue stopped matching the search
+    THEN the search is run from the start and the issues after the last
+        exported key are exported
+    """
+    assert export_keys(tmp_path, ["FOO-1", "FOO-2"]) == 0
+    bugjira.jira.search_issues.side_effect = None
+    bugjira.jira.search_issues.return_value = [Mock(key="FOO-2"),
+                                               Mock(key="FOO-3")]
+    assert export(tmp_path, "--jql", "project = FOO ORDER BY key",
+                  "--page-size", "10", "--resume") == 0
+    assert exported(tmp_path) == ["FOO-1", "FOO-2", "FOO-3"]
+    kwargs = bugjira.jira.search_issues.call_args.kwargs
+    assert kwargs["startAt"] == 0
@@ -0,0 +1,220 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from bugjira import concurrency
+from bugjira.common import JIRA
+from bugjira.concurrency import AdaptiveLimiter
+from bugjira.config import TransportConfig
+from bugjira.transport import configure_session, get_limiter, operation_name
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock)
+    return clock
+
+
+def request(limiter, clock, latency, status=200, operation=None):
+    started = limiter.acquire()
+    clock.now += latency
+    limiter.release(started, status, operation=operation)
+
+
+def test_limit_increases_additively(clock):
+    """
+    GIVEN a limiter
+    WHEN requests succeed with a steady latency
+    THEN the limit grows by about one per round trip, up to max_limit
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=2, max_limit=4)
+    for _ in range(2):
+        request(limiter, clock, 0.1)
+    assert limiter.limit == 2
+    for _ in range(2):
+        request(limiter, clock, 0.1)
+    assert limiter.limit == 3
+    for _ in range(100):
+        request(limiter, clock, 0.1)
+    assert limiter.limit == 4
+    stats = limiter.stats()
+    assert stats.successes == 104
+    assert stats.baseline_latency == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_limit_cut_on_throttling(clock, status):
+    """
+    GIVEN a limiter
+    WHEN the server throttles or fails
+    THEN the limit is multiplied by the backoff factor
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=8)
+    request(limiter, clock, 0.1, status)
+    assert limiter.limit == 4
+    assert limiter.stats().throttled == 1
+
+
+def test_limit_cut_once_per_overload(clock):
+    """
+    GIVEN a limiter with several requests in flight
+    WHEN they are all throttled
+    THEN the limit is only cut once, but a later request can cut it again
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=8)
+    started = [limiter.acquire() for _ in range(4)]
+    clock.now += 0.1
+    for start in started:
+        limiter.release(start, 429)
+    assert limiter.limit == 4
+    clock.now += 0.1
+    request(limiter, clock, 0.1, 429)
+    stats = limiter.stats()
+    assert stats.limit == 2
+    assert stats.decreases == 2
+    assert stats.throttled == 5
+
+
+def test_limit_cut_on_latency_spike(clock):
+    """
+    GIVEN a limiter with a baseline latency
+    WHEN a response takes much longer than the baseline, or fails
+    THEN the limit is cut, down to min_limit
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=8, min_limit=3)
+    request(limiter, clock, 0.1)
+    request(limiter, clock, 0.5)
+    assert limiter.limit == 4
+    with pytest.raises(requests.Timeout):
+        with limiter.slot():
+            clock.now += 0.1
+            raise requests.Timeout()
+    stats = limiter.stats()
+    assert stats.limit == 3
+    assert stats.latency_spikes == 2
+    assert stats.in_flight == 0
+
+
+def test_baseline_per_operation(clock):
+    """
+    GIVEN a limiter with a baseline latency for single lookups
+    WHEN bulk searches take much longer than the lookups, and then a lookup
+        takes much longer than usual
+    THEN the searches get their own baseline and do not cut the limit
+    AND the slow lookup does
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=8)
+    request(limiter, clock, 0.1, operation="GET /issue")
+    request(limiter, clock, 2.0, operation="GET /search")
+    request(limiter, clock, 2.5, operation="GET /search")
+    assert limiter.limit == 8
+    stats = limiter.stats()
+    assert stats.latency_spikes == 0
+    assert stats.baseline_latency == pytest.approx(2.025)
+    assert stats.baseline_latencies["GET /issue"] == pytest.approx(0.1)
+    request(limiter, clock, 0.5, operation="GET /issue")
+    assert limiter.limit == 4
+    assert limiter.stats().latency_spikes == 1
+
+
+@pytest.mark.parametrize("method,url,body,expected", [
+    ("GET", "https://jira.example.com/rest/api/2/issue/FOO-1", None,
+     "GET /rest/api/*/issue/*"),
+    ("GET", "https://jira.example.com/rest/api/2/search?jql=x", None,
+     "GET /rest/api/*/search"),
+    ("POST", "https://bugzilla.example.com/xmlrpc.cgi",
+     "<?xml version='1.0'?>\n<methodCall>\n<methodName>Bug.get"
+     "</methodName>", "POST /xmlrpc.cgi Bug.get"),
+])
+def test_operation_name(method, url, body, expected):
+    """
+    GIVEN a request
+    WHEN we get the name of its operation
+    THEN ids and keys are left out of the path, and XML-RPC calls are named
+        by their method
+    """
+    request = requests.Request(method, url, data=body).prepare()
+    assert operation_name(request) == expected
+
+
+def test_acquire_waits_for_free_slot():
+    """
+    GIVEN a limiter whose limit is reached
+    WHEN another request asks for a slot
+    THEN it waits until a slot is freed
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=1)
+    started = limiter.acquire()
+    acquired = threading.Event()
+
+    def wait_for_slot():
+        limiter.release(limiter.acquire())
+        acquired.set()
+
+    thread = threading.Thread(target=wait_for_slot)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(started)
+    thread.join()
+    assert acquired.is_set()
+    assert limiter.stats().waited == 1
+
+
+def test_invalid_limits():
+    """
+    GIVEN the AdaptiveLimiter class
+    WHEN it is created with inconsistent limits or factors
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(JIRA, initial_limit=8, max_limit=4)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(JIRA, backoff=1)
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(JIRA, latency_tolerance=1)
+
+
+def test_get_limiter():
+    """
+    GIVEN config sections with and without concurrency settings
+    WHEN we get their limiters
+    THEN a limiter is only returned when it is enabled, and the initial
+        limit is kept within max_limit
+    """
+    assert get_limiter({"concurrency": {"enabled": True}}, JIRA).limit == 8
+    assert get_limiter({"concurrency": {"enabled": True, "max_limit": 4}},
+                       JIRA).limit == 4
+    assert get_limiter({}, JIRA) is None
+    assert get_limiter({"concurrency": {"enabled": False}}, JIRA) is None
+
+
+def test_limited_adapter(monkeypatch):
+    """
+    GIVEN a session configured with a limiter
+    WHEN it sends a request that the server throttles
+    THEN the limiter records it
+    """
+    monkeypatch.setattr(HTTPAdapter, "send",
+                        Mock(return_value=Mock(status_code=503)))
+    limiter = AdaptiveLimiter(JIRA)
+    session = requests.Session()
+    configure_session(session, TransportConfig(), limiter)
+    session.get_adapter("https://jira.example.com").send(
+        requests.Request("GET", "https://jira.example.com/rest/api/2/"
+                         "issue/FOO-1").prepare())
+    stats = limiter.stats()
+    assert stats.throttled == 1
+    assert limiter.limit == 4
+    assert list(stats.baseline_latencies) == []
@@ -3,7 +3,7 @@ from copy import deepcopy
 import pytest
 from pydantic import ValidationError
 
-from bugjira.config import Config
+from bugjira.config import Config, get_instance_config
 
 
 def test_config_good_json(config_defaults):
@@ -191,3 +191,31 @@ def test_config_no_params():
     """
     with pytest.raises(ValueError):
         Config.from_config()
+
+
+def test_config_instances(multi_instance_config_dict):
+    """
+    GIVEN a config dict with named bugzilla and jira instances
+    WHEN we validate it and build the config for one of the instances
+    THEN the instance config is a valid config whose jira section holds the
+        instance's settings without its routing settings
+    """
+    config = Config.from_config(config_dict=multi_instance_config_dict)
+    instance_config = get_instance_config(config, "jira", "partner")
+    assert Config.from_config(config_dict=instance_config)
+    assert instance_config["jira"]["URL"] == "https://jira.partner.example.com"
+    assert "projects" not in instance_config["jira"]
+    assert "instances" not in instance_config
+    assert instance_config["bugzilla"] == config["bugzilla"]
+
+
+def test_config_instance_extra_value(multi_instance_config_dict):
+    """
+    GIVEN a config dict with a named instance containing an unknown setting
+    WHEN we call Config.from_config using the dict as the config_dict
+    THEN a ValidationError is raised
+    """
+    bad_config = deepcopy(multi_instance_config_dict)
+    bad_config["instances"]["jira"]["partner"]["foo"] = "bar"
+    with pytest.raises(ValidationError):
+        Config.from_config(config_dict=bad_config)
@@ -0,0 +1,127 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.crawler import (
+    Crawler,
+    Shard,
+    bugzilla_id_shards,
+    jira_date_shards
+)
+from bugjira.issue import BugzillaIssue
+
+
+def test_jira_date_shards():
+    """
+    GIVEN a JQL search with an ORDER BY clause
+    WHEN we split it into date windows
+    THEN each shard restricts the search to its window and orders by key
+    """
+    shards = jira_date_shards("project = FOO ORDER BY created DESC",
+                              datetime(2023, 1, 1), datetime(2023, 1, 3),
+                              timedelta(days=1))
+    assert len(shards) == 2
+    assert all(shard.backend == JIRA for shard in shards)
+    assert shards[1].query == (
+        '(project = FOO) AND created >= "2023/01/02 00:00" AND '
+        'created < "2023/01/03 00:00" ORDER BY key ASC')
+
+
+def test_bugzilla_id_shards():
+    """
+    GIVEN a bugzilla query that already uses advanced search parameters
+    WHEN we split it into id ranges
+    THEN each shard adds an id range using unused parameter numbers
+    """
+    shards = bugzilla_id_shards({"product": "foo", "f1": "x"}, 1, 250, 100)
+    assert [shard.query["v2"] for shard in shards] == ["1", "101", "201"]
+    assert shards[-1].query["v3"] == "250"
+    assert shards[0].query["f1"] == "x"
+    assert all(shard.backend == BUGZILLA for shard in shards)
+
+
+def make_bugjira(pages_by_query):
+    broker = Mock()
+
+    def search_pages(query, page_size, field_ids, start=0):
+        pages = pages_by_query[query["name"]]
+        consumed = 0
+        for page in pages:
+            if consumed >= start:
+                yield [BugzillaIssue(key=key) for key in page]
+            consumed += len(page)
+
+    broker.search_pages.side_effect = search_pages
+    broker.iter_dispatched.side_effect = iter
+    bugjira = Mock()
+    bugjira._get_backend_broker.return_value = broker
+    return bugjira
+
+
+def shard(name):
+    return Shard(name=name, backend=BUGZILLA, query={"name": name})
+
+
+def test_crawl_merges_and_dedupes(tmp_path):
+    """
+    GIVEN shards whose results overlap
+    WHEN we crawl them in parallel
+    THEN every issue is yielded exactly once
+    AND the checkpoint file records every shard as completed
+    """
+    bugjira = make_bugjira({"a": [["1", "2"], ["3"]], "b": [["3", "4"]]})
+    path = str(tmp_path / "checkpoint.json")
+    crawler = Crawler(bugjira, [shard("a"), shard("b")], workers=2,
+                      checkpoint_path=path)
+    assert sorted(issue.key for issue in crawler) == ["1", "2", "3", "4"]
+    with open(path) as checkpoint:
+        assert json.load(checkpoint)["completed"] == ["a", "b"]
+
+
+def test_crawl_resumes_from_checkpoint(tmp_path):
+    """
+    GIVEN a checkpoint file recording one completed shard and one partially
+        consumed shard
+    WHEN we crawl the same shards again
+    THEN the completed shard is skipped and the other continues from its
+        offset
+    """
+    path = tmp_path / "checkpoint.json"
+    path.write_text(json.dumps({"offsets": {"b": 2}, "completed": ["a"]}))
+    bugjira = make_bugjira({"a": [["1"]], "b": [["5", "6"], ["7"]]})
+    crawler = Crawler(bugjira, [shard("a"), shard("b")],
+                      checkpoint_path=str(path))
+    assert [issue.key for issue in crawler] == ["7"]
+
+
+def test_crawl_raises_shard_errors():
+    """
+    GIVEN a shard whose search raises an exception
+    WHEN we crawl it
+    THEN the exception is raised to the consumer
+    """
+    bugjira = make_bugjira({})
+    with pytest.raises(KeyError):
+        list(Crawler(bugjira, [shard("missing")]))
+
+
+def test_crawl_stops_early():
+    """
+    GIVEN a crawl with more pages than fit in the queue, and a second shard
+        waiting for a worker
+    WHEN the consumer stops after the first issue
+    THEN the crawl shuts down without hanging
+    AND the waiting shard is never crawled
+    """
+    pages = [[str(n)] for n in range(1, 50)]
+    bugjira = make_bugjira({"a": pages, "b": [["99"]]})
+    crawler = Crawler(bugjira, [shard("a"), shard("b")], workers=1)
+    stream = iter(crawler)
+    assert next(stream).key == "1"
+    stream.close()
+    broker = bugjira._get_backend_broker.return_value
+    assert [call.args[0]["name"]
+            for call in broker.search_pages.call_args_list] == ["a"]
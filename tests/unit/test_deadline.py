@@ -0,0 +1,176 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from bugjira import deadline
+from bugjira.common import JIRA
+from bugjira.concurrency import AdaptiveLimiter
+from bugjira.deadline import (
+    DeadlineExceeded,
+    RequestCancelled,
+    cancellable,
+    check_cancelled,
+    remaining,
+    request_timeout
+)
+from bugjira.exceptions import BrokerTimeoutException
+from bugjira.transport import BrokerHTTPAdapter
+
+ISSUE_URL = "https://jira.example.com/rest/api/2/issue/FOO-1"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(deadline.time, "monotonic", clock)
+    return clock
+
+
+def test_nested_deadlines(clock):
+    """
+    GIVEN a deadline
+    WHEN deadlines are nested within it
+    THEN a shorter one applies, a longer one cannot extend it, and None
+        leaves it unchanged
+    """
+    assert remaining() is None
+    with deadline.deadline(10):
+        assert remaining() == 10
+        with deadline.deadline(5):
+            assert remaining() == 5
+        with deadline.deadline(20):
+            assert remaining() == 10
+        with deadline.deadline(None):
+            clock.now += 4
+            assert remaining() == 6
+    assert remaining() is None
+    with pytest.raises(ValueError):
+        with deadline.deadline(0):
+            pass
+
+
+def test_request_timeout(clock):
+    """
+    GIVEN a deadline
+    WHEN requests are sent with various timeouts
+    THEN their timeouts are cut to the time left, and no request is sent once
+        it has passed
+    """
+    assert request_timeout((3, 60)) == (3, 60)
+    with deadline.deadline(10):
+        assert request_timeout(None) == 10
+        assert request_timeout(5) == 5
+        assert request_timeout(30) == 10
+        assert request_timeout((3, 60)) == (3, 10)
+        assert request_timeout((None, 5)) == (10, 5)
+        clock.now += 10
+        with pytest.raises(DeadlineExceeded):
+            request_timeout(5)
+
+
+def test_deadline_errors(clock):
+    """
+    GIVEN a deadline block
+    WHEN it raises before and after the deadline has passed
+    THEN only the error raised after it is replaced by a
+        BrokerTimeoutException
+    """
+    with pytest.raises(KeyError):
+        with deadline.deadline(10):
+            raise KeyError("x")
+    with pytest.raises(BrokerTimeoutException) as info:
+        with deadline.deadline(10):
+            clock.now += 11
+            raise requests.ReadTimeout()
+    assert isinstance(info.value.__cause__, requests.ReadTimeout)
+
+
+def test_cancellable():
+    """
+    GIVEN requests sent in a cancellable block
+    WHEN the block's event is set
+    THEN checking for cancellation raises RequestCancelled
+    """
+    cancel = threading.Event()
+    with cancellable(cancel):
+        check_cancelled()
+        cancel.set()
+        with pytest.raises(RequestCancelled):
+            check_cancelled()
+    check_cancelled()
+
+
+def test_adapter_caps_timeout(monkeypatch):
+    """
+    GIVEN a broker adapter
+    WHEN a request is sent within a deadline
+    THEN the request's timeout is cut to the time left
+    """
+    send = Mock(return_value=Mock(status_code=200))
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    adapter = BrokerHTTPAdapter(AdaptiveLimiter(JIRA))
+    with deadline.deadline(2):
+        adapter.send(requests.Request("GET", ISSUE_URL).prepare(),
+                     timeout=(5, 300))
+    connect, read = send.call_args.kwargs["timeout"]
+    assert 0 < connect <= 2
+    assert 0 < read <= 2
+
+
+def test_adapter_configured_timeout(monkeypatch):
+    """
+    GIVEN a broker adapter with a configured timeout
+    WHEN a client sends a request with its own timeout, with and without a
+        deadline
+    THEN the configured timeout is used, cut to the time left before the
+        deadline
+    """
+    send = Mock(return_value=Mock(status_code=200))
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    adapter = BrokerHTTPAdapter(timeout=(5, 60))
+    request = requests.Request("GET", ISSUE_URL).prepare()
+    adapter.send(request, timeout=300)
+    assert send.call_args.kwargs["timeout"] == (5, 60)
+    with deadline.deadline(2):
+        adapter.send(request, timeout=300)
+    connect, read = send.call_args.kwargs["timeout"]
+    assert 0 < connect <= 2
+    assert 0 < read <= 2
+
+
+def test_adapter_drops_cancelled_response(monkeypatch):
+    """
+    GIVEN a broker adapter with a limiter
+    WHEN its request is cancelled while the response is on its way
+    THEN the response is closed, RequestCancelled is raised, and the limit
+        is left alone
+    """
+    cancel = threading.Event()
+    response = Mock(status_code=200)
+
+    def send(*args, **kwargs):
+        cancel.set()
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    limiter = AdaptiveLimiter(JIRA)
+    adapter = BrokerHTTPAdapter(limiter)
+    with cancellable(cancel):
+        with pytest.raises(RequestCancelled):
+            adapter.send(requests.Request("GET", ISSUE_URL).prepare())
+    assert response.close.called
+    stats = limiter.stats()
+    assert stats.in_flight == 0
+    assert stats.latency_spikes == 0
+    assert stats.limit == 8
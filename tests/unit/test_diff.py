@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import Mock, create_autospec
+
+import pytest
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+from bugjira.bugjira import Bugjira
+from bugjira.diff import ChangeSet, Differ, FieldChange
+from bugjira.field import BugzillaField, JiraField
+from bugjira.issue import BugzillaIssue, JiraIssue
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def bugjira(good_config_dict):
+    bugjira = Bugjira(config_dict=good_config_dict)
+    bugjira._bugzilla_broker._fields = [
+        BugzillaField(name="status"),
+        BugzillaField(name="keywords"),
+        BugzillaField(name="last_change_time", data_type="datetime")]
+    bugjira._jira_broker._fields = [
+        JiraField(name="assignee", jira_field_id="assignee"),
+        JiraField(name="status", jira_field_id="status")]
+    return bugjira
+
+
+def bug(key, **fields):
+    return BugzillaIssue(key=key, bugzilla=SimpleNamespace(**fields))
+
+
+def jira_entity(name):
+    return Mock(raw={"self": f"https://jira.example.com/{name}",
+                     "name": name})
+
+
+def test_diff_reports_changed_fields(bugjira):
+    """
+    GIVEN two versions of a bug with one changed field
+    WHEN we call Bugjira.diff
+    THEN only that field is reported, with its old and new values
+    AND the payload maps it to its new value
+    """
+    old = bug("1", status="NEW", keywords=["a"], last_change_time=None)
+    new = bug("1", status="ASSIGNED", keywords=["a"], last_change_time=None)
+    changes = bugjira.diff(old, new)
+    assert changes == ChangeSet(key="1", changes={
+        "status": FieldChange(old="NEW", new="ASSIGNED")},
+        updates={"status": "ASSIGNED"})
+    assert changes.changed
+    assert changes.payload() == {"status": "ASSIGNED"}
+
+
+def test_diff_ignores_representation_changes(bugjira):
+    """
+    GIVEN two versions of a bug that differ only in how values are written:
+        an unset field that becomes an empty list, a reordered list, and the
+        same instant in another timezone
+    WHEN we call Bugjira.diff
+    THEN no change is reported
+    """
+    old = bug("1", status="NEW", keywords=["a", "b"],
+              last_change_time="2024-05-01T12:00:00+00:00")
+    new = bug("1", status="NEW", keywords=["b", "a"],
+              last_change_time=datetime(2024, 5, 1, 14, 0, tzinfo=timezone(
+                  timedelta(hours=2))))
+    assert not bugjira.diff(old, new).changed
+    assert not bugjira.diff(bug("1", keywords=None),
+                            bug("1", keywords=[])).changed
+
+
+def test_diff_normalizes_jira_entities(bugjira):
+    """
+    GIVEN two versions of a jira issue whose user and status objects are
+        different objects with the same names
+    WHEN we call Bugjira.diff
+    THEN only the field whose name changed is reported, by name
+    """
+    def issue(assignee, status):
+        return JiraIssue(key="FOO-1", jira_issue=Mock(fields=SimpleNamespace(
+            assignee=jira_entity(assignee), status=jira_entity(status))))
+
+    changes = bugjira.diff(issue("alice", "Open"), issue("bob", "Open"))
+    assert changes.changes == {"assignee": FieldChange(old="alice",
+                                                       new="bob")}
+
+
+def test_diff_jira_payload_updates_issue(bugjira):
+    """
+    GIVEN two versions of a jira issue with a new assignee and status
+    WHEN we pass the payload of their diff to update_issues
+    THEN the assignee is edited as a user reference
+    AND the status is performed as a transition
+    """
+    def issue(assignee, status):
+        return JiraIssue(key="FOO-1", jira_issue=Mock(fields=SimpleNamespace(
+            assignee=jira_entity(assignee), status=jira_entity(status))))
+
+    old, new = issue("alice", "Open"), issue("bob", "Done")
+    payload = bugjira.diff(old, new).payload()
+    assert payload == {"assignee": {"name": "bob"}, "status": "Done"}
+    results = bugjira.update_issues([old], payload)
+    assert results[0].error is None
+    old.jira_issue.update.assert_called_once_with(
+        fields={"assignee": {"name": "bob"}})
+    bugjira.jira.transition_issue.assert_called_once_with(old.jira_issue,
+                                                          "Done")
+
+
+def test_diff_snapshot_and_fields(bugjira):
+    """
+    GIVEN a projected snapshot of a bug and a later version of the bug
+    WHEN we call Bugjira.diff with and without a list of fields
+    THEN the snapshot is compared with the bug
+    AND only the requested fields are compared when a list is given
+    """
+    old = bugjira.project(bug("1", status="NEW", keywords=[],
+                              last_change_time=None))
+    new = bug("1", status="ASSIGNED", keywords=["x"], last_change_time=None)
+    assert set(bugjira.diff(old, new).changes) == {"status", "keywords"}
+    assert set(bugjira.diff(old, new, fields=["keywords"]).changes) == {
+        "keywords"}
+
+
+def test_diff_invalid_input(bugjira):
+    """
+    GIVEN a Bugjira instance
+    WHEN we call diff with two dicts, or with issues of different backends
+    THEN ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        bugjira.diff({"key": "1"}, {"key": "1"})
+    with pytest.raises(ValueError):
+        bugjira.diff(bug("1"), JiraIssue(key="FOO-1"))
+
+
+def test_diff_many(bugjira):
+    """
+    GIVEN pairs of bugs and jira issues
+    WHEN we call Bugjira.diff_many
+    THEN one ChangeSet is returned per pair, in order
+    AND the fields of each backend are looked up once
+    """
+    pairs = [(bug(str(key), status="NEW"), bug(str(key), status="NEW"))
+             for key in range(100)]
+    pairs[42] = (bug("42", status="NEW"), bug("42", status="CLOSED"))
+    pairs.insert(0, (JiraIssue(key="FOO-1"), JiraIssue(key="FOO-1")))
+    get_fields = Mock(wraps=bugjira._bugzilla_broker.get_fields)
+    bugjira._bugzilla_broker.get_fields = get_fields
+    results = bugjira.diff_many(pairs)
+    assert [result.key for result in results] == ["FOO-1"] + [
+        str(key) for key in range(100)]
+    assert [result.key for result in results if result.changed] == ["42"]
+    assert get_fields.call_count == 1
+
+
+def test_differ_rejects_other_snapshots(bugjira):
+    """
+    GIVEN a Differ
+    WHEN we diff something that is not an Issue or a dict
+    THEN ValueError is raised
+    """
+    differ = Differ(bugjira._bugzilla_broker)
+    with pytest.raises(ValueError):
+        differ.diff("1", {"key": "1"})
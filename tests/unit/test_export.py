@@ -0,0 +1,185 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from bugjira.exceptions import ExportException
+from bugjira.export import (
+    JSONL,
+    PARQUET,
+    JsonLinesExportWriter,
+    export_issues,
+    get_export_writer
+)
+from bugjira.issue import BugzillaIssue
+
+
+@pytest.fixture
+def projecting_bugjira():
+    bugjira = Mock()
+    bugjira.project.side_effect = lambda issue, fields: {"key": issue.key,
+                                                         "status": "NEW"}
+    return bugjira
+
+
+def issues(*keys):
+    return [BugzillaIssue(key=key) for key in keys]
+
+
+def test_jsonl_export(projecting_bugjira, tmp_path):
+    """
+    GIVEN a JsonLinesExportWriter
+    WHEN we export some issues with it
+    THEN the file contains one JSON object per issue
+    """
+    path = str(tmp_path / "export.jsonl")
+    with get_export_writer(JSONL, path) as writer:
+        written = export_issues(projecting_bugjira, issues("1", "2"), writer)
+    assert written == 2
+    with open(path) as export:
+        rows = [json.loads(line) for line in export]
+    assert rows == [{"key": "1", "status": "NEW"},
+                    {"key": "2", "status": "NEW"}]
+
+
+def test_jsonl_resume_truncates_partial_line(projecting_bugjira, tmp_path):
+    """
+    GIVEN a jsonl export without a checkpoint whose last line was only
+        partially written
+    WHEN we resume the export with the same input
+    THEN the partial line is discarded
+    AND the export continues after the last complete line
+    """
+    path = tmp_path / "export.jsonl"
+    path.write_text('{"key": "1"}\n{"key": "2"}\n{"key": "3", "sta')
+    with get_export_writer(JSONL, str(path), resume=True) as writer:
+        assert (writer.offset, writer.last_key) == (2, "2")
+        export_issues(projecting_bugjira, issues("1", "2", "3"), writer,
+                      skip=writer.offset)
+    keys = [json.loads(line)["key"] for line in path.read_text().split("\n")
+            if line]
+    assert keys == ["1", "2", "3"]
+
+
+def test_jsonl_resume_from_checkpoint(projecting_bugjira, tmp_path):
+    """
+    GIVEN a jsonl export that was interrupted after rows were written past
+        its last checkpoint
+    WHEN we resume the export
+    THEN the rows after the checkpoint are dropped
+    AND the export continues from the checkpoint's offset
+    """
+    path = str(tmp_path / "export.jsonl")
+    writer = get_export_writer(JSONL, path)
+    writer.flush_interval = 2
+    export_issues(projecting_bugjira, issues("1", "2", "3"), writer)
+    # The export is interrupted without closing the writer
+    writer._file.flush()
+    with get_export_writer(JSONL, path, resume=True) as writer:
+        assert (writer.offset, writer.last_key) == (2, "2")
+        export_issues(projecting_bugjira, issues("1", "2", "3", "4"), writer,
+                      skip=writer.offset)
+    with get_export_writer(JSONL, path, resume=True) as writer:
+        assert (writer.offset, writer.last_key) == (4, "4")
+    with open(path) as export:
+        assert [json.loads(line)["key"] for line in export] == [
+            "1", "2", "3", "4"]
+
+
+def test_jsonl_last_key_reads_backwards(tmp_path):
+    """
+    GIVEN a jsonl export larger than the writer's read block size
+    WHEN we resume it
+    THEN the last key is still found
+    """
+    path = tmp_path / "export.jsonl"
+    path.write_text("".join(json.dumps({"key": str(n), "pad": "x" * 50}) +
+                            "\n" for n in range(100)))
+    writer = JsonLinesExportWriter.__new__(JsonLinesExportWriter)
+    writer.path = str(path)
+    writer.block_size = 16
+    assert writer._find_last_key() == "99"
+
+
+def test_export_resume_after(projecting_bugjira, tmp_path):
+    """
+    GIVEN an export writer
+    WHEN we export issues with resume_after set
+    THEN only the issues after that key are written
+    AND an ExportException is raised if the key is not among the issues
+    """
+    with get_export_writer(JSONL, str(tmp_path / "export.jsonl")) as writer:
+        assert export_issues(projecting_bugjira, issues("1", "2", "3"),
+                             writer, resume_after="2") == 1
+        with pytest.raises(ExportException):
+            export_issues(projecting_bugjira, issues("1", "3"), writer,
+                          resume_after="2")
+
+
+def test_export_skip(projecting_bugjira, tmp_path):
+    """
+    GIVEN an export writer
+    WHEN we export issues with skip set
+    THEN only the issues after the first skip issues are written
+    """
+    with get_export_writer(JSONL, str(tmp_path / "export.jsonl")) as writer:
+        assert export_issues(projecting_bugjira, issues("1", "2", "3"),
+                             writer, skip=2) == 1
+
+
+def test_parquet_export_and_resume(projecting_bugjira, tmp_path):
+    """
+    GIVEN a ParquetExportWriter with a small row group size
+    WHEN we export issues, then resume the export with more issues
+    THEN one part file is written per row group
+    AND reading the directory returns every row exactly once
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "export")
+    with get_export_writer(PARQUET, path) as writer:
+        writer.row_group_size = 2
+        export_issues(projecting_bugjira, issues("1", "2", "3"), writer)
+    with get_export_writer(PARQUET, path, resume=True) as writer:
+        assert (writer.offset, writer.last_key) == (3, "3")
+        export_issues(projecting_bugjira, issues("1", "2", "3", "4"), writer,
+                      skip=writer.offset)
+    assert len(list((tmp_path / "export").glob("part-*.parquet"))) == 3
+    table = pq.read_table(path)
+    assert table.column("key").to_pylist() == ["1", "2", "3", "4"]
+
+
+def test_parquet_resume_skips_buffered_rows(projecting_bugjira, tmp_path):
+    """
+    GIVEN a parquet export that was interrupted with rows still buffered
+        in memory, and with a part file written after its last checkpoint
+    WHEN we resume the export
+    THEN the buffered rows are not counted as exported
+    AND the part file after the checkpoint is deleted
+    AND reading the directory returns every row exactly once
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "export")
+    writer = get_export_writer(PARQUET, path)
+    writer.row_group_size = 2
+    # The export is interrupted without closing the writer
+    export_issues(projecting_bugjira, issues("1", "2", "3"), writer)
+    stray = tmp_path / "export" / "part-00001.parquet"
+    stray.write_bytes((tmp_path / "export" / "part-00000.parquet")
+                      .read_bytes())
+    with get_export_writer(PARQUET, path, resume=True) as writer:
+        assert (writer.offset, writer.last_key) == (2, "2")
+        assert not stray.exists()
+        export_issues(projecting_bugjira, issues("1", "2", "3", "4"), writer,
+                      skip=writer.offset)
+    table = pq.read_table(path)
+    assert table.column("key").to_pylist() == ["1", "2", "3", "4"]
+
+
+def test_bad_format(tmp_path):
+    """
+    GIVEN the get_export_writer method
+    WHEN it is called with an unsupported format
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        get_export_writer("csv", str(tmp_path / "export.csv"))
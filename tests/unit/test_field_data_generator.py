@@ -5,7 +5,7 @@ from bugjira.common import BUGZILLA, JIRA
 from bugjira.exceptions import FieldDataGeneratorException
 from bugjira.field_data_generator import (
     FieldDataGenerator, BugzillaFieldDataGenerator, JiraFieldDataGenerator,
-    FieldDataGeneratorFactory
+    FieldDataGeneratorFactory, field_config_key
 )
 
 EXPECTED_BZ_FIELD_COUNT = 3
@@ -105,3 +105,20 @@ def test_get_plugin_name_from_config_bad_key():
     factory = FieldDataGeneratorFactory()
     with pytest.raises(ValueError):
         factory._get_plugin_name_from_config("foobar_key", {})
+
+
+def test_field_config_key_leaves_out_credentials(good_config_dict):
+    """
+    GIVEN a config with credentials in its bugzilla and jira sections
+    WHEN we get the field config key of each backend
+    THEN the credentials are not part of the key
+    AND configs that differ only in their credentials share a key
+    """
+    for key_name, backend in (("api_key", BUGZILLA), ("token_auth", JIRA)):
+        secret = good_config_dict[backend][key_name]
+        key = field_config_key(backend, good_config_dict)
+        assert secret not in repr(key)
+        assert good_config_dict[backend]["URL"] in repr(key)
+        other = dict(good_config_dict)
+        other[backend] = dict(good_config_dict[backend], **{key_name: "x"})
+        assert field_config_key(backend, other) == key
@@ -6,7 +6,8 @@ from bugjira.common import BUGZILLA, JIRA
 from bugjira.field_data_generator import (
     BugzillaFieldDataGenerator,
     JiraFieldDataGenerator,
-    FieldDataGeneratorFactory
+    FieldDataGeneratorFactory,
+    field_config_key
 )
 from bugjira.field_generator import FieldGenerator, FieldGeneratorFactory
 from bugjira.field import BugzillaField, JiraField
@@ -41,6 +42,7 @@ class StubbedFieldGeneratorFactory(FieldDataGeneratorFactory):
     via the get_field_data method.
     """
     def __init__(self):
+        super().__init__()
         field_data = {
             "bugzilla_field_data": [
                 get_field_instance_data_dict_from_field_class(BugzillaField)
@@ -56,8 +58,8 @@ class StubbedFieldGeneratorFactory(FieldDataGeneratorFactory):
             instance.field_data = field_data
 
         self.field_data_generators = {
-            BUGZILLA: bzfg,
-            JIRA: jfg
+            field_config_key(BUGZILLA, {}): bzfg,
+            field_config_key(JIRA, {}): jfg
         }
 
 
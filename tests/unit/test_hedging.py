@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from bugjira import deadline
+from bugjira.common import JIRA
+from bugjira.exceptions import BrokerTimeoutException
+from bugjira.hedging import Hedger, LatencyTracker
+
+
+def warm_up(hedger, operation, latency=0.001):
+    for _ in range(hedger.min_samples):
+        hedger._record(operation, latency)
+
+
+def test_latency_tracker():
+    """
+    GIVEN a latency tracker
+    WHEN latencies are recorded
+    THEN its percentiles reflect the most recent ones
+    """
+    tracker = LatencyTracker(size=100)
+    assert tracker.percentile(0.95) is None
+    for latency in range(200):
+        tracker.record(latency)
+    assert len(tracker) == 100
+    assert tracker.percentile(0.95) == 195
+    assert tracker.percentile(0.5) == 150
+
+
+def test_not_hedged_without_samples():
+    """
+    GIVEN a hedger without enough latencies for an operation
+    WHEN the operation is called
+    THEN it runs once in the calling thread and its latency is recorded
+    """
+    hedger = Hedger(JIRA)
+    thread = []
+    assert hedger.call("op", lambda: thread.append(
+        threading.current_thread()) or "done") == "done"
+    assert thread == [threading.current_thread()]
+    assert hedger.stats()[0].samples == 1
+    assert hedger.delay("op") is None
+
+
+def test_hedged_call_keeps_first_answer():
+    """
+    GIVEN a hedger with latencies for an operation
+    WHEN the first attempt is slower than the hedge delay
+    THEN a second attempt is sent, its answer is kept, and the first attempt
+        is cancelled
+    """
+    hedger = Hedger(JIRA)
+    warm_up(hedger, "op")
+    attempts = []
+    first_cancelled = threading.Event()
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            while not deadline.is_cancelled():
+                time.sleep(0.005)
+            first_cancelled.set()
+            return "slow"
+        return "fast"
+
+    assert hedger.call("op", call) == "fast"
+    assert first_cancelled.wait(5)
+    stats = hedger.stats()[0]
+    assert (stats.calls, stats.hedged, stats.hedge_wins) == (1, 1, 1)
+
+
+def test_hedge_delay_counts_losing_attempts():
+    """
+    GIVEN a hedger with latencies for an operation
+    WHEN the first attempt of every call is slow and loses to a fast second
+        attempt
+    THEN the hedge delay does not shrink
+    """
+    hedger = Hedger(JIRA)
+    hedger._trackers["op"] = LatencyTracker(size=hedger.min_samples)
+    warm_up(hedger, "op", latency=0.05)
+    delay = hedger.delay("op")
+
+    def make_call():
+        attempts = []
+
+        def call():
+            attempts.append(None)
+            if len(attempts) == 1:
+                while not deadline.is_cancelled():
+                    time.sleep(0.005)
+                return "slow"
+            return "fast"
+        return call
+
+    for _ in range(hedger.min_samples):
+        assert hedger.call("op", make_call()) == "fast"
+    assert hedger.delay("op") >= delay
+    assert hedger.stats()[0].hedge_wins == hedger.min_samples
+
+
+def test_hedged_call_survives_one_error():
+    """
+    GIVEN a hedged call whose first attempt fails after the second is sent
+    WHEN the second attempt succeeds
+    THEN its answer is returned
+    """
+    hedger = Hedger(JIRA)
+    warm_up(hedger, "op")
+    attempts = []
+    second_sent = threading.Event()
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            second_sent.wait(5)
+            raise ConnectionError("reset")
+        second_sent.set()
+        time.sleep(0.05)
+        return "ok"
+
+    assert hedger.call("op", call) == "ok"
+
+
+def test_hedged_call_deadline():
+    """
+    GIVEN a hedged call within a deadline
+    WHEN neither attempt answers in time
+    THEN the call gives up, and the deadline reports a timeout
+    """
+    hedger = Hedger(JIRA)
+    warm_up(hedger, "op")
+    release = threading.Event()
+    with pytest.raises(BrokerTimeoutException) as info:
+        with deadline.deadline(0.1):
+            hedger.call("op", release.wait)
+    assert isinstance(info.value.__cause__, deadline.DeadlineExceeded)
+    release.set()
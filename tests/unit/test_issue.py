@@ -1,7 +1,12 @@
 import pytest
 from pydantic import ValidationError
 
-from bugjira.issue import BugzillaIssue, JiraIssue
+from bugjira.issue import (
+    BugzillaIssue,
+    JiraIssue,
+    LazyBugzillaIssue,
+    LazyJiraIssue
+)
 
 
 def test_good_bz_keys(good_bz_keys):
@@ -46,3 +51,31 @@ def test_bad_jira_keys(bad_jira_keys):
     for key in bad_jira_keys:
         with pytest.raises(ValidationError):
             JiraIssue(key=key)
+
+
+def test_issue_is_loaded():
+    """
+    GIVEN an issue created with its backend data
+    WHEN we check whether it is loaded
+    THEN it is, and its backend data can be read without a lookup
+    """
+    issue = BugzillaIssue(key="123", bugzilla="bug")
+    assert issue.is_loaded
+    assert issue.bugzilla == "bug"
+
+
+def test_lazy_issue_classes(bad_bz_keys, bad_jira_keys):
+    """
+    GIVEN the issue classes
+    WHEN we check how their attributes are read, and create lazy issues
+    THEN only the lazy classes hook attribute access
+    AND lazy issues are issues of their backend, with the same key checks
+    """
+    for issue_class in (BugzillaIssue, JiraIssue):
+        assert issue_class.__getattribute__ is object.__getattribute__
+    assert isinstance(LazyBugzillaIssue(key="1"), BugzillaIssue)
+    assert isinstance(LazyJiraIssue(key="FOO-1"), JiraIssue)
+    with pytest.raises(ValidationError):
+        LazyBugzillaIssue(key=bad_bz_keys[0])
+    with pytest.raises(ValidationError):
+        LazyJiraIssue(key=bad_jira_keys[0])
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from bugjira.jsonstream import JsonArrayStream
+
+
+def chunked(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+DOCUMENT = {
+    "startAt": 0,
+    "total": 12345,
+    "issues": [
+        {"key": "FOO-1", "fields": {"summary": "a [tricky] {one}, \"quoted\""}},
+        {"key": "FOO-2", "fields": {"points": 12345, "labels": []}},
+        {"key": "FOO-3", "fields": {"summary": "été"}},
+    ],
+    "warningMessages": ["done"],
+}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 4096])
+def test_stream_items_and_meta(size):
+    """
+    GIVEN a JSON document split into chunks of various sizes
+    WHEN we stream the items of its issues array
+    THEN each item is decoded exactly as the whole document would be
+    AND the other members are collected in meta
+    """
+    text = json.dumps(DOCUMENT, indent=1)
+    stream = JsonArrayStream(chunked(text, size), "issues")
+    assert list(stream) == DOCUMENT["issues"]
+    assert stream.meta == {"startAt": 0, "total": 12345,
+                           "warningMessages": ["done"]}
+
+
+def test_stream_bytes_split_inside_character():
+    """
+    GIVEN a utf-8 encoded JSON document split in the middle of a multi-byte
+        character
+    WHEN we stream its items
+    THEN the characters are decoded correctly
+    """
+    data = json.dumps({"issues": ["été"]},
+                      ensure_ascii=False).encode("utf-8")
+    assert list(JsonArrayStream(chunked(data, 1), "issues")) == [
+        "été"]
+
+
+def test_stream_large_item_decoded_once():
+    """
+    GIVEN a document with a large item, with escaped quotes and brackets in
+        its strings, split into many small chunks
+    WHEN we stream its items
+    THEN the item is decoded correctly
+    AND each value, including the array's key, is decoded once rather than
+        once per chunk
+    """
+    item = {"key": "FOO-1", "fields": {"description": "a \\\"[{" * 2000}}
+    text = json.dumps({"issues": [item, 12345]})
+    stream = JsonArrayStream(chunked(text, 16), "issues")
+    stream._decoder.raw_decode = Mock(wraps=stream._decoder.raw_decode)
+    assert list(stream) == [item, 12345]
+    assert stream._decoder.raw_decode.call_count == 3
+
+
+def test_stream_truncated_document():
+    """
+    GIVEN a JSON document that ends in the middle of an item
+    WHEN we stream its items
+    THEN the complete items are yielded and then a ValueError is raised
+    """
+    text = json.dumps(DOCUMENT)[:-60]
+    stream = iter(JsonArrayStream(chunked(text, 10), "issues"))
+    assert next(stream)["key"] == "FOO-1"
+    with pytest.raises(ValueError):
+        list(stream)
@@ -0,0 +1,83 @@
+import pytest
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.keys import (
+    INVALID,
+    classify_key,
+    key_from_url,
+    normalize_key,
+    partition_keys
+)
+
+
+@pytest.mark.parametrize("key, expected", [
+    ("123", (BUGZILLA, "123")),
+    (" 123\n", (BUGZILLA, "123")),
+    ("FOO-1", (JIRA, "FOO-1")),
+    ("foo-1", (JIRA, "FOO-1")),
+    ("\tfoo_1 ", (JIRA, "FOO-1")),
+    ("MY_PROJ_12", (JIRA, "MY_PROJ-12")),
+    ("https://bz.example.com/show_bug.cgi?id=42", (BUGZILLA, "42")),
+    ("https://jira.example.com/browse/foo-7", (JIRA, "FOO-7")),
+    ("https://jira.example.com/secure/RapidBoard.jspa?selectedIssue=FOO-8",
+     (JIRA, "FOO-8")),
+    ("ABC-1xyz", (None, "ABC-1xyz")),
+    ("1a", (None, "1a")),
+    ("https://jira.example.com/browse", (None,
+                                         "https://jira.example.com/browse")),
+])
+def test_classify_key(key, expected):
+    """
+    GIVEN the classify_key method
+    WHEN it is called with keys, padded or lower-case keys, URLs and
+        non-keys
+    THEN it returns the backend and the normalized key, or None and the input
+    """
+    assert classify_key(key) == expected
+
+
+def test_classify_key_with_non_str():
+    """
+    GIVEN the classify_key method
+    WHEN it is called with a non-str input
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        classify_key(1)
+
+
+def test_normalize_key():
+    """
+    GIVEN the normalize_key method
+    WHEN it is called with a key and with a non-key
+    THEN it returns the normalized key, or raises a ValueError
+    """
+    assert normalize_key(" foo_12 ") == "FOO-12"
+    with pytest.raises(ValueError):
+        normalize_key("ABC-1xyz")
+
+
+def test_key_from_url():
+    """
+    GIVEN the key_from_url method
+    WHEN it is called with a show_bug URL without a valid id
+    THEN it returns None
+    """
+    assert key_from_url("https://bz.example.com/show_bug.cgi?id=abc") is None
+    assert key_from_url("https://bz.example.com/show_bug.cgi") is None
+
+
+def test_partition_keys():
+    """
+    GIVEN the partition_keys method
+    WHEN it is called with a mix of keys, duplicates and non-keys
+    THEN the unique normalized keys are grouped by backend in first-seen
+        order, and the non-keys are returned separately
+    """
+    keys = ["FOO-2", "123", "foo_2", " 123", "bar-1", "ABC-1xyz", None,
+            "https://bz.example.com/show_bug.cgi?id=7", "7"]
+    assert partition_keys(keys) == {
+        BUGZILLA: ["123", "7"],
+        JIRA: ["FOO-2", "BAR-1"],
+        INVALID: ["ABC-1xyz", None],
+    }
@@ -0,0 +1,201 @@
+from unittest.mock import Mock, create_autospec
+
+import pytest
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+import bugjira.local as local
+from bugjira.bugjira import Bugjira
+from bugjira.comment import Comment
+from bugjira.common import BUGZILLA
+from bugjira.field import BugzillaField, JiraField
+from bugjira.webhooks import DELETED, ChangeEvent
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def bugjira(good_config_dict):
+    bugjira = Bugjira(config_dict=dict(good_config_dict,
+                                       local_store={"enabled": True}))
+    bugjira._bugzilla_broker._fields = [
+        BugzillaField(name="summary"), BugzillaField(name="status"),
+        BugzillaField(name="component"), BugzillaField(name="keywords")]
+    bugjira._jira_broker._fields = [
+        JiraField(name="summary", jira_field_id="summary"),
+        JiraField(name="status", jira_field_id="status")]
+    bugs = [
+        Mock(id=1, summary="Crash on startup", status="NEW",
+             component="core", keywords=["Regression", "Triaged"]),
+        Mock(id=2, summary="Typo in docs", status="NEW", component="docs",
+             keywords=[]),
+        Mock(id=3, summary="Slow search", status="ASSIGNED",
+             component="core", keywords=["Triaged"]),
+    ]
+    bugjira.bugzilla.getbugs.return_value = bugs
+    bugjira.get_issues(["1", "2", "3"])
+    return bugjira
+
+
+def keys(result):
+    return [row["key"] for row in result.rows]
+
+
+def test_local_query_filters(bugjira):
+    """
+    GIVEN a Bugjira instance with the local store enabled, which has looked
+        up some bugs
+    WHEN we query the local store with field filters
+    THEN the matching bugs are returned without any request
+    AND list fields match any of their items, and None matches unset fields
+    AND the result says when the bugs were fetched
+    """
+    bugjira.bugzilla.reset_mock()
+    result = bugjira.local_query({"component": "core", "status": "NEW"})
+    assert keys(result) == ["1"]
+    assert result.rows[0]["summary"] == "Crash on startup"
+    assert result.oldest is not None
+    assert 0 <= result.staleness < 60
+    assert result.stale == []
+    assert keys(bugjira.local_query(
+        {"status": ["NEW", "ASSIGNED"]}, backend=BUGZILLA)) == ["1", "2", "3"]
+    assert keys(bugjira.local_query({"keywords": "Triaged"})) == ["1", "3"]
+    assert keys(bugjira.local_query({"keywords": None})) == ["2"]
+    assert bugjira.local_query({"component": "ui"}).rows == []
+    assert bugjira.local_query(fields=["status"], limit=1).rows == [
+        {"key": "1", "status": "NEW"}]
+    assert bugjira.bugzilla.method_calls == []
+
+
+def test_local_query_text(bugjira, monkeypatch):
+    """
+    GIVEN a Bugjira instance with the local store enabled, which has looked
+        up some bugs and fetched their comments
+    WHEN we query the local store with full-text queries
+    THEN bugs whose summary or comments match are returned
+    """
+    comments = [Comment(key="2", id="20", body="The installer segfaults")]
+    monkeypatch.setattr(bugjira._bugzilla_broker, "get_comments",
+                        lambda issues, since: iter(comments))
+    list(bugjira.get_comments(
+        [result.issue for result in bugjira.get_issues(["1", "2"])]))
+    assert keys(bugjira.local_query(text="crash")) == ["1"]
+    assert keys(bugjira.local_query(text="segfaults")) == ["2"]
+    assert keys(bugjira.local_query({"component": "core"},
+                                    text="crash OR segfaults")) == ["1"]
+    with pytest.raises(ValueError):
+        bugjira.local_query(text="AND")
+
+
+def test_local_store_changes(bugjira):
+    """
+    GIVEN a Bugjira instance with the local store enabled
+    WHEN bugs are updated, or changed or deleted by pushed events
+    THEN changed bugs are reported as stale until they are fetched again
+    AND deleted bugs are dropped
+    """
+    bugjira.bugzilla.build_update.return_value = {}
+    bugjira.update_issues([bugjira.get_issue("1", lazy=True)],
+                          {"status": "ASSIGNED"})
+    bugjira.apply_event(ChangeEvent(backend=BUGZILLA, key="3"))
+    bugjira.apply_event(ChangeEvent(backend=BUGZILLA, key="2",
+                                    action=DELETED))
+    result = bugjira.local_query()
+    assert keys(result) == ["1", "3"]
+    assert result.stale == ["1", "3"]
+    bugjira.bugzilla.getbugs.return_value = [
+        Mock(id=3, summary="Slow search", status="CLOSED",
+             component="core", keywords=[])]
+    bugjira.get_issues(["3"])
+    result = bugjira.local_query({"status": "CLOSED"})
+    assert keys(result) == ["3"]
+    assert result.stale == []
+
+
+def test_add_comment_marks_stale(bugjira):
+    """
+    GIVEN a Bugjira instance with the local store enabled
+    WHEN a comment is added to a stored bug
+    THEN the bug is reported as stale
+    """
+    bugjira.add_comment(bugjira.get_issue("1", lazy=True), "Still crashes")
+    assert bugjira.local_query().stale == ["1"]
+
+
+def test_local_store_search(bugjira):
+    """
+    GIVEN a Bugjira instance with the local store enabled
+    WHEN we search with and without a list of fields
+    THEN only the issues found with all their fields are stored
+    """
+    bugjira.bugzilla.query.return_value = [
+        Mock(id=4, summary="Found", status="NEW", component="ui",
+             keywords=[])]
+    list(bugjira.search({"product": "foo"}, BUGZILLA, fields=["status"]))
+    assert bugjira.local_query({"component": "ui"}).rows == []
+    list(bugjira.search({"product": "foo"}, BUGZILLA))
+    assert keys(bugjira.local_query({"component": "ui"})) == ["4"]
+
+
+def test_local_query_indexes(bugjira):
+    """
+    GIVEN a local store
+    WHEN a field filter is planned
+    THEN it is answered from the field index
+    """
+    plan = bugjira.local_store._db.execute(
+        "EXPLAIN QUERY PLAN SELECT issue FROM field_values "
+        "WHERE name = ? AND value IN (?)", ("status", "NEW")).fetchall()
+    assert any("field_values_by_value" in row[-1] for row in plan)
+
+
+def test_local_query_instance(bugjira):
+    """
+    GIVEN a local store holding bugs of the default and a named instance
+    WHEN we query it by instance, with and without a backend
+    THEN only the issues of the requested instance are returned
+    AND querying an instance that is not configured raises ValueError
+    """
+    partner = Mock(generator_type=BUGZILLA, instance="partnerbz")
+    partner.project.side_effect = lambda issue: issue
+    bugjira.local_store.put(partner, [{"key": "7", "status": "NEW"}])
+    store = bugjira.local_store
+    assert keys(store.query(instance="partnerbz")) == ["partnerbz:7"]
+    assert keys(store.query(backend=BUGZILLA, instance="partnerbz")) == [
+        "partnerbz:7"]
+    assert keys(store.query(backend=BUGZILLA)) == ["1", "2", "3"]
+    assert len(store.query().rows) == 4
+    with pytest.raises(ValueError):
+        bugjira.local_query(instance="partnerbz")
+
+
+def test_local_query_invalid(bugjira, good_config_dict):
+    """
+    GIVEN Bugjira instances with and without the local store
+    WHEN we query with an unconfigured field, or without a store
+    THEN ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        bugjira.local_query({"severity": "high"})
+    with pytest.raises(ValueError):
+        bugjira.local_query({"component": "core"}, backend="jira")
+    with pytest.raises(ValueError):
+        Bugjira(config_dict=good_config_dict).local_query()
+
+
+def test_local_store_requires_fts5(good_config_dict, monkeypatch):
+    """
+    GIVEN an SQLite library without the full-text search extension
+    WHEN we create a Bugjira instance with the local store enabled
+    THEN ImportError is raised, naming the missing extension
+    """
+    monkeypatch.setattr(local, "_SCHEMA", local._SCHEMA.replace(
+        "USING fts5", "USING fts5_missing"))
+    with pytest.raises(ImportError, match="FTS5"):
+        Bugjira(config_dict=dict(good_config_dict,
+                                 local_store={"enabled": True}))
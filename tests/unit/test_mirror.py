@@ -0,0 +1,244 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, create_autospec
+
+import pytest
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+from bugjira.bugjira import Bugjira
+from bugjira.comment import Comment
+from bugjira.field import BugzillaField, JiraField
+from bugjira.mirror import COMMENT_MARKER
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def server():
+    """The state of the fake bugzilla and jira servers"""
+    return Mock(bugs={}, updated=set(), comments={}, jira_comments={},
+                created=0)
+
+
+@pytest.fixture
+def bugjira(good_config_dict, server):
+    bugjira = Bugjira(config_dict=good_config_dict)
+    bugjira._bugzilla_broker._fields = [BugzillaField(name="status"),
+                                        BugzillaField(name="summary")]
+    bugjira._jira_broker._fields = [
+        JiraField(name="status", jira_field_id="status"),
+        JiraField(name="summary", jira_field_id="summary"),
+        JiraField(name="project", jira_field_id="project")]
+
+    def query(query):
+        found = [bug for key, bug in sorted(server.bugs.items())
+                 if "last_change_time" not in query or key in server.updated]
+        return found[query["offset"]:query["offset"] + query["limit"]]
+
+    def create_issues(specs, prefetch):
+        created = []
+        for _ in specs:
+            server.created += 1
+            created.append({"issue": Mock(key=f"FOO-{server.created}"),
+                            "error": None})
+        return created
+
+    def get_comments(issues, since=None):
+        for issue in issues:
+            for comment in server.comments.get(issue.key, []):
+                if not since or issue.key not in since or \
+                        comment.created > since[issue.key]:
+                    yield comment
+
+    def get_jira_comments(issues, since=None):
+        for issue in issues:
+            for body in server.jira_comments.get(issue.key, []):
+                yield Comment(key=issue.key, id="1", body=body)
+
+    def add_comment(key, body):
+        server.jira_comments.setdefault(key, []).append(body)
+
+    bugjira.bugzilla.query.side_effect = query
+    bugjira.bugzilla.getbugs.side_effect = lambda keys, permissive: [
+        server.bugs[key] for key in keys]
+    bugjira._bugzilla_broker.get_comments = get_comments
+    bugjira._jira_broker.get_comments = get_jira_comments
+    bugjira.jira.create_issues.side_effect = create_issues
+    bugjira.jira.add_comment.side_effect = add_comment
+    return bugjira
+
+
+def add_bug(server, key, comments=(), **fields):
+    fields = dict({"status": "NEW", "summary": f"bug {key}",
+                   "depends_on": [], "blocks": [], "external_bugs": []},
+                  **fields)
+    server.bugs[key] = Mock(id=int(key), **fields)
+    server.comments[key] = [
+        Comment(key=key, id=f"{key}{number}", author="alice",
+                created=NOW - timedelta(hours=10 - number), body=text)
+        for number, text in enumerate(comments)]
+
+
+@pytest.fixture
+def mirror(bugjira, tmp_path):
+    with bugjira.mirror(str(tmp_path / "mirror.db"), {"product": "foo"},
+                        {"status": "status", "summary": "summary"},
+                        defaults={"project": "FOO"},
+                        values={"status": {"ASSIGNED": "Start"}}) as mirror:
+        yield mirror
+
+
+def test_first_sync(bugjira, server, mirror):
+    """
+    GIVEN two bugzilla bugs, one blocking the other and one with comments
+    WHEN we sync a new mirror
+    THEN a jira issue is created for each bug with the translated fields,
+        leaving the statuses to transitions
+    AND the comments are copied with their markers
+    AND the dependency is mirrored as a link between the issues
+    """
+    add_bug(server, "1", comments=["first", "second"], blocks=[2],
+            status="ASSIGNED")
+    add_bug(server, "2", depends_on=[1])
+    stats = mirror.sync()
+    assert stats.errors == {}
+    assert (stats.read, stats.created, stats.comments, stats.links) == (
+        2, 2, 2, 1)
+    specs = bugjira.jira.create_issues.call_args.args[0]
+    assert specs == [{"project": "FOO", "summary": "bug 1"},
+                     {"project": "FOO", "summary": "bug 2"}]
+    assert sorted(call.args[1] for call in
+                  bugjira.jira.transition_issue.call_args_list) == [
+        "NEW", "Start"]
+    assert server.jira_comments["FOO-1"] == [
+        f"{COMMENT_MARKER.format(id='10')} alice wrote:\n\nfirst",
+        f"{COMMENT_MARKER.format(id='11')} alice wrote:\n\nsecond"]
+    bugjira.jira.create_issue_link.assert_called_once_with("Blocks",
+                                                           "FOO-1", "FOO-2")
+
+
+def test_sync_writes_only_changes(bugjira, server, mirror):
+    """
+    GIVEN a mirror that has been synced
+    WHEN nothing changes, and then two bugs get the same new status and one
+        gets a new comment
+    THEN the next syncs only ask for the bugs changed since the watermark
+    AND only the changed bugs are written, the two status changes with one
+        update_issues call
+    """
+    for key in "123":
+        add_bug(server, key, comments=["old"])
+    mirror.sync()
+    bugjira.jira.reset_mock()
+    bugjira.update_issues = Mock(wraps=bugjira.update_issues)
+
+    stats = mirror.sync()
+    query = bugjira.bugzilla.query.call_args.args[0]
+    assert "last_change_time" in query
+    assert (stats.read, stats.created, stats.updated, stats.comments) == (
+        0, 0, 0, 0)
+
+    server.bugs["1"].status = "ASSIGNED"
+    server.bugs["2"].status = "ASSIGNED"
+    server.comments["3"].append(Comment(key="3", id="99", created=NOW,
+                                        body="new"))
+    server.updated.update({"1", "2", "3"})
+    stats = mirror.sync()
+    assert (stats.read, stats.updated, stats.comments) == (3, 2, 1)
+    assert bugjira.update_issues.call_count == 1
+    assert bugjira.jira.transition_issue.call_count == 2
+    assert server.jira_comments["FOO-3"][-1].endswith("new")
+    assert not bugjira.jira.create_issues.called
+
+    # The overlap reads the same bugs again, but nothing is written
+    stats = mirror.sync()
+    assert (stats.read, stats.updated, stats.comments) == (3, 0, 0)
+    assert bugjira.update_issues.call_count == 1
+
+
+def test_failed_comment_is_retried_once(bugjira, server, mirror):
+    """
+    GIVEN a bug whose second comment fails to post
+    WHEN we sync, and then sync again without the bug changing
+    THEN the first sync reports the bug
+    AND the second sync rereads it and posts only the missing comment
+    """
+    add_bug(server, "1", comments=["first", "second"])
+    add_comment = bugjira.jira.add_comment.side_effect
+
+    def flaky(key, body):
+        if body.endswith("second") and flaky.failed is False:
+            flaky.failed = True
+            raise Exception("boom")
+        add_comment(key, body)
+    flaky.failed = False
+    bugjira.jira.add_comment.side_effect = flaky
+    stats = mirror.sync()
+    assert list(stats.errors) == ["1"]
+    assert len(server.jira_comments["FOO-1"]) == 1
+    stats = mirror.sync()
+    assert stats.errors == {}
+    assert stats.comments == 1
+    assert [body.rsplit("\n", 1)[1]
+            for body in server.jira_comments["FOO-1"]] == ["first", "second"]
+
+
+def test_interrupted_comment_is_not_posted_twice(bugjira, server, mirror):
+    """
+    GIVEN a comment recorded as being posted, which is on the jira issue
+    WHEN we sync
+    THEN the comment is found by its marker and not posted again
+    """
+    add_bug(server, "1")
+    mirror.sync()
+    comment = Comment(key="1", id="7", created=NOW, body="text")
+    server.comments["1"].append(comment)
+    server.updated.add("1")
+    mirror.store.begin_comments([("7", "1")])
+    server.jira_comments["FOO-1"] = [
+        f"{COMMENT_MARKER.format(id='7')}\n\ntext"]
+    stats = mirror.sync()
+    assert stats.comments == 0
+    assert len(server.jira_comments["FOO-1"]) == 1
+    assert mirror.store.get_comments(["7"]) == {"7": True}
+
+
+def test_interrupted_create_is_not_repeated(bugjira, server, mirror):
+    """
+    GIVEN a bug whose jira issue creation fails without a response
+    WHEN we sync again
+    THEN no issue is created and the bug is reported
+    AND once the issue is recorded with add_mapping, it is synced
+    """
+    add_bug(server, "1", status="ASSIGNED")
+    bugjira.jira.create_issues.side_effect = Exception("timed out")
+    assert list(mirror.sync().errors) == ["1"]
+    bugjira.jira.create_issues.side_effect = None
+    stats = mirror.sync()
+    assert "add_mapping" in stats.errors["1"]
+    assert bugjira.jira.create_issues.call_count == 1
+    mirror.add_mapping("1", "FOO-9")
+    stats = mirror.sync()
+    assert stats.errors == {}
+    assert stats.updated == 1
+    assert bugjira.jira.issue.call_args.args[0] == "FOO-9"
+
+
+def test_mirror_invalid_fields(bugjira, tmp_path):
+    """
+    GIVEN a Bugjira instance
+    WHEN we create a mirror with a field that is not configured
+    THEN ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        bugjira.mirror(str(tmp_path / "mirror.db"), {},
+                       {"status": "resolution"})
+    with pytest.raises(ValueError):
+        bugjira.mirror(str(tmp_path / "mirror.db"), {}, {})
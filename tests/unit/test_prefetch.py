@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from bugjira.prefetch import Prefetcher
+
+
+def test_prefetch_yields_all_items():
+    """
+    GIVEN a Prefetcher wrapping an iterable
+    WHEN we iterate over it
+    THEN every item is yielded in order
+    """
+    assert list(Prefetcher(range(10), depth=2)) == list(range(10))
+
+
+def test_prefetch_disabled():
+    """
+    GIVEN a Prefetcher with a depth of 0
+    WHEN we iterate over it
+    THEN the items are yielded without starting a background thread
+    """
+    threads = threading.active_count()
+    stream = iter(Prefetcher(range(3), depth=0))
+    assert next(stream) == 0
+    assert threading.active_count() == threads
+
+
+def test_prefetch_fetches_ahead():
+    """
+    GIVEN a Prefetcher wrapping a generator of pages
+    WHEN the consumer is working on the first page
+    THEN the second page is fetched in the background
+    """
+    second_fetched = threading.Event()
+
+    def pages():
+        yield "page 1"
+        second_fetched.set()
+        yield "page 2"
+
+    stream = iter(Prefetcher(pages(), depth=1))
+    assert next(stream) == "page 1"
+    assert second_fetched.wait(timeout=5)
+    assert list(stream) == ["page 2"]
+
+
+def test_prefetch_raises_errors():
+    """
+    GIVEN a Prefetcher wrapping a generator that raises an exception
+    WHEN we iterate over it
+    THEN the items before the error are yielded and the error is raised
+    """
+    def pages():
+        yield 1
+        raise RuntimeError("boom")
+
+    stream = iter(Prefetcher(pages()))
+    assert next(stream) == 1
+    with pytest.raises(RuntimeError):
+        next(stream)
+
+
+def test_prefetch_cancels_when_consumer_stops():
+    """
+    GIVEN a Prefetcher wrapping an endless generator
+    WHEN the consumer stops after the first item
+    THEN the generator is closed by the background thread
+    """
+    closed = threading.Event()
+
+    def pages():
+        try:
+            while True:
+                yield "page"
+        finally:
+            closed.set()
+
+    stream = iter(Prefetcher(pages(), depth=2))
+    next(stream)
+    stream.close()
+    assert closed.wait(timeout=5)
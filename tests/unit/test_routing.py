@@ -0,0 +1,126 @@
+from unittest.mock import Mock
+
+import pytest
+
+from bugjira.common import BUGZILLA, JIRA
+from bugjira.issue import BugzillaIssue, JiraIssue
+from bugjira.routing import Router
+
+
+def broker(backend, url=None):
+    return Mock(generator_type=backend,
+                config={backend: {"URL": url}} if url else None)
+
+
+@pytest.fixture
+def router():
+    router = Router(broker(BUGZILLA), broker(JIRA))
+    router.add_instance(BUGZILLA, "partnerbz", broker(BUGZILLA),
+                        hints=["pbz"])
+    router.add_instance(JIRA, "partner", broker(JIRA), projects=["part"])
+    return router
+
+
+def test_route_default_instances(router):
+    """
+    GIVEN a router with named instances
+    WHEN we route unqualified keys whose projects are not routed elsewhere
+    THEN they go to the default instances
+    """
+    assert router.route("123") == (router.bugzilla, "123")
+    assert router.route("FOO-1") == (router.jira, "FOO-1")
+
+
+def test_route_jira_project(router):
+    """
+    GIVEN a router with a jira instance that hosts the PART project
+    WHEN we route a PART key
+    THEN it goes to that instance regardless of case, with a normalized key
+    """
+    assert router.route("part-7") == (router.get(JIRA, "partner"), "PART-7")
+    assert router.route(" part_7 ") == (router.get(JIRA, "partner"), "PART-7")
+
+
+def test_route_urls():
+    """
+    GIVEN a router whose instances have configured URLs
+    WHEN we route bug and issue URLs
+    THEN they go to the instance with the same host
+    """
+    router = Router(broker(BUGZILLA, "https://bz.example.com"),
+                    broker(JIRA, "https://jira.example.com"))
+    partner_bz = broker(BUGZILLA, "https://partner-bz.example.com")
+    partner = broker(JIRA, "https://partner.example.com")
+    router.add_instance(BUGZILLA, "partnerbz", partner_bz)
+    router.add_instance(JIRA, "partner", partner)
+    assert router.route(
+        "https://partner-bz.example.com/show_bug.cgi?id=12") == \
+        (partner_bz, "12")
+    assert router.route("https://bz.example.com/show_bug.cgi?id=12") == \
+        (router.bugzilla, "12")
+    assert router.route("https://partner.example.com/browse/foo-3") == \
+        (partner, "FOO-3")
+    assert router.route("https://elsewhere.example.com/browse/FOO-3") == \
+        (router.jira, "FOO-3")
+
+
+def test_route_qualified_keys(router):
+    """
+    GIVEN a router with named instances
+    WHEN we route keys qualified with an instance name or hint
+    THEN they go to that instance without the qualifier
+    """
+    partner_bz = router.get(BUGZILLA, "partnerbz")
+    assert router.route("partnerbz:123") == (partner_bz, "123")
+    assert router.route("pbz:123") == (partner_bz, "123")
+    assert router.route("partner:FOO-1") == (router.get(JIRA, "partner"),
+                                             "FOO-1")
+
+
+@pytest.mark.parametrize("key", ["partnerbz:FOO-1", "nowhere:123", "abc"])
+def test_route_bad_keys(router, key):
+    """
+    GIVEN a router with named instances
+    WHEN we route a key that does not match its instance's backend, has an
+        unknown qualifier, or is not a key
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        router.route(key)
+
+
+def test_for_issue(router):
+    """
+    GIVEN issues that record the instance they came from
+    WHEN we route them
+    THEN they go to that instance, while issues without one are routed by key
+    """
+    assert router.for_issue(BugzillaIssue(key="1", instance="partnerbz")) is \
+        router.get(BUGZILLA, "partnerbz")
+    assert router.for_issue(JiraIssue(key="PART-1")) is \
+        router.get(JIRA, "partner")
+    assert router.for_issue(JiraIssue(key="FOO-1")) is router.jira
+
+
+def test_add_instance_conflicts(router):
+    """
+    GIVEN a router with named instances
+    WHEN we add an instance whose name or project is already routed
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        router.add_instance(JIRA, "pbz", broker(JIRA))
+    with pytest.raises(ValueError):
+        router.add_instance(JIRA, "other", broker(JIRA), projects=["PART"])
+
+
+def test_get_unknown_instance(router):
+    """
+    GIVEN a router
+    WHEN we ask for an unknown instance or backend
+    THEN a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        router.get(JIRA, "nowhere")
+    with pytest.raises(ValueError):
+        router.get("trac")
@@ -0,0 +1,300 @@
+import threading
+import time
+from copy import deepcopy
+from unittest.mock import Mock
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import bugjira.broker as broker
+from bugjira import deadline
+from bugjira.broker import JiraBroker
+from bugjira.common import JIRA
+from bugjira.concurrency import AdaptiveLimiter
+from bugjira.scheduling import (
+    BULK,
+    INTERACTIVE,
+    NORMAL,
+    ContextThreadPoolExecutor,
+    Dispatcher,
+    FairQueue,
+    get_priority,
+    iter_with_priority,
+    priority
+)
+
+
+def test_priority_context():
+    """
+    GIVEN the priority context manager
+    WHEN it is nested, given None, or given an unknown class
+    THEN the innermost class applies, None changes nothing, and an unknown
+        class raises a ValueError
+    """
+    assert get_priority() == NORMAL
+    with priority(BULK):
+        assert get_priority() == BULK
+        with priority(INTERACTIVE):
+            assert get_priority() == INTERACTIVE
+        with priority(None):
+            assert get_priority() == BULK
+    assert get_priority() == NORMAL
+    with pytest.raises(ValueError):
+        with priority("urgent"):
+            pass
+
+
+def test_iter_with_priority():
+    """
+    GIVEN a generator that records the priority it runs with
+    WHEN it is iterated with iter_with_priority
+    THEN it runs with that priority while the consumer keeps its own
+    """
+    def produce():
+        for _ in range(2):
+            yield get_priority()
+
+    consumed = []
+    for produced in iter_with_priority(produce(), BULK):
+        consumed.append((produced, get_priority()))
+    assert consumed == [(BULK, NORMAL), (BULK, NORMAL)]
+
+
+def test_executor_keeps_priority():
+    """
+    GIVEN a ContextThreadPoolExecutor
+    WHEN tasks are submitted with a priority
+    THEN they run with that priority
+    """
+    with priority(BULK), ContextThreadPoolExecutor(max_workers=2) as executor:
+        priorities = list(executor.map(lambda _: get_priority(), range(4)))
+    assert priorities == [BULK] * 4
+
+
+def test_executor_passes_keyword_arguments():
+    """
+    GIVEN a ContextThreadPoolExecutor
+    WHEN a task is submitted with keyword arguments named fn and self
+    THEN they are passed to the task
+    """
+    with ContextThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(lambda fn, self: (fn, self), fn=1, self=2)
+    assert future.result() == (1, 2)
+
+
+def test_fair_queue_weights():
+    """
+    GIVEN a fair queue with many bulk requests waiting
+    WHEN as many interactive requests arrive
+    THEN interactive requests are let through sixteen times as often
+    """
+    queue = FairQueue()
+    for name in BULK, INTERACTIVE:
+        for _ in range(32):
+            queue.push(name)
+    assert queue.waiting() == {INTERACTIVE: 32, NORMAL: 0, BULK: 32}
+    first = [queue.pop().priority for _ in range(17)]
+    assert first.count(INTERACTIVE) == 16
+    assert first.count(BULK) == 1
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_limiter_lets_interactive_requests_through_first():
+    """
+    GIVEN a limiter whose only slot is taken, with a bulk request waiting
+    WHEN an interactive request arrives and the slot is freed
+    THEN the interactive request gets the slot before the bulk request
+    """
+    limiter = AdaptiveLimiter(JIRA, initial_limit=1, max_limit=1)
+    started = limiter.acquire()
+    order = []
+
+    def request(name):
+        limiter.release(limiter.acquire(name))
+        order.append(name)
+
+    threads = []
+    for name in BULK, INTERACTIVE:
+        thread = threading.Thread(target=request, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: limiter.stats().waiting[name] == 1)
+    limiter.release(started)
+    for thread in threads:
+        thread.join()
+    assert order == [INTERACTIVE, BULK]
+    stats = limiter.stats()
+    assert stats.waiting == {INTERACTIVE: 0, NORMAL: 0, BULK: 0}
+    assert stats.wait_time[BULK] > stats.wait_time[INTERACTIVE] > 0
+
+
+def test_dispatcher():
+    """
+    GIVEN a dispatcher whose only slot is taken, with a bulk request waiting
+    WHEN an interactive request arrives and the slot is freed
+    THEN the interactive request gets the slot before the bulk request
+    """
+    dispatcher = Dispatcher(limit=1)
+    slot = dispatcher.slot()
+    slot.__enter__()
+    order = []
+
+    def request(name):
+        with dispatcher.slot(name):
+            order.append(name)
+
+    threads = []
+    for name in BULK, INTERACTIVE:
+        thread = threading.Thread(target=request, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: dispatcher.waiting()[name] == 1)
+    slot.__exit__(None, None, None)
+    for thread in threads:
+        thread.join()
+    assert order == [INTERACTIVE, BULK]
+    with pytest.raises(ValueError):
+        Dispatcher(limit=0)
+
+
+class FakeJira:
+    """A jira client that sends a real request for each lookup"""
+
+    def __init__(self, url, **kwargs):
+        self._session = requests.Session()
+
+    def issue(self, key):
+        self._session.get(f"https://jira.example.com/rest/api/2/issue/{key}")
+        return Mock(key=key)
+
+
+def test_default_broker_has_no_dispatcher(monkeypatch, good_config_dict):
+    """
+    GIVEN a config without max_in_flight
+    WHEN a jira broker is created from it, or with a backend passed to it
+    THEN the broker does not cap its requests in flight
+    """
+    monkeypatch.setattr(broker, "JIRA", FakeJira)
+    assert JiraBroker(config=good_config_dict).dispatcher is None
+    jira_broker = JiraBroker(config=good_config_dict, backend=Mock())
+    assert jira_broker.dispatcher is None
+    assert jira_broker.dispatch(lambda: "called") == "called"
+
+
+def test_broker_lets_interactive_requests_through_first(
+        monkeypatch, good_config_dict):
+    """
+    GIVEN a jira broker created from a config with max_in_flight set and
+        without concurrency settings, with bulk lookups taking every slot and
+        another one waiting
+    WHEN an interactive lookup arrives and a slot is freed
+    THEN the interactive lookup is sent before the waiting bulk lookup
+    """
+    monkeypatch.setattr(broker, "JIRA", FakeJira)
+    sent = []
+    finish = threading.Semaphore(0)
+
+    def send(adapter, request, **kwargs):
+        sent.append(request.url.rsplit("/", 1)[1])
+        finish.acquire()
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, "send", send)
+    max_in_flight = 4
+    config = deepcopy(good_config_dict)
+    config["jira"]["transport"] = {"max_in_flight": max_in_flight}
+    jira_broker = JiraBroker(config=config)
+    assert jira_broker.limiter is None
+
+    def lookup(key, name):
+        with priority(name):
+            jira_broker.get_issue(key)
+
+    threads = []
+
+    def start(key, name):
+        thread = threading.Thread(target=lookup, args=(key, name))
+        thread.start()
+        threads.append(thread)
+
+    for number in range(max_in_flight):
+        start(f"BULK-{number}", BULK)
+    wait_until(lambda: len(sent) == max_in_flight)
+    start("BULK-99", BULK)
+    wait_until(lambda: jira_broker.dispatcher.waiting()[BULK] == 1)
+    start("FOO-1", INTERACTIVE)
+    wait_until(lambda: jira_broker.dispatcher.waiting()[INTERACTIVE] == 1)
+    finish.release()
+    wait_until(lambda: len(sent) == max_in_flight + 1)
+    assert sent[-1] == "FOO-1"
+    for _ in range(len(threads)):
+        finish.release()
+    for thread in threads:
+        thread.join()
+    assert sent[-1] == "BULK-99"
+
+
+def test_injected_backend_calls_are_dispatched():
+    """
+    GIVEN a jira broker with a backend passed to it, whose dispatcher has
+        one slot, taken by a bulk call, and another bulk call waiting
+    WHEN an interactive call arrives and the slot is freed
+    THEN the interactive call is made before the waiting bulk call
+    """
+    jira_broker = JiraBroker(backend=Mock())
+    jira_broker.dispatcher = Dispatcher(limit=1)
+    called = []
+    finish = threading.Event()
+
+    def call(name):
+        called.append(name)
+        if name == "first":
+            finish.wait()
+
+    def dispatch(name, priority_name):
+        with priority(priority_name):
+            jira_broker.dispatch(call, name)
+
+    threads = [threading.Thread(target=dispatch, args=args) for args in
+               [("first", BULK), ("bulk", BULK), ("interactive", INTERACTIVE)]]
+    threads[0].start()
+    wait_until(lambda: called == ["first"])
+    for thread, name in zip(threads[1:], (BULK, INTERACTIVE)):
+        thread.start()
+        wait_until(lambda: jira_broker.dispatcher.waiting()[name] == 1)
+    finish.set()
+    for thread in threads:
+        thread.join()
+    assert called == ["first", "interactive", "bulk"]
+
+
+def test_nested_dispatch_reuses_slot(good_config_dict):
+    """
+    GIVEN a jira broker with a backend passed to it and a configured
+        dispatcher with one slot
+    WHEN a dispatched call dispatches another call, directly and within a
+        deadline
+    THEN the nested calls use the slot the outer call holds
+    """
+    config = deepcopy(good_config_dict)
+    config["jira"]["transport"] = {"max_in_flight": 1}
+    jira_broker = JiraBroker(config=config, backend=Mock())
+    assert jira_broker.dispatcher.limit == 1
+
+    def outer():
+        with deadline.deadline(5):
+            return [jira_broker.dispatch(lambda: "inner"),
+                    jira_broker.within_deadline(lambda: "deadline")]
+
+    assert jira_broker.dispatch(outer) == ["inner", "deadline"]
+    # The slot is free again
+    assert jira_broker.dispatch(lambda: "again") == "again"
@@ -0,0 +1,84 @@
+import threading
+from itertools import count
+from unittest.mock import Mock
+
+import pytest
+
+from bugjira import session
+from bugjira.session import ClientPool, register_lock_owner
+
+
+@pytest.fixture
+def pool():
+    counter = count()
+    return ClientPool(lambda: f"client-{next(counter)}")
+
+
+def run_in_thread(target):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(target()))
+    thread.start()
+    thread.join()
+    return results[0]
+
+
+def test_pool_client_per_thread(pool):
+    """
+    GIVEN a client pool
+    WHEN two threads that are alive at the same time ask for a client
+    THEN each gets its own client, and keeps getting the same one
+    """
+    barrier = threading.Barrier(2)
+    clients = {}
+
+    def get_clients(name):
+        clients[name] = pool.get()
+        barrier.wait()
+        assert pool.get() is clients[name]
+
+    threads = [threading.Thread(target=get_clients, args=(name,))
+               for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert clients["a"] != clients["b"]
+
+
+def test_pool_reuses_clients_of_exited_threads(pool):
+    """
+    GIVEN a client pool
+    WHEN a thread that got a client exits, and another thread asks for one
+    THEN the second thread gets the first thread's client
+    """
+    first = run_in_thread(pool.get)
+    assert pool.idle == 1
+    assert run_in_thread(pool.get) == first
+
+
+def test_pool_after_fork(pool):
+    """
+    GIVEN a client pool with a client in use and a client waiting
+    WHEN the process forks
+    THEN the child creates new clients rather than using either of them
+    """
+    idle = run_in_thread(pool.get)
+    in_use = pool.get()
+    session._after_fork_in_child()
+    client = pool.get()
+    assert client not in (idle, in_use)
+    assert run_in_thread(pool.get) not in (idle, in_use, client)
+
+
+def test_register_lock_owner():
+    """
+    GIVEN an object registered as a lock owner whose lock is held
+    WHEN the process forks
+    THEN the child has a new, released lock
+    """
+    owner = Mock()
+    owner._lock = threading.Lock()
+    owner._lock.acquire()
+    register_lock_owner(owner)
+    session._after_fork_in_child()
+    assert owner._lock.acquire(blocking=False)
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bugjira.table import (  # noqa: E402
+    CATEGORY,
+    DATETIME,
+    NUMBER,
+    CategoricalColumn,
+    IssueTable
+)
+
+
+@pytest.fixture
+def table():
+    rows = [
+        {"key": "1", "status": "NEW", "created": "2023-01-01T00:00:00Z",
+         "points": 3},
+        {"key": "2", "status": "ASSIGNED",
+         "created": "2023-01-03T00:00:00.000+0000", "points": None},
+        {"key": "3", "status": "NEW", "created": None, "points": 5},
+        {"key": "4", "status": None},
+    ]
+    return IssueTable.from_rows(rows, {"status": CATEGORY,
+                                       "created": DATETIME,
+                                       "points": NUMBER})
+
+
+def test_from_rows_column_types(table):
+    """
+    GIVEN rows of projected issues and a dict of data types
+    WHEN we build an IssueTable from them
+    THEN each column has the type matching its data type
+    AND values missing from a row are treated as missing
+    """
+    assert len(table) == 4
+    assert isinstance(table["status"], CategoricalColumn)
+    assert table["status"].categories == ["NEW", "ASSIGNED"]
+    assert table["status"].codes.tolist() == [0, 1, 0, -1]
+    assert table["created"].dtype == np.dtype("datetime64[ms]")
+    assert np.isnat(table["created"][2])
+    assert table["points"].dtype == np.float64
+    assert np.isnan(table["points"][3])
+    assert table["key"].dtype == object
+
+
+def test_from_rows_invalid_datetime():
+    """
+    GIVEN rows with a value in a datetime column that is not a timestamp
+    WHEN we build an IssueTable from them
+    THEN ValueError is raised naming the column and the value
+    """
+    with pytest.raises(ValueError, match="created.*'yesterday'"):
+        IssueTable.from_rows([{"key": "1", "created": "yesterday"}],
+                             {"created": DATETIME})
+
+
+def test_filter_and_count(table):
+    """
+    GIVEN an IssueTable
+    WHEN we filter it with a mask built from a categorical column
+    THEN only the matching rows remain
+    """
+    new = table.filter(table["status"] == "NEW")
+    assert new["key"].tolist() == ["1", "3"]
+    assert table.count(table["status"].isin(["NEW", "ASSIGNED"])) == 3
+    assert table.count(table["status"] == "CLOSED") == 0
+    assert new["status"].to_numpy().tolist() == ["NEW", "NEW"]
+
+
+def test_group_by(table):
+    """
+    GIVEN an IssueTable
+    WHEN we group it by a categorical column
+    THEN per-group aggregates are computed, leaving out missing values
+    """
+    groups = table.group_by("status")
+    assert groups.count() == {"NEW": 2, "ASSIGNED": 1}
+    assert groups.sum("points") == {"NEW": 8.0, "ASSIGNED": 0.0}
+    assert groups.max("points")["NEW"] == 5.0
+    assert groups.min("created")["NEW"] == datetime(2023, 1, 1)
+    assert groups.mean("points")["NEW"] == 4.0
+
+
+def test_group_by_object_column(table):
+    """
+    GIVEN an IssueTable
+    WHEN we group it by an untyped column
+    THEN the groups are the distinct values of the column
+    """
+    assert table.group_by("key").count() == {"1": 1, "2": 1, "3": 1, "4": 1}
+
+
+def test_group_by_list_column():
+    """
+    GIVEN an IssueTable with a column of lists, and one with a dict
+    WHEN we group by them
+    THEN the lists are grouped as tuples of their items
+    AND grouping by the dict column raises ValueError
+    """
+    table = IssueTable.from_rows([
+        {"key": "1", "keywords": ["a", "b"], "flags": {"x": 1}},
+        {"key": "2", "keywords": ["a", "b"]},
+        {"key": "3", "keywords": []}])
+    assert table.group_by("keywords").count() == {(): 1, ("a", "b"): 2}
+    with pytest.raises(ValueError, match="flags"):
+        table.group_by("flags")
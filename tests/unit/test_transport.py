@@ -0,0 +1,80 @@
+import pytest
+import requests
+from pydantic import ValidationError
+
+from bugjira.common import JIRA
+from bugjira.config import TransportConfig
+from bugjira.transport import (
+    configure_session,
+    get_pool_stats,
+    get_timeout,
+    get_transport_config
+)
+
+
+def test_get_transport_config():
+    """
+    GIVEN config sections with and without transport settings
+    WHEN we get their transport config
+    THEN configured settings are used and the rest are defaults
+    """
+    assert get_transport_config({}) == TransportConfig()
+    transport = get_transport_config({"transport": {"pool_maxsize": 32}})
+    assert transport.pool_maxsize == 32
+    assert transport.pool_connections == 10
+    with pytest.raises(ValidationError):
+        get_transport_config({"transport": {"pool_maxsize": 0}})
+    with pytest.raises(ValidationError):
+        get_transport_config({"transport": {"keepalive": True}})
+
+
+def test_get_timeout():
+    """
+    GIVEN transport configs with and without timeouts
+    WHEN we get their requests timeout
+    THEN it is a (connect, read) tuple, or None if neither is set
+    """
+    assert get_timeout(TransportConfig()) is None
+    assert get_timeout(TransportConfig(connect_timeout=3.05)) == (3.05, None)
+    assert get_timeout(TransportConfig(connect_timeout=3,
+                                       read_timeout=30)) == (3, 30)
+
+
+def test_configure_session():
+    """
+    GIVEN a requests session
+    WHEN we configure it with transport settings
+    THEN its adapters, Accept-Encoding header and proxies are set
+    """
+    session = requests.Session()
+    configure_session(session, TransportConfig(
+        pool_connections=2, pool_maxsize=16, pool_block=True, gzip=False,
+        proxy="http://proxy.example.com:3128"))
+    adapter = session.get_adapter("https://jira.example.com")
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 16
+    assert adapter._pool_block is True
+    assert session.headers["Accept-Encoding"] == "identity"
+    assert session.proxies == {"http": "http://proxy.example.com:3128",
+                               "https": "http://proxy.example.com:3128"}
+
+
+def test_get_pool_stats():
+    """
+    GIVEN sessions whose adapters have connection pools for a host
+    WHEN we get their pool statistics
+    THEN there is one entry for the host, summed over the sessions
+    """
+    sessions = [requests.Session(), requests.Session()]
+    for session in sessions:
+        configure_session(session, TransportConfig(pool_maxsize=4))
+        session.get_adapter("https://jira.example.com").poolmanager\
+            .connection_from_url("https://jira.example.com")
+    stats = get_pool_stats(sessions, JIRA, "partner")
+    assert len(stats) == 1
+    assert stats[0].host == "jira.example.com:443"
+    assert stats[0].instance == "partner"
+    assert stats[0].clients == 2
+    assert stats[0].maxsize == 8
+    assert stats[0].connections == 0
+    assert stats[0].idle == 0
@@ -1,6 +1,16 @@
+from datetime import datetime, timezone
+from xmlrpc.client import DateTime
+
 import pytest
 
-from bugjira.util import is_bugzilla_key, is_jira_key
+from bugjira.util import (
+    bugzilla_key_from_url,
+    is_bugzilla_key,
+    is_jira_key,
+    jira_update_value,
+    normalize_value,
+    parse_datetime
+)
 
 
 def test_is_key_with_non_str():
@@ -52,3 +62,76 @@ def test_is_jira_key_false(bad_jira_keys):
     """
     for key in bad_jira_keys:
         assert is_jira_key(key) is False
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("https://bugzilla.redhat.com/show_bug.cgi?id=123456", "123456"),
+    ("https://bugzilla.redhat.com/show_bug.cgi?id=alias", None),
+    ("https://issues.redhat.com/browse/FOO-1", None),
+])
+def test_bugzilla_key_from_url(url, expected):
+    """
+    GIVEN the bugzilla_key_from_url method
+    WHEN it is called with a URL
+    THEN it returns the bug id referenced by a show_bug URL, or None
+    """
+    assert bugzilla_key_from_url(url) == expected
+
+
+@pytest.mark.parametrize("value,expected", [
+    (1, 1),
+    (DateTime("20230102T03:04:05"), "2023-01-02T03:04:05"),
+    (datetime(2023, 1, 2), "2023-01-02T00:00:00"),
+    ({"self": "https://jira/rest/api/2/user?username=a", "name": "a",
+      "displayName": "A"}, "a"),
+    ([{"self": "https://jira/rest/api/2/option/1", "value": "x"}], ["x"]),
+    ({"name": "needinfo", "status": "?"},
+     {"name": "needinfo", "status": "?"}),
+])
+def test_normalize_value(value, expected):
+    """
+    GIVEN the normalize_value method
+    WHEN it is called with a field value
+    THEN dates become ISO strings and jira entities are reduced to one value
+    """
+    assert normalize_value(value) == expected
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("summary", "summary"),
+    ({"self": "https://jira/rest/api/2/user?username=a", "name": "a",
+      "displayName": "A"}, {"name": "a"}),
+    ([{"self": "https://jira/rest/api/2/component/1", "id": "1",
+       "name": "ui"}], [{"name": "ui"}]),
+    ({"self": "https://jira/rest/api/2/option/1", "value": "x"},
+     {"value": "x"}),
+])
+def test_jira_update_value(value, expected):
+    """
+    GIVEN the jira_update_value method
+    WHEN it is called with a jira field value
+    THEN entities are reduced to a reference that jira accepts in an edit
+    """
+    assert jira_update_value(value) == expected
+
+
+@pytest.mark.parametrize("value,expected", [
+    (None, None),
+    (DateTime("20230102T03:04:05"),
+     datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    ("2023-01-02T03:04:05Z",
+     datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    ("2023-01-02T05:04:05.000+0200",
+     datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    ("2023-01-02T03:04:05.000+0000",
+     datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    ("2023-01-02", datetime(2023, 1, 2, tzinfo=timezone.utc)),
+    (datetime(2023, 1, 2), datetime(2023, 1, 2, tzinfo=timezone.utc)),
+])
+def test_parse_datetime(value, expected):
+    """
+    GIVEN the parse_datetime method
+    WHEN it is called with a bugzilla or jira timestamp
+    THEN it returns the timestamp as a timezone-aware UTC datetime
+    """
+    assert parse_datetime(value) == expected
@@ -0,0 +1,270 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, create_autospec
+
+import pytest
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+import bugjira.watch as watch
+from bugjira.bugjira import Bugjira
+from bugjira.field import BugzillaField
+from bugjira.watch import FieldChange, Watcher
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def bugs():
+    """The bugs on the fake bugzilla server, by id"""
+    return {}
+
+
+@pytest.fixture
+def watched(good_config_dict, bugs):
+    """A Bugjira object with a fake bugzilla backend serving bugs. Bugs are
+    reported as updated whenever they are in the updated set.
+    """
+    bugjira = Bugjira(config_dict=good_config_dict)
+    bugjira._bugzilla_broker._fields = [BugzillaField(name="status"),
+                                        BugzillaField(name="product")]
+    bugjira.updated = set()
+    backend = bugjira.bugzilla
+    backend.getbugs.side_effect = lambda keys, permissive: [
+        bugs[key] for key in keys if key in bugs]
+    backend.query.side_effect = lambda query: [
+        bugs[key] for key in query["id"] if key in bugjira.updated]
+    return bugjira
+
+
+@pytest.fixture
+def polled(watched, monkeypatch):
+    """watched, without a polling thread, so that tests poll by hand"""
+    monkeypatch.setattr(Watcher, "_start", lambda self: None)
+    return watched
+
+
+def test_watch_reports_changes(polled, bugs):
+    """
+    GIVEN two subscriptions to overlapping bugs
+    WHEN the bugs are polled before and after a change
+    THEN the first poll only records the bugs, each later poll sends one
+        query for all the keys, and only the subscribers of the changed bug
+        are called, with the changed fields
+    """
+    bugs.update({key: Mock(id=int(key), status="NEW", product="foo")
+                 for key in ("1", "2", "3")})
+    first, second = [], []
+    polled.watch(["1", "2"], first.append)
+    polled.watch(["2", "3"], second.append)
+    assert polled._watcher.poll() == 0
+    assert polled.bugzilla.getbugs.call_count == 1
+    assert polled.bugzilla.query.call_count == 0
+    bugs["3"].status = "ON_QA"
+    polled.updated.update({"2", "3"})
+    assert polled._watcher.poll() == 1
+    assert polled.bugzilla.query.call_count == 1
+    assert sorted(polled.bugzilla.query.call_args.args[0]["id"]) == [
+        "1", "2", "3"]
+    assert first == []
+    assert [(change.key, change.changes) for change in second] == [
+        ("3", {"status": FieldChange(old="NEW", new="ON_QA")})]
+    # Reported again by the updated-since overlap, but unchanged
+    assert polled._watcher.poll() == 0
+    assert len(second) == 1
+
+
+def test_watch_key_added_mid_interval(polled, bugs, monkeypatch):
+    """
+    GIVEN a key recorded between two updates polls
+    WHEN it changes before the next updates poll
+    THEN that poll asks for the changes since the key was recorded, and
+        reports the change
+    """
+    now = [datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)]
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[0]
+
+    monkeypatch.setattr(watch, "datetime", Clock)
+    changed_at = {}
+    polled.bugzilla.query.side_effect = lambda query: [
+        bugs[key] for key in query["id"] if key in changed_at and
+        changed_at[key].strftime("%Y-%m-%dT%H:%M:%SZ") >=
+        query["last_change_time"]]
+    polled._watcher.overlap = 0
+    bugs["1"] = Mock(id=1, status="NEW", product="foo")
+    changes = []
+    polled.watch(["1"], changes.append)
+    polled._watcher._poll(updates=False)
+    now[0] += timedelta(seconds=30)
+    bugs["1"].status = "ASSIGNED"
+    changed_at["1"] = now[0]
+    now[0] += timedelta(seconds=30)
+    assert polled._watcher.poll() == 1
+    assert polled.bugzilla.query.call_args.args[0]["last_change_time"] == \
+        "2024-01-01T12:00:00Z"
+    assert [change.changes for change in changes] == [
+        {"status": FieldChange(old="NEW", new="ASSIGNED")}]
+
+
+def test_watch_fields(polled, bugs):
+    """
+    GIVEN a subscription to some of a bug's fields
+    WHEN another field changes
+    THEN the subscriber is not called
+    """
+    bugs["1"] = Mock(id=1, status="NEW", product="foo")
+    changes = []
+    polled.watch(["1"], changes.append, fields=["product"])
+    polled._watcher.poll()
+    bugs["1"].status = "ASSIGNED"
+    polled.updated.add("1")
+    polled._watcher.poll()
+    assert changes == []
+    bugs["1"].product = "bar"
+    polled._watcher.poll()
+    assert [change.changes for change in changes] == [
+        {"product": FieldChange(old="foo", new="bar")}]
+
+
+def test_watch_add_and_remove(polled, bugs):
+    """
+    GIVEN a running subscription
+    WHEN keys are added and removed
+    THEN added keys are recorded at the next poll and then watched, and
+        removed keys are no longer queried or reported
+    """
+    bugs.update({key: Mock(id=int(key), status="NEW", product="foo")
+                 for key in ("1", "2")})
+    changes = []
+    subscription = polled.watch(["1"], changes.append)
+    polled._watcher.poll()
+    subscription.add(["2"])
+    subscription.remove(["1"])
+    polled._watcher.poll()
+    assert polled.bugzilla.getbugs.call_args.args[0] == ["2"]
+    assert polled.bugzilla.query.call_count == 0
+    for bug in bugs.values():
+        bug.status = "CLOSED"
+    polled.updated.update(bugs)
+    polled._watcher.poll()
+    assert polled.bugzilla.query.call_args.args[0]["id"] == ["2"]
+    assert [change.key for change in changes] == ["2"]
+    subscription.cancel()
+    assert polled._watcher.poll() == 0
+    with pytest.raises(ValueError):
+        subscription.add(["1"])
+
+
+def test_watch_errors(polled, bugs):
+    """
+    GIVEN a subscription with an error handler
+    WHEN a poll fails, and then the callback fails
+    THEN both errors are passed to the handler, and the failed poll's
+        changes are reported by the next one
+    """
+    bugs["1"] = Mock(id=1, status="NEW", product="foo")
+    errors = []
+
+    def callback(change):
+        raise RuntimeError("callback failed")
+
+    polled.watch(["1"], callback, on_error=errors.append)
+    polled._watcher.poll()
+    bugs["1"].status = "ON_QA"
+    polled.updated.add("1")
+    query = polled.bugzilla.query.side_effect
+    polled.bugzilla.query.side_effect = ConnectionError("down")
+    assert polled._watcher.poll() == 0
+    polled.bugzilla.query.side_effect = query
+    assert polled._watcher.poll() == 1
+    assert [type(error) for error in errors] == [
+        broker.BrokerLookupException, RuntimeError]
+
+
+def test_watch_validation(polled):
+    """
+    GIVEN a Bugjira object
+    WHEN we watch with a bad interval, key or field
+    THEN ValueError is raised and nothing is watched
+    """
+    with pytest.raises(ValueError):
+        polled.watch(["1"], print, interval=0)
+    with pytest.raises(ValueError):
+        polled.watch(["not a key"], print)
+    with pytest.raises(ValueError):
+        polled.watch(["1"], print, fields=["nonexistent"])
+    assert polled._watcher._subscriptions == []
+
+
+def test_watch_thread(watched, bugs):
+    """
+    GIVEN a subscription with a short interval
+    WHEN a watched bug changes
+    THEN the polling thread calls the subscriber, and stops once the
+        subscription is cancelled
+    """
+    bugs["1"] = Mock(id=1, status="NEW", product="foo")
+    changed = threading.Event()
+    subscription = watched.watch(["1"], lambda change: changed.set(),
+                                 interval=0.01)
+    deadline = time.monotonic() + 5
+    while "1" not in watched._watcher._snapshots:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    bugs["1"].status = "ON_QA"
+    watched.updated.add("1")
+    assert changed.wait(5)
+    thread = watched._watcher._thread
+    subscription.cancel()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert watched._watcher._thread is None
+
+
+def test_watch_thread_survives_errors(watched, bugs, monkeypatch):
+    """
+    GIVEN a subscription with a short interval and an error handler
+    WHEN a poll fails outside the backend lookups, and the handler fails too
+    THEN the polling thread keeps running and reports the change on the
+        next poll
+    """
+    bugs["1"] = Mock(id=1, status="NEW", product="foo")
+    watcher = watched._watcher
+    poll = watcher._poll
+    failures = []
+
+    def failing_poll(updates):
+        if not failures:
+            failures.append(updates)
+            raise RuntimeError("poll failed")
+        return poll(updates)
+
+    def on_error(error):
+        raise error
+
+    monkeypatch.setattr(watcher, "_poll", failing_poll)
+    changed = threading.Event()
+    subscription = watched.watch(["1"], lambda change: changed.set(),
+                                 interval=0.01, on_error=on_error)
+    deadline = time.monotonic() + 5
+    while "1" not in watcher._snapshots:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    bugs["1"].status = "ON_QA"
+    watched.updated.add("1")
+    assert changed.wait(5)
+    assert failures
+    thread = watcher._thread
+    subscription.cancel()
+    thread.join(5)
+    assert watcher._thread is None
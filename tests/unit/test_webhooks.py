@@ -0,0 +1,232 @@
+import http.client
+import json
+import os
+from unittest.mock import Mock, create_autospec
+
+import pytest
+import requests
+from bugzilla import Bugzilla
+from jira import JIRA
+
+import bugjira.broker as broker
+from bugjira.bugjira import Bugjira
+from bugjira.common import BUGZILLA, JIRA as JIRA_TYPE
+from bugjira.config import BugzillaPushConfig
+from bugjira.field import BugzillaField, JiraField
+from bugjira.watch import FieldChange, Watcher
+from bugjira.webhooks import (
+    CREATED,
+    DELETED,
+    UPDATED,
+    ChangeEvent,
+    parse_bugzilla_event,
+    parse_jira_event
+)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr(broker, "Bugzilla", create_autospec(Bugzilla))
+    monkeypatch.setattr(broker, "JIRA", create_autospec(JIRA))
+
+
+@pytest.fixture
+def payloads(config_defaults):
+    """Load a recorded webhook payload by name"""
+    def load(name):
+        with open(os.path.join(config_defaults, "data", "webhooks",
+                               f"{name}.json")) as payload:
+            return json.load(payload)
+    return load
+
+
+@pytest.fixture
+def pushed(good_config_dict, monkeypatch):
+    """A Bugjira object with an issue cache and a webhook token, without a
+    polling thread
+    """
+    monkeypatch.setattr(Watcher, "_start", lambda self: None)
+    bugjira = Bugjira(config_dict=dict(
+        good_config_dict, cache={"enabled": True},
+        webhooks={"token": "s3cret"}))
+    bugjira.jira._session = Mock(headers={}, proxies={})
+    bugjira.jira._options = {"server": "https://jira.example.com"}
+    return bugjira
+
+
+def test_parse_jira_event(payloads):
+    """
+    GIVEN a recorded jira issue_updated webhook payload
+    WHEN we parse it
+    THEN the event has the issue's key, its changed fields and its JSON
+    """
+    event = parse_jira_event(payloads("jira_issue_updated"), "partner")
+    assert (event.backend, event.instance, event.key, event.action) == (
+        JIRA_TYPE, "partner", "FOO-1", UPDATED)
+    assert event.changes == {
+        "status": FieldChange(old="To Do", new="In Progress")}
+    assert event.time.isoformat() == "2024-05-01T12:30:00+00:00"
+    assert event.raw["fields"]["summary"] == "Crash on startup"
+
+
+def test_parse_other_jira_events():
+    """
+    GIVEN jira webhook payloads that are not issue events
+    WHEN we parse them
+    THEN events about an issue are updates without its JSON, and others
+        raise ValueError
+    """
+    event = parse_jira_event({"webhookEvent": "comment_created",
+                              "issue": {"key": "FOO-1", "fields": {}}})
+    assert (event.key, event.action, event.raw) == ("FOO-1", UPDATED, None)
+    event = parse_jira_event({"webhookEvent": "jira:issue_deleted",
+                              "issue": {"key": "FOO-1", "fields": {}}})
+    assert event.action == DELETED
+    for payload in ([], {"webhookEvent": "project_created"},
+                    {"webhookEvent": "jira:issue_updated", "issue": {}}):
+        with pytest.raises(ValueError):
+            parse_jira_event(payload)
+
+
+def test_parse_bugzilla_event(payloads):
+    """
+    GIVEN bugzilla push payloads in the default and a custom format
+    WHEN we parse them
+    THEN the events have the bug id, the action and the changed fields
+    """
+    event = parse_bugzilla_event(payloads("bugzilla_bug_modify"))
+    assert (event.backend, event.key, event.action) == (
+        BUGZILLA, "123456", UPDATED)
+    assert event.changes == {"status": FieldChange(old="NEW",
+                                                   new="ASSIGNED")}
+    assert event.time.isoformat() == "2024-05-01T12:30:00+00:00"
+    push = BugzillaPushConfig(key="bug_id", action="type", time="when",
+                              changes="diff", field="name", old="from",
+                              new="to", created=["new"])
+    event = parse_bugzilla_event(
+        {"bug_id": 7, "type": "new", "when": "not a time",
+         "diff": [{"name": "product", "from": "", "to": "foo"}, "junk"]},
+        push)
+    assert (event.key, event.action, event.time) == ("7", CREATED, None)
+    assert event.changes == {"product": FieldChange(old="", new="foo")}
+    with pytest.raises(ValueError):
+        parse_bugzilla_event({"event": {}})
+
+
+def test_apply_event_updates_cache(pushed, payloads):
+    """
+    GIVEN a Bugjira object with an issue cache
+    WHEN jira and bugzilla events are applied
+    THEN an event carrying the whole issue replaces the cached issue, and
+        other events drop it
+    """
+    pushed.bugzilla.getbug.return_value = Mock(id=123456)
+    pushed.get_issue("123456")
+    pushed.get_issue("123456")
+    assert pushed.bugzilla.getbug.call_count == 1
+    pushed.apply_event(parse_bugzilla_event(payloads("bugzilla_bug_modify")))
+    pushed.get_issue("123456")
+    assert pushed.bugzilla.getbug.call_count == 2
+    pushed.apply_event(parse_jira_event(payloads("jira_issue_updated")))
+    issue = pushed.get_issue("FOO-1")
+    assert issue.jira_issue.fields.summary == "Crash on startup"
+    pushed.jira.issue.assert_not_called()
+    pushed.apply_event(ChangeEvent(backend=JIRA_TYPE, key="FOO-1",
+                                   action=DELETED))
+    assert pushed.cache.get(JIRA_TYPE, None, "FOO-1") is None
+    with pytest.raises(ValueError):
+        pushed.apply_event(ChangeEvent(backend=JIRA_TYPE, instance="nope",
+                                       key="FOO-1"))
+
+
+def test_add_comment_invalidates_cache(pushed):
+    """
+    GIVEN a Bugjira object with an issue cache holding a bug
+    WHEN a comment is added to the bug
+    THEN the bug is dropped from the cache
+    """
+    pushed.bugzilla.getbug.return_value = Mock(id=123456)
+    issue = pushed.get_issue("123456")
+    pushed.add_comment(issue, "Still crashes")
+    assert pushed.cache.get(BUGZILLA, None, "123456") is None
+
+
+def test_apply_event_with_raw_bugzilla_json(pushed):
+    """
+    GIVEN a Bugjira object with an issue cache
+    WHEN a bugzilla event carrying raw JSON is applied
+    THEN ValueError is raised, since bugzilla issues are not built from it
+    AND jira brokers build issues from raw JSON with a public method
+    """
+    with pytest.raises(ValueError):
+        pushed.apply_event(ChangeEvent(backend=BUGZILLA, key="1",
+                                       raw={"id": 1}))
+    issue = pushed._jira_broker.issue_from_raw(
+        {"key": "FOO-2", "fields": {"summary": "pushed"}})
+    assert issue.key == "FOO-2"
+    assert issue.jira_issue.fields.summary == "pushed"
+    with pytest.raises(ValueError):
+        pushed._jira_broker.issue_from_raw({"fields": {}})
+
+
+def test_apply_event_wakes_watchers(pushed, payloads):
+    """
+    GIVEN watched jira and bugzilla issues
+    WHEN events about them are applied
+    THEN a jira event carrying the issue is reported to the watchers at
+        once, and a bugzilla event asks the polling thread to poll now
+    """
+    pushed._jira_broker._fields = [JiraField(name="Summary",
+                                             jira_field_id="summary")]
+    pushed._bugzilla_broker._fields = [BugzillaField(name="status")]
+    pushed.jira.search_issues.return_value = [Mock(
+        key="FOO-1", fields=Mock(summary="Crash"))]
+    pushed.bugzilla.getbugs.return_value = [Mock(id=123456, status="NEW")]
+    changes = []
+    pushed.watch(["FOO-1", "123456"], changes.append)
+    pushed._watcher.poll()
+    pushed.apply_event(parse_jira_event(payloads("jira_issue_updated")))
+    assert [(change.key, change.changes) for change in changes] == [
+        ("FOO-1", {"Summary": FieldChange(old="Crash",
+                                          new="Crash on startup")})]
+    assert not pushed._watcher._urgent
+    pushed.apply_event(parse_bugzilla_event(payloads("bugzilla_bug_modify")))
+    assert pushed._watcher._urgent
+    assert pushed._watcher._wake.is_set()
+
+
+def test_receiver(pushed, payloads):
+    """
+    GIVEN a running webhook receiver
+    WHEN recorded payloads are posted to it
+    THEN events with the right token and path are applied, and others are
+        refused
+    AND a malformed Content-Length is refused
+    """
+    pushed.cache.put(JIRA_TYPE, None, "FOO-1", "stale")
+    pushed.cache.put(BUGZILLA, None, "123456", "stale")
+    with pushed.serve_webhooks() as receiver:
+        def post(path, payload):
+            return requests.post(receiver.url + path, data=payload,
+                                 timeout=5).status_code
+
+        jira = json.dumps(payloads("jira_issue_updated"))
+        bugzilla = json.dumps(payloads("bugzilla_bug_modify"))
+        assert post("/jira", jira) == 403
+        assert post("/jira?token=wrong", jira) == 403
+        assert post("/github?token=s3cret", jira) == 404
+        assert post("/jira/nope?token=s3cret", jira) == 404
+        assert post("/jira?token=s3cret", "{not json") == 400
+        for length in ("many", "-1"):
+            connection = http.client.HTTPConnection(
+                receiver.host, receiver.port, timeout=5)
+            connection.putrequest("POST", "/jira?token=s3cret")
+            connection.putheader("Content-Length", length)
+            connection.endheaders()
+            assert connection.getresponse().status == 400
+            connection.close()
+        assert pushed.cache.get(JIRA_TYPE, None, "FOO-1") == "stale"
+        assert post("/jira?token=s3cret", jira) == 204
+        assert post("/bugzilla?token=s3cret", bugzilla) == 204
+    assert pushed.cache.get(JIRA_TYPE, None, "FOO-1").key == "FOO-1"
+    assert pushed.cache.get(BUGZILLA, None, "123456") is None